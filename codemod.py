@@ -0,0 +1,636 @@
+#!/usr/bin/env python3
+"""Apply declarative constructor-migration rules to Python source trees.
+
+Replaces the one-off regex fixers (fix_test_report.py / fix_test_report2.py).
+Each file is parsed once with ``ast``. A single visitor walks the tree and
+records every matching call and statement together with its enclosing
+function. Edits are then spliced into the original text at the exact node
+offsets, so formatting, comments and quoting outside the edited arguments
+are untouched. The result is re-parsed before it is written, and a file
+whose rewrite would not parse is left alone.
+
+Rule file (JSON)::
+
+    {
+      "include": ["test_*.py"],
+      "rules": [
+        {"name": "task-status-flat", "call": "TaskStatus", "ops": [
+            {"flatten": "issue", "fields": {"issue_key": "\\"TEST-X\\"", "summary": "\\"Task\\""}},
+            {"rename": {"days_overdue": "days_late"}},
+            {"enum_to_str": "risk_level", "enum": "RiskLevel", "case": "lower"}]},
+        {"name": "report-health", "call": "ReportData", "ops": [
+            {"replace": "metrics", "with": "health", "cases": [
+                {"value": "{}", "function": "test_format_summary_basic", "source": "ProjectHealth(...)"}]}]},
+        {"name": "drop-issue-copies", "remove_statement": {"target": "task.*", "value": "task.issue.*"}}
+      ]
+    }
+
+Call operations (keyword arguments of calls whose callee name or dotted
+suffix equals ``call``):
+    rename       {"old": "new"} keyword renames
+    flatten      replace ``arg=Inner(a=.., b=..)`` with ``a=.., b=..`` (missing fields use the default source)
+    enum_to_str  ``arg=Enum.MEMBER`` -> ``arg="member"`` (case: lower / upper / keep)
+    replace      swap ``arg=<value>`` for ``with=<source>``; each case may match on the value
+                 (compared as an AST, so spacing/quotes do not matter) and/or the enclosing
+                 function name (fnmatch pattern); first matching case wins
+    remove       drop the keyword argument
+    add          {"arg": .., "source": ..} add the keyword when it is missing
+
+Statement removal matches assignments whose target (and optionally value)
+source matches an fnmatch pattern. A loop or ``with`` block left empty is
+removed as a whole; other emptied blocks get ``pass``.
+
+Usage:
+    python codemod.py codemods/bk_track_flat_models.json .claude/skills/bk-track/tests
+    python codemod.py rules.json src tests --include "*.py" --workers 8
+    python codemod.py rules.json tests --dry-run -v
+    python codemod.py rules.json tests --diff > migration.patch
+    python codemod.py rules.json tests --check      # CI: exit 1 if anything is left to migrate
+
+Incremental runs: a manifest (``.codemod-manifest.json``) records, per rule-set
+version, the size, mtime and content hash of every file that ended a run clean.
+On the next run such a file is skipped without reading (same size and mtime)
+or without parsing (same hash). Only files with real edits are written, each
+atomically through a temp file and ``os.replace``, so untouched files keep
+their mtime and pytest caches stay valid.
+"""
+
+import argparse
+import ast
+import difflib
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import re
+import stat
+import sys
+import time
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MANIFEST = ".codemod-manifest.json"
+MAX_PASSES = 5  # Nested matches (a call inside an edited argument) are picked up on the next pass
+LOOP_STATEMENTS = (ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith)
+
+
+class RuleError(ValueError):
+    """Invalid rule file."""
+
+
+def load_rules(rules_file):
+    """Read and validate a rule file; returns the parsed dict."""
+    with open(rules_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    for index, rule in enumerate(spec.get("rules", [])):
+        rule.setdefault("name", f"rule-{index + 1}")
+        if ("call" in rule) == ("remove_statement" in rule):
+            raise RuleError(f"{rule['name']}: needs exactly one of 'call' or 'remove_statement'")
+        for op in rule.get("ops", []):
+            known = {"rename", "flatten", "enum_to_str", "replace", "remove", "add"} & set(op)
+            if len(known) != 1:
+                raise RuleError(f"{rule['name']}: cannot tell the operation of {op}")
+            for case in op.get("cases", []):
+                if "value" in case:
+                    case["value_dump"] = _dump_source(case["value"], rule["name"])
+    return spec
+
+
+def _dump_source(source, rule_name):
+    try:
+        return ast.dump(ast.parse(source, mode="eval").body)
+    except SyntaxError as e:
+        raise RuleError(f"{rule_name}: cannot parse {source!r}: {e}") from None
+
+
+# ---------------------------------------------------------------- source positions
+
+
+class Source:
+    """Source text plus conversion from ast (line, utf-8 byte column) to string offsets."""
+
+    def __init__(self, text):
+        self.text = text
+        self.newline = "\r\n" if "\r\n" in text else "\n"
+        # ast counts \r\n, \r and \n as line ends (unlike str.splitlines)
+        self.line_starts = [0] + [m.end() for m in re.finditer(r"\r\n|\r|\n", text)]
+
+    def offset(self, lineno, col):
+        start = self.line_starts[lineno - 1]
+        end = self.line_starts[lineno] if lineno < len(self.line_starts) else len(self.text)
+        return start + len(self.text[start:end].encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def span(self, node):
+        return (self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset))
+
+    def segment(self, node):
+        start, end = self.span(node)
+        return self.text[start:end]
+
+    def line_span(self, node):
+        """Whole lines of a statement when nothing else shares them (else just the node span)."""
+        start, end = self.span(node)
+        line_start = self.line_starts[node.lineno - 1]
+        line_end = self.line_starts[node.end_lineno] if node.end_lineno < len(self.line_starts) else len(self.text)
+        before = self.text[line_start:start]
+        after = self.text[end:line_end]
+        if before.strip() or not re.fullmatch(r"[ \t]*(#[^\r\n]*)?(\r\n|\r|\n)?", after):
+            return start, end
+        return line_start, line_end
+
+    def indent_of(self, node):
+        line_start = self.line_starts[node.lineno - 1]
+        prefix = self.text[line_start:self.offset(node.lineno, node.col_offset)]
+        return prefix if not prefix.strip() else None
+
+
+# ---------------------------------------------------------------- one-pass collection
+
+
+def _dotted(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return f"{base}.{node.attr}" if base else node.attr
+    return None
+
+
+class Collector(ast.NodeVisitor):
+    """One walk over the tree: matching calls and statements with their enclosing function."""
+
+    def __init__(self, rules, source):
+        self.call_rules = {}
+        for rule in rules:
+            if "call" in rule:
+                self.call_rules.setdefault(rule["call"].rsplit(".", 1)[-1], []).append(rule)
+        self.statement_rules = [rule for rule in rules if "remove_statement" in rule]
+        self.source = source
+        self.scope = []
+        self.calls = []       # (rule, call node, function name)
+        self.statements = []  # (rule, statement node)
+        self.parents = {}     # id(statement) -> (parent node, body field)
+
+    def _visit_scope(self, node):
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = _visit_scope
+
+    def generic_visit(self, node):
+        for field in ("body", "orelse", "finalbody"):
+            for child in getattr(node, field, None) or ():
+                if isinstance(child, ast.stmt):
+                    self.parents[id(child)] = (node, field)
+        super().generic_visit(node)
+
+    def visit_Call(self, node):
+        name = _dotted(node.func)
+        for rule in self.call_rules.get(name.rsplit(".", 1)[-1] if name else None, ()):
+            if name == rule["call"] or name.endswith("." + rule["call"]):
+                self.calls.append((rule, node, self._function()))
+        self.generic_visit(node)
+
+    def _visit_assign(self, node):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        target_sources = [self.source.segment(target) for target in targets]
+        value_source = self.source.segment(node.value) if node.value is not None else ""
+        for rule in self.statement_rules:
+            pattern = rule["remove_statement"]
+            if not any(fnmatch.fnmatchcase(target, pattern["target"]) for target in target_sources):
+                continue
+            if "value" in pattern and not fnmatch.fnmatchcase(value_source, pattern["value"]):
+                continue
+            self.statements.append((rule, node))
+            break
+        self.generic_visit(node)
+
+    visit_Assign = visit_AnnAssign = visit_AugAssign = _visit_assign
+
+    def _function(self):
+        """Innermost enclosing function/method name."""
+        return self.scope[-1] if self.scope else None
+
+
+# ---------------------------------------------------------------- edits
+
+
+def _keyword(call, name):
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword
+    return None
+
+
+def _arguments(call):
+    """Positional and keyword arguments in source order."""
+    return sorted(list(call.args) + list(call.keywords), key=lambda node: (node.lineno, node.col_offset))
+
+
+def _remove_argument(source, call, node):
+    """Edit deleting one argument together with its separating comma."""
+    items = _arguments(call)
+    index = items.index(node)
+    start, end = source.span(node)
+    if index + 1 < len(items):
+        return (start, source.span(items[index + 1])[0], "")
+    if index > 0:
+        return (source.span(items[index - 1])[1], end, "")
+    # Only argument: clear up to the closing parenthesis (drops a trailing comma too)
+    return (start, source.span(call)[1] - 1, "")
+
+
+def _joiner(source, node):
+    """Separator for arguments replacing node: one per line if node sat on its own line."""
+    indent = source.indent_of(node)
+    _, end = source.span(node)
+    line_end = source.line_starts[node.end_lineno] if node.end_lineno < len(source.line_starts) else len(source.text)
+    own_line = re.fullmatch(r",?[ \t]*(#[^\r\n]*)?(\r\n|\r|\n)?", source.text[end:line_end]) is not None
+    return f",{source.newline}{indent}" if indent is not None and own_line else ", "
+
+
+def _string_literal(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def call_edits(source, rule, call, function):
+    """Edits (start, end, replacement) for one matched call."""
+    edits = []
+    for op in rule.get("ops", []):
+        if "rename" in op:
+            for old, new in op["rename"].items():
+                keyword = _keyword(call, old)
+                if keyword is not None and _keyword(call, new) is None:
+                    start, _ = source.span(keyword)
+                    edits.append((start, start + len(old), new))
+        elif "flatten" in op:
+            keyword = _keyword(call, op["flatten"])
+            if keyword is None:
+                continue
+            inner = {k.arg: source.segment(k.value) for k in getattr(keyword.value, "keywords", ()) if k.arg}
+            parts = [f"{field}={inner.get(field, default)}" for field, default in op["fields"].items()
+                     if field in inner or default is not None]
+            start, end = source.span(keyword)
+            edits.append((start, end, _joiner(source, keyword).join(parts)) if parts
+                         else _remove_argument(source, call, keyword))
+        elif "enum_to_str" in op:
+            keyword = _keyword(call, op["enum_to_str"])
+            value = keyword.value if keyword is not None else None
+            if isinstance(value, ast.Attribute) and (_dotted(value.value) or "").rsplit(".", 1)[-1] == op["enum"]:
+                member = value.attr
+                member = {"lower": member.lower(), "upper": member.upper()}.get(op.get("case", "lower"), member)
+                start, end = source.span(value)
+                edits.append((start, end, _string_literal(member)))
+        elif "replace" in op:
+            keyword = _keyword(call, op["replace"])
+            if keyword is None:
+                continue
+            dumped = ast.dump(keyword.value)
+            for case in op["cases"]:
+                if "value_dump" in case and case["value_dump"] != dumped:
+                    continue
+                if "function" in case and not (function and fnmatch.fnmatchcase(function, case["function"])):
+                    continue
+                start, end = source.span(keyword)
+                edits.append((start, end, f"{op.get('with', op['replace'])}={case['source']}"))
+                break
+        elif "remove" in op:
+            keyword = _keyword(call, op["remove"])
+            if keyword is not None:
+                edits.append(_remove_argument(source, call, keyword))
+        elif "add" in op:
+            if _keyword(call, op["add"]) is None:
+                items = _arguments(call)
+                text = f"{op['add']}={op['source']}"
+                if items:
+                    end = source.span(items[-1])[1]
+                    edits.append((end, end, _joiner(source, items[-1]) + text))
+                else:
+                    end = source.span(call)[1] - 1
+                    edits.append((end, end, text))
+    return edits
+
+
+def statement_edits(source, collector, matches):
+    """
+    Edit groups deleting matched statements: [(rule, [edits])]
+
+    A loop / with block whose whole body is removed goes too; any other block
+    left empty (function, if, try, ...) keeps a ``pass``.
+    """
+    removed = {id(node): (rule, node) for rule, node in matches}
+    changed = True
+    while changed:
+        # Bottom-up: an emptied loop is removed itself (and may empty its own parent)
+        changed = False
+        for parent, field in {id(p): (p, f) for p, f in
+                              (collector.parents.get(key, (None, None)) for key in list(removed)) if p}.values():
+            body = getattr(parent, field)
+            if isinstance(parent, LOOP_STATEMENTS) and not getattr(parent, "orelse", None) \
+                    and id(parent) in collector.parents and id(parent) not in removed \
+                    and all(id(child) in removed for child in body):
+                rule = removed[id(body[0])][0]
+                for child in body:
+                    removed.pop(id(child))
+                removed[id(parent)] = (rule, parent)
+                changed = True
+
+    groups, emptied = [], set()
+    for rule, node in removed.values():
+        parent, field = collector.parents.get(id(node), (None, None))
+        body = getattr(parent, field) if parent is not None else []
+        if body and all(id(child) in removed for child in body):
+            if (id(parent), field) in emptied:
+                continue
+            # Keep the block valid: the first removed statement becomes "pass"
+            emptied.add((id(parent), field))
+            start, end = source.span(body[0])
+            edits = [(start, end, "pass")] + [source.line_span(child) + ("",) for child in body[1:]]
+            groups.append((rule, edits))
+            continue
+        groups.append((rule, [source.line_span(node) + ("",)]))
+    return groups
+
+
+def apply_edits(text, groups):
+    """
+    Apply edit groups (rule, [(start, end, replacement)]) atomically
+
+    A group overlapping an earlier one is skipped and left for the next pass.
+
+    Returns:
+        (new text, list of rules whose group was applied)
+    """
+    accepted, applied_rules = [], []
+    taken = []
+    for rule, edits in sorted(groups, key=lambda group: min(edit[0] for edit in group[1])):
+        if any(start < other_end and other_start < end or start == end == other_start
+               for start, end, _ in edits for other_start, other_end in taken):
+            continue
+        accepted.extend(edits)
+        taken.extend((start, end) for start, end, _ in edits)
+        applied_rules.append(rule)
+    for start, end, replacement in sorted(accepted, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text, applied_rules
+
+
+def transform(text, rules, filename="<source>"):
+    """
+    Run every rule over the source until nothing changes (a match inside an edited
+    argument, or overlapping with another edit, is picked up on the next pass)
+
+    Returns:
+        (new text, {rule name: number of calls/statements rewritten})
+
+    Raises:
+        SyntaxError: the input, or the rewritten source, does not parse
+    """
+    counts = {}
+    for _ in range(MAX_PASSES):
+        source = Source(text)
+        collector = Collector(rules, source)
+        collector.visit(ast.parse(text, filename))
+        groups = []
+        for rule, call, function in collector.calls:
+            edits = call_edits(source, rule, call, function)
+            if edits:
+                groups.append((rule, edits))
+        if collector.statements:
+            groups.extend(statement_edits(source, collector, collector.statements))
+        if not groups:
+            break
+        text, applied_rules = apply_edits(text, groups)
+        for rule in applied_rules:
+            counts[rule["name"]] = counts.get(rule["name"], 0) + 1
+    ast.parse(text, filename)
+    return text, counts
+
+
+# ---------------------------------------------------------------- files
+
+
+def decode_source(data):
+    """Decode honouring the PEP 263 encoding cookie; newlines are kept as they are."""
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    return data.decode(encoding), encoding
+
+
+def write_atomic(path, data):
+    """Replace path with data via a temp file in the same directory, keeping the file mode."""
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    tmp_path = f"{path}.codemod.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_entry(path, digest):
+    info = os.stat(path)
+    return {"sha256": digest, "size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def process_file(path, rules, mode="write", cached=None):
+    """
+    Transform one file (mode: write / dry-run / check / diff; only "write" touches the file)
+
+    ``cached`` is the file's manifest entry from the last clean run of the same rule set:
+    a matching size + mtime skips the file without reading it, a matching content hash
+    skips it without parsing it.
+
+    Returns:
+        {"path", "counts", "changed", "skipped", "error", "diff", "entry"}
+        ``entry`` is the new manifest entry, or None when the file is not clean yet
+    """
+    result = {"path": path, "counts": {}, "changed": False, "skipped": False,
+              "error": None, "diff": None, "entry": None}
+    try:
+        if cached:
+            info = os.stat(path)
+            if (info.st_size, info.st_mtime_ns) == (cached["size"], cached["mtime_ns"]):
+                result["skipped"] = True
+                result["entry"] = cached
+                return result
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if cached and digest == cached["sha256"]:
+            result["skipped"] = True
+            result["entry"] = _file_entry(path, digest)
+            return result
+        text, encoding = decode_source(data)
+        new_text, counts = transform(text, rules, path)
+        result["counts"] = counts
+        result["changed"] = new_text != text
+        if not result["changed"]:
+            result["entry"] = _file_entry(path, digest)
+        elif mode == "write":
+            new_data = new_text.encode(encoding)
+            write_atomic(path, new_data)
+            result["entry"] = _file_entry(path, hashlib.sha256(new_data).hexdigest())
+        elif mode == "diff":
+            name = os.path.relpath(path).replace(os.sep, "/")  # git-style a/ b/ prefixes apply with -p1
+            result["diff"] = "".join(difflib.unified_diff(
+                text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                fromfile=f"a/{name}", tofile=f"b/{name}"))
+    except (OSError, SyntaxError, UnicodeDecodeError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# ---------------------------------------------------------------- manifest
+
+
+def ruleset_version(spec):
+    """Hash of the rules plus this engine's own source: a change to either invalidates the manifest."""
+    digest = hashlib.sha256(json.dumps(spec["rules"], sort_keys=True).encode("utf-8"))
+    with open(__file__, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def load_manifest(manifest_file):
+    """{"rulesets": {version: {absolute path: entry}}}; a missing or unreadable manifest is empty."""
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"rulesets": {}}
+    if not isinstance(manifest.get("rulesets"), dict):
+        return {"rulesets": {}}
+    return manifest
+
+
+def save_manifest(manifest_file, manifest):
+    data = json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8")
+    if os.path.exists(manifest_file):
+        write_atomic(manifest_file, data)
+    else:
+        with open(manifest_file, "wb") as f:
+            f.write(data)
+
+
+# ---------------------------------------------------------------- driver
+
+
+def iter_files(paths, include):
+    """Python files under the given paths whose name matches one of the include patterns."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in ("__pycache__", "node_modules"))
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in include):
+                    yield os.path.join(root, name)
+
+
+def _process_job(job):
+    return process_file(*job)
+
+
+def run(paths, spec, include=None, workers=None, mode="write", files=None):
+    """
+    Process all files (in parallel when there is more than one); returns the per-file results
+
+    ``files`` maps absolute paths to manifest entries of the current rule set; it is
+    consulted for skipping and updated in place with the files that ended up clean.
+    """
+    include = include or spec.get("include") or ["*.py"]
+    files = {} if files is None else files
+    jobs = []
+    for path in iter_files(paths, include):
+        jobs.append((path, spec["rules"], mode, files.get(os.path.abspath(path))))
+    if len(jobs) <= 1 or workers == 1:
+        results = [_process_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(executor.map(_process_job, jobs, chunksize=chunksize))
+    for result in results:
+        key = os.path.abspath(result["path"])
+        if result["entry"]:
+            files[key] = result["entry"]
+        else:
+            files.pop(key, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply declarative constructor-migration rules to Python files")
+    parser.add_argument("rules", help="Rule file (JSON)")
+    parser.add_argument("paths", nargs="+", help="Files or directories to process")
+    parser.add_argument("--include", action="append", help="File name pattern (repeatable). Default: from rule file, else *.py")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    modes.add_argument("--check", action="store_true", help="Like --dry-run, but exit 1 when any file would change")
+    modes.add_argument("--diff", action="store_true", help="Print a unified diff of what would change without writing")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST,
+                        help=f"Content-hash manifest used to skip files already clean (default: {DEFAULT_MANIFEST})")
+    parser.add_argument("--no-manifest", action="store_true", help="Neither read nor update the manifest")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest for this run (it is still updated)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Also list unchanged and skipped files")
+    args = parser.parse_args()
+
+    try:
+        spec = load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    mode = "check" if args.check else "diff" if args.diff else "dry-run" if args.dry_run else "write"
+
+    started = time.perf_counter()
+    manifest = None if args.no_manifest else load_manifest(args.manifest)
+    version = ruleset_version(spec)
+    # Only the current rule set is kept: entries of older versions can never match again
+    files = {} if manifest is None or args.force else manifest["rulesets"].get(version, {})
+    results = run(args.paths, spec, args.include, args.workers, mode, files)
+    if manifest is not None:
+        manifest["rulesets"] = {version: files}
+        try:
+            save_manifest(args.manifest, manifest)
+        except OSError as e:
+            print(f"WARNING cannot write manifest {args.manifest}: {e}", file=sys.stderr)
+
+    totals = {}
+    for result in results:
+        if result["error"]:
+            print(f"ERROR {result['path']}: {result['error']}", file=sys.stderr)
+            continue
+        for name, count in result["counts"].items():
+            totals[name] = totals.get(name, 0) + count
+        if result["diff"]:
+            sys.stdout.write(result["diff"])
+        elif result["skipped"]:
+            if args.verbose:
+                print(f"Skipped {result['path']} (unchanged since last run)")
+        elif result["changed"] or args.verbose:
+            detail = ", ".join(f"{name} x{count}" for name, count in sorted(result["counts"].items())) or "no matches"
+            verb = "Fixed" if mode == "write" else "Would fix"
+            print(f"{verb if result['changed'] else 'Unchanged'} {result['path']} ({detail})")
+
+    changed = sum(1 for result in results if result["changed"])
+    skipped = sum(1 for result in results if result["skipped"])
+    failed = sum(1 for result in results if result["error"])
+    # With --diff the summary goes to stderr so stdout stays a clean patch
+    out = sys.stderr if mode == "diff" else sys.stdout
+    print(f"\n{len(results)} files scanned, {skipped} skipped, {changed} {'changed' if mode == 'write' else 'would change'}"
+          + (f", {failed} failed" if failed else "") + f" in {time.perf_counter() - started:.2f}s", file=out)
+    for name, count in sorted(totals.items()):
+        print(f"  {name}: {count}", file=out)
+    if failed:
+        return 1
+    return 1 if mode == "check" and changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
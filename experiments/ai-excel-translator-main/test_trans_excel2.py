@@ -0,0 +1,156 @@
+"""Tests for the budget handling of trans-excel2.py.
+
+Excel (xlwings) and the API client are replaced by small in-memory fakes, so
+these run anywhere:
+
+    python -m pytest experiments/ai-excel-translator-main/test_trans_excel2.py
+"""
+
+import importlib.machinery
+import importlib.util
+import json
+import os
+import sys
+import types
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trans-excel2.py")
+
+
+class FakeRange:
+    """A single cell: the part of xlwings.Range the translator uses."""
+
+    def __init__(self, value, address):
+        self.value = value
+        self.address = address
+
+
+class FakeUsedRange(list):
+    @property
+    def count(self):
+        return len(self)
+
+    @property
+    def value(self):
+        return [cell.value for cell in self] or None
+
+
+class FakeSheet:
+    def __init__(self, name, values):
+        self.name = name
+        self.cells = [FakeRange(value, f"A{row}") for row, value in enumerate(values, 1)]
+        self.api = types.SimpleNamespace(Shapes=types.SimpleNamespace(Count=0))
+
+    @property
+    def used_range(self):
+        return FakeUsedRange(self.cells)
+
+    def values(self):
+        return [cell.value for cell in self.cells]
+
+
+class FakeBook:
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.saved = {}
+
+    def save(self, path):
+        self.saved[path] = {sheet.name: sheet.values() for sheet in self.sheets}
+
+    def close(self):
+        pass
+
+
+class FakeApp:
+    pid = 1
+
+    def __init__(self, book):
+        self.books = types.SimpleNamespace(open=lambda path: book)
+
+
+class FakeClient:
+    """Translates by prefixing "JA:"; optionally reports more usage than estimated."""
+
+    def __init__(self, usage=None):
+        self.usage = usage
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        self.calls += 1
+        texts = messages[-1]["content"].split("\n\n", 1)[1].split("|||")
+        message = types.SimpleNamespace(content="|||".join("JA:" + text for text in texts))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=self.usage)
+
+
+@pytest.fixture
+def trans(monkeypatch, tmp_path):
+    """trans-excel2.py imported against fake xlwings / openai / httpx / dotenv, writing under tmp_path."""
+    xlwings = types.ModuleType("xlwings")
+    xlwings.App = None
+    xlwings.main = types.SimpleNamespace(Range=FakeRange)
+    dotenv = types.ModuleType("dotenv")
+    dotenv.load_dotenv = lambda *args, **kwargs: None
+    openai = types.ModuleType("openai")
+    openai.OpenAI = None
+    for name, module in (("xlwings", xlwings), ("dotenv", dotenv), ("openai", openai),
+                         ("httpx", types.ModuleType("httpx"))):
+        module.__spec__ = importlib.machinery.ModuleSpec(name, None)  # Found by importlib.util.find_spec
+        monkeypatch.setitem(sys.modules, name, module)
+    for name in ("llm_client", "token_budget", "watch_folder"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+
+    spec = importlib.util.spec_from_file_location("trans_excel2", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Output folder, prompt file and ledger go to tmp_path instead of the script folder
+    module.__file__ = str(tmp_path / "trans-excel2.py")
+    module.API_DELAY = 0
+    module.ROUTING = False
+    return module
+
+
+def budget_for(trans, values, extra=0):
+    """Token budget that fits exactly the projection of translating values in one batch, plus extra."""
+    prompt, completion = trans.estimate_request(values)
+    return prompt + completion + extra
+
+
+def test_budget_hit_on_second_sheet_keeps_first_sheet(trans, monkeypatch, tmp_path):
+    first = FakeSheet("Sheet1", ["Xin chào", "Tạm biệt"])
+    second = FakeSheet("Sheet2", ["Đây là một đoạn văn dài cần dịch sang tiếng Nhật"] * 20)
+    book = FakeBook([first, second])
+    client = FakeClient()
+    monkeypatch.setattr(trans, "get_client", lambda concurrency: client)
+    ledger = str(tmp_path / "budget_ledger.json")
+    trans.governor = trans.BudgetGovernor(run_tokens=budget_for(trans, first.values(), extra=10), ledger_path=ledger)
+
+    output_path = trans.process_excel("book.xlsx", app=FakeApp(book))
+
+    assert output_path == str(tmp_path / "output" / "book-translated.xlsx")
+    assert book.saved[output_path]["Sheet1"] == ["JA:Xin chào", "JA:Tạm biệt"]
+    assert book.saved[output_path]["Sheet2"] == second.values()  # Refused up front, left as is
+    assert client.calls == 1
+    with open(ledger, encoding="utf-8") as f:
+        assert sum(day["tokens"] for day in json.load(f).values()) > 0
+
+
+def test_budget_hit_mid_sheet_keeps_translated_batches(trans, monkeypatch, tmp_path):
+    sheet = FakeSheet("Sheet1", ["Xin chào", "Tạm biệt", "Cảm ơn"])
+    book = FakeBook([sheet])
+    limit = budget_for(trans, sheet.values(), extra=1000)
+    # The first request costs the whole budget, so the next reservation is refused
+    client = FakeClient(usage=types.SimpleNamespace(prompt_tokens=limit, completion_tokens=0))
+    monkeypatch.setattr(trans, "get_client", lambda concurrency: client)
+    monkeypatch.setattr(trans, "BATCH_SIZE", 1)
+    ledger = str(tmp_path / "budget_ledger.json")
+    trans.governor = trans.BudgetGovernor(run_tokens=limit, ledger_path=ledger)
+
+    output_path = trans.process_excel("book.xlsx", app=FakeApp(book))
+
+    assert book.saved[output_path]["Sheet1"] == ["JA:Xin chào", "Tạm biệt", "Cảm ơn"]
+    assert client.calls == 1
+    with open(ledger, encoding="utf-8") as f:
+        assert sum(day["tokens"] for day in json.load(f).values()) == limit
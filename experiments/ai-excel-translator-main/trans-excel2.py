@@ -7,6 +7,8 @@ import argparse
 import json
 import re
 import glob
+import importlib.util
+import sys
 from pathlib import Path
 
 # Check and install required dependencies
@@ -19,7 +21,7 @@ def check_and_install_dependencies():
         if not os.path.exists(req_file):
             print("⚠️ Requirements file not found, creating file...")
             with open(req_file, 'w', encoding='utf-8') as f:
-                f.write("openai>=1.0.0\nxlwings>=0.30.0\npython-dotenv>=1.0.0\npathlib>=1.0.1")
+                f.write("openai>=1.0.0\nhttpx>=0.27.0\nxlwings>=0.30.0\npython-dotenv>=1.0.0\npathlib>=1.0.1")
             print(f"✅ Requirements file created at: {req_file}")
         
         print(f"📋 To install required libraries, run the command:\npip install -r {req_file}")
@@ -29,6 +31,9 @@ def check_and_install_dependencies():
             import xlwings as xw
             from openai import OpenAI
             from dotenv import load_dotenv
+            # httpx is only used by the shared client (llm_client), so just check it is installed
+            if importlib.util.find_spec("httpx") is None:
+                raise ImportError("No module named 'httpx'")
             print("✅ All required libraries loaded successfully.")
             return True
         except ImportError as e:
@@ -45,21 +50,27 @@ if not check_and_install_dependencies():
 
 # Import libraries after checking
 import xlwings as xw
-from openai import OpenAI
 from dotenv import load_dotenv
 
+# Shared pooled API client (experiments/shared/llm_client.py), created on first use
+# and reused for every file of a directory run
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+from llm_client import get_client
+from watch_folder import FolderWatcher
+from token_budget import BudgetExceeded, BudgetGovernor, estimate_completion, estimate_tokens, format_spend, route_batches
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize API client with Gemini (OpenAI compatible)
-client = OpenAI(
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-    api_key=os.getenv("GEMINI_API_KEY"),
-)
-
 # Set API delay and batch size
 API_DELAY = 2  # Delay 2 seconds between API calls
 BATCH_SIZE = 100  # Maximum number of cells in a batch
+API_CONCURRENCY = 1  # Batches are sent one at a time, so one pooled connection is enough
+
+# Token budgets and model tiers (experiments/shared/token_budget.py); replaced in main() from the CLI
+governor = BudgetGovernor()
+ROUTING = True  # Route short labels / long prose to cheaper / stronger models
+DEFAULT_TIER = "standard"  # Tier used for every batch when routing is off (gemini-2.5-flash-lite)
 
 def clean_text(text):
     """Clean and normalize text before translation"""
@@ -79,11 +90,8 @@ def should_translate(text):
         return False
     return True
 
-def translate_batch(texts, target_lang="ja"):
-    """Translate a batch of texts to the target language (Japanese or Vietnamese)"""
-    if not texts:
-        return []
-
+def build_prompts(texts, target_lang="ja"):
+    """System and user prompt for translating a batch of texts"""
     # Read system prompt from file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     prompt_file = os.path.join(script_dir, "trans-excel-system-prompt.txt")
@@ -116,17 +124,40 @@ def translate_batch(texts, target_lang="ja"):
     # Determine translation direction based on parameter
     direction = "Vietnamese to Japanese" if target_lang == "ja" else "Japanese to Vietnamese"
     user_prompt = f"Translate the following text from {direction}, keeping segments separated by '{separator}':\n\n{combined_text}"
+    return system_prompt, user_prompt
+
+def estimate_request(texts, target_lang="ja"):
+    """Estimated (prompt tokens, completion tokens) for translating texts in one request"""
+    system_prompt, user_prompt = build_prompts(texts, target_lang)
+    return estimate_tokens(system_prompt) + estimate_tokens(user_prompt), estimate_completion(texts)
+
+def translate_batch(texts, target_lang="ja", tier=DEFAULT_TIER, file=None):
+    """Translate a batch of texts to the target language (Japanese or Vietnamese)
+
+    The request goes to the model of the given tier. Its estimated cost is reserved
+    against the budgets first (BudgetExceeded is raised when it does not fit) and
+    corrected with the usage the API reports.
+    """
+    if not texts:
+        return []
+
+    separator = "|||"
+    system_prompt, user_prompt = build_prompts(texts, target_lang)
+    reservation = governor.reserve(tier, estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+                                   estimate_completion(texts), file=file)
+    recorded = False
 
     try:
         # Call translation API
-        response = client.chat.completions.create(
-            # model="gemini-2.0-flash-lite", # Or "gemini-pro" or other suitable model
-            model="gemini-2.5-flash-lite", # Or "gemini-pro" or other suitable model
+        response = get_client(API_CONCURRENCY).chat.completions.create(
+            model=governor.model(tier),
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ]
         )
+        governor.record(reservation, getattr(response, "usage", None))
+        recorded = True
 
         # Split translation result into separate parts
         translated_text = response.choices[0].message.content
@@ -147,11 +178,17 @@ def translate_batch(texts, target_lang="ja"):
 
     except Exception as e:
         print(f"❌ Error translating batch: {str(e)}")
+        if not recorded:
+            governor.release(reservation) # The request did not complete
         # Return original texts if translation fails
         return texts
 
-def process_excel(input_path, target_lang="ja"):
-    """Process Excel file: read, translate and save with original format"""
+def process_excel(input_path, target_lang="ja", app=None):
+    """Process Excel file: read, translate and save with original format
+
+    When a running Excel app is passed (watch mode), it is reused and left open;
+    only the workbook is closed. Otherwise an app is started and quit per file.
+    """
     try:
         # Create output file path
         filename = os.path.basename(input_path)
@@ -166,8 +203,11 @@ def process_excel(input_path, target_lang="ja"):
         print(f"\n🔄 Processing file: {filename}")
 
         # Open workbook with xlwings to preserve formatting
-        app = xw.App(visible=False)
+        own_app = app is None
+        if own_app:
+            app = xw.App(visible=False)
         wb = None # Initialize wb
+        over_budget = [] # Sheets left (partly) untranslated because the budget ran out
         try:
             wb = app.books.open(input_path)
 
@@ -275,18 +315,34 @@ def process_excel(input_path, target_lang="ja"):
                      print(f"   ✅ No text to translate on sheet '{sheet.name}'.")
                      continue # Move to next sheet
 
-                total_batches = (len(texts_to_translate) - 1) // BATCH_SIZE + 1
-                print(f"   📦 Preparing to translate {len(texts_to_translate)} text segments in {total_batches} batches.")
-
-                for i in range(0, len(texts_to_translate), BATCH_SIZE):
-                    batch_texts = texts_to_translate[i:i+BATCH_SIZE]
-                    batch_refs = cell_references[i:i+BATCH_SIZE]
-                    current_batch_num = i // BATCH_SIZE + 1
-
-                    print(f"   🔄 Translating batch {current_batch_num}/{total_batches} ({len(batch_texts)} texts)")
-
-                    # Translate batch
-                    translated_batch = translate_batch(batch_texts, target_lang)
+                # Short labels and long prose go to different model tiers; refuse the
+                # sheet up front if its projected cost does not fit the budgets
+                batches = route_batches(texts_to_translate, BATCH_SIZE, routing=ROUTING, default_tier=DEFAULT_TIER)
+                try:
+                    projected_usd, projected_tokens = governor.project(filename, [
+                        (tier, *estimate_request([texts_to_translate[k] for k in indices], target_lang))
+                        for tier, indices in batches])
+                except BudgetExceeded as budget_err:
+                    print(f"   💸 Skipping sheet '{sheet.name}': {budget_err}")
+                    over_budget.append(sheet.name)
+                    continue # Move to next sheet, it may still fit
+                total_batches = len(batches)
+                print(f"   📦 Preparing to translate {len(texts_to_translate)} text segments in {total_batches} batches "
+                      f"(projected ${projected_usd:.4f}, ~{projected_tokens} tokens).")
+
+                for current_batch_num, (tier, indices) in enumerate(batches, 1):
+                    batch_texts = [texts_to_translate[k] for k in indices]
+                    batch_refs = [cell_references[k] for k in indices]
+
+                    print(f"   🔄 Translating batch {current_batch_num}/{total_batches} ({len(batch_texts)} texts, {governor.model(tier)})")
+
+                    # Translate batch; once the budget refuses one, the rest of the sheet stays untranslated
+                    try:
+                        translated_batch = translate_batch(batch_texts, target_lang, tier, filename)
+                    except BudgetExceeded as budget_err:
+                        print(f"   💸 Stopping sheet '{sheet.name}' after {current_batch_num - 1}/{total_batches} batches: {budget_err}")
+                        over_budget.append(sheet.name)
+                        break
 
                     # Update translated content
                     print(f"   ✍️ Updating content for batch {current_batch_num}...")
@@ -377,29 +433,39 @@ def process_excel(input_path, target_lang="ja"):
             print(f"\n💾 Saving translated file to: {output_path}")
             wb.save(output_path)
             print(f"✅ File saved successfully: {output_path}")
+            if over_budget:
+                print(f"   ⚠️ Partially translated: budget ran out on sheet(s) {', '.join(over_budget)}")
 
         except Exception as wb_process_err:
              print(f"❌ Error processing workbook '{filename}': {str(wb_process_err)}")
+             output_path = None # Nothing (complete) was saved
              # Ensure workbook is closed if error occurs before saving
              if wb is not None:
                  try:
                      wb.close()
                  except Exception as close_err:
                      print(f"   ⚠️ Error trying to close workbook after processing error: {close_err}")
+                 wb = None
         finally:
-            # Close workbook (if not already closed) and Excel app
-            # wb.close() has been called in the except block if needed
-            # Just need to ensure app is closed
-            if 'app' in locals() and app.pid: # Check if app exists and is still running
+            if not own_app:
+                # Shared app stays open for the next file; only release this workbook
+                if wb is not None:
+                    try:
+                        wb.close()
+                    except Exception as close_err:
+                        print(f"   ⚠️ Error closing workbook: {close_err}")
+            elif app.pid: # Check if app is still running
                  app.quit()
                  print("   🔌 Excel application closed.")
 
+        print(f"💰 Spend for {filename}: {format_spend(governor.file_report(filename))}")
+        governor.commit()
         return output_path
 
     except Exception as e:
         print(f"❌ Critical error when starting Excel file processing '{input_path}': {str(e)}")
         # Ensure Excel app is closed if error occurs right at the beginning
-        if 'app' in locals() and app.pid:
+        if 'own_app' in locals() and own_app and app is not None and app.pid:
             app.quit()
         return None
 
@@ -429,6 +495,11 @@ def process_directory(input_dir, target_lang="ja"):
             print(f"   ⏩ Skipping temporary file: {os.path.basename(file_path)}")
             continue
 
+        if governor.exhausted():
+            print(f"⚠️ Budget used up, skipping: {os.path.basename(file_path)}")
+            failed_files.append(os.path.basename(file_path))
+            continue
+
         output_file = process_excel(file_path, target_lang)
         if output_file:
             successful_files.append(os.path.basename(file_path))
@@ -440,12 +511,81 @@ def process_directory(input_dir, target_lang="ja"):
     if failed_files:
         print(f"❌ Failed: {len(failed_files)} files: {', '.join(failed_files)}")
 
+def excel_app_alive(app):
+    """Check that a shared Excel app still answers (the user may have closed it)"""
+    try:
+        return app is not None and app.pid is not None and app.books.count >= 0
+    except Exception:
+        return False
+
+def watch_directory(input_dir, target_lang="ja", interval=2.0, settle=3.0):
+    """Keep running and translate each Excel file as it lands in the input directory
+
+    One hidden Excel app and the pooled API client stay warm between files. A status
+    record per file is written to the 'status' directory next to 'output'.
+    """
+    status_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status")
+    watcher = FolderWatcher(input_dir, ["*.xlsx", "*.xls"], status_dir, settle=settle)
+    app = None
+    done = failed = 0
+    print(f"👀 Watching {input_dir} (poll every {interval}s, files must be unchanged for {settle}s). Press Ctrl+C to stop.")
+    print(f"📄 Status records: {status_dir}")
+    try:
+        while True:
+            for file_path in watcher.ready():
+                if not excel_app_alive(app):
+                    print("   🔌 Starting Excel application...")
+                    app = xw.App(visible=False)
+                record = watcher.start(file_path)
+                try:
+                    output_file = process_excel(file_path, target_lang, app=app)
+                    record = watcher.finish(file_path, record, output=output_file)
+                except Exception as e:
+                    record = watcher.finish(file_path, record, error=str(e))
+                if record["state"] == "done":
+                    done += 1
+                    print(f"✅ {record['file']} done in {record['seconds']:.1f}s")
+                else:
+                    failed += 1
+                    print(f"❌ {record['file']} failed: {record['error']}")
+                print(f"👀 Waiting for files... ({done} done, {failed} failed so far)")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Watch stopped: {done} done, {failed} failed")
+    finally:
+        if excel_app_alive(app):
+            app.quit()
+            print("   🔌 Excel application closed.")
+
 def main():
     parser = argparse.ArgumentParser(description='Translate Excel files from input directory to output directory')
     parser.add_argument('--to', choices=['ja', 'vi'], default='ja',
                         help='Target language (ja: Japanese, vi: Vietnamese). Default: ja')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and translate files as they are dropped into the input directory')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Watch mode: seconds between input directory scans. Default: 2')
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help='Watch mode: seconds a file must stay unchanged before it is processed. Default: 3')
+    parser.add_argument('--budget-usd', type=float, default=None,
+                        help='Maximum API spend (USD) for this run, or for the whole session in watch mode')
+    parser.add_argument('--daily-budget-usd', type=float,
+                        default=float(os.getenv('LLM_DAILY_BUDGET_USD')) if os.getenv('LLM_DAILY_BUDGET_USD') else None,
+                        help='Maximum API spend (USD) per UTC day across runs. Default: $LLM_DAILY_BUDGET_USD or unlimited')
+    parser.add_argument('--budget-tokens', type=int, default=None, help='Maximum tokens for this run')
+    parser.add_argument('--daily-budget-tokens', type=int, default=None, help='Maximum tokens per UTC day across runs')
+    parser.add_argument('--routing', choices=['auto', 'off'], default='auto',
+                        help='auto: short labels to the fast tier, long prose to the strong tier; '
+                             'off: every batch on gemini-2.5-flash-lite. Default: auto')
     args = parser.parse_args()
 
+    # Budgets and routing; the ledger shares the daily budget between runs
+    global governor, ROUTING
+    governor = BudgetGovernor(run_usd=args.budget_usd, day_usd=args.daily_budget_usd,
+                              run_tokens=args.budget_tokens, day_tokens=args.daily_budget_tokens,
+                              ledger_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "budget_ledger.json"))
+    ROUTING = args.routing == 'auto'
+
     # Path to input directory (in current project directory)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     input_dir = os.path.join(script_dir, "input")
@@ -454,8 +594,9 @@ def main():
     if not os.path.exists(input_dir):
          os.makedirs(input_dir)
          print(f"📁 Created 'input' directory at: {input_dir}")
-         print("   Please place Excel files to translate in this directory.")
-         return # Stop to let user add files
+         if not args.watch:
+             print("   Please place Excel files to translate in this directory.")
+             return # Stop to let user add files
 
     # Create output directory if it doesn't exist
     output_dir = os.path.join(script_dir, "output")
@@ -464,6 +605,9 @@ def main():
 
 
     print(f"🎯 Target language: {'Japanese' if args.to == 'ja' else 'Vietnamese'}")
+    if args.watch:
+        watch_directory(input_dir, args.to, args.interval, args.settle)
+        return
     # Process all files in the input directory
     process_directory(input_dir, args.to)
 
@@ -1,111 +1,277 @@
 import os
 import glob
 from pptx import Presentation
-from openai import OpenAI
 from dotenv import load_dotenv
 import logging
+import logging.handlers
+import json
+import hashlib
+import random
 import time
-from datetime import datetime
-import httpx
+from datetime import datetime, timezone
 import sys
 import re
+import argparse
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from pptx.enum.text import PP_ALIGN
 from pptx.util import Pt
+from text_fit import fit_translated_text
 
-# Set up logging first, before any other imports
-def setup_logging():
-    # Create logs directory if it doesn't exist
-    log_dir = 'SlideTranslateLog'
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Create a timestamp for the log file
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_file = os.path.join(log_dir, f'translation_{timestamp}.log')
-    
-    # Configure logging to only file
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8')
-        ]
-    )
-    return log_file
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from llm_client import get_client
+from watch_folder import FolderWatcher
+from token_budget import BudgetExceeded, BudgetGovernor, estimate_completion, estimate_tokens, format_spend, route_batches
+
+# Logs are JSON Lines in one size-capped, rotating file
+LOG_DIR = 'SlideTranslateLog'
+LOG_FILE = os.path.join(LOG_DIR, 'translation.jsonl')
+LOG_MAX_BYTES = int(os.getenv('SLIDE_TRAN_LOG_MAX_BYTES', 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = 5
+
+# Fraction of batches whose full source/translated texts are logged at INFO.
+# Full texts are always logged at DEBUG.
+LOG_SAMPLE_RATE = float(os.getenv('SLIDE_TRAN_LOG_SAMPLE', '0'))
+
+class JsonLineFormatter(logging.Formatter):
+    """Format each record as one JSON object; fields passed via extra={...} become keys."""
+
+    # Attributes every LogRecord has; anything else was passed through `extra`
+    RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging(level=None):
+    """Configure JSONL logging to a rotating file; safe to call more than once.
+
+    Called from main() only: spawned pool workers re-import this script and must not
+    open the log file themselves (rotation renames it, which fails on Windows while
+    another process holds it open); they log through init_worker's queue instead.
+    """
+    root = logging.getLogger()
+    if level is None:
+        level = os.getenv('SLIDE_TRAN_LOG_LEVEL', 'INFO')
+    root.setLevel(level)
+
+    if not any(getattr(h, 'baseFilename', None) == os.path.abspath(LOG_FILE) for h in root.handlers):
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+        handler.setFormatter(JsonLineFormatter())
+        root.addHandler(handler)
+    return LOG_FILE
 
-# Initialize logging first
-log_file = setup_logging()
-logging.info("Logging system initialized")
+def should_log_texts():
+    """Whether full segment texts should be logged for the current batch."""
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        return logging.DEBUG
+    if LOG_SAMPLE_RATE and random.random() < LOG_SAMPLE_RATE:
+        return logging.INFO
+    return None
 
 # Load environment variables
 load_dotenv()
 
 
-# Initialize OpenAI client
-# Tạo một HTTP client tùy chỉnh, ở đây chúng ta không cấu hình proxy
-# Nếu bạn CẦN dùng proxy, bạn phải cấu hình nó đúng cách tại đây.
-# Ví dụ: proxies = {"http://": os.getenv("HTTP_PROXY"), "https://": os.getenv("HTTPS_PROXY")}
-custom_http_client = httpx.Client() # Explicitly disable proxies if not needed
-
-client = OpenAI(
-    api_key=os.getenv('GEMINI_API_KEY'),
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-    http_client=custom_http_client # Truyền HTTP client tùy chỉnh vào
-)
+# The API client comes from experiments/shared/llm_client.py: one pooled, keep-alive
+# httpx client per process with explicit timeouts, created on first use and reused
+# for every deck that process translates (see that module for LLM_* tuning variables).
+# Each process sends one request at a time (the rate limiter serialises calls), so
+# its pool needs a single connection.
+API_CONCURRENCY = 1
 
 
 # Load translation prompt
 with open('prompt.txt', 'r', encoding='utf-8') as f:
     PROMPT_TEMPLATE = f.read()
 
-def batch_texts(texts, batch_size=30):
-    """Group texts into batches for translation."""
-    return [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+# Minimum number of seconds between two API calls, shared by all worker processes
+API_MIN_INTERVAL = 2
+
+class RateLimiter:
+    """Space API calls at least min_interval seconds apart across processes."""
+
+    def __init__(self, min_interval, lock=None, next_slot=None):
+        self.min_interval = min_interval
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+        # Timestamp of the next free call slot, in shared memory so workers see it
+        self.next_slot = next_slot if next_slot is not None else multiprocessing.Value('d', 0.0, lock=False)
+
+    def wait(self):
+        """Block until this process may make the next API call."""
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot.value)
+            self.next_slot.value = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# Global rate limiter; replaced in each worker by init_worker so all share one slot clock
+rate_limiter = RateLimiter(API_MIN_INTERVAL)
+
+# Token budgets and model tiers (experiments/shared/token_budget.py); set up in main() from
+# the CLI and attached in each worker by init_worker, so all processes spend from one budget
+governor = BudgetGovernor()
+ROUTING = True  # Route short labels / long prose to cheaper / stronger models
+DEFAULT_TIER = "fast"  # Tier used for every batch when routing is off (gemini-2.0-flash-lite)
+BATCH_SIZE = 30
+SYSTEM_MESSAGE = "You are a professional translator from Vietnamese to Japanese."
+
+# Whether to draw the single-line progress bar (disabled in workers to avoid interleaving)
+SHOW_PROGRESS_BAR = True
+
+def init_worker(lock, next_slot, log_queue, log_level, budget_args, routing):
+    """Initializer for pool workers: attach to the parent's shared rate limiter and
+    budget counters, and send log records to the parent, which owns the rotating log file."""
+    global rate_limiter, SHOW_PROGRESS_BAR, governor, ROUTING
+    rate_limiter = RateLimiter(API_MIN_INTERVAL, lock, next_slot)
+    governor = BudgetGovernor.attach(*budget_args)
+    ROUTING = routing
+    SHOW_PROGRESS_BAR = False
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(log_level)
+
+def normalize_segment(text):
+    """Normalize a paragraph text into the key used for cross-slide dedup."""
+    # Collapse runs of spaces/tabs (including full-width spaces) but keep line breaks
+    lines = [re.sub(r'[ \t\u3000]+', ' ', line).strip() for line in text.strip().splitlines()]
+    return '\n'.join(lines)
 
-def translate_batch(texts):
-    """Translate a batch of texts from Vietnamese to Japanese."""
+def dedup_segments(texts):
+    """Build an index of unique normalized segments.
+
+    Returns (unique_texts, segment_map) where segment_map[i] is the position in
+    unique_texts whose translation belongs to texts[i].
+    """
+    unique_texts = []
+    segment_map = []
+    seen = {}
+    for text in texts:
+        key = normalize_segment(text)
+        if key not in seen:
+            seen[key] = len(unique_texts)
+            unique_texts.append(text)
+        segment_map.append(seen[key])
+    return unique_texts, segment_map
+
+def report_dedup(input_file, all_texts, unique_texts, segment_map, text_locations):
+    """Log and print how much cross-slide dedup saved for a deck.
+
+    Batch counts are those route_batches makes with the run's BATCH_SIZE and
+    routing, i.e. the requests actually sent (before resume skips any).
+    """
+    total = len(all_texts)
+    unique = len(unique_texts)
+    ratio = 1 - unique / total if total else 0.0
+    batches_before = len(route_batches(all_texts, BATCH_SIZE, ROUTING, DEFAULT_TIER))
+    batches_after = len(route_batches(unique_texts, BATCH_SIZE, ROUTING, DEFAULT_TIER))
+    chars_before = sum(len(t) for t in all_texts)
+    chars_after = sum(len(t) for t in unique_texts)
+
+    summary = (f"Dedup {os.path.basename(input_file)}: {total} segments -> {unique} unique "
+               f"({ratio:.1%} saved), batches {batches_before} -> {batches_after}, "
+               f"chars {chars_before} -> {chars_after}")
+    logging.info(summary, extra={
+        "event": "dedup", "deck": os.path.basename(input_file), "segments": total,
+        "unique": unique, "dedup_ratio": round(ratio, 4),
+        "batches_before": batches_before, "batches_after": batches_after,
+    })
+    print(summary)
+
+    # Report boilerplate: segments repeated on 3 or more slides (footers, notices, headers)
+    slides_per_segment = {}
+    for unique_idx, location in zip(segment_map, text_locations):
+        slides_per_segment.setdefault(unique_idx, set()).add(location[1])
+    boilerplate = sorted(
+        ((len(slides), idx) for idx, slides in slides_per_segment.items() if len(slides) >= 3),
+        reverse=True
+    )
+    for slide_count, idx in boilerplate[:10]:
+        logging.debug("Boilerplate on %d slides: %s", slide_count, unique_texts[idx][:60])
+
+def estimate_request(texts):
+    """Estimated (prompt tokens, completion tokens) for translating texts in one request."""
+    prompt = PROMPT_TEMPLATE.format(texts="\n---\n".join(texts))
+    return estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(prompt), estimate_completion(texts)
+
+def translate_batch(texts, deck=None, tier=DEFAULT_TIER):
+    """Translate a batch of texts from Vietnamese to Japanese on the model of the given tier.
+
+    The estimated cost is reserved against the budgets before sending (BudgetExceeded
+    when it does not fit) and corrected with the usage the API reports.
+    """
     if not texts:
         return []
     
     prompt = PROMPT_TEMPLATE.format(texts="\n---\n".join(texts))
-    
-    # Log the request
-    logging.info("=== Translation Request ===")
-    for idx, text in enumerate(texts):
-        logging.info(f"Text {idx + 1}: {text}")
-    logging.info("=== End Request ===\n")
+    text_log_level = should_log_texts()
+    reservation = governor.reserve(tier, estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(prompt),
+                                   estimate_completion(texts), file=deck)
+    recorded = False
     
     try:
-        response = client.chat.completions.create(
-            model="gemini-2.0-flash-lite",
+        rate_limiter.wait()
+        start_time = time.perf_counter()
+        response = get_client(API_CONCURRENCY).chat.completions.create(
+            model=governor.model(tier),
             n=1,
             messages=[
-                {"role": "system", "content": "You are a professional translator from Vietnamese to Japanese."},
+                {"role": "system", "content": SYSTEM_MESSAGE},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
             stream=False
         )
-        
-        # Log the response
-        logging.info("=== Translation Response ===")
-        logging.info(f"Raw response: {response.choices[0].message.content}")
-        logging.info("=== End Response ===\n")
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        cost_usd, _ = governor.record(reservation, getattr(response, "usage", None))
+        recorded = True
         
         # Parse the response to get translations
-        translations = response.choices[0].message.content.strip().split("\n---\n")
+        content = response.choices[0].message.content
+        translations = content.strip().split("\n---\n")
+        
+        # One summary record per batch: size, latency and token usage
+        usage = getattr(response, "usage", None)
+        logging.info("Translated batch", extra={
+            "event": "batch", "deck": deck, "segments": len(texts),
+            "chars": sum(len(t) for t in texts), "latency_ms": round(latency_ms, 1),
+            "tier": tier, "model": governor.model(tier), "cost_usd": round(cost_usd, 6),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+            "returned": len(translations),
+        })
         
-        # Log parsed translations
-        logging.info("=== Parsed Translations ===")
-        for idx, (text, trans) in enumerate(zip(texts, translations)):
-            logging.info(f"Text {idx + 1}:")
-            logging.info(f"Original: {text}")
-            logging.info(f"Translated: {trans}")
-            logging.info("---")
-        logging.info("=== End Parsed Translations ===\n")
+        # Full texts only at DEBUG, or for a sampled fraction of batches
+        if text_log_level is not None:
+            logging.log(text_log_level, "Batch texts", extra={
+                "event": "batch_texts", "deck": deck,
+                "pairs": [{"original": o, "translated": t} for o, t in zip(texts, translations)],
+                "raw_response": content,
+            })
         
         # Ensure we have the same number of translations as input texts
         if len(translations) != len(texts):
-            logging.warning(f"Received {len(translations)} translations for {len(texts)} texts")
+            logging.warning("Received %d translations for %d texts", len(translations), len(texts),
+                            extra={"event": "count_mismatch", "deck": deck})
             # Pad or trim translations to match input count
             if len(translations) < len(texts):
                 translations.extend([""] * (len(texts) - len(translations)))
@@ -117,11 +283,90 @@ def translate_batch(texts):
         return translations
         
     except Exception as e:
-        logging.error(f"Error during translation: {str(e)}")
+        if not recorded:
+            governor.release(reservation)  # The request did not complete
+        logging.error("Error during translation: %s", e, extra={"event": "batch_error", "deck": deck})
         raise
 
-def save_presentation(prs, original_filename):
-    """Save presentation with error handling and unique filename."""
+# Per-deck journals of finished segment translations, used by --resume
+JOURNAL_DIR = 'SlideTranslateJournal'
+
+def deck_hash(input_file):
+    """SHA-256 of the deck file contents, so a journal only matches the exact same deck."""
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SegmentJournal:
+    """Append-only JSONL record of finished segment translations for one deck.
+
+    Entries are keyed by segment location and store the original text, so a
+    resumed run only reuses a translation for an unchanged segment. Empty
+    translations (padding for a short model reply) are never journaled, so a
+    resumed run translates those segments again.
+    """
+
+    def __init__(self, input_file, resume=False):
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        # Keyed by name and content: byte-identical decks under different names (possibly
+        # processed at the same time by the pool) must not share, or delete, one journal
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        self.path = os.path.join(JOURNAL_DIR, f"{name}-{deck_hash(input_file)}.jsonl")
+        self.done = {}
+        if resume and os.path.exists(self.path):
+            self.done = self._load()
+        elif os.path.exists(self.path):
+            # Fresh run: stale progress from an earlier attempt must not leak in
+            os.remove(self.path)
+
+    @staticmethod
+    def _key(location):
+        return json.dumps(list(location))
+
+    def _load(self):
+        done = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from a crash mid-write
+                continue
+            done[self._key(entry["loc"])] = entry
+        if content and not content.endswith("\n"):
+            # Terminate the torn line so new entries start on a line of their own
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("\n")
+        return done
+
+    def lookup(self, location, text):
+        """Return the journaled translation for a segment, or None if not finished."""
+        entry = self.done.get(self._key(location))
+        if entry is not None and entry["text"] == text and entry["translation"]:
+            return entry["translation"]
+        return None
+
+    def record(self, entries):
+        """Durably append (location, text, translation) entries after a finished batch; empty ones stay pending."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for location, text, translation in entries:
+                if not translation:
+                    continue
+                f.write(json.dumps({"loc": list(location), "text": text, "translation": translation},
+                                   ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish(self):
+        """Drop the journal once the translated deck has been saved."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def save_presentation(prs, original_filename, suffix="_ja"):
+    """Save presentation with error handling and unique filename (suffix "_ja_partial" for partial decks)."""
     # Create output directory if it doesn't exist
     output_dir = 'output'
     os.makedirs(output_dir, exist_ok=True)
@@ -134,22 +379,22 @@ def save_presentation(prs, original_filename):
     counter = 1
     while True:
         if counter == 1:
-            output_filename = os.path.join(output_dir, f"{name_without_ext}_ja.pptx")
+            output_filename = os.path.join(output_dir, f"{name_without_ext}{suffix}.pptx")
         else:
-            output_filename = os.path.join(output_dir, f"{name_without_ext}_ja_{counter}.pptx")
+            output_filename = os.path.join(output_dir, f"{name_without_ext}{suffix}_{counter}.pptx")
         
         try:
             prs.save(output_filename)
-            logging.info(f"Successfully saved presentation to {output_filename}")
+            logging.info("Successfully saved presentation to %s", output_filename)
             return output_filename
         except PermissionError:
-            logging.warning(f"Permission denied when saving to {output_filename}. File might be open in PowerPoint.")
+            logging.warning("Permission denied when saving to %s. File might be open in PowerPoint.", output_filename)
             logging.info("Please close the file in PowerPoint if it's open.")
             counter += 1
             if counter > 5:  # Limit number of attempts
                 raise Exception(f"Failed to save presentation after {counter-1} attempts. Please ensure the file is not open in PowerPoint.")
         except Exception as e:
-            logging.error(f"Error saving presentation: {str(e)}")
+            logging.error("Error saving presentation: %s", e)
             raise
 
 def extract_table_texts(shape):
@@ -209,9 +454,21 @@ def split_text_by_paragraphs(text):
         
     return result
 
-def process_presentation(input_file):
-    """Process a PowerPoint presentation, translating text from Vietnamese to Japanese."""
-    logging.info(f"Processing {input_file}")
+def process_presentation(input_file, resume=False, fit_mode="autofit"):
+    """Process a PowerPoint presentation, translating text from Vietnamese to Japanese.
+
+    Finished segments are journaled after every batch; with resume=True,
+    segments already in the journal for this exact deck are not re-translated.
+    After write-back, text that no longer fits its shape or table cell is
+    shrunk according to fit_mode ("autofit", "shrink" or "off").
+
+    When the token budget runs out, the segments translated so far are kept
+    and the deck is saved as <name>_ja_partial.pptx; its journal is kept, so
+    --resume translates the rest later.
+
+    Returns (output file, None or why the deck is partial); (None, None) for a deck without text.
+    """
+    logging.debug("Processing %s", input_file)
     
     try:
         prs = Presentation(input_file)
@@ -252,29 +509,89 @@ def process_presentation(input_file):
                         text_locations.append(("table", slide_idx, shape_idx, row_idx, cell_idx, para_idx))
         
         if not all_texts:
-            logging.info(f"No text found in {input_file}")
-            return
-        
-        # Translate texts in batches
-        translated_texts = []
-        batches = batch_texts(all_texts)
+            logging.info("No text found in %s", input_file)
+            return None, None
         
-        print(f"\nTranslating {os.path.basename(input_file)}:")
-        for i, batch in enumerate(batches):
+        # Collapse repeated segments (footers, notices, agenda headings, table headers)
+        # so each unique text is translated once
+        unique_texts, segment_map = dedup_segments(all_texts)
+        report_dedup(input_file, all_texts, unique_texts, segment_map, text_locations)
+
+        # Reuse translations journaled by an earlier, interrupted run
+        journal = SegmentJournal(input_file, resume=resume)
+        positions_by_unique = [[] for _ in unique_texts]
+        for position, idx in enumerate(segment_map):
+            positions_by_unique[idx].append(position)
+
+        unique_translations = [None] * len(unique_texts)
+        for idx, positions in enumerate(positions_by_unique):
+            cached = [journal.lookup(text_locations[p], all_texts[p]) for p in positions]
+            if all(c is not None for c in cached):
+                unique_translations[idx] = cached[0]
+
+        pending = [idx for idx, translation in enumerate(unique_translations) if translation is None]
+        deck_name = os.path.basename(input_file)
+        if resume:
+            resumed = len(unique_texts) - len(pending)
+            logging.info("Resumed %s: %d/%d unique segments already translated", deck_name, resumed,
+                         len(unique_texts), extra={"event": "resume", "deck": deck_name, "resumed": resumed})
+            print(f"Resuming {deck_name}: {resumed}/{len(unique_texts)} segments already translated")
+
+        # Translate the remaining unique texts in batches, one model tier per batch;
+        # send nothing new if the deck's projected cost does not fit the budgets
+        batches = [(tier, [pending[k] for k in indices]) for tier, indices in
+                   route_batches([unique_texts[idx] for idx in pending], BATCH_SIZE, ROUTING, DEFAULT_TIER)]
+        partial = None
+        try:
+            projected_usd, projected_tokens = governor.project(
+                deck_name, [(tier, *estimate_request([unique_texts[idx] for idx in batch])) for tier, batch in batches])
+            logging.info("Projected spend for %s: $%.4f, %d tokens", deck_name, projected_usd, projected_tokens,
+                         extra={"event": "projection", "deck": deck_name, "projected_usd": round(projected_usd, 6),
+                                "projected_tokens": projected_tokens, "batches": len(batches)})
+        except BudgetExceeded as e:
+            if not any(translation is not None for translation in unique_translations):
+                raise  # Nothing translated at all: the deck fails instead of saving an untranslated copy
+            logging.warning("Budget refused the rest of %s: %s", deck_name, e,
+                            extra={"event": "budget_exceeded", "deck": deck_name})
+            partial = f"budget: {e}"
+            batches = []
+
+        if SHOW_PROGRESS_BAR:
+            print(f"\nTranslating {deck_name}:")
+        for i, (tier, batch) in enumerate(batches):
             progress = (i + 1) / len(batches) * 100
-            sys.stdout.write(f"\rProgress: [{int(progress)}%] Batch {i+1}/{len(batches)}")
-            sys.stdout.flush()
-            
-            logging.info(f"Translating batch {i+1}/{len(batches)} (size: {len(batch)} texts)")
-            translations = translate_batch(batch)
-            translated_texts.extend(translations)
-            
-            if i < len(batches) - 1:
-                time.sleep(2)
-        print("\nTranslation completed!")
+            if SHOW_PROGRESS_BAR:
+                sys.stdout.write(f"\rProgress: [{int(progress)}%] Batch {i+1}/{len(batches)}")
+                sys.stdout.flush()
+            else:
+                print(f"[{deck_name}] Batch {i+1}/{len(batches)} ({int(progress)}%)", flush=True)
+
+            logging.debug("Translating batch %d/%d (size: %d texts)", i + 1, len(batches), len(batch))
+            try:
+                translations = translate_batch([unique_texts[idx] for idx in batch], deck=deck_name, tier=tier)
+            except BudgetExceeded as e:
+                # Keep what is translated; the remaining segments stay in the source language
+                logging.warning("Budget stopped %s after %d/%d batches: %s", deck_name, i, len(batches), e,
+                                extra={"event": "budget_exceeded", "deck": deck_name, "batches_done": i})
+                partial = f"budget ran out after {i}/{len(batches)} batches: {e}"
+                break
+            for idx, translation in zip(batch, translations):
+                unique_translations[idx] = translation
+            journal.record(
+                (text_locations[p], all_texts[p], translation)
+                for idx, translation in zip(batch, translations)
+                for p in positions_by_unique[idx]
+            )
+        if SHOW_PROGRESS_BAR:
+            print("\nTranslation stopped (budget)!" if partial else "\nTranslation completed!")
+
+        # Fan translations back out to every location of each segment
+        translated_texts = [unique_translations[idx] for idx in segment_map]
         
-        # Update presentation with translations
+        # Update presentation with translations (untranslated segments of a partial deck stay as they are)
         for location, translated_text in zip(text_locations, translated_texts):
+            if translated_text is None:
+                continue
             if location[0] == "paragraph":
                 _, slide_idx, shape_idx, para_idx = location
                 shape = prs.slides[slide_idx].shapes[shape_idx]
@@ -363,29 +680,259 @@ def process_presentation(input_file):
                                 # If bullet restoration fails, log but continue
                                 logging.warning("Failed to restore bullet formatting")
         
-        # Save translated presentation with error handling
-        save_presentation(prs, input_file)
+        # Shrink translated text that overflows its shape or cell, measured locally
+        if fit_mode != "off":
+            fit_summary = fit_translated_text(prs, text_locations, fit_mode)
+            metrics = ", ".join(f"{font}: {source}" for font, source in fit_summary["font_metrics"].items())
+            logging.info("Text fit for %s: %d/%d frames shrunk (min scale %.2f; metrics %s)", deck_name,
+                         fit_summary["shrunk"], fit_summary["frames"], fit_summary["min_scale"],
+                         metrics or "none", extra={"event": "text_fit", "deck": deck_name, **fit_summary})
+            if fit_summary["estimated_fonts"]:
+                logging.warning("Text fit for %s used estimated glyph widths for %s; install the font "
+                                "(and fonttools) for exact fits", deck_name, ", ".join(fit_summary["estimated_fonts"]),
+                                extra={"event": "text_fit_estimated", "deck": deck_name})
+
+        # Save translated presentation with error handling; a partial deck keeps its journal for --resume
+        output_file = save_presentation(prs, input_file, suffix="_ja_partial" if partial else "_ja")
+        if not partial:
+            journal.finish()
+        return output_file, partial
         
     except Exception as e:
-        logging.error(f"Error processing presentation {input_file}: {str(e)}")
+        logging.error("Error processing presentation %s: %s", input_file, e, extra={"event": "deck_error"})
         raise
 
+def process_deck(input_file, resume=False, fit_mode="autofit"):
+    """Translate one deck and report its outcome instead of raising.
+
+    Used as the unit of work for both sequential and pooled runs, so a single
+    corrupt deck fails on its own without aborting the rest of the folder.
+    """
+    start_time = time.time()
+    logging.info("Processing file %s", input_file, extra={"event": "deck_start"})
+    try:
+        output_file, partial = process_presentation(input_file, resume=resume, fit_mode=fit_mode)
+        logging.debug("Completed translation of %s", input_file)
+        # No output without an error means the deck had no text: nothing to do, not a failure
+        return {"input": input_file, "output": output_file, "ok": True,
+                "skipped": None if output_file else "no text", "partial": partial,
+                "error": None, "seconds": time.time() - start_time,
+                "spend": governor.file_report(os.path.basename(input_file))}
+    except Exception as e:
+        return {"input": input_file, "output": None, "ok": False,
+                "error": str(e), "seconds": time.time() - start_time,
+                "spend": governor.file_report(os.path.basename(input_file))}
+
+def run_decks(input_files, workers, resume=False, fit_mode="autofit"):
+    """Process decks sequentially or in a process pool and collect their results."""
+    results = []
+    total = len(input_files)
+
+    if workers <= 1 or total == 1:
+        for input_file in input_files:
+            results.append(process_deck(input_file, resume, fit_mode))
+            report_deck_result(results[-1], len(results), total)
+        return results
+
+    # python-pptx parsing is CPU-bound, so use processes; the rate limiter lives
+    # in shared memory so the API still sees one global call rate.
+    # Workers log through a queue so only this process writes the rotating log file.
+    root = logging.getLogger()
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        results = _run_pool(input_files, workers, log_queue, root.level, resume, fit_mode)
+    finally:
+        listener.stop()
+    return results
+
+def _run_pool(input_files, workers, log_queue, log_level, resume, fit_mode):
+    """Run process_deck over input_files in a process pool."""
+    results = []
+    total = len(input_files)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(rate_limiter.lock, rate_limiter.next_slot, log_queue, log_level, governor.worker_args(), ROUTING),
+    ) as executor:
+        futures = {executor.submit(process_deck, f, resume, fit_mode): f for f in input_files}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker process died (e.g. crash while parsing); keep going with the rest
+                result = {"input": futures[future], "output": None, "ok": False,
+                          "error": str(e), "seconds": 0.0}
+            results.append(result)
+            report_deck_result(result, len(results), total)
+    return results
+
+def report_deck_result(result, done, total):
+    """Print and log per-deck progress, timing and projected vs actual spend.
+
+    Runs in the parent process, which also adds the spend to the daily budget ledger.
+    """
+    name = os.path.basename(result["input"])
+    spend = result.get("spend")
+    extra = {"event": "deck_done", "deck": name, "ok": result["ok"], "skipped": result.get("skipped"),
+             "partial": result.get("partial"), "seconds": round(result["seconds"], 2), "error": result["error"],
+             "spend": spend}
+    if result["ok"] and result.get("partial"):
+        message = f"[{done}/{total}] {name} PARTIAL after {result['seconds']:.1f}s ({result['partial']})"
+        logging.warning("Deck %s saved partially translated: %s", name, result["partial"], extra=extra)
+    elif result["ok"] and result.get("skipped"):
+        message = f"[{done}/{total}] {name} skipped: {result['skipped']}"
+        logging.info("Deck %s skipped: %s", name, result["skipped"], extra=extra)
+    elif result["ok"]:
+        message = f"[{done}/{total}] {name} done in {result['seconds']:.1f}s"
+        logging.info("Deck %s done in %.1fs", name, result["seconds"], extra=extra)
+    else:
+        message = f"[{done}/{total}] {name} FAILED after {result['seconds']:.1f}s: {result['error']}"
+        logging.error("Deck %s failed: %s", name, result["error"], extra=extra)
+    if spend:
+        message += f"\n    spend: {format_spend(spend)}"
+    print(message, flush=True)
+    governor.commit()
+
+# Per-deck status records written in --watch mode
+STATUS_DIR = 'SlideTranslateStatus'
+
+def watch_decks(input_dir, workers, resume=False, fit_mode="autofit", interval=2.0, settle=3.0):
+    """Keep running and translate each deck as soon as it has been copied into input_dir.
+
+    The worker processes (with python-pptx loaded and their pooled API client) are
+    started once and reused for every deck. At most `workers` decks are in flight;
+    each gets a status record in STATUS_DIR. Decks interrupted by Ctrl+C keep the
+    "processing" state and are picked up again on the next start.
+    """
+    watcher = FolderWatcher(input_dir, ['*.pptx'], STATUS_DIR, settle=settle)
+    listener = None
+    if workers > 1:
+        root = logging.getLogger()
+        log_queue = multiprocessing.Queue()
+        listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+        listener.start()
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(rate_limiter.lock, rate_limiter.next_slot, log_queue, root.level,
+                      governor.worker_args(), ROUTING),
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=1)
+
+    print(f"Watching {input_dir}/ with {workers} worker(s); status records in {STATUS_DIR}/. Press Ctrl+C to stop.",
+          flush=True)
+    logging.info("Watching %s", input_dir, extra={"event": "watch_start", "workers": workers})
+    futures = {}
+    done = 0
+    try:
+        while True:
+            for input_file in watcher.ready()[:workers - len(futures)]:
+                record = watcher.start(input_file)
+                futures[executor.submit(process_deck, input_file, resume, fit_mode)] = (input_file, record)
+            if not futures:
+                time.sleep(interval)
+                continue
+            finished, _ = wait(futures, timeout=interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                input_file, record = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"input": input_file, "output": None, "ok": False, "error": str(e), "seconds": 0.0}
+                watcher.finish(input_file, record, output=result["output"], error=result["error"],
+                               skipped=result.get("skipped"), partial=result.get("partial"))
+                done += 1
+                report_deck_result(result, done, done + len(futures))
+    except KeyboardInterrupt:
+        print(f"\nWatch stopped after {done} deck(s); {len(futures)} in progress will be retried next time", flush=True)
+        for future in futures:
+            future.cancel()
+    finally:
+        executor.shutdown(wait=False)
+        if listener is not None:
+            listener.stop()
+        logging.info("Watch stopped", extra={"event": "watch_stop", "decks": done})
+
 def main():
+    parser = argparse.ArgumentParser(description='Translate PowerPoint files from input/ to output/')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of decks processed in parallel. Default: CPU count (capped by number of decks)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default=None,
+                        help='Log level. INFO logs batch summaries, DEBUG adds every source/translated text. '
+                             'Default: $SLIDE_TRAN_LOG_LEVEL or INFO')
+    parser.add_argument('--log-sample', type=float, default=None,
+                        help='Fraction of batches (0-1) whose full texts are logged at INFO. Default: $SLIDE_TRAN_LOG_SAMPLE or 0')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip segments already translated by an earlier interrupted run of the same deck')
+    parser.add_argument('--fit', choices=['autofit', 'shrink', 'off'], default='autofit',
+                        help='How to fix translated text that overflows its box: autofit (PowerPoint shrink-on-overflow '
+                             'with a precomputed font scale), shrink (rewrite font sizes) or off. Default: autofit')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and translate decks as they are dropped into input/')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Watch mode: seconds between scans of input/. Default: 2')
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help='Watch mode: seconds a deck must stay unchanged before it is translated. Default: 3')
+    parser.add_argument('--budget-usd', type=float, default=None,
+                        help='Maximum API spend (USD) for this run, or for the whole session in watch mode')
+    parser.add_argument('--daily-budget-usd', type=float,
+                        default=float(os.getenv('LLM_DAILY_BUDGET_USD')) if os.getenv('LLM_DAILY_BUDGET_USD') else None,
+                        help='Maximum API spend (USD) per UTC day across runs. Default: $LLM_DAILY_BUDGET_USD or unlimited')
+    parser.add_argument('--budget-tokens', type=int, default=None, help='Maximum tokens for this run')
+    parser.add_argument('--daily-budget-tokens', type=int, default=None, help='Maximum tokens per UTC day across runs')
+    parser.add_argument('--routing', choices=['auto', 'off'], default='auto',
+                        help='auto: short labels to the fast tier, long prose to the strong tier; '
+                             'off: every batch on gemini-2.0-flash-lite. Default: auto')
+    args = parser.parse_args()
+
     # Setup logging
-    log_file = setup_logging()
-    logging.info(f"Translation log file: {log_file}")
+    global LOG_SAMPLE_RATE
+    if args.log_sample is not None:
+        LOG_SAMPLE_RATE = args.log_sample
+    log_file = setup_logging(args.log_level)
+    logging.debug("Translation log file: %s", log_file)
+
+    # Budgets and routing; the ledger shares the daily budget between runs
+    global governor, ROUTING
+    governor = BudgetGovernor(run_usd=args.budget_usd, day_usd=args.daily_budget_usd,
+                              run_tokens=args.budget_tokens, day_tokens=args.daily_budget_tokens,
+                              ledger_path=os.path.join(LOG_DIR, 'budget_ledger.json'))
+    ROUTING = args.routing == 'auto'
     
+    if args.watch:
+        os.makedirs('input', exist_ok=True)
+        watch_decks('input', args.workers or os.cpu_count() or 1, resume=args.resume, fit_mode=args.fit,
+                    interval=args.interval, settle=args.settle)
+        return
+
     # Find all PPTX files in the input directory
     input_files = glob.glob('input/*.pptx')
     
     if not input_files:
         logging.warning("No PowerPoint files found in the input directory")
         return
-    
-    for input_file in input_files:
-        logging.info(f"\n=== Processing file: {input_file} ===")
-        process_presentation(input_file)
-        logging.info(f"Completed translation of {input_file}")
+
+    workers = args.workers or min(os.cpu_count() or 1, len(input_files))
+    start_time = time.time()
+    results = run_decks(input_files, workers, resume=args.resume, fit_mode=args.fit)
+
+    failed = [r for r in results if not r["ok"]]
+    skipped = [r for r in results if r["ok"] and r.get("skipped")]
+    partial = [r for r in results if r["ok"] and r.get("partial")]
+    summary = (f"Processed {len(results)} decks with {workers} worker(s) in "
+               f"{time.time() - start_time:.1f}s: {len(results) - len(failed) - len(skipped) - len(partial)} succeeded, "
+               f"{len(partial)} partial, {len(skipped)} skipped, {len(failed)} failed")
+    logging.info(summary, extra={"event": "run_done", "decks": len(results), "failed": len(failed),
+                                 "partial": len(partial), "skipped": len(skipped), "workers": workers,
+                                 "seconds": round(time.time() - start_time, 2)})
+    print(f"\n{summary}")
+    for result in partial:
+        print(f"  - {os.path.basename(result['input'])} (partial, {result['output']}): {result['partial']}")
+    for result in failed:
+        print(f"  - {os.path.basename(result['input'])}: {result['error']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
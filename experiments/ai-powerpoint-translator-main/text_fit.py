@@ -0,0 +1,376 @@
+"""Local text measurement and fit computation for translated slides.
+
+Japanese output is often longer or wider than the Vietnamese source, so text
+overflows its shape after write-back. This module measures text with glyph
+width tables cached per (font, size) and computes, in one pass over every
+translated shape and table cell, the font scale needed to fit the box. No
+running PowerPoint is needed.
+
+Glyph widths come from the installed font file when fontTools is available
+(pip install fonttools) and the font is found; otherwise built-in
+approximations of Meiryo UI metrics are used. The fit summary reports the
+source per font, so fits that relied on approximations can be spotted.
+"""
+
+import os
+import re
+import sys
+import logging
+import functools
+import unicodedata
+
+from pptx.util import Pt
+from pptx.enum.text import MSO_AUTO_SIZE
+
+try:
+    from fontTools.ttLib import TTFont, TTCollection
+except ImportError:
+    TTFont = None
+    TTCollection = None
+
+# Fonts tried in order when measuring text set in a given font
+FONT_FALLBACKS = {
+    "Meiryo UI": ["Meiryo UI", "Meiryo", "Yu Gothic UI", "MS PGothic"],
+    "Meiryo": ["Meiryo", "Meiryo UI", "Yu Gothic", "MS PGothic"],
+}
+
+# Directories searched for font files (extend with TEXT_FIT_FONT_DIRS, os.pathsep separated)
+FONT_DIRS = [
+    os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+    os.path.expanduser(r"~\AppData\Local\Microsoft\Windows\Fonts"),
+    "/Library/Fonts",
+    os.path.expanduser("~/Library/Fonts"),
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+] + [d for d in os.getenv("TEXT_FIT_FONT_DIRS", "").split(os.pathsep) if d]
+
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf", ".otc")
+
+# Layout assumptions
+LINE_SPACING = 1.2          # Line height as a multiple of font size
+DEFAULT_FONT_SIZE_PT = 18   # PowerPoint default when a run has no explicit size
+MIN_SCALE = 0.5             # Never shrink text below half its original size
+MIN_FONT_SIZE_PT = 6
+SCALE_STEP = 0.025          # Resolution of the computed scale
+
+# Approximate advance widths (em) of Meiryo UI, used when no font file is available
+_NARROW_LATIN = set("il.,:;'|!`ijI[]()")
+_WIDE_LATIN = set("mwMW@%")
+_UPPER_LATIN = set("ABCDEFGHJKLNOPQRSTUVXYZ&")
+
+def _heuristic_em(ch):
+    """Approximate advance width of a character in em units."""
+    if unicodedata.combining(ch):
+        return 0.0
+    if ch == " ":
+        return 0.28
+    if ch == "\u3000":
+        return 1.0
+    if ch in _NARROW_LATIN:
+        return 0.27
+    if ch in _WIDE_LATIN:
+        return 0.85
+    if ch in _UPPER_LATIN:
+        return 0.64
+    if ch.isdigit():
+        return 0.55
+    east_asian = unicodedata.east_asian_width(ch)
+    if east_asian in ("W", "F"):
+        # Meiryo UI sets kana narrower than kanji
+        if "\u3041" <= ch <= "\u30ff":
+            return 0.88
+        return 1.0
+    if east_asian == "H":
+        return 0.5
+    return 0.52
+
+@functools.lru_cache(maxsize=None)
+def _font_file_index():
+    """Map lowercase family name -> (path, font number) for installed fonts."""
+    index = {}
+    if TTFont is None:
+        return index
+    for font_dir in FONT_DIRS:
+        if not os.path.isdir(font_dir):
+            continue
+        for root, _, files in os.walk(font_dir):
+            for name in files:
+                if not name.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if name.lower().endswith((".ttc", ".otc")):
+                        fonts = TTCollection(path, lazy=True).fonts
+                    else:
+                        fonts = [TTFont(path, lazy=True)]
+                    for number, font in enumerate(fonts):
+                        family = font["name"].getDebugName(1)
+                        if family:
+                            index.setdefault(family.lower(), (path, number))
+                except Exception as e:
+                    logging.debug("Skipping font file %s: %s", path, e)
+    return index
+
+@functools.lru_cache(maxsize=None)
+def _font_em_widths(font_name):
+    """Advance widths (em) of every mapped character of an installed font, or None."""
+    entry = _font_file_index().get(font_name.lower())
+    if entry is None:
+        return None
+    path, number = entry
+    try:
+        font = TTFont(path, fontNumber=number, lazy=True)
+        units_per_em = font["head"].unitsPerEm
+        metrics = font["hmtx"].metrics
+        return {
+            chr(codepoint): metrics[glyph][0] / units_per_em
+            for codepoint, glyph in font.getBestCmap().items()
+            if glyph in metrics
+        }
+    except Exception as e:
+        logging.warning("Could not read metrics from %s: %s", path, e)
+        return None
+
+class GlyphWidthTable:
+    """Character advance widths in points for one (font, size)."""
+
+    def __init__(self, font_name, size_pt):
+        self.font_name = font_name
+        self.size_pt = size_pt
+        # (family, em widths) of the installed font files tried in order
+        self.sources = [(f, w) for f, w in ((f, _font_em_widths(f)) for f in FONT_FALLBACKS.get(font_name, [font_name]))
+                        if w]
+        self.estimated = set()  # Characters measured with the built-in approximations
+        self._widths = {}
+
+    def width(self, ch):
+        width = self._widths.get(ch)
+        if width is None:
+            em = None
+            for _, source in self.sources:
+                em = source.get(ch)
+                if em is not None:
+                    break
+            if em is None:
+                em = _heuristic_em(ch)
+                self.estimated.add(ch)
+            width = em * self.size_pt
+            self._widths[ch] = width
+        return width
+
+    def text_width(self, text):
+        width = self.width
+        return sum(width(ch) for ch in text)
+
+@functools.lru_cache(maxsize=256)
+def glyph_width_table(font_name, size_pt):
+    """Shared glyph width table for a (font, size) pair."""
+    return GlyphWidthTable(font_name, size_pt)
+
+# Break opportunities: every CJK character stands alone, Latin words keep their trailing spaces
+_TOKEN_RE = re.compile(r"[\u3000-\u9fff\uf900-\ufaff\uff00-\uffef]|[^\s\u3000-\u9fff\uf900-\ufaff\uff00-\uffef]+\s*|\s+")
+
+def count_wrapped_lines(text, max_width_pt, table):
+    """Number of lines text occupies when greedily wrapped to max_width_pt."""
+    lines = 0
+    for line in re.split(r"[\n\v]", text):
+        lines += 1
+        current = 0.0
+        for token in _TOKEN_RE.findall(line):
+            token_width = table.text_width(token)
+            if current and current + table.text_width(token.rstrip()) > max_width_pt:
+                lines += 1
+                current = 0.0
+                token = token.lstrip()
+                token_width = table.text_width(token)
+            # A single token wider than the line (long URL, ID) wraps on its own
+            while token_width > max_width_pt and max_width_pt > 0:
+                lines += 1
+                token_width -= max_width_pt
+            current += token_width
+    return lines
+
+def widest_line(text, table):
+    """Width of the widest hard line of text, for boxes that do not wrap."""
+    return max(table.text_width(line) for line in re.split(r"[\n\v]", text))
+
+def fits(job, scale):
+    """Whether a job's paragraphs fit its box when every font size is multiplied by scale.
+
+    A job with height None (table cell: the row grows with its text) is only
+    constrained by its width.
+    """
+    width, height = job["width"], job["height"]
+    total_height = 0.0
+    for text, font_name, size_pt in job["paragraphs"]:
+        # Glyph widths are linear in size, so measure at the original size
+        # against a box widened by 1/scale instead of rebuilding tables per scale
+        table = glyph_width_table(font_name, size_pt)
+        if job["wrap"]:
+            lines = count_wrapped_lines(text, width / scale, table)
+        else:
+            if widest_line(text, table) * scale > width:
+                return False
+            lines = len(re.split(r"[\n\v]", text))
+        total_height += lines * size_pt * scale * LINE_SPACING
+        if height is not None and total_height > height:
+            return False
+    return True
+
+def compute_fit_scales(jobs):
+    """Compute the font scale (MIN_SCALE..1.0) that makes each job's text fit its box.
+
+    Jobs are processed in a single pass; width tables are shared across all
+    jobs through the (font, size) cache.
+    """
+    scales = []
+    steps = int(round((1.0 - MIN_SCALE) / SCALE_STEP))
+    for job in jobs:
+        if job["width"] <= 0 or (job["height"] is not None and job["height"] <= 0) or fits(job, 1.0):
+            scales.append(1.0)
+            continue
+        # Binary search for the largest step index whose scale still fits
+        low, high = 0, steps
+        while low < high:
+            mid = (low + high) // 2
+            if fits(job, 1.0 - mid * SCALE_STEP):
+                high = mid
+            else:
+                low = mid + 1
+        scales.append(round(1.0 - low * SCALE_STEP, 3))
+    return scales
+
+def _frame_job(text_frame, width_pt, height_pt, kind, target):
+    """Describe a text frame as a fit job: its paragraphs and available box (height_pt None: unbounded)."""
+    paragraphs = []
+    for paragraph in text_frame.paragraphs:
+        if not paragraph.text.strip():
+            continue
+        run = paragraph.runs[0] if paragraph.runs else None
+        size = run.font.size.pt if run is not None and run.font.size is not None else DEFAULT_FONT_SIZE_PT
+        font_name = run.font.name if run is not None and run.font.name else "Meiryo UI"
+        paragraphs.append((paragraph.text, font_name, size))
+    width = width_pt - text_frame.margin_left.pt - text_frame.margin_right.pt
+    height = None if height_pt is None else height_pt - text_frame.margin_top.pt - text_frame.margin_bottom.pt
+    return {
+        "kind": kind,
+        "target": target,
+        "paragraphs": paragraphs,
+        "width": width,
+        "height": height,
+        "wrap": text_frame.word_wrap is not False,
+    }
+
+def collect_fit_jobs(prs, text_locations):
+    """Build one fit job per translated shape and table cell."""
+    jobs = []
+    seen = set()
+    for location in text_locations:
+        if location[0] == "paragraph":
+            key = location[1:3]
+        elif location[0] == "table":
+            key = location[1:5]
+        else:
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+
+        shape = prs.slides[location[1]].shapes[location[2]]
+        if location[0] == "paragraph":
+            if not hasattr(shape, "text_frame") or shape.width is None or shape.height is None:
+                continue
+            jobs.append(_frame_job(shape.text_frame, shape.width.pt, shape.height.pt, "shape", shape))
+        else:
+            _, _, _, row_idx, cell_idx, _ = location
+            table = shape.table
+            cell = table.rows[row_idx].cells[cell_idx]
+            # A merged cell spans several grid columns; the row height is only a minimum
+            # (PowerPoint grows the row to fit its text), so cells are fitted by width only
+            span = cell.span_width if cell.is_merge_origin else 1
+            width = sum(table.columns[c].width.pt for c in range(cell_idx, min(cell_idx + span, len(table.columns))))
+            jobs.append(_frame_job(cell.text_frame, width, None, "cell", cell))
+    return jobs
+
+def _shrink_runs(text_frame, scale):
+    for paragraph in text_frame.paragraphs:
+        for run in paragraph.runs:
+            size = run.font.size.pt if run.font.size is not None else DEFAULT_FONT_SIZE_PT
+            run.font.size = Pt(max(MIN_FONT_SIZE_PT, round(size * scale * 2) / 2))
+
+def apply_fit(jobs, scales, mode="autofit"):
+    """Apply computed scales to the presentation.
+
+    mode "autofit" writes PowerPoint's shrink-on-overflow setting with the
+    computed fontScale for shapes (table cells do not support autofit and are
+    always shrunk); mode "shrink" rewrites run font sizes everywhere.
+    Returns the number of text frames changed.
+    """
+    changed = 0
+    for job, scale in zip(jobs, scales):
+        if scale >= 1.0:
+            continue
+        text_frame = job["target"].text_frame
+        if mode == "autofit" and job["kind"] == "shape":
+            text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
+            autofit = text_frame._txBody.bodyPr.find(
+                "{http://schemas.openxmlformats.org/drawingml/2006/main}normAutofit")
+            if autofit is not None:
+                autofit.set("fontScale", str(int(round(scale * 100000))))
+        else:
+            _shrink_runs(text_frame, scale)
+        changed += 1
+    return changed
+
+def font_metrics_report(jobs):
+    """Where the glyph widths of each font used by jobs came from, e.g.
+    {"Meiryo UI": "font file", "Meiryo": "font file Meiryo UI", "Arial": "estimated"}.
+
+    Call after the jobs were measured: a font file lacking some measured
+    characters is reported as "... + estimated glyphs".
+    """
+    report = {}
+    estimated = set()
+    for job in jobs:
+        for _, font_name, size_pt in job["paragraphs"]:
+            table = glyph_width_table(font_name, size_pt)
+            if table.estimated and table.sources:
+                estimated.add(font_name)
+            if font_name in report:
+                continue
+            if not table.sources:
+                report[font_name] = "estimated"
+            elif table.sources[0][0].lower() == font_name.lower():
+                report[font_name] = "font file"
+            else:
+                report[font_name] = f"font file {table.sources[0][0]}"
+    for font_name in estimated:
+        report[font_name] += " + estimated glyphs"
+    return report
+
+def fit_translated_text(prs, text_locations, mode="autofit"):
+    """Measure every translated shape/cell and shrink text that overflows.
+
+    Returns a summary dict for logging; "font_metrics" maps each font to the
+    source of its glyph widths and "estimated_fonts" lists the fonts measured
+    (partly) with approximations.
+    """
+    jobs = collect_fit_jobs(prs, text_locations)
+    scales = compute_fit_scales(jobs)
+    changed = apply_fit(jobs, scales, mode)
+    font_metrics = font_metrics_report(jobs)
+    return {
+        "frames": len(jobs),
+        "shrunk": changed,
+        "min_scale": min(scales) if scales else 1.0,
+        "font_metrics": font_metrics,
+        "estimated_fonts": sorted(font for font, source in font_metrics.items() if "estimated" in source),
+    }
+
+if __name__ == "__main__":
+    # Quick check: python text_fit.py "テキスト" 120 40 12
+    text, width, height, size = sys.argv[1], float(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4])
+    job = {"paragraphs": [(text, "Meiryo UI", size)], "width": width, "height": height, "wrap": True}
+    print(f"Scale needed: {compute_fit_scales([job])[0]}")
+    print(f"Font metrics: {font_metrics_report([job])}")
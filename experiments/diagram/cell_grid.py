@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Lưới ô của một sheet: đổi qua lại giữa tọa độ point và ô / range ("A50:C100")
+
+Đọc kích thước cột/hàng một lần từ sheet XML (<cols>, <row ht>, <sheetFormatPr>).
+Phần lớn cột/hàng có kích thước mặc định nên chỉ lưu các index có kích thước riêng
+(đã sort) cùng prefix sum của phần chênh lệch so với mặc định:
+
+    start(i) = i * default + (tổng chênh lệch của các index riêng < i)
+
+-> ô -> point và point -> ô đều là một lần bisect, O(log k) với k = số cột/hàng
+có kích thước riêng, thay vì cộng dồn từng hàng (hàng 100000 là 100000 vòng lặp).
+
+Usage:
+    python cell_grid.py workbook.xlsx A50:C100          # range -> tọa độ point
+    python cell_grid.py workbook.xlsx --point 300 800   # point -> ô
+"""
+
+import math
+import re
+from bisect import bisect_left, bisect_right
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+}
+
+EMU_PER_POINT = 12700
+
+# Giới hạn lưới của Excel 2007+
+MAX_COLS = 16384
+MAX_ROWS = 1048576
+
+DEFAULT_ROW_HEIGHT = 15.0
+
+_CELL_RE = re.compile(r"\$?([A-Za-z]{1,3})\$?(\d+)")
+
+
+def column_letter(col):
+    """0 -> 'A', 27 -> 'AB'"""
+    letters = ""
+    col += 1
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def column_index(letters):
+    """'A' -> 0, 'AB' -> 27"""
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + ord(ch) - 64
+    return col - 1
+
+
+def parse_cell(ref):
+    """'B12' / '$B$12' -> (col, row) 0-based"""
+    match = _CELL_RE.fullmatch(ref.strip())
+    if not match:
+        raise ValueError(f"Địa chỉ ô không hợp lệ: {ref!r}")
+    col, row = column_index(match.group(1)), int(match.group(2)) - 1
+    if not (0 <= col < MAX_COLS and 0 <= row < MAX_ROWS):
+        raise ValueError(f"Ô nằm ngoài giới hạn sheet: {ref!r}")
+    return col, row
+
+
+def parse_range(ref):
+    """'A50:C100' / 'Sheet1!B3' -> (col1, row1, col2, row2) 0-based, đã chuẩn hóa góc"""
+    ref = ref.rsplit("!", 1)[-1]
+    first, _, last = ref.partition(":")
+    c1, r1 = parse_cell(first)
+    c2, r2 = parse_cell(last) if last else (c1, r1)
+    return min(c1, c2), min(r1, r2), max(c1, c2), max(r1, r2)
+
+
+def cell_name(col, row):
+    """(col, row) 0-based -> 'B12'"""
+    return f"{column_letter(col)}{row + 1}"
+
+
+class _Axis:
+    """Một chiều của lưới: kích thước mặc định + các index có kích thước riêng (prefix sum)"""
+
+    def __init__(self, default, sizes, count):
+        self.default = default
+        self.count = count
+        self.sizes = {i: size for i, size in sizes.items() if 0 <= i < count}
+        self.indexes = sorted(self.sizes)
+        self.starts = []
+        # deltas[k]: tổng chênh lệch so với mặc định của indexes[0..k]
+        self.deltas = []
+        delta = 0.0
+        for i in self.indexes:
+            self.starts.append(i * default + delta)
+            delta += self.sizes[i] - default
+            self.deltas.append(delta)
+
+    def size(self, i):
+        return self.sizes.get(i, self.default)
+
+    def start(self, i):
+        k = bisect_left(self.indexes, i)
+        return i * self.default + (self.deltas[k - 1] if k else 0.0)
+
+    def locate(self, pos):
+        """Vị trí (point) -> (index, offset trong index đó); index có kích thước 0 bị bỏ qua"""
+        pos = max(pos or 0, 0)
+        k = bisect_right(self.starts, pos) - 1
+        if k >= 0:
+            i = self.indexes[k]
+            end = self.starts[k] + self.sizes[i]
+            if pos < end:
+                return i, pos - self.starts[k]
+            base_index, base = i + 1, end
+        else:
+            base_index, base = 0, 0.0
+        # Sau index riêng cuối cùng <= pos chỉ còn các index mặc định
+        index = base_index + int((pos - base) // self.default) if self.default > 0 else self.count - 1
+        index = min(index, self.count - 1)
+        return index, pos - self.start(index)
+
+
+class SheetGrid:
+    """Kích thước cột/hàng của một sheet (point), để đổi anchor cell <-> tọa độ"""
+
+    def __init__(self, sheet_root=None, max_digit_width=7):
+        self.mdw = max_digit_width
+        fmt = sheet_root.find("main:sheetFormatPr", NS) if sheet_root is not None else None
+        self.default_row_height = DEFAULT_ROW_HEIGHT
+        default_col_chars = None
+        base_col_width = 8
+        if fmt is not None:
+            self.default_row_height = float(fmt.get("defaultRowHeight", DEFAULT_ROW_HEIGHT))
+            if fmt.get("defaultColWidth"):
+                default_col_chars = float(fmt.get("defaultColWidth"))
+            elif fmt.get("baseColWidth"):
+                base_col_width = int(fmt.get("baseColWidth"))
+        if default_col_chars is None:
+            # Không có defaultColWidth: Excel lấy baseColWidth ký tự + 5px padding,
+            # làm tròn lên bội số của 8px (Calibri 11 -> 64px)
+            pixels = math.ceil((base_col_width * self.mdw + 5) / 8) * 8
+            self.default_col_width = pixels * 72 / 96
+        else:
+            self.default_col_width = self._chars_to_points(default_col_chars)
+
+        self.col_widths = {}
+        self.row_heights = {}
+        if sheet_root is not None:
+            for col in sheet_root.findall("main:cols/main:col", NS):
+                if col.get("hidden") in ("1", "true"):
+                    width = 0.0
+                elif col.get("width"):
+                    width = self._chars_to_points(float(col.get("width")))
+                else:
+                    width = self.default_col_width
+                for index in range(int(col.get("min")) - 1, min(int(col.get("max")), MAX_COLS)):
+                    self.col_widths[index] = width
+
+            for row in sheet_root.iterfind("main:sheetData/main:row", NS):
+                if row.get("hidden") in ("1", "true"):
+                    self.row_heights[int(row.get("r")) - 1] = 0.0
+                elif row.get("ht"):
+                    self.row_heights[int(row.get("r")) - 1] = float(row.get("ht"))
+
+        self.cols = _Axis(self.default_col_width, self.col_widths, MAX_COLS)
+        self.rows = _Axis(self.default_row_height, self.row_heights, MAX_ROWS)
+
+    def _chars_to_points(self, chars):
+        # Công thức của Excel: pixel = trunc(((256*w + trunc(128/mdw)) / 256) * mdw), 96 dpi
+        pixels = math.trunc(((256 * chars + math.trunc(128 / self.mdw)) / 256) * self.mdw)
+        return pixels * 72 / 96
+
+    def col_left(self, col):
+        """Tọa độ x (point) của mép trái cột col (0-based)"""
+        return self.cols.start(col)
+
+    def row_top(self, row):
+        """Tọa độ y (point) của mép trên hàng row (0-based)"""
+        return self.rows.start(row)
+
+    def marker(self, x, y):
+        """Tọa độ (x, y) point -> (col, colOff, row, rowOff), offset tính bằng point"""
+        col, col_off = self.cols.locate(x)
+        row, row_off = self.rows.locate(y)
+        return col, col_off, row, row_off
+
+    def point(self, marker):
+        """xdr:from / xdr:to -> (x, y) point"""
+        col = int(marker.find("xdr:col", NS).text)
+        col_off = int(marker.find("xdr:colOff", NS).text)
+        row = int(marker.find("xdr:row", NS).text)
+        row_off = int(marker.find("xdr:rowOff", NS).text)
+        # Excel không cho offset vượt quá kích thước ô chứa nó
+        return (self.col_left(col) + min(col_off / EMU_PER_POINT, self.cols.size(col)),
+                self.row_top(row) + min(row_off / EMU_PER_POINT, self.rows.size(row)))
+
+    def range_bbox(self, ref):
+        """'A50:C100' -> (left, top, right, bottom) point, tính cả ô cuối"""
+        c1, r1, c2, r2 = parse_range(ref)
+        return self.col_left(c1), self.row_top(r1), self.col_left(c2 + 1), self.row_top(r2 + 1)
+
+    def cell_at(self, x, y):
+        """Ô chứa điểm (x, y) point -> 'B12'"""
+        col, _, row, _ = self.marker(x, y)
+        return cell_name(col, row)
+
+    def range_of(self, bbox):
+        """(left, top, right, bottom) point -> range nhỏ nhất phủ hết bbox, vd 'A50:C100'"""
+        c1, _, r1, _ = self.marker(bbox[0], bbox[1])
+        c2, col_off, r2, row_off = self.marker(bbox[2], bbox[3])
+        # Mép phải/dưới trùng đường lưới thì không tính ô kế tiếp
+        if col_off == 0 and c2 > c1:
+            c2 -= 1
+        if row_off == 0 and r2 > r1:
+            r2 -= 1
+        return f"{cell_name(c1, r1)}:{cell_name(c2, r2)}"
+
+
+def _shapes_extent(shapes):
+    boxes = [s["position"] for s in shapes if s.get("position")]
+    if not boxes:
+        return None
+    return (min(p["left"] for p in boxes), min(p["top"] for p in boxes),
+            max(p["left"] + p["width"] for p in boxes), max(p["top"] + p["height"] for p in boxes))
+
+
+def transform_shape(shape, move, scale=1.0):
+    """
+    Dời/co một shape tại chỗ: move(x, y) -> [x', y'] cho điểm tuyệt đối, scale cho kích thước
+    (position, waypoints/route/path tuyệt đối, cỡ chữ khi thu nhỏ)
+    """
+    position = shape.get("position")
+    if position:
+        shape["position"] = dict(zip(("left", "top"), move(position["left"], position["top"])),
+                                 width=round(position["width"] * scale, 2),
+                                 height=round(position["height"] * scale, 2))
+    # Các key chứa tọa độ tuyệt đối (layout.py / router.py / drawing_reader)
+    for key in ("waypoints", "route", "path"):
+        if shape.get(key):
+            shape[key] = [move(x, y) for x, y in shape[key]]
+    font = shape.get("font")
+    if scale < 1.0 and font and font.get("size"):
+        shape["font"] = dict(font, size=round(font["size"] * scale * 2) / 2 or 1.0)
+
+
+def place_in_range(data, cell_range, grid=None, shrink=True):
+    """
+    Đặt diagram vào range (vd "A50:C100"): dời góc trên-trái về góc range và thu nhỏ
+    đều hai chiều (không phóng to) để không tràn ra ngoài range. Sửa trực tiếp data.
+
+    Args:
+        data: {sheet: {"shapes": [...]}} cùng schema với *_analysis.json
+        grid: SheetGrid của sheet đích (mặc định: lưới mặc định của sheet mới)
+        shrink: False thì chỉ dời, giữ nguyên kích thước
+
+    Returns:
+        {sheet: {"range", "bbox", "scale"}} - bbox là vùng point của range
+    """
+    grid = grid or SheetGrid()
+    left, top, right, bottom = grid.range_bbox(cell_range)
+    placed = {}
+    for sheet_name, sheet_data in data.items():
+        shapes = sheet_data.get("shapes", [])
+        extent = _shapes_extent(shapes)
+        if extent is None:
+            continue
+        width, height = extent[2] - extent[0], extent[3] - extent[1]
+        scale = 1.0
+        if shrink and width > 0 and height > 0:
+            scale = min(1.0, (right - left) / width, (bottom - top) / height)
+
+        def move(x, y):
+            return [round(left + (x - extent[0]) * scale, 2), round(top + (y - extent[1]) * scale, 2)]
+
+        for shape in shapes:
+            transform_shape(shape, move, scale)
+        placed[sheet_name] = {"range": cell_range, "bbox": (left, top, right, bottom), "scale": scale}
+    return placed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from drawing_reader import load_sheet_grids
+
+    parser = argparse.ArgumentParser(description="Đổi qua lại giữa ô/range và tọa độ point của sheet")
+    parser.add_argument("excel_file")
+    parser.add_argument("ranges", nargs="*", help="Range cần đổi sang point, vd A50:C100")
+    parser.add_argument("--sheet", help="Tên sheet (mặc định: sheet đầu tiên)")
+    parser.add_argument("--point", nargs=2, type=float, action="append", metavar=("X", "Y"),
+                        help="Tọa độ point cần đổi sang ô (lặp lại được)")
+    args = parser.parse_args()
+
+    grids = load_sheet_grids(args.excel_file)
+    sheet_name = args.sheet or next(iter(grids), None)
+    if sheet_name not in grids:
+        parser.error(f"Không tìm thấy sheet: {sheet_name}")
+    grid = grids[sheet_name]
+    print(f"📄 {sheet_name}: {len(grid.col_widths)} cột / {len(grid.row_heights)} hàng có kích thước riêng")
+    for ref in args.ranges:
+        left, top, right, bottom = grid.range_bbox(ref)
+        print(f"  {ref} -> left={left:g}, top={top:g}, width={right - left:g}, height={bottom - top:g}")
+    for x, y in args.point or ():
+        col, col_off, row, row_off = grid.marker(x, y)
+        print(f"  ({x:g}, {y:g}) -> {cell_name(col, row)} (+{col_off:g}, +{row_off:g})")
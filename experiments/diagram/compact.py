@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Định dạng JSON rút gọn cho diagram (*_analysis.json, diagram.json)
+
+Bản đầy đủ lặp lại font/fill/line/alignment cho từng shape và ghi indent=2.
+Bản rút gọn gom các style giống nhau vào bảng "styles", mỗi shape chỉ còn một
+hàng giá trị theo thứ tự cố định + id style, ghi không khoảng trắng:
+
+    {"schema": "diagram-compact/1",
+     "styles": [{"font": {...}, "fill_color": ..., ...}, ...],
+     "sheets": {"Sheet1": {"total_shapes": 2,
+                           "shapes": [[index, name, type, type_name, [left, top, width, height], text, style_id], ...]}}}
+
+Key không thuộc hàng cố định (id, geometry, connection, route...) nằm trong dict
+ở phần tử thứ 8 của hàng. Chuyển đổi hai chiều không mất dữ liệu.
+
+Usage:
+    python compact.py diagram.json                 # -> diagram_compact.json
+    python compact.py diagram_compact.json --expand
+"""
+
+import json
+from collections.abc import Mapping, Sequence
+
+SCHEMA_VERSION = "diagram-compact/1"
+
+# Thứ tự key giống export_to_json (revert.py)
+ROW_KEYS = ("index", "name", "type", "type_name", "position", "text")
+STYLE_KEYS = ("font", "fill_color", "line_color", "line_weight", "line_style",
+              "arrow_end", "arrow_begin", "alignment")
+POSITION_KEYS = ("left", "top", "width", "height")
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("schema") == SCHEMA_VERSION
+
+
+def _pack_position(position):
+    if isinstance(position, dict) and tuple(position) == POSITION_KEYS:
+        return [position[key] for key in POSITION_KEYS]
+    return position
+
+
+def _unpack_position(position):
+    if isinstance(position, list):
+        return dict(zip(POSITION_KEYS, position))
+    return position
+
+
+def _pack_shape(shape, intern):
+    if not all(key in shape for key in ROW_KEYS):
+        # Shape thiếu key bắt buộc: giữ nguyên dạng dict
+        return dict(shape)
+    style = {key: shape[key] for key in STYLE_KEYS if key in shape}
+    row = [shape["index"], shape["name"], shape["type"], shape["type_name"],
+           _pack_position(shape["position"]), shape["text"], intern(style)]
+    extra = {key: value for key, value in shape.items() if key not in ROW_KEYS and key not in STYLE_KEYS}
+    if extra:
+        row.append(extra)
+    return row
+
+
+def _unpack_shape(row, styles):
+    if isinstance(row, dict):
+        return dict(row)
+    shape = dict(zip(ROW_KEYS, row))
+    shape["position"] = _unpack_position(shape["position"])
+    # Style dùng chung giữa các shape -> copy font/alignment để sửa shape này không ảnh hưởng shape khác
+    for key, value in styles[row[6]].items():
+        shape[key] = dict(value) if isinstance(value, dict) else value
+    if len(row) > 7:
+        shape.update(row[7])
+    return shape
+
+
+def compact_diagram(data):
+    """Diagram đầy đủ ({sheet: {"total_shapes", "shapes"}}) -> dạng rút gọn"""
+    styles = []
+    style_ids = {}
+
+    def intern(style):
+        key = json.dumps(style, sort_keys=True, ensure_ascii=False)
+        if key not in style_ids:
+            style_ids[key] = len(styles)
+            styles.append(style)
+        return style_ids[key]
+
+    sheets = {}
+    for sheet_name, sheet_data in data.items():
+        packed = dict(sheet_data)
+        packed["shapes"] = [_pack_shape(shape, intern) for shape in sheet_data.get("shapes", [])]
+        sheets[sheet_name] = packed
+    return {"schema": SCHEMA_VERSION, "styles": styles, "sheets": sheets}
+
+
+def expand_diagram(compact):
+    """Dạng rút gọn -> diagram đầy đủ (dict thường, bung hết mọi sheet)"""
+    return LazyDiagram(compact).to_dict()
+
+
+class LazyShapes(Sequence):
+    """List shape chỉ bung hàng rút gọn thành dict khi được truy cập (có cache)"""
+
+    def __init__(self, rows, styles):
+        self._rows = rows
+        self._styles = styles
+        self._cache = [None] * len(rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        shape = self._cache[i]
+        if shape is None:
+            shape = self._cache[i] = _unpack_shape(self._rows[i], self._styles)
+        return shape
+
+
+class LazyDiagram(Mapping):
+    """
+    {sheet: {"total_shapes", "shapes"}} đọc từ dạng rút gọn, bung từng sheet khi truy cập
+    Shape nào chưa đọc tới thì chưa tạo dict; to_dict() trả về dict thường để ghi JSON.
+    """
+
+    def __init__(self, compact):
+        self._compact = compact
+        self._sheets = {}
+
+    def __getitem__(self, name):
+        sheet = self._sheets.get(name)
+        if sheet is None:
+            raw = self._compact["sheets"][name]
+            sheet = {key: value for key, value in raw.items() if key != "shapes"}
+            sheet["shapes"] = LazyShapes(raw.get("shapes", []), self._compact["styles"])
+            self._sheets[name] = sheet
+        return sheet
+
+    def __iter__(self):
+        return iter(self._compact["sheets"])
+
+    def __len__(self):
+        return len(self._compact["sheets"])
+
+    def to_dict(self):
+        return {name: {key: (list(value) if key == "shapes" else value) for key, value in sheet.items()}
+                for name, sheet in self.items()}
+
+
+def load_diagram_json(json_file, lazy=False):
+    """
+    Đọc file diagram JSON, dạng đầy đủ hay rút gọn đều được
+
+    Args:
+        lazy: Với file rút gọn, trả về LazyDiagram thay vì bung hết ngay
+
+    Returns:
+        {sheet: {"total_shapes", "shapes"}} (hoặc dữ liệu JSON khác nguyên trạng)
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if is_compact(data):
+        return LazyDiagram(data) if lazy else expand_diagram(data)
+    return data
+
+
+def save_diagram_json(data, output_file, compact=False):
+    """Ghi diagram ra JSON: mặc định indent=2 như export_to_json, compact=True thì ghi dạng rút gọn"""
+    if isinstance(data, LazyDiagram):
+        data = data.to_dict()
+    with open(output_file, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(compact_diagram(data), f, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description="Chuyển diagram JSON giữa dạng đầy đủ và dạng rút gọn")
+    parser.add_argument("input", help="File diagram JSON")
+    parser.add_argument("-o", "--output", help="File output (mặc định: <input>_compact.json / <input>_expanded.json)")
+    parser.add_argument("--expand", action="store_true", help="Bung dạng rút gọn về dạng đầy đủ (indent=2)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    data = load_diagram_json(args.input)
+    load_time = time.perf_counter() - started
+    stem = args.input.rsplit(".", 1)[0]
+    output_file = args.output or stem + ("_expanded.json" if args.expand else "_compact.json")
+    save_diagram_json(data, output_file, compact=not args.expand)
+
+    shapes = sum(len(sheet.get("shapes", [])) for sheet in data.values())
+    print(f"📦 {shapes} shapes: {os.path.getsize(args.input):,} bytes -> {os.path.getsize(output_file):,} bytes")
+    if not args.expand:
+        started = time.perf_counter()
+        lazy = load_diagram_json(output_file, lazy=True)
+        print(f"⏱️  Thời gian đọc: {load_time * 1000:.1f}ms -> {(time.perf_counter() - started) * 1000:.1f}ms")
+        if lazy.to_dict() != data:
+            print("❌ Chuyển đổi bị mất dữ liệu")
+    print(f"✅ Đã xuất ra file: {output_file}")
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+So sánh cấu trúc hai snapshot diagram (diagram.json vs diagram_new.json, *_analysis.json, .xlsx)
+
+Ghép shape giữa hai snapshot theo từng bước, mỗi bước chỉ xét shape chưa ghép:
+  1. hash (name, text)  2. hash name  3. hash text (khác rỗng)
+  4. spatial nearest-neighbour (cùng loại shape/connector, tâm lệch <= MATCH_DISTANCE)
+Mỗi bucket hash thường chỉ có 1-2 shape nên tổng chi phí gần tuyến tính, không so từng cặp O(n²).
+
+Kết quả là JSON (schema "diagram-diff/1") liệt kê shape/connector added, removed, moved,
+resized, restyled, retexted, renamed, rewired - đồng thời là patch: apply_diff(old, diff) == new.
+
+Usage:
+    python diff.py diagram.json diagram_new.json
+    python diff.py diagram.json diagram_new.json -o diagram.diff.json
+    python diff.py diagram.json --apply diagram.diff.json -o diagram_patched.json
+"""
+
+import copy
+import math
+import sys
+
+from spatial import SpatialGrid, bbox_from_position, bbox_center
+from topology import build_graph, is_connector, _node_id
+
+SCHEMA_VERSION = "diagram-diff/1"
+
+# Tâm shape lệch tối đa (point) để ghép bằng vị trí khi name/text đều đổi
+MATCH_DISTANCE = 60.0
+# Sai số tọa độ (point) coi như không di chuyển
+POSITION_EPSILON = 0.01
+
+STYLE_KEYS = ("font", "fill_color", "line_color", "line_weight", "line_style",
+              "arrow_end", "arrow_begin", "alignment", "geometry", "flip", "rotation", "adjust")
+CHANGE_KINDS = ("moved", "resized", "restyled", "retexted", "renamed", "rewired", "modified")
+
+
+def _center(shape):
+    return bbox_center(bbox_from_position(shape.get("position") or {}))
+
+
+def _center_distance(bbox, x, y):
+    cx, cy = bbox_center(bbox)
+    return math.hypot(cx - x, cy - y)
+
+
+def _text(shape):
+    return (shape.get("text") or "").strip()
+
+
+def _pair_bucket(old_items, new_items):
+    """Ghép các shape cùng bucket hash: lần lượt cặp có tâm gần nhau nhất"""
+    if len(old_items) == 1 and len(new_items) == 1:
+        return [(old_items[0][0], new_items[0][0])]
+    candidates = sorted((math.dist(_center(o), _center(n)), i, j)
+                        for i, o in old_items for j, n in new_items)
+    used_old, used_new, pairs = set(), set(), []
+    for _, i, j in candidates:
+        if i not in used_old and j not in used_new:
+            used_old.add(i)
+            used_new.add(j)
+            pairs.append((i, j))
+    return pairs
+
+
+def match_shapes(old_shapes, new_shapes, max_distance=MATCH_DISTANCE):
+    """
+    Ghép shape giữa hai list
+
+    Returns:
+        Dict {vị trí trong old_shapes: (vị trí trong new_shapes, cách ghép)}
+    """
+    matches = {}
+    matched_new = set()
+    keys = (("name+text", lambda s: (s.get("name"), _text(s))),
+            ("name", lambda s: s.get("name")),
+            ("text", lambda s: _text(s) or None))
+    for method, key in keys:
+        buckets = {}
+        for j, shape in enumerate(new_shapes):
+            if j not in matched_new:
+                k = key(shape)
+                if k is not None:
+                    buckets.setdefault((is_connector(shape), k), []).append((j, shape))
+        old_buckets = {}
+        for i, shape in enumerate(old_shapes):
+            if i not in matches:
+                k = key(shape)
+                if k is not None and (is_connector(shape), k) in buckets:
+                    old_buckets.setdefault((is_connector(shape), k), []).append((i, shape))
+        for k, old_items in old_buckets.items():
+            for i, j in _pair_bucket(old_items, buckets[k]):
+                matches[i] = (j, method)
+                matched_new.add(j)
+
+    # Spatial fallback: shape đổi cả name lẫn text nhưng gần như giữ vị trí
+    grids = {True: SpatialGrid(cell_size=max_distance), False: SpatialGrid(cell_size=max_distance)}
+    for j, shape in enumerate(new_shapes):
+        if j not in matched_new:
+            grids[is_connector(shape)].insert(j, bbox_from_position(shape.get("position") or {}))
+    candidates = []
+    for i, shape in enumerate(old_shapes):
+        if i not in matches:
+            x, y = _center(shape)
+            for d, j in grids[is_connector(shape)].nearest(x, y, max_distance, distance=_center_distance):
+                candidates.append((d, i, j))
+    for _, i, j in sorted(candidates):
+        if i not in matches and j not in matched_new:
+            matches[i] = (j, "position")
+            matched_new.add(j)
+    return matches
+
+
+def _position_changes(old, new):
+    old, new = old or {}, new or {}
+    changed = lambda keys: any(abs((old.get(k) or 0) - (new.get(k) or 0)) > POSITION_EPSILON for k in keys)
+    return [kind for kind, keys in (("moved", ("left", "top")), ("resized", ("width", "height"))) if changed(keys)]
+
+
+def _plain(value):
+    """tuple -> list (đọc từ .xlsx ra tuple, từ JSON ra list) để so sánh không phụ thuộc nguồn"""
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def _classify(old, new):
+    """Các loại thay đổi giữa hai phiên bản của một shape + key đổi giá trị / bị xóa"""
+    old, new = _plain(old), _plain(new)
+    kinds = set()
+    changed_keys, removed_keys = [], []
+    for key in new:
+        if key == "index" or old.get(key) == new[key] and key in old:
+            continue
+        changed_keys.append(key)
+        if key == "position":
+            kinds.update(_position_changes(old.get(key), new[key]))
+        elif key in STYLE_KEYS:
+            kinds.add("restyled")
+        elif key == "text":
+            kinds.add("retexted")
+        elif key == "name":
+            kinds.add("renamed")
+        else:
+            kinds.add("modified")
+    for key in old:
+        if key not in new:
+            removed_keys.append(key)
+            kinds.add("restyled" if key in STYLE_KEYS else "modified")
+    return [k for k in CHANGE_KINDS if k in kinds], changed_keys, removed_keys
+
+
+def _edge_ends(shapes):
+    """{vị trí connector: (vị trí shape nguồn, vị trí shape đích)} theo topology"""
+    position_of = {_node_id(shape): i for i, shape in enumerate(shapes)}
+    ends = {}
+    for edge in build_graph(shapes)["edges"]:
+        i = position_of.get(edge["id"])
+        if i is not None:
+            ends[i] = (position_of.get(edge["source"]), position_of.get(edge["target"]))
+    return ends
+
+
+def _ref(shape):
+    return {"index": shape.get("index"), "name": shape.get("name")}
+
+
+def _kind(shape):
+    return "connector" if is_connector(shape) else "shape"
+
+
+def diff_sheet(old_shapes, new_shapes, max_distance=MATCH_DISTANCE):
+    """
+    So sánh một sheet
+
+    Returns:
+        {"added": [{"kind", "shape"}], "removed": [ref], "changed": [...], "reindexed": [[old, new], ...]}
+    """
+    matches = match_shapes(old_shapes, new_shapes, max_distance)
+    new_to_old = {j: i for i, (j, _) in matches.items()}
+    old_ends, new_ends = _edge_ends(old_shapes), _edge_ends(new_shapes)
+
+    result = {"added": [], "removed": [], "changed": [], "reindexed": []}
+    for i, shape in enumerate(old_shapes):
+        if i not in matches:
+            result["removed"].append(dict(_ref(shape), kind=_kind(shape)))
+    for j, shape in enumerate(new_shapes):
+        if j not in new_to_old:
+            result["added"].append({"kind": _kind(shape), "shape": shape})
+            continue
+        i = new_to_old[j]
+        old = old_shapes[i]
+        kinds, changed_keys, removed_keys = _classify(old, shape)
+
+        # Connector nối lại sang shape khác (so qua bảng ghép)
+        if i in old_ends or j in new_ends:
+            mapped = tuple(matches[e][0] if e in matches else None for e in old_ends.get(i, (None, None)))
+            if mapped != new_ends.get(j, (None, None)):
+                kinds = [k for k in CHANGE_KINDS if k in kinds or k == "rewired"]
+
+        if kinds:
+            entry = {"old": _ref(old), "new": _ref(shape), "kind": _kind(shape),
+                     "matched_by": matches[i][1], "changes": kinds,
+                     "set": {key: shape[key] for key in changed_keys}}
+            if removed_keys:
+                entry["unset"] = removed_keys
+            if "rewired" in kinds:
+                entry["ends"] = {"old": [old_shapes[e].get("name") if e is not None else None
+                                         for e in old_ends.get(i, (None, None))],
+                                 "new": [new_shapes[e].get("name") if e is not None else None
+                                         for e in new_ends.get(j, (None, None))]}
+            result["changed"].append(entry)
+        elif old.get("index") != shape.get("index"):
+            result["reindexed"].append([old.get("index"), shape.get("index")])
+    return result
+
+
+def diff_diagrams(old_data, new_data, max_distance=MATCH_DISTANCE):
+    """So sánh hai diagram {sheet: {"total_shapes", "shapes"}} -> diff (schema diagram-diff/1)"""
+    sheets = {}
+    for name, new_sheet in new_data.items():
+        old_sheet = old_data.get(name)
+        if old_sheet is None:
+            sheets[name] = {"status": "added", "sheet": new_sheet}
+            continue
+        sheet_diff = diff_sheet(old_sheet.get("shapes", []), new_sheet.get("shapes", []), max_distance)
+        extra = {k: v for k, v in new_sheet.items() if k != "shapes" and old_sheet.get(k) != v}
+        if extra:
+            sheet_diff["set"] = extra
+        if any(sheet_diff.values()):
+            sheets[name] = sheet_diff
+    for name in old_data:
+        if name not in new_data:
+            sheets[name] = {"status": "removed"}
+    return {"schema": SCHEMA_VERSION, "sheets": sheets, "summary": summarize(sheets)}
+
+
+def summarize(sheets):
+    """Đếm số shape/connector theo loại thay đổi"""
+    summary = {}
+
+    def count(kind, shape_kind):
+        bucket = summary.setdefault(kind, {"shape": 0, "connector": 0})
+        bucket[shape_kind] += 1
+
+    for sheet_diff in sheets.values():
+        for entry in sheet_diff.get("added", []):
+            count("added", entry["kind"])
+        for ref in sheet_diff.get("removed", []):
+            count("removed", ref["kind"])
+        for entry in sheet_diff.get("changed", []):
+            for kind in entry["changes"]:
+                count(kind, entry["kind"])
+    return summary
+
+
+def apply_diff(old_data, diff):
+    """
+    Áp diff lên snapshot cũ -> snapshot mới (không sửa old_data)
+
+    Shape không nằm trong diff giữ nguyên (kể cả index, trừ khi có trong "reindexed").
+    """
+    result = {}
+    sheets = diff.get("sheets", {})
+    for name, old_sheet in old_data.items():
+        sheet_diff = sheets.get(name)
+        if sheet_diff is None:
+            result[name] = copy.deepcopy(old_sheet)
+            continue
+        if sheet_diff.get("status") == "removed":
+            continue
+        removed = {ref["index"] for ref in sheet_diff.get("removed", [])}
+        changed = {entry["old"]["index"]: entry for entry in sheet_diff.get("changed", [])}
+        reindexed = dict(map(tuple, sheet_diff.get("reindexed", [])))
+
+        shapes = []
+        for shape in old_sheet.get("shapes", []):
+            index = shape.get("index")
+            if index in removed:
+                continue
+            shape = copy.deepcopy(shape)
+            entry = changed.get(index)
+            if entry:
+                for key in entry.get("unset", ()):
+                    shape.pop(key, None)
+                shape.update(copy.deepcopy(entry["set"]))
+                shape["index"] = entry["new"]["index"]
+            elif index in reindexed:
+                shape["index"] = reindexed[index]
+            shapes.append(shape)
+        shapes.extend(copy.deepcopy(entry["shape"]) for entry in sheet_diff.get("added", []))
+        shapes.sort(key=lambda s: s.get("index") or 0)
+
+        sheet = {k: copy.deepcopy(v) for k, v in old_sheet.items() if k != "shapes"}
+        sheet.update(copy.deepcopy(sheet_diff.get("set", {})))
+        sheet["shapes"] = shapes
+        result[name] = {k: sheet[k] for k in list(old_sheet) + [k for k in sheet if k not in old_sheet]}
+    for name, sheet_diff in sheets.items():
+        if sheet_diff.get("status") == "added":
+            result[name] = copy.deepcopy(sheet_diff["sheet"])
+    return result
+
+
+def print_diff(diff):
+    """In tóm tắt diff dạng dễ đọc"""
+    for name, sheet_diff in diff["sheets"].items():
+        status = sheet_diff.get("status")
+        if status:
+            print(f"📄 Sheet '{name}': {'thêm mới' if status == 'added' else 'bị xóa'}")
+            continue
+        print(f"📄 Sheet '{name}':")
+        for entry in sheet_diff["added"]:
+            print(f"  + [{entry['kind']}] #{entry['shape'].get('index')} {entry['shape'].get('name')}")
+        for ref in sheet_diff["removed"]:
+            print(f"  - [{ref['kind']}] #{ref['index']} {ref['name']}")
+        for entry in sheet_diff["changed"]:
+            detail = ", ".join(entry["changes"])
+            if "rewired" in entry["changes"]:
+                detail += f" ({' -> '.join(map(str, entry['ends']['old']))} => {' -> '.join(map(str, entry['ends']['new']))})"
+            print(f"  ~ [{entry['kind']}] #{entry['old']['index']} {entry['new']['name']}: {detail}")
+    totals = ", ".join(f"{kind} {c['shape']} shape/{c['connector']} connector"
+                       for kind, c in diff["summary"].items())
+    print(f"📊 {totals or 'Không có thay đổi'}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    from compact import save_diagram_json
+    from topology import load_diagram
+
+    parser = argparse.ArgumentParser(description="So sánh cấu trúc hai snapshot diagram / áp diff như patch")
+    parser.add_argument("old", help="Snapshot cũ (.json / .xlsx)")
+    parser.add_argument("new", nargs="?", help="Snapshot mới (.json / .xlsx)")
+    parser.add_argument("-o", "--output", help="Ghi diff (hoặc kết quả --apply) ra file JSON")
+    parser.add_argument("--apply", metavar="DIFF_JSON", help="Áp file diff lên snapshot cũ")
+    parser.add_argument("--max-distance", type=float, default=MATCH_DISTANCE,
+                        help=f"Khoảng cách tâm tối đa khi ghép theo vị trí (mặc định: {MATCH_DISTANCE})")
+    args = parser.parse_args()
+
+    old_data = load_diagram(args.old)
+    if args.apply:
+        with open(args.apply, 'r', encoding='utf-8') as f:
+            patched = apply_diff(old_data, json.load(f))
+        output_file = args.output or args.old.rsplit(".", 1)[0] + "_patched.json"
+        save_diagram_json(patched, output_file)
+        print(f"✅ Đã áp diff, xuất ra file: {output_file}")
+        sys.exit(0)
+    if not args.new:
+        parser.error("cần snapshot mới hoặc --apply")
+
+    diff = diff_diagrams(old_data, load_diagram(args.new), args.max_distance)
+    print_diff(diff)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, indent=2, ensure_ascii=False)
+        print(f"✅ Đã xuất diff ra file: {args.output}")
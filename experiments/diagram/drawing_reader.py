@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+Đọc diagram trực tiếp từ file .xlsx (DrawingML) - không cần mở Excel
+Đọc xl/drawings/drawingN.xml và relationships của từng sheet trong file zip,
+trả về cùng schema với revert.reverse_engineer_diagram:
+    {sheet_name: {"total_shapes": N, "shapes": [...]}}
+Chạy được trên Linux/CI vì không dùng COM.
+"""
+
+import posixpath
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+
+from cell_grid import SheetGrid
+from revert import get_shape_type_name
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "mc": "http://schemas.openxmlformats.org/markup-compatibility/2006",
+}
+
+EMU_PER_POINT = 12700
+
+# Giá trị COM trả về khi shape không có line (msoMixed / mixed weight)
+NO_LINE_WEIGHT = -2147483648.0
+MSO_MIXED = -2
+
+# MsoShapeType
+MSO_AUTO_SHAPE = 1
+MSO_CHART = 3
+MSO_GROUP = 6
+MSO_LINE = 9
+MSO_PICTURE = 13
+MSO_TEXT_BOX = 17
+
+# prstDash -> MsoLineDashStyle
+DASH_STYLES = {
+    "solid": 1, "dot": 2, "sysDot": 3, "dash": 4, "dashDot": 5,
+    "lgDashDotDot": 6, "lgDash": 7, "lgDashDot": 8, "sysDash": 10, "sysDashDot": 12,
+}
+
+# headEnd/tailEnd type -> MsoArrowheadStyle
+ARROWHEAD_STYLES = {
+    "none": 1, "triangle": 2, "arrow": 3, "stealth": 4, "diamond": 5, "oval": 6,
+}
+
+# algn / anchor -> hằng số XlHAlign / XlVAlign
+H_ALIGN = {"l": -4131, "ctr": -4108, "r": -4152, "just": -4130, "dist": -4117}
+V_ALIGN = {"t": -4160, "ctr": -4108, "b": -4107, "just": -4130, "dist": -4117}
+
+# Màu preset hay gặp (a:prstClr)
+PRESET_COLORS = {"black": "#000000", "white": "#FFFFFF", "red": "#FF0000",
+                 "green": "#008000", "blue": "#0000FF", "yellow": "#FFFF00"}
+
+# Chiều rộng ký tự số lớn nhất (pixel) theo font mặc định của workbook,
+# dùng để đổi column width (đơn vị ký tự) sang point
+MAX_DIGIT_WIDTH = {("Calibri", 11): 7, ("Arial", 10): 7, ("Arial", 11): 8,
+                   ("MS PGothic", 11): 8, ("Meiryo", 11): 8, ("Yu Gothic", 11): 8}
+
+
+def _q(tag):
+    """'a:ln' -> '{namespace}ln'"""
+    prefix, local = tag.split(":")
+    return f"{{{NS[prefix]}}}{local}"
+
+
+def _read_xml(zf, path):
+    try:
+        return ET.fromstring(zf.read(path))
+    except KeyError:
+        return None
+
+
+def _read_rels(zf, part_path):
+    """Đọc file .rels của một part, trả về {rId: target_path_tuyệt_đối}"""
+    base_dir = posixpath.dirname(part_path)
+    rels_path = posixpath.join(base_dir, "_rels", posixpath.basename(part_path) + ".rels")
+    root = _read_xml(zf, rels_path)
+    rels = {}
+    if root is None:
+        return rels
+    for rel in root.findall("rel:Relationship", NS):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(base_dir, target))
+        rels[rel.get("Id")] = path
+    return rels
+
+
+def _read_theme_colors(zf, workbook_rels):
+    """Lấy bảng màu theme: {'dk1': '#000000', 'accent1': '#4472C4', ...}"""
+    colors = {"dk1": "#000000", "lt1": "#FFFFFF", "dk2": "#44546A", "lt2": "#E7E6E6",
+              "accent1": "#4472C4", "accent2": "#ED7D31", "accent3": "#A5A5A5",
+              "accent4": "#FFC000", "accent5": "#5B9BD5", "accent6": "#70AD47"}
+    theme_path = next((p for p in workbook_rels.values() if "theme/" in p), None)
+    root = _read_xml(zf, theme_path) if theme_path else None
+    if root is None:
+        return colors
+    scheme = root.find(".//a:clrScheme", NS)
+    if scheme is None:
+        return colors
+    for entry in scheme:
+        name = entry.tag.split("}")[1]
+        srgb = entry.find("a:srgbClr", NS)
+        sys_clr = entry.find("a:sysClr", NS)
+        if srgb is not None:
+            colors[name] = "#" + srgb.get("val").upper()
+        elif sys_clr is not None and sys_clr.get("lastClr"):
+            colors[name] = "#" + sys_clr.get("lastClr").upper()
+    # Alias dùng trong shape: tx1/bg1 -> dk1/lt1
+    colors.update({"tx1": colors["dk1"], "bg1": colors["lt1"],
+                   "tx2": colors["dk2"], "bg2": colors["lt2"]})
+    return colors
+
+
+def _default_font(zf, workbook_rels):
+    """Font của style Normal (font đầu tiên trong styles.xml)"""
+    styles_path = next((p for p in workbook_rels.values() if p.endswith("styles.xml")), None)
+    root = _read_xml(zf, styles_path) if styles_path else None
+    if root is not None:
+        font = root.find("main:fonts/main:font", NS)
+        if font is not None:
+            name = font.find("main:name", NS)
+            size = font.find("main:sz", NS)
+            return (name.get("val") if name is not None else "Calibri",
+                    float(size.get("val")) if size is not None else 11.0)
+    return ("Calibri", 11.0)
+
+
+def _anchor_position(anchor, grid):
+    """Tính left/top/width/height (point) từ one/two/absolute anchor"""
+    kind = anchor.tag.split("}")[1]
+    if kind == "absoluteAnchor":
+        pos = anchor.find("xdr:pos", NS)
+        left, top = int(pos.get("x")) / EMU_PER_POINT, int(pos.get("y")) / EMU_PER_POINT
+    else:
+        left, top = grid.point(anchor.find("xdr:from", NS))
+    if kind == "twoCellAnchor":
+        right, bottom = grid.point(anchor.find("xdr:to", NS))
+        width, height = right - left, bottom - top
+    else:
+        ext = anchor.find("xdr:ext", NS)
+        width, height = int(ext.get("cx")) / EMU_PER_POINT, int(ext.get("cy")) / EMU_PER_POINT
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+def _resolve_color(parent, theme):
+    """Đọc màu từ phần tử chứa srgbClr/schemeClr/prstClr/sysClr"""
+    if parent is None:
+        return None
+    srgb = parent.find("a:srgbClr", NS)
+    if srgb is not None:
+        return "#" + srgb.get("val").upper()
+    scheme = parent.find("a:schemeClr", NS)
+    if scheme is not None:
+        return theme.get(scheme.get("val"))
+    preset = parent.find("a:prstClr", NS)
+    if preset is not None:
+        return PRESET_COLORS.get(preset.get("val"))
+    sys_clr = parent.find("a:sysClr", NS)
+    if sys_clr is not None and sys_clr.get("lastClr"):
+        return "#" + sys_clr.get("lastClr").upper()
+    return None
+
+
+def _fill_color(sp_pr, style, theme):
+    """Màu fill như Fill.ForeColor.RGB: noFill/không có fill -> trắng"""
+    if sp_pr is not None:
+        if sp_pr.find("a:noFill", NS) is not None:
+            return "#FFFFFF"
+        solid = sp_pr.find("a:solidFill", NS)
+        if solid is not None:
+            return _resolve_color(solid, theme)
+        gradient = sp_pr.find("a:gradFill/a:gsLst/a:gs", NS)
+        if gradient is not None:
+            return _resolve_color(gradient, theme)
+    if style is not None:
+        color = _resolve_color(style.find("a:fillRef", NS), theme)
+        if color:
+            return color
+    return "#FFFFFF"
+
+
+def _line_props(sp_pr, style, theme):
+    """Line color/weight/dash/arrowheads như thuộc tính Line của COM"""
+    line = sp_pr.find("a:ln", NS) if sp_pr is not None else None
+    style_color = _resolve_color(style.find("a:lnRef", NS), theme) if style is not None else None
+    if (line is None and style_color is None) or (line is not None and line.find("a:noFill", NS) is not None):
+        return {"line_color": "#FFFFFF", "line_weight": NO_LINE_WEIGHT, "line_style": MSO_MIXED,
+                "arrow_end": MSO_MIXED, "arrow_begin": MSO_MIXED}
+
+    props = {"line_color": style_color or "#000000", "line_weight": 0.75, "line_style": 1,
+             "arrow_end": 1, "arrow_begin": 1}
+    if line is not None:
+        color = _resolve_color(line.find("a:solidFill", NS), theme)
+        if color:
+            props["line_color"] = color
+        if line.get("w"):
+            props["line_weight"] = int(line.get("w")) / EMU_PER_POINT
+        dash = line.find("a:prstDash", NS)
+        if dash is not None:
+            props["line_style"] = DASH_STYLES.get(dash.get("val"), 1)
+        head = line.find("a:headEnd", NS)
+        tail = line.find("a:tailEnd", NS)
+        if head is not None:
+            props["arrow_begin"] = ARROWHEAD_STYLES.get(head.get("type", "none"), 1)
+        if tail is not None:
+            props["arrow_end"] = ARROWHEAD_STYLES.get(tail.get("type", "none"), 1)
+    return props
+
+
+def _paragraph_text(paragraph):
+    parts = []
+    for child in paragraph:
+        tag = child.tag.split("}")[1]
+        if tag in ("r", "fld"):
+            t = child.find("a:t", NS)
+            parts.append(t.text or "" if t is not None else "")
+        elif tag == "br":
+            # Excel trả line break trong đoạn là vertical tab
+            parts.append("\x0b")
+    return "".join(parts)
+
+
+def _run_font(rpr, theme, default_name):
+    latin = rpr.find("a:latin", NS) if rpr is not None else None
+    name = latin.get("typeface") if latin is not None else None
+    if name and name.startswith("+"):
+        name = default_name
+    size = rpr.get("sz") if rpr is not None else None
+    color = _resolve_color(rpr.find("a:solidFill", NS), theme) if rpr is not None else None
+    return {
+        "name": name,
+        "size": int(size) / 100 if size else None,
+        "bold": rpr is not None and rpr.get("b") in ("1", "true"),
+        "italic": rpr is not None and rpr.get("i") in ("1", "true"),
+        "color": color,
+    }
+
+
+def _text_and_font(tx_body, theme, default_font):
+    """Text (các đoạn nối bằng \\n) và font như TextFrame.Characters()"""
+    paragraphs = tx_body.findall("a:p", NS)
+    text = "\n".join(_paragraph_text(p) for p in paragraphs)
+
+    # Characters().Font: lấy theo run đầu tiên; tên font chỉ có khi mọi run
+    # và ký tự xuống dòng giữa các đoạn (endParaRPr) dùng cùng một font
+    fonts = []
+    for i, paragraph in enumerate(paragraphs):
+        for run in paragraph.findall("a:r", NS):
+            fonts.append(_run_font(run.find("a:rPr", NS), theme, default_font[0]))
+        end = paragraph.find("a:endParaRPr", NS)
+        if i < len(paragraphs) - 1 or not fonts:
+            fonts.append(_run_font(end, theme, default_font[0]))
+
+    first = fonts[0] if fonts else _run_font(None, theme, default_font[0])
+    names = {f["name"] for f in fonts}
+    name = first["name"] if len(names) == 1 else ""
+    font = {
+        "name": name if name is not None else default_font[0],
+        "size": first["size"] if first["size"] is not None else default_font[1],
+        "bold": first["bold"],
+        "italic": first["italic"],
+        "color": first["color"] or "#000000",
+    }
+    return text, font
+
+
+def _alignment(tx_body):
+    body_pr = tx_body.find("a:bodyPr", NS)
+    first_ppr = tx_body.find("a:p/a:pPr", NS)
+    return {
+        "horizontal": H_ALIGN.get(first_ppr.get("algn", "l") if first_ppr is not None else "l", -4131),
+        "vertical": V_ALIGN.get(body_pr.get("anchor", "t") if body_pr is not None else "t", -4160),
+    }
+
+
+def _connection(nv_cxn):
+    """stCxn/endCxn của connector -> {'begin': (shape_id, site), 'end': ...}"""
+    conn = {}
+    if nv_cxn is None:
+        return conn
+    for key, tag in (("begin", "a:stCxn"), ("end", "a:endCxn")):
+        el = nv_cxn.find(tag, NS)
+        if el is not None:
+            conn[key] = (el.get("id"), int(el.get("idx", 0)))
+    return conn
+
+
+def _flip(sp_pr):
+    """flipH/flipV của a:xfrm -> {'h': bool, 'v': bool} (None nếu không lật)"""
+    xfrm = sp_pr.find("a:xfrm", NS) if sp_pr is not None else None
+    if xfrm is None:
+        return None
+    flip = {"h": xfrm.get("flipH") in ("1", "true"), "v": xfrm.get("flipV") in ("1", "true")}
+    return flip if flip["h"] or flip["v"] else None
+
+
+def _rotation(sp_pr):
+    """rot của a:xfrm (1/60000 độ) -> độ, chiều kim đồng hồ (0 nếu không xoay)"""
+    xfrm = sp_pr.find("a:xfrm", NS) if sp_pr is not None else None
+    if xfrm is None or not xfrm.get("rot"):
+        return 0
+    return (int(xfrm.get("rot")) / 60000) % 360
+
+
+def _adjust(geom):
+    """a:avLst/a:gd (fmla "val N") của prstGeom -> [N, ...] (None nếu dùng giá trị mặc định)"""
+    values = []
+    for gd in geom.findall("a:avLst/a:gd", NS) if geom is not None else ():
+        parts = (gd.get("fmla") or "").split()
+        if len(parts) == 2 and parts[0] == "val":
+            values.append(int(parts[1]))
+    return values or None
+
+
+def _custom_path(sp_pr):
+    """Path đầu tiên của a:custGeom -> list điểm (x, y) theo tỉ lệ 0..1 của khung shape"""
+    path = sp_pr.find("a:custGeom/a:pathLst/a:path", NS) if sp_pr is not None else None
+    if path is None:
+        return None
+    width, height = int(path.get("w") or 0) or 1, int(path.get("h") or 0) or 1
+    points = []
+    for command in path:
+        pt = command.find("a:pt", NS)
+        if command.tag in (_q("a:moveTo"), _q("a:lnTo")) and pt is not None:
+            points.append((int(pt.get("x")) / width, int(pt.get("y")) / height))
+    return points or None
+
+
+def _read_element(element, theme, default_font):
+    """Đọc một shape cấp cao nhất (sp/cxnSp/grpSp/pic/graphicFrame) -> dict theo schema"""
+    kind = element.tag.split("}")[1]
+    nv = element.find("*/xdr:cNvPr", NS)
+    data = {"name": nv.get("name") if nv is not None else None,
+            "id": nv.get("id") if nv is not None else None,
+            "type": None, "text": None, "font": {}}
+
+    if kind == "sp":
+        sp_pr = element.find("xdr:spPr", NS)
+        style = element.find("xdr:style", NS)
+        c_nv_sp = element.find("xdr:nvSpPr/xdr:cNvSpPr", NS)
+        data["type"] = MSO_TEXT_BOX if c_nv_sp is not None and c_nv_sp.get("txBox") == "1" else MSO_AUTO_SHAPE
+        data["fill_color"] = _fill_color(sp_pr, style, theme)
+        data.update(_line_props(sp_pr, style, theme))
+        tx_body = element.find("xdr:txBody", NS)
+        if tx_body is not None:
+            data["text"], data["font"] = _text_and_font(tx_body, theme, default_font)
+            data["alignment"] = _alignment(tx_body)
+        else:
+            data["text"] = ""
+        geom = sp_pr.find("a:prstGeom", NS) if sp_pr is not None else None
+        data["geometry"] = geom.get("prst") if geom is not None else None
+
+    elif kind == "cxnSp":
+        sp_pr = element.find("xdr:spPr", NS)
+        style = element.find("xdr:style", NS)
+        geom = sp_pr.find("a:prstGeom", NS) if sp_pr is not None else None
+        data["geometry"] = geom.get("prst") if geom is not None else None
+        adjust = _adjust(geom)
+        if adjust:
+            data["adjust"] = adjust
+        path = _custom_path(sp_pr)
+        if path:
+            data["geometry"], data["path"] = "custGeom", path
+        data["type"] = MSO_LINE if data["geometry"] == "line" else MSO_AUTO_SHAPE
+        data["fill_color"] = _fill_color(sp_pr, style, theme)
+        data.update(_line_props(sp_pr, style, theme))
+        data["connection"] = _connection(element.find("xdr:nvCxnSpPr/xdr:cNvCxnSpPr", NS))
+        flip = _flip(sp_pr)
+        if flip:
+            data["flip"] = flip
+        rotation = _rotation(sp_pr)
+        if rotation:
+            data["rotation"] = rotation
+
+    elif kind == "grpSp":
+        data["type"] = MSO_GROUP
+        data["fill_color"] = "#000000"
+        # Group không có line riêng: COM trả thuộc tính của shape con (có line) đầu tiên
+        children = [c for c in element if c.tag.split("}")[1] in ("sp", "cxnSp", "pic", "grpSp")]
+        child_data = [_read_element(c, theme, default_font) for c in children]
+        line_child = next((c for c in child_data if c.get("line_weight") != NO_LINE_WEIGHT), None)
+        source = line_child or (child_data[0] if child_data else {})
+        for key in ("line_color", "line_weight", "line_style", "arrow_end", "arrow_begin"):
+            data[key] = source.get(key)
+        data["children"] = child_data
+
+    elif kind == "pic":
+        sp_pr = element.find("xdr:spPr", NS)
+        data["type"] = MSO_PICTURE
+        data["fill_color"] = "#FFFFFF"
+        data.update(_line_props(sp_pr, None, theme))
+
+    elif kind == "graphicFrame":
+        data["type"] = MSO_CHART
+        data["fill_color"] = "#FFFFFF"
+        data.update(_line_props(None, None, theme))
+
+    return data
+
+
+# Phần tử shape trực tiếp trong một anchor
+DRAWING_ELEMENTS = ("sp", "cxnSp", "grpSp", "pic", "graphicFrame")
+
+
+def anchors_of(child):
+    """Một phần tử con của xdr:wsDr -> các anchor (mc:AlternateContent lấy nhánh mc:Choice)"""
+    if child.tag == _q("mc:AlternateContent"):
+        choice = child.find("mc:Choice", NS)
+        return list(choice) if choice is not None else []
+    return [child]
+
+
+def anchor_element(anchor):
+    """Phần tử shape (sp/cxnSp/grpSp/pic/graphicFrame) của anchor, None nếu không có"""
+    return next((c for c in anchor if c.tag.split("}")[1] in DRAWING_ELEMENTS), None)
+
+
+def _iter_anchors(drawing_root):
+    for child in drawing_root:
+        yield from anchors_of(child)
+
+
+# Các key nội bộ, không thuộc schema của revert.py
+EXTRA_KEYS = ("id", "geometry", "connection", "flip", "rotation", "adjust", "path", "children")
+
+
+def _absolute_path(fractions, position, flip=None):
+    """Điểm theo tỉ lệ khung (custGeom) -> tọa độ point trên sheet"""
+    flip = flip or {}
+    left, top = position["left"], position["top"]
+    width, height = position["width"], position["height"]
+    return [[round(left + width * (1 - fx if flip.get("h") else fx), 2),
+             round(top + height * (1 - fy if flip.get("v") else fy), 2)] for fx, fy in fractions]
+
+
+def read_anchor(anchor, grid, theme, default_font, include_extra=False):
+    """Một anchor -> shape dict (chưa có index), None nếu anchor không chứa shape"""
+    element = anchor_element(anchor)
+    if element is None:
+        return None
+    data = _read_element(element, theme, default_font)
+    shape = {
+        "name": data["name"],
+        "type": data["type"],
+        "type_name": get_shape_type_name(data["type"]),
+        "position": _anchor_position(anchor, grid),
+        "text": data["text"],
+        "font": data["font"],
+        "fill_color": data.get("fill_color"),
+        "line_color": data.get("line_color"),
+        "line_weight": data.get("line_weight"),
+        "line_style": data.get("line_style"),
+        "arrow_end": data.get("arrow_end"),
+        "arrow_begin": data.get("arrow_begin"),
+    }
+    if "alignment" in data:
+        shape["alignment"] = data["alignment"]
+    if include_extra:
+        for key in EXTRA_KEYS:
+            if key in data:
+                shape[key] = data[key]
+        if "path" in data:
+            shape["path"] = _absolute_path(data["path"], shape["position"], data.get("flip"))
+    return shape
+
+
+def read_sheet_drawing(zf, drawing_path, grid, theme, default_font, include_extra=False):
+    """Đọc tất cả shapes trong một drawing part"""
+    root = _read_xml(zf, drawing_path)
+    shapes = []
+    if root is None:
+        return shapes
+    for anchor in _iter_anchors(root):
+        shape = read_anchor(anchor, grid, theme, default_font, include_extra)
+        if shape is not None:
+            shapes.append(dict(index=len(shapes) + 1, **shape))
+    return shapes
+
+
+def iter_sheet_drawings(zf, sheets=None):
+    """
+    Duyệt các sheet theo thứ tự trong workbook (sheets: chỉ duyệt các sheet có tên trong danh sách)
+
+    Yields:
+        (sheet_name, sheet_path, drawing_path, grid, theme, default_font)
+        drawing_path/grid là None nếu sheet không có drawing
+    """
+    workbook_rels = _read_rels(zf, "xl/workbook.xml")
+    workbook = _read_xml(zf, "xl/workbook.xml")
+    theme = _read_theme_colors(zf, workbook_rels)
+    default_font = _default_font(zf, workbook_rels)
+    mdw = MAX_DIGIT_WIDTH.get((default_font[0], int(default_font[1])), 7)
+
+    for sheet in workbook.findall("main:sheets/main:sheet", NS):
+        if sheets is not None and sheet.get("name") not in sheets:
+            continue
+        sheet_path = workbook_rels.get(sheet.get(_q("r:id")))
+        sheet_root = _read_xml(zf, sheet_path) if sheet_path else None
+        drawing_path, grid = None, None
+        if sheet_root is not None:
+            grid = SheetGrid(sheet_root, mdw)
+            drawing = sheet_root.find("main:drawing", NS)
+            if drawing is not None:
+                drawing_path = _read_rels(zf, sheet_path).get(drawing.get(_q("r:id")))
+        yield sheet.get("name"), sheet_path, drawing_path, grid, theme, default_font
+
+
+def load_sheet_grids(excel_file):
+    """{sheet_name: SheetGrid} của mọi sheet trong workbook (sheet không đọc được -> lưới mặc định)"""
+    grids = {}
+    with zipfile.ZipFile(excel_file) as zf:
+        workbook_rels = _read_rels(zf, "xl/workbook.xml")
+        workbook = _read_xml(zf, "xl/workbook.xml")
+        default_font = _default_font(zf, workbook_rels)
+        mdw = MAX_DIGIT_WIDTH.get((default_font[0], int(default_font[1])), 7)
+        for sheet in workbook.findall("main:sheets/main:sheet", NS):
+            sheet_path = workbook_rels.get(sheet.get(_q("r:id")))
+            grids[sheet.get("name")] = SheetGrid(_read_xml(zf, sheet_path) if sheet_path else None, mdw)
+    return grids
+
+
+def sheet_names(excel_file):
+    """Tên các sheet theo thứ tự trong workbook (chỉ đọc xl/workbook.xml)"""
+    with zipfile.ZipFile(excel_file) as zf:
+        workbook = _read_xml(zf, "xl/workbook.xml")
+        return [sheet.get("name") for sheet in workbook.findall("main:sheets/main:sheet", NS)]
+
+
+def read_workbook_diagram(excel_file, include_extra=False, sheets=None):
+    """
+    Đọc tất cả shapes của mọi sheet từ file .xlsx mà không cần Excel
+
+    Args:
+        excel_file: Đường dẫn đến file Excel (.xlsx/.xlsm)
+        include_extra: Thêm các key nội bộ (id, geometry, connection, flip, rotation, adjust, path, children)
+        sheets: Chỉ đọc các sheet có tên trong danh sách này (mặc định: tất cả)
+
+    Returns:
+        Dictionary {sheet_name: {"total_shapes": N, "shapes": [...]}}
+    """
+    all_sheets_info = {}
+    with zipfile.ZipFile(excel_file) as zf:
+        for sheet_name, _, drawing_path, grid, theme, default_font in iter_sheet_drawings(zf, sheets):
+            shapes = []
+            if drawing_path:
+                shapes = read_sheet_drawing(zf, drawing_path, grid, theme, default_font, include_extra)
+            all_sheets_info[sheet_name] = {
+                "total_shapes": len(shapes),
+                "shapes": shapes,
+            }
+    return all_sheets_info
+
+
+def compare_with_analysis(headless_data, analysis_data, tolerance=0.01):
+    """
+    So sánh kết quả headless với file *_analysis.json tạo bởi COM
+
+    Returns:
+        List các chuỗi mô tả khác biệt (rỗng nếu khớp hoàn toàn)
+    """
+    diffs = []
+
+    def same(a, b):
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+            return abs(a - b) <= tolerance
+        return a == b
+
+    def walk(path, expected, actual):
+        if isinstance(expected, dict):
+            if not isinstance(actual, dict):
+                diffs.append(f"{path}: expected {expected!r}, got {actual!r}")
+                return
+            for key, value in expected.items():
+                walk(f"{path}.{key}", value, actual.get(key))
+        elif not same(expected, actual):
+            diffs.append(f"{path}: expected {expected!r}, got {actual!r}")
+
+    for sheet_name, sheet_data in analysis_data.items():
+        actual_sheet = headless_data.get(sheet_name)
+        if actual_sheet is None:
+            diffs.append(f"{sheet_name}: sheet missing")
+            continue
+        if sheet_data["total_shapes"] != actual_sheet["total_shapes"]:
+            diffs.append(f"{sheet_name}: total_shapes expected {sheet_data['total_shapes']}, "
+                         f"got {actual_sheet['total_shapes']}")
+        for expected, actual in zip(sheet_data["shapes"], actual_sheet["shapes"]):
+            # revert.py (COM) có thể ghi thêm id/connection/flip/rotation -> không so sánh
+            expected = {k: v for k, v in expected.items() if k not in EXTRA_KEYS}
+            walk(f"{sheet_name}[{expected['index']}] {expected['name']}", expected, actual)
+    return diffs
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from compact import load_diagram_json, save_diagram_json
+
+    parser = argparse.ArgumentParser(description="Đọc diagram từ .xlsx không cần Excel")
+    parser.add_argument("excel_file")
+    parser.add_argument("-o", "--output", help="File JSON output (mặc định: <file>_analysis.json)")
+    parser.add_argument("--compare", metavar="ANALYSIS_JSON",
+                        help="Kiểm tra parity với file *_analysis.json đã tạo bằng revert.py (COM)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Ghi JSON dạng rút gọn (bảng style dùng chung, xem compact.py)")
+    args = parser.parse_args()
+
+    diagram_info = read_workbook_diagram(args.excel_file)
+
+    if args.compare:
+        analysis = load_diagram_json(args.compare)
+        diffs = compare_with_analysis(diagram_info, analysis)
+        total = sum(s["total_shapes"] for s in analysis.values())
+        if diffs:
+            print(f"❌ {len(diffs)} khác biệt so với {args.compare} ({total} shapes):")
+            for diff in diffs:
+                print(f"  - {diff}")
+            sys.exit(1)
+        print(f"✅ Khớp hoàn toàn với {args.compare} ({total} shapes)")
+    else:
+        output_file = args.output or args.excel_file.replace('.xlsx', '_analysis.json')
+        save_diagram_json(diagram_info, output_file, compact=args.compact)
+        for sheet_name, sheet_data in diagram_info.items():
+            print(f"Sheet '{sheet_name}': {sheet_data['total_shapes']} shapes")
+        print(f"✅ Đã xuất thông tin ra file: {output_file}")
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Vẽ diagram từ JSON (schema của revert.reverse_engineer_diagram) ra file .xlsx
+Ghi thẳng DrawingML (xl/drawings/drawingN.xml) vào file zip - không cần Excel,
+thay cho script *_recreate.py phải chạy qua COM.
+
+Usage:
+    python drawing_writer.py diagram.json                  # -> diagram_rendered.xlsx
+    python drawing_writer.py login_flow.json -o out.xlsx
+    python drawing_writer.py specs/ --output-dir rendered/ # render cả thư mục
+    python drawing_writer.py diagram.json --range A50:C100 # đặt diagram vào range
+"""
+
+import copy
+import os
+import re
+import sys
+import time
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from cell_grid import place_in_range
+from compact import load_diagram_json
+from drawing_reader import (
+    NS, EMU_PER_POINT, NO_LINE_WEIGHT, MSO_MIXED, MSO_GROUP, MSO_PICTURE, MSO_TEXT_BOX,
+    DASH_STYLES, ARROWHEAD_STYLES, H_ALIGN, V_ALIGN,
+)
+
+# Kích thước ô mặc định (Calibri 11): cột 8.43 ký tự = 64px = 48pt, hàng 15pt
+DEFAULT_COL_WIDTH = 48.0
+DEFAULT_ROW_HEIGHT = 15.0
+
+# type_name (get_shape_type_name) -> prstGeom
+GEOMETRIES = {
+    "Rectangle": "rect",
+    "Rounded Rectangle": "roundRect",
+    "Ellipse/Oval": "ellipse",
+    "Oval": "ellipse",
+    "Diamond": "diamond",
+    "Isosceles Triangle": "triangle",
+    "Cube": "cube",
+}
+
+CONNECTOR_GEOMETRIES = ("line", "straightConnector1", "bentConnector2", "bentConnector3",
+                        "bentConnector4", "bentConnector5", "curvedConnector3", "custGeom")
+
+# Đảo ngược các bảng hằng số của drawing_reader
+DASH_PRESETS = {v: k for k, v in DASH_STYLES.items()}
+ARROWHEAD_TYPES = {v: k for k, v in ARROWHEAD_STYLES.items()}
+H_ALGN = {v: k for k, v in H_ALIGN.items()}
+V_ANCHOR = {v: k for k, v in V_ALIGN.items()}
+
+# Ký tự không hợp lệ trong XML 1.0 (trừ \t \n \r)
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+CONTENT_TYPES = {
+    "workbook": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml",
+    "sheet": "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml",
+    "drawing": "application/vnd.openxmlformats-officedocument.drawing+xml",
+    "styles": "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml",
+}
+
+REL_TYPES = {
+    "officeDocument": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument",
+    "sheet": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet",
+    "drawing": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing",
+    "styles": "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles",
+}
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+STYLES_XML = (
+    XML_HEADER
+    + f'<styleSheet xmlns="{NS["main"]}">'
+    '<fonts count="1"><font><sz val="11"/><color theme="1"/><name val="Calibri"/><family val="2"/>'
+    '<scheme val="minor"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _emu(points):
+    return int(round((points or 0) * EMU_PER_POINT))
+
+
+def _hex(color):
+    """'#A9DCDE' -> 'A9DCDE' (None nếu không hợp lệ)"""
+    if not color:
+        return None
+    value = color.lstrip("#").upper()
+    return value if re.fullmatch(r"[0-9A-F]{6}", value) else None
+
+
+def _text(value):
+    return escape(_INVALID_XML_CHARS.sub("", value))
+
+
+def _attr(value):
+    """Giá trị attribute: ký tự điều khiển (vd \x0b trong tên shape) -> khoảng trắng"""
+    return quoteattr(_INVALID_XML_CHARS.sub(" ", str(value)))
+
+
+def _sheet_title(name, used):
+    """Tên sheet hợp lệ cho Excel: tối đa 31 ký tự, không trùng"""
+    title = _INVALID_SHEET_CHARS.sub("_", str(name))[:31] or "Sheet"
+    candidate, n = title, 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = title[:31 - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def _shape_kind(shape):
+    """
+    Xác định cách vẽ một shape: ('sp', prst) / ('txBox', 'rect') / ('cxn', prst) / (None, None)
+
+    Ưu tiên key "geometry" (drawing_reader include_extra); nếu không có thì suy ra từ
+    type/type_name. Type 6 trong JSON sinh tự động là "Connector", trong file phân tích COM
+    là group bọc connector - cả hai đều vẽ thành connector.
+    """
+    geometry = shape.get("geometry")
+    if geometry:
+        if geometry in CONNECTOR_GEOMETRIES:
+            return "cxn", geometry
+        return ("txBox" if shape.get("type") == MSO_TEXT_BOX else "sp"), geometry
+
+    shape_type = shape.get("type")
+    type_name = shape.get("type_name") or ""
+    if shape_type == MSO_PICTURE:
+        # Không có dữ liệu ảnh trong JSON
+        return None, None
+    if shape_type == MSO_TEXT_BOX or type_name in ("TextBox", "Text Box"):
+        return "txBox", "rect"
+    if shape_type == MSO_GROUP or type_name == "Connector":
+        return "cxn", "straightConnector1"
+    return "sp", GEOMETRIES.get(type_name, "rect")
+
+
+def _anchor_from(left, top, grid=None, tag="from"):
+    """Tọa độ point -> xdr:from (hoặc xdr:to) theo lưới ô mặc định / SheetGrid của sheet có sẵn"""
+    left, top = max(left or 0, 0), max(top or 0, 0)
+    if grid is not None:
+        col, col_off, row, row_off = grid.marker(left, top)
+    else:
+        col = int(left // DEFAULT_COL_WIDTH)
+        row = int(top // DEFAULT_ROW_HEIGHT)
+        col_off, row_off = left - col * DEFAULT_COL_WIDTH, top - row * DEFAULT_ROW_HEIGHT
+    return (f'<xdr:{tag}><xdr:col>{col}</xdr:col><xdr:colOff>{_emu(col_off)}</xdr:colOff>'
+            f'<xdr:row>{row}</xdr:row><xdr:rowOff>{_emu(row_off)}</xdr:rowOff></xdr:{tag}>')
+
+
+def _fill_xml(color):
+    value = _hex(color)
+    return f'<a:solidFill><a:srgbClr val="{value}"/></a:solidFill>' if value else '<a:noFill/>'
+
+
+def _line_xml(shape):
+    weight = shape.get("line_weight")
+    if weight in (None, NO_LINE_WEIGHT) or shape.get("line_style") == MSO_MIXED:
+        return '<a:ln><a:noFill/></a:ln>'
+    parts = [f'<a:ln w="{_emu(weight)}">', _fill_xml(shape.get("line_color") or "#000000")]
+    dash = DASH_PRESETS.get(shape.get("line_style"))
+    if dash and dash != "solid":
+        parts.append(f'<a:prstDash val="{dash}"/>')
+    for key, tag in (("arrow_begin", "headEnd"), ("arrow_end", "tailEnd")):
+        arrow = ARROWHEAD_TYPES.get(shape.get(key))
+        if arrow and arrow != "none":
+            parts.append(f'<a:{tag} type="{arrow}"/>')
+    parts.append('</a:ln>')
+    return "".join(parts)
+
+
+def _run_props_xml(tag, font):
+    attrs = ['lang="ja-JP"', 'altLang="en-US"']
+    if font.get("size"):
+        attrs.append(f'sz="{int(round(font["size"] * 100))}"')
+    attrs.append(f'b="{1 if font.get("bold") else 0}"')
+    attrs.append(f'i="{1 if font.get("italic") else 0}"')
+    children = [_fill_xml(font.get("color") or "#000000")]
+    if font.get("name"):
+        typeface = _attr(font["name"])
+        children += [f'<a:latin typeface={typeface}/>', f'<a:ea typeface={typeface}/>',
+                     f'<a:cs typeface={typeface}/>']
+    return f'<a:{tag} {" ".join(attrs)}>{"".join(children)}</a:{tag}>'
+
+
+def _text_body_xml(shape):
+    """text + font + alignment -> xdr:txBody (\\n tách đoạn, \\x0b là line break trong đoạn)"""
+    font = shape.get("font") or {}
+    alignment = shape.get("alignment") or {}
+    anchor = V_ANCHOR.get(alignment.get("vertical"), "t")
+    algn = H_ALGN.get(alignment.get("horizontal"), "l")
+    rpr = _run_props_xml("rPr", font)
+    end_rpr = _run_props_xml("endParaRPr", font)
+
+    paragraphs = []
+    for paragraph in (shape.get("text") or "").split("\n"):
+        runs = []
+        for i, line in enumerate(paragraph.split("\x0b")):
+            if i:
+                runs.append(f'<a:br>{rpr}</a:br>')
+            if line:
+                runs.append(f'<a:r>{rpr}<a:t>{_text(line)}</a:t></a:r>')
+        paragraphs.append(f'<a:p><a:pPr algn="{algn}"/>{"".join(runs)}{end_rpr}</a:p>')
+    return (f'<xdr:txBody><a:bodyPr vertOverflow="clip" horzOverflow="clip" wrap="square" rtlCol="0" '
+            f'anchor="{anchor}"/><a:lstStyle/>{"".join(paragraphs)}</xdr:txBody>')
+
+
+def _frame(position, rotation=0):
+    """position (bbox sau khi xoay) -> (left, top, width, height) của khung a:xfrm trước khi xoay"""
+    left, top = position.get("left") or 0, position.get("top") or 0
+    width, height = position.get("width") or 0, position.get("height") or 0
+    if round(rotation) % 180 == 90:
+        # Cùng tâm, đổi chiều
+        left, top = left + (width - height) / 2, top + (height - width) / 2
+        width, height = height, width
+    return left, top, width, height
+
+
+def _xfrm_xml(position, flip=None, rotation=0):
+    flip = flip or {}
+    attrs = f' rot="{int(round(rotation * 60000))}"' if rotation else ""
+    attrs += "".join(f' {name}="1"' for key, name in (("h", "flipH"), ("v", "flipV")) if flip.get(key))
+    left, top, width, height = _frame(position, rotation)
+    return (f'<a:xfrm{attrs}><a:off x="{_emu(left)}" y="{_emu(top)}"/>'
+            f'<a:ext cx="{_emu(width)}" cy="{_emu(height)}"/></a:xfrm>')
+
+
+def _connection_xml(connection):
+    parts = []
+    for key, tag in (("begin", "stCxn"), ("end", "endCxn")):
+        target = (connection or {}).get(key)
+        if target:
+            parts.append(f'<a:{tag} id="{target[0]}" idx="{target[1]}"/>')
+    return "".join(parts)
+
+
+def _geometry_xml(shape, prst):
+    """prstGeom (kèm adjust nếu có) hoặc custGeom từ "path" (list điểm tuyệt đối, point)"""
+    path = shape.get("path")
+    if prst == "custGeom" and path:
+        position = shape.get("position") or {}
+        left, top = position.get("left") or 0, position.get("top") or 0
+        width, height = _emu(position.get("width")), _emu(position.get("height"))
+        commands = "".join(
+            f'<a:{"moveTo" if i == 0 else "lnTo"}><a:pt x="{_emu(x - left)}" y="{_emu(y - top)}"/>'
+            f'</a:{"moveTo" if i == 0 else "lnTo"}>' for i, (x, y) in enumerate(path))
+        return (f'<a:custGeom><a:avLst/><a:gdLst/><a:ahLst/><a:cxnLst/><a:rect l="0" t="0" r="r" b="b"/>'
+                f'<a:pathLst><a:path w="{width}" h="{height}" fill="none">{commands}</a:path></a:pathLst></a:custGeom>')
+    if prst == "custGeom":
+        prst = "straightConnector1"
+    guides = "".join(f'<a:gd name="adj{i}" fmla="val {int(value)}"/>'
+                     for i, value in enumerate(shape.get("adjust") or (), start=1))
+    return f'<a:prstGeom prst="{prst}"><a:avLst>{guides}</a:avLst></a:prstGeom>'
+
+
+def _shape_xml(shape, shape_id, grid=None):
+    """Một shape -> xdr:oneCellAnchor (None nếu không vẽ được); grid: SheetGrid khi ghi vào sheet có sẵn"""
+    kind, prst = _shape_kind(shape)
+    if kind is None:
+        return None
+    position = shape.get("position") or {}
+    name = _attr(shape.get("name") or f"Shape {shape_id}")
+    if prst == "custGeom" and shape.get("path"):
+        # path đã là tọa độ tuyệt đối (đã tính flip/rotation)
+        xfrm = _xfrm_xml(position)
+    else:
+        xfrm = _xfrm_xml(position, shape.get("flip"), shape.get("rotation") or 0)
+    geom = _geometry_xml(shape, prst)
+
+    if kind == "cxn":
+        body = (f'<xdr:cxnSp macro=""><xdr:nvCxnSpPr><xdr:cNvPr id="{shape_id}" name={name}/>'
+                f'<xdr:cNvCxnSpPr>{_connection_xml(shape.get("connection"))}</xdr:cNvCxnSpPr></xdr:nvCxnSpPr>'
+                f'<xdr:spPr>{xfrm}{geom}<a:noFill/>{_line_xml(shape)}</xdr:spPr></xdr:cxnSp>')
+    else:
+        # Text box nền trắng thường đè lên shape khác -> vẽ không fill
+        fill = shape.get("fill_color")
+        if kind == "txBox" and (_hex(fill) in (None, "FFFFFF")):
+            fill = None
+        tx_box = ' txBox="1"' if kind == "txBox" else ''
+        body = (f'<xdr:sp macro="" textlink=""><xdr:nvSpPr><xdr:cNvPr id="{shape_id}" name={name}/>'
+                f'<xdr:cNvSpPr{tx_box}/></xdr:nvSpPr>'
+                f'<xdr:spPr>{xfrm}{geom}{_fill_xml(fill)}{_line_xml(shape)}</xdr:spPr>'
+                f'{_text_body_xml(shape)}</xdr:sp>')
+
+    return (f'<xdr:oneCellAnchor>{_anchor_from(position.get("left"), position.get("top"), grid)}'
+            f'<xdr:ext cx="{_emu(position.get("width"))}" cy="{_emu(position.get("height"))}"/>'
+            f'{body}<xdr:clientData/></xdr:oneCellAnchor>')
+
+
+def _shape_ids(shapes):
+    """Giữ id gốc nếu mọi shape đều có id số (để stCxn/endCxn còn đúng), ngược lại đánh số lại"""
+    ids = [shape.get("id") for shape in shapes]
+    if ids and all(str(i).isdigit() for i in ids) and len(set(map(str, ids))) == len(ids):
+        return [int(i) for i in ids]
+    return list(range(2, len(shapes) + 2))
+
+
+def build_drawing_xml(shapes):
+    """
+    Tạo nội dung xl/drawings/drawingN.xml cho danh sách shapes
+
+    Returns:
+        (xml_string, số shape đã vẽ, số shape bỏ qua)
+    """
+    anchors = []
+    skipped = 0
+    for shape, shape_id in zip(shapes, _shape_ids(shapes)):
+        anchor = _shape_xml(shape, shape_id)
+        if anchor is None:
+            skipped += 1
+        else:
+            anchors.append(anchor)
+    xml = (XML_HEADER + f'<xdr:wsDr xmlns:xdr="{NS["xdr"]}" xmlns:a="{NS["a"]}">'
+           + "".join(anchors) + '</xdr:wsDr>')
+    return xml, len(anchors), skipped
+
+
+# Khổ giấy -> mã paperSize của pageSetup
+PAPER_SIZES = {"Letter": 1, "A3": 8, "A4": 9, "B4": 12, "B5": 13}
+
+
+def _page_xml(page):
+    """
+    Thiết lập in của sheet (key "page" của sheet, xem paginate.py):
+    {"size": "A4", "landscape": bool, "row_breaks": [row...], "col_breaks": [col...]}
+    """
+    if not page:
+        return ""
+    # Số trang P1, P2... của paginate.py đánh theo hàng -> in ngang trước, xuống sau
+    xml = (f'<pageSetup paperSize="{PAPER_SIZES.get(page.get("size"), 9)}" pageOrder="overThenDown" '
+           f'orientation="{"landscape" if page.get("landscape") else "portrait"}"/>')
+    # Ngắt trang thủ công trước hàng/cột (0-based) trong danh sách
+    for tag, key, limit in (("rowBreaks", "row_breaks", 16383), ("colBreaks", "col_breaks", 1048575)):
+        breaks = page.get(key) or []
+        if breaks:
+            xml += (f'<{tag} count="{len(breaks)}" manualBreakCount="{len(breaks)}">'
+                    + "".join(f'<brk id="{int(b)}" max="{limit}" man="1"/>' for b in breaks) + f'</{tag}>')
+    return xml
+
+
+def _sheet_xml(page=None):
+    return (XML_HEADER + f'<worksheet xmlns="{NS["main"]}" xmlns:r="{NS["r"]}">'
+            f'<sheetFormatPr defaultRowHeight="{DEFAULT_ROW_HEIGHT:g}"/><sheetData/>'
+            f'{_page_xml(page)}<drawing r:id="rId1"/></worksheet>')
+
+
+def _rels_xml(relationships):
+    items = "".join(f'<Relationship Id="{rid}" Type="{REL_TYPES[kind]}" Target="{target}"/>'
+                    for rid, kind, target in relationships)
+    return XML_HEADER + f'<Relationships xmlns="{NS["rel"]}">{items}</Relationships>'
+
+
+def render_diagram(data, output_file, cell_range=None):
+    """
+    Ghi diagram (dict {sheet_name: {"shapes": [...]}}) ra file .xlsx
+
+    Args:
+        data: Dictionary cùng schema với file *_analysis.json
+        output_file: Đường dẫn file .xlsx output
+        cell_range: Range đích (vd "A50:C100") - dời và thu nhỏ diagram cho vừa range
+
+    Returns:
+        Dictionary {"sheets": N, "shapes": số shape đã vẽ, "skipped": số shape bỏ qua}
+    """
+    if cell_range:
+        # Không sửa data của caller
+        data = {name: dict(sheet, shapes=copy.deepcopy(list(sheet.get("shapes", [])))) for name, sheet in data.items()}
+        place_in_range(data, cell_range)
+    used_titles = set()
+    sheets = []
+    stats = {"sheets": 0, "shapes": 0, "skipped": 0}
+    for sheet_name, sheet_data in data.items():
+        drawing, drawn, skipped = build_drawing_xml(sheet_data.get("shapes", []))
+        sheets.append((_sheet_title(sheet_name, used_titles), drawing, sheet_data.get("page")))
+        stats["sheets"] += 1
+        stats["shapes"] += drawn
+        stats["skipped"] += skipped
+    if not sheets:
+        sheets.append((_sheet_title("Sheet1", used_titles), build_drawing_xml([])[0], None))
+
+    overrides = [("/xl/workbook.xml", "workbook"), ("/xl/styles.xml", "styles")]
+    for n in range(1, len(sheets) + 1):
+        overrides += [(f"/xl/worksheets/sheet{n}.xml", "sheet"), (f"/xl/drawings/drawing{n}.xml", "drawing")]
+    content_types = (
+        XML_HEADER + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        + "".join(f'<Override PartName="{part}" ContentType="{CONTENT_TYPES[kind]}"/>' for part, kind in overrides)
+        + '</Types>'
+    )
+    workbook = (
+        XML_HEADER + f'<workbook xmlns="{NS["main"]}" xmlns:r="{NS["r"]}"><sheets>'
+        + "".join(f'<sheet name={_attr(title)} sheetId="{n}" r:id="rId{n}"/>'
+                  for n, (title, _, _) in enumerate(sheets, 1))
+        + '</sheets></workbook>'
+    )
+    workbook_rels = [(f"rId{n}", "sheet", f"worksheets/sheet{n}.xml") for n in range(1, len(sheets) + 1)]
+    workbook_rels.append((f"rId{len(sheets) + 1}", "styles", "styles.xml"))
+
+    with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", _rels_xml([("rId1", "officeDocument", "xl/workbook.xml")]))
+        zf.writestr("xl/workbook.xml", workbook)
+        zf.writestr("xl/_rels/workbook.xml.rels", _rels_xml(workbook_rels))
+        zf.writestr("xl/styles.xml", STYLES_XML)
+        for n, (_, drawing, page) in enumerate(sheets, 1):
+            zf.writestr(f"xl/worksheets/sheet{n}.xml", _sheet_xml(page))
+            zf.writestr(f"xl/worksheets/_rels/sheet{n}.xml.rels",
+                        _rels_xml([("rId1", "drawing", f"../drawings/drawing{n}.xml")]))
+            zf.writestr(f"xl/drawings/drawing{n}.xml", drawing)
+    return stats
+
+
+def render_diagram_from_json_file(json_file, output_file, cell_range=None):
+    """Đọc file JSON diagram (dạng đầy đủ hoặc rút gọn) và render ra .xlsx"""
+    return render_diagram(load_diagram_json(json_file, lazy=True), output_file, cell_range)
+
+
+def is_diagram_spec(data):
+    """JSON có đúng schema {sheet: {"shapes": [...]}} hay không"""
+    return (isinstance(data, dict) and bool(data)
+            and all(isinstance(v, dict) and isinstance(v.get("shapes"), list) for v in data.values()))
+
+
+def render_directory(input_dir, output_dir=None, cell_range=None):
+    """
+    Render tất cả file *.json đúng schema trong thư mục
+
+    Returns:
+        List (json_file, output_file, stats) - stats là None nếu file bị bỏ qua
+    """
+    output_dir = output_dir or input_dir
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(".json"):
+            continue
+        json_file = os.path.join(input_dir, name)
+        try:
+            data = load_diagram_json(json_file)
+        except (OSError, ValueError):
+            results.append((json_file, None, None))
+            continue
+        if not is_diagram_spec(data):
+            results.append((json_file, None, None))
+            continue
+        output_file = os.path.join(output_dir, os.path.splitext(name)[0] + "_rendered.xlsx")
+        results.append((json_file, output_file, render_diagram(data, output_file, cell_range)))
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render diagram JSON ra .xlsx không cần Excel")
+    parser.add_argument("inputs", nargs="+", help="File JSON hoặc thư mục chứa các file JSON")
+    parser.add_argument("-o", "--output", help="File .xlsx output (chỉ dùng khi có 1 file input)")
+    parser.add_argument("--output-dir", help="Thư mục output (mặc định: cạnh file input)")
+    parser.add_argument("--range", dest="cell_range", metavar="A50:C100",
+                        help="Đặt diagram vào range này (dời + thu nhỏ cho vừa)")
+    args = parser.parse_args()
+
+    if args.output and (len(args.inputs) > 1 or os.path.isdir(args.inputs[0])):
+        parser.error("--output chỉ dùng với 1 file JSON; dùng --output-dir cho nhiều file")
+
+    started = time.perf_counter()
+    rendered = 0
+    for input_path in args.inputs:
+        if os.path.isdir(input_path):
+            results = render_directory(input_path, args.output_dir, args.cell_range)
+        else:
+            base = os.path.splitext(os.path.basename(input_path))[0] + "_rendered.xlsx"
+            output_file = args.output or os.path.join(args.output_dir or os.path.dirname(input_path), base)
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+            results = [(input_path, output_file, render_diagram_from_json_file(input_path, output_file, args.cell_range))]
+
+        for json_file, output_file, stats in results:
+            if stats is None:
+                print(f"⏭️  Bỏ qua (không phải diagram JSON): {json_file}")
+                continue
+            rendered += 1
+            note = f", bỏ qua {stats['skipped']} ảnh" if stats["skipped"] else ""
+            print(f"✅ {json_file} -> {output_file} ({stats['shapes']} shapes{note})")
+
+    print(f"\n📊 Đã render {rendered} file trong {time.perf_counter() - started:.2f}s")
+    if not rendered:
+        sys.exit(1)
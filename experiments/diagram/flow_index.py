@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Index toàn văn + index cạnh graph cho diagram của nhiều workbook (không cần Excel)
+
+Build: duyệt thư mục, đọc text shape + connector thẳng từ drawing XML
+(drawing_reader + topology.build_graph), chạy song song bằng process pool.
+Chỉ đọc lại file có SHA-256 thay đổi so với lần build trước; file đã xóa thì bỏ khỏi index.
+
+Index lưu thành một file JSON:
+    {"schema": "diagram-index/1",
+     "files": {path: {"hash", "error", "sheets": {sheet: {"nodes": [[id, label, shape]],
+                                                          "edges": [[source, target, label]]}}}},
+     "docs": [[path, sheet, id, label, shape], ...],
+     "postings": {bigram: [doc, ...]},        # text chuẩn hóa NFKC, bỏ khoảng trắng, cắt 2 ký tự
+     "next": {doc: [[doc, edge_label], ...]}} # cạnh có hướng theo mũi tên
+
+Query: lấy giao các posting list của bigram trong câu hỏi rồi kiểm tra lại bằng
+substring -> vài ms, không phải mở lại workbook nào.
+
+Usage:
+    python flow_index.py build flows/                          # -> flows/diagram_index.json
+    python flow_index.py query flows/diagram_index.json "MOCS登録"
+    python flow_index.py query flows/diagram_index.json "MOCS登録" --next-shape decision
+    python flow_index.py query flows/diagram_index.json "チェック" --prev "DL" --limit 20
+"""
+
+import hashlib
+import json
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from drawing_reader import read_workbook_diagram
+from topology import build_graph
+
+SCHEMA_VERSION = "diagram-index/1"
+INDEX_FILE = "diagram_index.json"
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+# Shape chỉ có text tự do (không phải node của graph) vẫn tìm được bằng text
+ANNOTATION_SHAPE = "annotation"
+# Tên nhóm dùng trong query -> các geometry tương đương (prstGeom cơ bản và flowChart*)
+SHAPE_GROUPS = {
+    "decision": ("diamond", "flowChartDecision"),
+    "process": ("rect", "flowChartProcess", "roundRect", "flowChartAlternateProcess"),
+    "terminator": ("flowChartTerminator", "ellipse", "flowChartConnector"),
+    "document": ("flowChartDocument", "flowChartMultidocument"),
+    "data": ("flowChartMagneticDisk", "can", "flowChartInputOutput", "parallelogram"),
+}
+
+
+def normalize(text):
+    """NFKC + chữ thường + bỏ mọi khoảng trắng (label tiếng Nhật hay bị xuống dòng giữa từ)"""
+    return "".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+def tokenize(text):
+    """Text đã chuẩn hóa -> tập bigram (text 1 ký tự -> chính nó)"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def file_hash(path):
+    """SHA-256 nội dung file, để chỉ index lại workbook đã thay đổi"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shape_matches(shape, wanted):
+    """wanted là geometry cụ thể (vd "diamond") hoặc tên nhóm trong SHAPE_GROUPS (vd "decision")"""
+    return wanted is None or shape == wanted or shape in SHAPE_GROUPS.get(wanted, ())
+
+
+def _directed(edge):
+    """Edge của topology -> các cặp (from, to) theo chiều mũi tên"""
+    source, target = edge["source"], edge["target"]
+    if source is None or target is None:
+        return []
+    return {"backward": [(target, source)], "both": [(source, target), (target, source)]}.get(
+        edge["arrow"], [(source, target)])
+
+
+def extract_workbook(path):
+    """
+    Đọc một workbook -> {sheet: {"nodes": [[id, label, shape]], "edges": [[from, to, label]]}}
+    Chạy trong process con nên chỉ trả về dữ liệu thuần (list/dict/str).
+    """
+    sheets = {}
+    for sheet_name, sheet_data in read_workbook_diagram(path, include_extra=True).items():
+        shapes = sheet_data.get("shapes", [])
+        if not shapes:
+            continue
+        graph = build_graph(shapes)
+        nodes = [[node["id"], node["label"], node["shape"]] for node in graph["nodes"] if node["label"]]
+        nodes += [[item["id"], item["text"], ANNOTATION_SHAPE] for item in graph["annotations"]]
+        edges = [[a, b, edge["label"]] for edge in graph["edges"] for a, b in _directed(edge)]
+        sheets[sheet_name] = {"nodes": nodes, "edges": edges}
+    return sheets
+
+
+def find_workbooks(root):
+    """Các file .xlsx/.xlsm trong thư mục (bỏ file lock ~$ của Excel), path tương đối so với root"""
+    found = []
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$"):
+                found.append(os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/"))
+    return found
+
+
+def _extract(root, path):
+    try:
+        return extract_workbook(os.path.join(root, path)), None
+    except Exception as e:
+        # File hỏng / không phải OOXML: ghi lỗi lại, lần sau hash không đổi thì không đọc lại
+        return {}, f"{type(e).__name__}: {e}"
+
+
+def _derive(files):
+    """Dựng docs / postings / next từ bản ghi từng file"""
+    docs, postings, next_docs = [], {}, {}
+    for path in sorted(files):
+        for sheet_name, sheet in files[path].get("sheets", {}).items():
+            doc_ids = {}
+            for node_id, label, shape in sheet["nodes"]:
+                doc = len(docs)
+                doc_ids[node_id] = doc
+                docs.append([path, sheet_name, node_id, label, shape])
+                for gram in tokenize(normalize(label)):
+                    postings.setdefault(gram, []).append(doc)
+            for source, target, label in sheet["edges"]:
+                if source in doc_ids and target in doc_ids:
+                    next_docs.setdefault(str(doc_ids[source]), []).append([doc_ids[target], label])
+    return docs, postings, next_docs
+
+
+def build_index(root, index_file=None, workers=None, rebuild=False, progress=None):
+    """
+    Build (hoặc cập nhật) index cho mọi workbook trong thư mục root
+
+    Args:
+        index_file: File index (mặc định: <root>/diagram_index.json)
+        workers: Số process song song (mặc định: số CPU, không quá số file cần đọc)
+        rebuild: True thì bỏ qua index cũ, đọc lại tất cả
+        progress: Callback(path, done, total, error) sau mỗi file được đọc
+
+    Returns:
+        (index, stats) - stats: {"files", "indexed", "unchanged", "removed", "failed", "docs", "edges"}
+    """
+    index_file = index_file or os.path.join(root, INDEX_FILE)
+    old_files = {}
+    if not rebuild and os.path.exists(index_file):
+        old = load_index(index_file)
+        if old.get("schema") == SCHEMA_VERSION:
+            old_files = old.get("files", {})
+
+    files, pending = {}, {}
+    for path in find_workbooks(root):
+        digest = file_hash(os.path.join(root, path))
+        if path in old_files and old_files[path].get("hash") == digest:
+            files[path] = old_files[path]
+        else:
+            pending[path] = digest
+
+    stats = {"files": len(files) + len(pending), "indexed": 0, "unchanged": len(files),
+             "removed": len(set(old_files) - set(files) - set(pending)), "failed": 0}
+
+    def record(path, sheets, error):
+        files[path] = {"hash": pending[path], "error": error, "sheets": sheets}
+        stats["indexed"] += 1
+        stats["failed"] += bool(error)
+        if progress:
+            progress(path, stats["indexed"], len(pending), error)
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for path in pending:
+            record(path, *_extract(root, path))
+    else:
+        # Parse XML tốn CPU -> dùng process, mỗi workbook là một task
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_extract, root, path): path for path in pending}
+            for future in as_completed(futures):
+                try:
+                    sheets, error = future.result()
+                except Exception as e:
+                    # Process con chết (vd hết bộ nhớ khi parse) -> vẫn chạy tiếp các file khác
+                    sheets, error = {}, f"{type(e).__name__}: {e}"
+                record(futures[future], sheets, error)
+
+    docs, postings, next_docs = _derive(files)
+    index = {"schema": SCHEMA_VERSION, "files": files, "docs": docs, "postings": postings, "next": next_docs}
+    stats["docs"] = len(docs)
+    stats["edges"] = sum(len(targets) for targets in next_docs.values())
+
+    # Ghi file tạm rồi đổi tên để query đang chạy không đọc phải index ghi dở
+    temp_file = index_file + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_file, index_file)
+    return index, stats
+
+
+def load_index(index_file):
+    with open(index_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class DiagramIndex:
+    """Query trên index đã load: tìm node theo text/shape và theo cạnh kề"""
+
+    def __init__(self, index):
+        self.docs = index["docs"]
+        self.postings = index["postings"]
+        self.next = {int(doc): targets for doc, targets in index["next"].items()}
+        self.prev = {}
+        for source, targets in self.next.items():
+            for target, label in targets:
+                self.prev.setdefault(target, []).append([source, label])
+        self._normalized = {}
+
+    def _label(self, doc):
+        label = self._normalized.get(doc)
+        if label is None:
+            label = self._normalized[doc] = normalize(self.docs[doc][3])
+        return label
+
+    def search(self, text=None, shape=None):
+        """Doc id của các node có label chứa text (và đúng shape nếu có), theo thứ tự file/sheet"""
+        query = normalize(text)
+        if len(query) >= 2:
+            lists = sorted((self.postings.get(gram, []) for gram in tokenize(query)), key=len)
+            candidates = set(lists[0])
+            for posting in lists[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    break
+            candidates = sorted(candidates)
+        else:
+            # Query 0-1 ký tự: quét toàn bộ (postings chỉ có bigram)
+            candidates = range(len(self.docs))
+        return [doc for doc in candidates
+                if query in self._label(doc) and shape_matches(self.docs[doc][4], shape)]
+
+    def neighbors(self, doc, direction="next"):
+        """[(doc, edge_label)] của các node nối từ doc (direction="next") hoặc nối tới doc ("prev")"""
+        return [tuple(item) for item in (self.next if direction == "next" else self.prev).get(doc, [])]
+
+    def adjacent(self, text, shape=None, direction="next", other_text=None, other_shape=None):
+        """
+        Cặp (doc, doc kề, edge_label): doc khớp text/shape, doc kề khớp other_text/other_shape
+        vd "bước MOCS登録 dẫn tới một decision": adjacent("MOCS登録", other_shape="decision")
+        """
+        query = normalize(other_text)
+        pairs = []
+        for doc in self.search(text, shape):
+            for other, label in self.neighbors(doc, direction):
+                if query in self._label(other) and shape_matches(self.docs[other][4], other_shape):
+                    pairs.append((doc, other, label))
+        return pairs
+
+
+def _describe(docs, doc):
+    path, sheet_name, node_id, label, shape = docs[doc]
+    return f"{path} [{sheet_name}] #{node_id} ({shape}) {' '.join(label.split())}"
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Index và tìm kiếm diagram trong nhiều workbook")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build/cập nhật index cho thư mục workbook")
+    build.add_argument("directory")
+    build.add_argument("--index", help=f"File index (mặc định: <directory>/{INDEX_FILE})")
+    build.add_argument("--workers", type=int, help="Số process song song (mặc định: số CPU)")
+    build.add_argument("--rebuild", action="store_true", help="Đọc lại tất cả, bỏ qua index cũ")
+
+    query = commands.add_parser("query", help="Tìm node theo text / cạnh kề")
+    query.add_argument("index")
+    query.add_argument("text", nargs="?", default="", help="Text cần tìm trong label của node")
+    query.add_argument("--shape", help="Chỉ lấy node có shape này (rect, diamond... hoặc nhóm: " + ", ".join(SHAPE_GROUPS) + ")")
+    query.add_argument("--next", dest="next_text", help="Node kế tiếp (theo mũi tên) chứa text này")
+    query.add_argument("--next-shape", help="Node kế tiếp có shape này")
+    query.add_argument("--prev", dest="prev_text", help="Node đứng trước chứa text này")
+    query.add_argument("--prev-shape", help="Node đứng trước có shape này")
+    query.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+
+        def report(path, done, total, error):
+            print(f"[{done}/{total}] {'❌ ' + path + ': ' + error if error else path}", flush=True)
+
+        _, stats = build_index(args.directory, args.index, args.workers, args.rebuild, report)
+        print(f"\n📊 {stats['files']} workbook: đọc {stats['indexed']}, không đổi {stats['unchanged']}, "
+              f"xóa {stats['removed']}, lỗi {stats['failed']}")
+        print(f"✅ {stats['docs']} node, {stats['edges']} cạnh trong {time.perf_counter() - started:.2f}s")
+        sys.exit(1 if stats["failed"] else 0)
+
+    started = time.perf_counter()
+    index = DiagramIndex(load_index(args.index))
+    load_time = time.perf_counter() - started
+    started = time.perf_counter()
+    if args.next_text is not None or args.next_shape:
+        rows = [(a, b, label, "->") for a, b, label in
+                index.adjacent(args.text, args.shape, "next", args.next_text, args.next_shape)]
+    elif args.prev_text is not None or args.prev_shape:
+        rows = [(a, b, label, "<-") for a, b, label in
+                index.adjacent(args.text, args.shape, "prev", args.prev_text, args.prev_shape)]
+    else:
+        rows = [(doc, None, None, None) for doc in index.search(args.text, args.shape)]
+    query_time = time.perf_counter() - started
+
+    for doc, other, label, arrow in rows[:args.limit]:
+        print(_describe(index.docs, doc))
+        if other is not None:
+            edge = f" [{label}]" if label else ""
+            print(f"    {arrow}{edge} #{index.docs[other][2]} ({index.docs[other][4]}) "
+                  f"{' '.join(index.docs[other][3].split())}")
+    if len(rows) > args.limit:
+        print(f"... và {len(rows) - args.limit} kết quả khác (--limit)")
+    print(f"\n⏱️  {len(rows)} kết quả: query {query_time * 1000:.1f}ms (load index {load_time * 1000:.0f}ms)")
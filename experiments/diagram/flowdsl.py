@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Biên dịch flowchart dạng text (tập con cú pháp Mermaid) ra diagram JSON, tự bố trí bằng layout.py
+
+Cú pháp hỗ trợ:
+    flowchart TD | TB | LR        (graph ... cũng được; BT/RL coi như TD/LR)
+    A[Xử lý]  B(Bo góc)  C{Rẽ nhánh}  D((Tròn))  E([Bắt đầu/Kết thúc])  F[[Sub process]]
+    G[(Database)]  H{{Chuẩn bị}}  I[/Nhập xuất/]  J[/Thao tác tay\\]  K>Cờ]
+    A --> B       A --- B       A <--> B      A -.-> B (nét đứt)    A ==> B (nét đậm)
+    A -->|nhãn| B     A -- nhãn --> B       A --> B & C --> D      (chuỗi và &)
+    subgraph lane1 [Phòng A] ... end         -> swimlane (subgraph lồng nhau lấy tên trong cùng)
+    classDef done fill:#cfc,stroke:#393     class A,B done     A:::done     style A fill:#fcc
+    %% comment      ; để viết nhiều lệnh trên một dòng      "nhãn có <br> xuống dòng"
+Frontmatter "---\\ntitle: Tên\\n---" đặt tên sheet (mặc định: tên file).
+Output của topology.py --format mermaid biên dịch lại được.
+
+Chế độ thư mục biên dịch + render hàng trăm flow trong một process: kích thước
+label (layout.label_size) và style classDef được cache dùng chung giữa các flow.
+
+Usage:
+    python flowdsl.py login.mmd                               # -> login.json
+    python flowdsl.py login.mmd --render login.xlsx
+    python flowdsl.py flows/ --output-dir out --render-each   # mỗi flow một .json + .xlsx
+    python flowdsl.py flows/ --combine all_flows.xlsx         # mọi flow vào một workbook
+"""
+
+import functools
+import os
+import re
+import unicodedata
+
+from drawing_reader import MSO_TEXT_BOX, PRESET_COLORS
+from layout import NODE_GAP, RANK_GAP, layout_graph, to_diagram_json
+
+EXTENSIONS = (".mmd", ".mermaid", ".flow")
+FONT_SIZE = 8.0
+
+# Dấu mở -> (dấu đóng, preset geometry); dấu dài xét trước
+NODE_SHAPES = [
+    ("(((", ")))", "ellipse"),
+    ("([", "])", "flowChartTerminator"),
+    ("[[", "]]", "flowChartPredefinedProcess"),
+    ("[(", ")]", "flowChartMagneticDisk"),
+    ("((", "))", "ellipse"),
+    ("{{", "}}", "flowChartPreparation"),
+    ("[/", "/]", "flowChartInputOutput"),
+    ("[\\", "\\]", "flowChartInputOutput"),
+    ("[/", "\\]", "flowChartManualOperation"),
+    ("(", ")", "roundRect"),
+    ("[", "]", "rect"),
+    ("{", "}", "diamond"),
+    (">", "]", "rect"),
+]
+
+# Nét của edge: (line_style theo MsoLineDashStyle, line_weight)
+LINK_STYLES = {"-": (1, 0.75), "=": (1, 2.25), ".": (4, 0.75)}
+
+_HEADER = re.compile(r"^(?:flowchart|graph)(?:\s+(TD|TB|BT|LR|RL))?\s*$", re.I)
+_ID = re.compile(r"[\w.]+")
+# "-- nhãn -->", "== nhãn ==>", "-. nhãn .->"
+_TEXT_LINK = re.compile(r"(<)?(--|==|-\.)(?![->=.])\s*(.+?)\s*(-{2,}|={2,}|\.-+)(>)?")
+# "-->", "---", "==>", "-.->", "<-->" + "|nhãn|" tùy chọn
+_LINK = re.compile(r"(<)?(-{2,}|={2,}|-\.+-)(>)?(?:\s*\|([^|]*)\|)?")
+_SUBGRAPH = re.compile(r"^subgraph\s+(.*)$")
+
+
+class FlowSyntaxError(ValueError):
+    """Lỗi cú pháp DSL, kèm số dòng"""
+
+    def __init__(self, message, line_no=None):
+        super().__init__(f"Dòng {line_no}: {message}" if line_no else message)
+        self.line_no = line_no
+
+
+def _label(text):
+    """Bỏ ngoặc kép, đổi <br> / #quot; như Mermaid"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.I)
+    return text.replace("#quot;", '"').strip()
+
+
+def _color(value):
+    """#f9f / #ff99ff / red -> "#FF99FF" (None nếu không hiểu)"""
+    value = value.strip()
+    if re.fullmatch(r"#[0-9a-fA-F]{3}", value):
+        value = "#" + "".join(ch * 2 for ch in value[1:])
+    if re.fullmatch(r"#[0-9a-fA-F]{6}", value):
+        return value.upper()
+    return PRESET_COLORS.get(value.lower())
+
+
+def _length(value):
+    """"4px" / "2" -> point (1px = 0.75pt)"""
+    match = re.match(r"([\d.]+)\s*(px|pt)?", value.strip())
+    if not match:
+        return None
+    number = float(match.group(1))
+    return number if match.group(2) == "pt" else number * 0.75
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_style(text):
+    """
+    "fill:#f9f,stroke:#333,stroke-width:2px,color:#fff" -> tuple (key JSON, giá trị)
+
+    key: fill_color, line_color, line_weight, line_style, font.color, font.size, font.bold
+    (cache: cùng classDef lặp lại trên hàng trăm flow chỉ parse một lần)
+    """
+    items = []
+    for part in text.split(","):
+        if ":" not in part:
+            continue
+        key, value = (item.strip() for item in part.split(":", 1))
+        key = key.lower()
+        if key == "fill":
+            items.append(("fill_color", _color(value)))
+        elif key == "stroke":
+            items.append(("line_color", _color(value)))
+        elif key == "stroke-width":
+            items.append(("line_weight", _length(value)))
+        elif key == "stroke-dasharray":
+            items.append(("line_style", 4))
+        elif key == "color":
+            items.append(("font.color", _color(value)))
+        elif key == "font-size":
+            items.append(("font.size", _length(value)))
+        elif key == "font-weight":
+            items.append(("font.bold", value.lower() in ("bold", "bolder", "600", "700", "800", "900")))
+    return tuple((key, value) for key, value in items if value is not None)
+
+
+def _apply_style(shape, style):
+    for key, value in style:
+        if key.startswith("font."):
+            shape.setdefault("font", {})[key[5:]] = value
+        else:
+            shape[key] = value
+
+
+class FlowParser:
+    """Parse một flow -> nodes / edges / style theo đúng thứ tự xuất hiện"""
+
+    def __init__(self):
+        self.direction = "TD"
+        self.title = None
+        self.nodes = {}          # id -> {"id", "label", "shape", "lane"}
+        self.edges = []          # {"source", "target", "arrow", "label", "style"}
+        self.class_defs = {}     # tên class -> chuỗi style
+        self.node_classes = {}   # id -> [tên class]
+        self.node_styles = {}    # id -> [chuỗi style]
+        self.lanes = []          # stack tên subgraph đang mở
+        self.warnings = []
+
+    # ------------------------------------------------------------ node / edge
+
+    def _node(self, text, pos, line_no):
+        """Đọc một node tại text[pos:] -> (id, pos mới)"""
+        match = _ID.match(text, pos)
+        if not match:
+            raise FlowSyntaxError(f"Cần id node tại '{text[pos:pos + 20]}'", line_no)
+        node_id, pos = match.group(0), match.end()
+        label = shape = None
+        for opener, closer, geometry in NODE_SHAPES:
+            if not text.startswith(opener, pos):
+                continue
+            start = pos + len(opener)
+            if text.startswith('"', start):
+                quote_end = text.find('"', start + 1)
+                end = text.find(closer, quote_end + 1) if quote_end >= 0 else -1
+            else:
+                end = text.find(closer, start)
+                # Nhãn không có ngoặc kép thì không chứa ngoặc ASCII (tránh ăn sang node sau)
+                if end >= 0 and any(ch in "[]{}()" for ch in text[start:end]):
+                    continue
+            if end < 0:
+                continue
+            label, shape, pos = _label(text[start:end]), geometry, end + len(closer)
+            break
+        if text.startswith(":::", pos):
+            match = _ID.match(text, pos + 3)
+            if not match:
+                raise FlowSyntaxError("Thiếu tên class sau ':::'", line_no)
+            self.node_classes.setdefault(node_id, []).append(match.group(0))
+            pos = match.end()
+
+        node = self.nodes.get(node_id)
+        if node is None:
+            node = self.nodes[node_id] = {"id": node_id, "label": node_id, "shape": "rect", "lane": None}
+        if label is not None:
+            node["label"], node["shape"] = label, shape
+        if node["lane"] is None and self.lanes:
+            node["lane"] = self.lanes[-1]
+        return node_id, pos
+
+    def _node_group(self, text, pos, line_no):
+        """A & B & C -> ([id...], pos mới)"""
+        ids = []
+        while True:
+            pos = _skip_space(text, pos)
+            node_id, pos = self._node(text, pos, line_no)
+            ids.append(node_id)
+            after = _skip_space(text, pos)
+            if not text.startswith("&", after):
+                return ids, pos
+            pos = after + 1
+
+    def _link(self, text, pos, line_no):
+        """Đọc một link tại text[pos:] -> (dict edge không có source/target, pos mới) hoặc None"""
+        pos = _skip_space(text, pos)
+        match = _TEXT_LINK.match(text, pos)
+        if match:
+            back, start, label, _, forward = match.groups()
+            kind = {"--": "-", "==": "=", "-.": "."}[start]
+        else:
+            match = _LINK.match(text, pos)
+            if not match:
+                return None
+            back, body, forward, label = match.groups()
+            kind = "." if "." in body else body[0]
+        arrow = {(False, True): "forward", (True, True): "both", (True, False): "backward",
+                 (False, False): "none"}[(bool(back), bool(forward))]
+        return {"arrow": arrow, "label": _label(label) if label else "", "style": LINK_STYLES[kind]}, match.end()
+
+    def _chain(self, text, line_no):
+        """A --> B -->|x| C & D"""
+        sources, pos = self._node_group(text, 0, line_no)
+        while True:
+            link = self._link(text, pos, line_no)
+            if link is None:
+                break
+            edge, pos = link
+            targets, pos = self._node_group(text, pos, line_no)
+            for source in sources:
+                for target in targets:
+                    self.edges.append(dict(edge, source=source, target=target))
+            sources = targets
+        if text[pos:].strip():
+            raise FlowSyntaxError(f"Không hiểu '{text[pos:].strip()[:30]}'", line_no)
+
+    # ------------------------------------------------------------ lệnh
+
+    def statement(self, text, line_no):
+        words = text.split(None, 2)
+        keyword = words[0].lower()
+        if keyword == "end" and len(words) == 1:
+            if not self.lanes:
+                raise FlowSyntaxError("'end' không có subgraph tương ứng", line_no)
+            self.lanes.pop()
+            return
+        match = _SUBGRAPH.match(text)
+        if match:
+            # subgraph id [Tên] / subgraph id / subgraph "Tên" / subgraph Tên có khoảng trắng
+            spec = match.group(1).strip()
+            title = re.match(r"^[\w.]+\s*\[(.*)\]$", spec)
+            self.lanes.append(_label(title.group(1)) if title else _label(spec))
+            return
+        if keyword == "direction":
+            return
+        if keyword == "classdef" and len(words) == 3:
+            for name in words[1].split(","):
+                self.class_defs[name] = words[2]
+            return
+        if keyword == "class" and len(words) == 3:
+            for node_id in words[1].split(","):
+                self.node_classes.setdefault(node_id.strip(), []).append(words[2].strip())
+            return
+        if keyword == "style" and len(words) == 3:
+            self.node_styles.setdefault(words[1], []).append(words[2])
+            return
+        if keyword in ("linkstyle", "click", "accdescr", "acctitle"):
+            self.warnings.append(f"Dòng {line_no}: bỏ qua lệnh '{keyword}'")
+            return
+        self._chain(text, line_no)
+
+    def parse(self, source):
+        lines = source.splitlines()
+        start = 0
+        # Frontmatter --- title: ... ---
+        if lines and lines[0].strip() == "---":
+            for i in range(1, len(lines)):
+                if lines[i].strip() == "---":
+                    start = i + 1
+                    break
+                key, _, value = lines[i].partition(":")
+                if key.strip() == "title":
+                    self.title = value.strip().strip('"')
+        header_seen = False
+        for line_no, raw in enumerate(lines[start:], start + 1):
+            line = raw.strip()
+            if not line or line.startswith("%%"):
+                continue
+            for text in _split_statements(line):
+                if not header_seen:
+                    match = _HEADER.match(text)
+                    if not match:
+                        raise FlowSyntaxError("Cần dòng 'flowchart TD|LR' ở đầu", line_no)
+                    self.direction = (match.group(1) or "TD").upper()
+                    if self.direction in ("BT", "RL"):
+                        self.warnings.append(f"Chiều {self.direction} chưa hỗ trợ, dùng "
+                                             f"{'TD' if self.direction == 'BT' else 'LR'}")
+                    header_seen = True
+                    continue
+                self.statement(text, line_no)
+        if not header_seen:
+            raise FlowSyntaxError("File rỗng, thiếu dòng 'flowchart'")
+        if self.lanes:
+            raise FlowSyntaxError(f"Subgraph '{self.lanes[-1]}' chưa có 'end'")
+        return self
+
+
+def _skip_space(text, pos):
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _split_statements(line):
+    """Tách ';' nằm ngoài ngoặc kép"""
+    parts, current, quoted = [], [], False
+    for ch in line:
+        if ch == '"':
+            quoted = not quoted
+        if ch == ";" and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip() and not part.strip().startswith("%%")]
+
+
+@functools.lru_cache(maxsize=4096)
+def _label_box(text):
+    """Kích thước text box vừa nhãn edge (cùng ước lượng với layout.label_size: CJK 1em, Latin 0.55em)"""
+    lines = text.split("\n")
+    widest = max(sum(1.0 if unicodedata.east_asian_width(ch) in "WF" else 0.55 for ch in line) for line in lines)
+    # + lề trong mặc định của text box Excel (7.2pt trái/phải, 3.6pt trên/dưới)
+    return round(widest * FONT_SIZE + 16, 2), round(len(lines) * FONT_SIZE * 1.4 + 8, 2)
+
+
+def _edge_label_shape(text, points, horizontal, index):
+    """Text box nhãn edge cạnh điểm giữa đoạn giữa của connector (không fill, không viền)"""
+    (x0, y0), (x1, y1) = points[(len(points) - 1) // 2], points[(len(points) - 1) // 2 + 1]
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    width, height = _label_box(text)
+    # Đặt lệch sang cạnh đường nối để không đè lên nét
+    left, top = (cx - width / 2, cy - height - 2) if horizontal else (cx + 4, cy - height / 2)
+    return {
+        "index": index,
+        "name": f"Label: {' '.join(text.split())}",
+        "type": MSO_TEXT_BOX,
+        "type_name": "Text Box",
+        "position": {"left": round(left, 2), "top": round(top, 2), "width": width, "height": height},
+        "text": text,
+        "font": {"name": "Arial", "size": FONT_SIZE, "bold": False, "italic": False, "color": "#000000"},
+        "fill_color": None,
+        "line_color": None,
+        "line_weight": None,
+        "line_style": 1,
+        "arrow_end": 1,
+        "arrow_begin": 1,
+        "alignment": {"horizontal": -4108, "vertical": -4108},
+    }
+
+
+def compile_flow(source, sheet_name="Flow", direction=None, rank_gap=RANK_GAP, node_gap=NODE_GAP):
+    """
+    Text DSL -> diagram JSON {sheet_name: {"total_shapes", "shapes"}}
+
+    Raises:
+        FlowSyntaxError: Sai cú pháp (kèm số dòng)
+
+    Returns:
+        (diagram, stats {"nodes", "edges", "lanes", "crossings", "warnings"})
+    """
+    flow = FlowParser().parse(source)
+    sheet_name = flow.title or sheet_name
+    layout_direction = direction or ("horizontal" if flow.direction in ("LR", "RL") else "vertical")
+    horizontal = layout_direction == "horizontal"
+    nodes = list(flow.nodes.values())
+    swimlanes = any(node["lane"] for node in nodes)
+    for node in nodes:
+        node["lane"] = node["lane"] or ""
+    edges = flow.edges
+
+    result = layout_graph(nodes, edges, layout_direction, swimlanes, rank_gap, node_gap,
+                          origin=(20.0, 20.0), font_size=FONT_SIZE)
+    diagram = to_diagram_json(nodes, edges, result, sheet_name, layout_direction, font_size=FONT_SIZE)
+    shapes = diagram[sheet_name]["shapes"]
+
+    # to_diagram_json xếp: lane, node (theo nodes), connector (theo edges)
+    offset = len(result["lanes"])
+    default_style = flow.class_defs.get("default")
+    for i, node in enumerate(nodes):
+        shape = shapes[offset + i]
+        if default_style:
+            _apply_style(shape, parse_style(default_style))
+        for name in flow.node_classes.get(node["id"], ()):
+            if name in flow.class_defs:
+                _apply_style(shape, parse_style(flow.class_defs[name]))
+            else:
+                flow.warnings.append(f"Class '{name}' chưa khai báo classDef")
+        for style in flow.node_styles.get(node["id"], ()):
+            _apply_style(shape, parse_style(style))
+
+    offset += len(nodes)
+    labels = []
+    for edge, points, shape in zip(edges, result["waypoints"], shapes[offset:]):
+        shape["line_style"], shape["line_weight"] = edge["style"]
+        if edge["label"]:
+            connection = shape["position"]
+            begin = (connection["left"] + (connection["width"] if shape.get("flip", {}).get("h") else 0),
+                     connection["top"] + (connection["height"] if shape.get("flip", {}).get("v") else 0))
+            end = (connection["left"] + connection["width"] - (begin[0] - connection["left"]),
+                   connection["top"] + connection["height"] - (begin[1] - connection["top"]))
+            polyline = [begin] + [tuple(p) for p in points or ()] + [end]
+            labels.append(_edge_label_shape(edge["label"], polyline, horizontal, len(shapes) + len(labels) + 1))
+    shapes.extend(labels)
+    diagram[sheet_name]["total_shapes"] = len(shapes)
+    return diagram, {"nodes": len(nodes), "edges": len(edges), "lanes": len(result["lanes"]),
+                     "crossings": result["crossings"], "warnings": flow.warnings}
+
+
+def compile_file(flow_file, direction=None):
+    """File DSL -> (diagram, stats); tên sheet mặc định = tên file"""
+    with open(flow_file, "r", encoding="utf-8") as f:
+        source = f.read()
+    sheet_name = os.path.splitext(os.path.basename(flow_file))[0]
+    return compile_flow(source, sheet_name, direction)
+
+
+def flow_files(inputs):
+    """File DSL trong danh sách input (thư mục: các file *.mmd/*.mermaid/*.flow ở cấp đầu)"""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import time
+
+    from drawing_writer import render_diagram
+
+    parser = argparse.ArgumentParser(description="Biên dịch flowchart DSL (tập con Mermaid) ra diagram JSON/.xlsx")
+    parser.add_argument("inputs", nargs="+", help="File .mmd/.mermaid/.flow hoặc thư mục chứa chúng")
+    parser.add_argument("-o", "--output", help="File JSON output (chỉ dùng khi có 1 file input)")
+    parser.add_argument("--output-dir", help="Thư mục output (mặc định: cạnh file input)")
+    parser.add_argument("--direction", choices=["vertical", "horizontal"], help="Ghi đè chiều trong file")
+    parser.add_argument("--render", metavar="XLSX", help="Render ra .xlsx (chỉ dùng khi có 1 file input)")
+    parser.add_argument("--render-each", action="store_true", help="Render mỗi flow ra <tên>.xlsx")
+    parser.add_argument("--combine", metavar="XLSX", help="Gộp mọi flow vào một workbook (mỗi flow một sheet)")
+    parser.add_argument("--no-json", action="store_true", help="Không ghi file JSON")
+    args = parser.parse_args()
+
+    files = flow_files(args.inputs)
+    if not files:
+        parser.error("Không tìm thấy file DSL nào")
+    single = len(files) == 1 and not os.path.isdir(args.inputs[0])
+    if (args.output or args.render) and not single:
+        parser.error("--output/--render chỉ dùng với 1 file; dùng --output-dir/--render-each/--combine")
+
+    started = time.perf_counter()
+    combined, failed, shape_count = {}, [], 0
+    for flow_file in files:
+        base = os.path.splitext(os.path.basename(flow_file))[0]
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(flow_file))
+        try:
+            diagram, stats = compile_file(flow_file, args.direction)
+        except (OSError, FlowSyntaxError) as e:
+            print(f"❌ {os.path.basename(flow_file)}: {e}")
+            failed.append(flow_file)
+            continue
+        for warning in stats["warnings"]:
+            print(f"⚠️  {os.path.basename(flow_file)}: {warning}")
+        shape_count += sum(len(sheet["shapes"]) for sheet in diagram.values())
+        if single:
+            print(f"📊 {stats['nodes']} nodes, {stats['edges']} edges, {stats['lanes']} lane, "
+                  f"{stats['crossings']} giao cắt")
+        if not args.no_json:
+            os.makedirs(output_dir, exist_ok=True)
+            json_file = args.output or os.path.join(output_dir, base + ".json")
+            with open(json_file, "w", encoding="utf-8") as f:
+                json.dump(diagram, f, indent=2, ensure_ascii=False)
+            if single:
+                print(f"✅ Đã xuất ra file: {json_file}")
+        if args.render or args.render_each:
+            os.makedirs(output_dir, exist_ok=True)
+            xlsx_file = args.render or os.path.join(output_dir, base + ".xlsx")
+            render_diagram(diagram, xlsx_file)
+            if single:
+                print(f"✅ Đã render ra file: {xlsx_file}")
+        if args.combine:
+            for sheet_name, sheet in diagram.items():
+                name, n = sheet_name, 2
+                while name in combined:
+                    name, n = f"{sheet_name} ({n})", n + 1
+                combined[name] = sheet
+
+    if args.combine and combined:
+        stats = render_diagram(combined, args.combine)
+        print(f"✅ Đã gộp {stats['sheets']} flow vào file: {args.combine}")
+    elapsed = time.perf_counter() - started
+    compiled = len(files) - len(failed)
+    print(f"⏱️  Biên dịch {compiled} flow ({shape_count} shapes) trong {elapsed:.2f}s"
+          + (f" - trung bình {elapsed / compiled * 1000:.1f}ms/flow" if compiled else "")
+          + (f", ❌ {len(failed)} file lỗi" if failed else ""))
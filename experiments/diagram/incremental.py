@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Cập nhật diagram trong workbook có sẵn theo JSON spec mới, chỉ đụng tới shape thay đổi
+
+Thay vì chạy lại *_recreate.py (vẽ lại mọi shape trong workbook mới), so sánh spec với
+shapes đang có (diff.py, ghép theo name trước) rồi sửa trực tiếp drawing XML:
+  - shape chỉ đổi vị trí/kích thước: sửa anchor + a:xfrm tại chỗ, giữ nguyên style gốc
+  - shape đổi text/style/...: vẽ lại riêng anchor đó bằng drawing_writer (giữ cNvPr id);
+    group/ảnh/chart không vẽ lại được từ JSON nên chỉ sửa được vị trí
+  - shape bị xóa: bỏ anchor; shape mới: thêm anchor vào cuối drawing
+Các anchor không đổi được giữ nguyên từng byte; các part khác trong file .xlsx chép nguyên.
+
+Usage:
+    python incremental.py RPA業務フロー_xxx.xlsx diagram_new.json
+    python incremental.py RPA業務フロー_xxx.xlsx diagram_new.json -o updated.xlsx
+    python incremental.py RPA業務フロー_xxx.xlsx diagram_new.json --dry-run
+"""
+
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+from diff import diff_sheet
+from cell_grid import SheetGrid
+from drawing_reader import (
+    EXTRA_KEYS, NS, anchor_element, anchors_of, iter_sheet_drawings, read_anchor, read_sheet_drawing,
+)
+from drawing_writer import CONTENT_TYPES, REL_TYPES, _anchor_from, _emu, _frame, _shape_xml
+
+# Tag XML (bỏ qua khai báo <?...?> và comment), giá trị thuộc tính có thể chứa '>'
+_TAG = re.compile(r'<\?.*?\?>|<!--.*?-->|<(/?)([^\s>/!?]+)(?:[^>"\']|"[^"]*"|\'[^\']*\')*?(/?)>', re.S)
+_ANCHOR_KIND = re.compile(r'<xdr:(twoCellAnchor|oneCellAnchor|absoluteAnchor)\b')
+_XFRM = re.compile(r'(<(?:a|xdr):xfrm\b[^>]*>\s*)<a:off [^>]*/>(\s*)<a:ext [^>]*/>')
+
+# Phần tử đứng sau <drawing> trong worksheet (thứ tự theo schema SpreadsheetML)
+_AFTER_DRAWING = ("legacyDrawing", "legacyDrawingHF", "drawingHF", "picture", "oleObjects",
+                  "controls", "webPublishItems", "tableParts", "extLst")
+
+
+def _top_level_spans(xml):
+    """
+    Vị trí (start, end) trong chuỗi XML của từng phần tử con trực tiếp của phần tử gốc
+
+    Returns:
+        (list span, vị trí bắt đầu thẻ đóng của phần tử gốc)
+    """
+    spans, depth, start, root_end = [], 0, None, len(xml)
+    for match in _TAG.finditer(xml):
+        closing, name, self_closing = match.group(1), match.group(2), match.group(3)
+        if name is None:
+            continue
+        if closing:
+            depth -= 1
+            if depth == 1:
+                spans.append((start, match.end()))
+            elif depth == 0:
+                root_end = match.start()
+        elif self_closing:
+            if depth == 1:
+                spans.append((match.start(), match.end()))
+        else:
+            depth += 1
+            if depth == 2:
+                start = match.start()
+    return spans, root_end
+
+
+def _patch_position(anchor_xml, shape, grid):
+    """Sửa vị trí/kích thước ngay trong anchor XML gốc; None nếu cấu trúc không như mong đợi"""
+    kind = _ANCHOR_KIND.match(anchor_xml)
+    if kind is None:
+        return None
+    position = shape.get("position") or {}
+    left, top = position.get("left") or 0, position.get("top") or 0
+    width, height = position.get("width") or 0, position.get("height") or 0
+    ext = f'<xdr:ext cx="{_emu(width)}" cy="{_emu(height)}"/>'
+    replacements = {
+        "twoCellAnchor": [(r'<xdr:from>.*?</xdr:from>', _anchor_from(left, top, grid)),
+                          (r'<xdr:to>.*?</xdr:to>', _anchor_from(left + width, top + height, grid, "to"))],
+        "oneCellAnchor": [(r'<xdr:from>.*?</xdr:from>', _anchor_from(left, top, grid)),
+                          (r'<xdr:ext [^>]*/>', ext)],
+        "absoluteAnchor": [(r'<xdr:pos [^>]*/>', f'<xdr:pos x="{_emu(left)}" y="{_emu(top)}"/>'),
+                           (r'<xdr:ext [^>]*/>', ext)],
+    }[kind.group(1)]
+    for pattern, value in replacements:
+        anchor_xml, count = re.subn(pattern, lambda _: value, anchor_xml, count=1, flags=re.S)
+        if not count:
+            return None
+
+    x, y, w, h = _frame(position, shape.get("rotation") or 0)
+    anchor_xml, count = _XFRM.subn(
+        lambda m: f'{m.group(1)}<a:off x="{_emu(x)}" y="{_emu(y)}"/>{m.group(2)}<a:ext cx="{_emu(w)}" cy="{_emu(h)}"/>',
+        anchor_xml, count=1)
+    return anchor_xml if count else None
+
+
+def _shape_spans(root):
+    """Vị trí shape (theo thứ tự của read_sheet_drawing) -> (span index, số shape trong span)"""
+    owners = []
+    for i, child in enumerate(root):
+        count = sum(1 for anchor in anchors_of(child) if anchor_element(anchor) is not None)
+        owners.extend([(i, count)] * count)
+    return owners
+
+
+def _as_written(shape, grid, theme, default_font):
+    """
+    Shape trong spec -> shape như khi đọc lại sau khi drawing_writer vẽ nó (None nếu không vẽ được)
+
+    Spec và drawing mô tả cùng một shape theo hai cách khác nhau (connector type 6 trong spec
+    được đọc lại là cxnSp type 1 + geometry, text "" thành None, connector luôn noFill...),
+    nên so sánh spec đã qua writer + reader với shape đọc từ drawing, không so trực tiếp.
+    """
+    anchor_xml = _shape_xml(shape, 1, grid)
+    if anchor_xml is None:
+        return None
+    root = ET.fromstring(_empty_drawing().replace("</xdr:wsDr>", anchor_xml + "</xdr:wsDr>"))
+    written = read_anchor(root[0], grid, theme, default_font, include_extra=True)
+    if written is None:
+        return None
+    written["index"] = shape.get("index")
+    # Key nội bộ mà spec tự ghi (id, connection...) giữ giá trị của spec
+    written.update({key: shape[key] for key in EXTRA_KEYS if key in shape})
+    return written
+
+
+def plan_sheet_update(old_shapes, new_shapes, grid=None, theme=None, default_font=("Calibri", 11.0)):
+    """
+    So sánh shapes đang có với spec mới -> danh sách thao tác
+
+    Args:
+        grid, theme, default_font: của sheet đang sửa (như iter_sheet_drawings trả về)
+
+    Returns:
+        {"add": [shape], "remove": [vị trí cũ], "move": [(vị trí cũ, shape)],
+         "replace": [(vị trí cũ, shape)], "unchanged": số shape giữ nguyên}
+    """
+    grid = grid if grid is not None else SheetGrid()
+    theme = theme or {}
+    new_views = []
+    for shape in new_shapes:
+        written = _as_written(shape, grid, theme, default_font)
+        new_views.append(written if written is not None else shape)
+
+    # Key nội bộ (id, geometry...) chỉ so khi spec cũng có
+    spec_keys = {key for shape in new_shapes for key in shape}
+    hidden = [key for key in EXTRA_KEYS if key not in spec_keys]
+
+    def view(shape):
+        return {k: v for k, v in shape.items() if k not in hidden}
+
+    old_view = [view(shape) for shape in old_shapes]
+    new_view = [view(shape) for shape in new_views]
+    spec_of = {id(shape): spec for shape, spec in zip(new_view, new_shapes)}
+    sheet_diff = diff_sheet(old_view, new_view)
+
+    position_of = {shape.get("index"): i for i, shape in enumerate(old_shapes)}
+    plan = {"add": [spec_of[id(entry["shape"])] for entry in sheet_diff["added"]],
+            "remove": [position_of[ref["index"]] for ref in sheet_diff["removed"]],
+            "move": [], "replace": []}
+    new_of = {shape.get("index"): shape for shape in new_shapes}
+    for entry in sheet_diff["changed"]:
+        i = position_of[entry["old"]["index"]]
+        changed = set(entry["set"]) | set(entry.get("unset", ()))
+        if not changed:
+            continue
+        spec = new_of.get(entry["new"]["index"], {})
+        # Giá trị lấy từ spec (dạng writer hiểu), không lấy từ bản đã đọc lại
+        shape = dict(old_shapes[i], **{key: spec.get(key, value) for key, value in entry["set"].items()})
+        for key in entry.get("unset", ()):
+            shape.pop(key, None)
+        if changed & {"type", "type_name"}:
+            # Đổi loại shape: geometry cũ không còn đúng, để writer suy ra lại từ type
+            for key in ("geometry", "adjust", "path"):
+                if key not in spec:
+                    shape.pop(key, None)
+        plan["move" if changed == {"position"} else "replace"].append((i, shape))
+    plan["unchanged"] = len(old_shapes) - len(plan["remove"]) - len(plan["move"]) - len(plan["replace"])
+    return plan
+
+
+def _apply_plan(xml, plan, old_shapes, grid):
+    """Áp các thao tác lên drawing XML -> (xml mới, thống kê)"""
+    root = ET.fromstring(xml)
+    spans, root_end = _top_level_spans(xml)
+    owners = _shape_spans(root)
+    stats = {"added": 0, "removed": 0, "moved": 0, "replaced": 0, "skipped": 0}
+
+    used_ids = {int(s["id"]) for s in old_shapes if str(s.get("id") or "").isdigit()}
+    edits = {}
+    for i in plan["remove"]:
+        span, count = owners[i]
+        if count == 1:
+            edits[span] = ""
+            stats["removed"] += 1
+        else:
+            stats["skipped"] += 1
+    for i, shape in plan["move"]:
+        span, count = owners[i]
+        start, end = spans[span]
+        patched = _patch_position(xml[start:end], shape, grid) if count == 1 else None
+        if patched is None:
+            plan["replace"].append((i, shape))
+        else:
+            edits[span] = patched
+            stats["moved"] += 1
+    for i, shape in plan["replace"]:
+        span, count = owners[i]
+        shape_id = old_shapes[i].get("id")
+        anchor = None
+        if count == 1 and str(shape_id).isdigit() and "children" not in old_shapes[i]:
+            anchor = _shape_xml(shape, int(shape_id), grid)
+        if anchor is None:
+            # Ảnh/chart/group hoặc anchor chứa nhiều shape: không vẽ lại được từ JSON
+            stats["skipped"] += 1
+        else:
+            edits[span] = anchor
+            stats["replaced"] += 1
+
+    added = []
+    next_id = max(used_ids, default=1) + 1
+    for shape in plan["add"]:
+        shape_id = shape.get("id")
+        if str(shape_id).isdigit() and int(shape_id) not in used_ids:
+            shape_id = int(shape_id)
+        else:
+            shape_id, next_id = next_id, next_id + 1
+        used_ids.add(shape_id)
+        anchor = _shape_xml(shape, shape_id, grid)
+        if anchor is None:
+            stats["skipped"] += 1
+        else:
+            added.append(anchor)
+            stats["added"] += 1
+
+    parts, cursor = [], 0
+    for span, (start, end) in enumerate(spans):
+        if span in edits:
+            parts.append(xml[cursor:start])
+            parts.append(edits[span])
+            cursor = end
+    parts.append(xml[cursor:root_end])
+    parts.extend(added)
+    parts.append(xml[root_end:])
+    return "".join(parts), stats
+
+
+def _empty_drawing():
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<xdr:wsDr xmlns:xdr="{NS["xdr"]}" xmlns:a="{NS["a"]}"></xdr:wsDr>')
+
+
+def _attach_drawing(zf, sheet_path, replaced):
+    """
+    Sheet chưa có drawing: tạo drawing part mới + relationship + <drawing r:id>
+
+    Returns:
+        Đường dẫn drawing part mới (các part phải ghi thêm nằm trong replaced)
+    """
+    names = set(zf.namelist()) | set(replaced)
+    n = 1
+    while f"xl/drawings/drawing{n}.xml" in names:
+        n += 1
+    drawing_path = f"xl/drawings/drawing{n}.xml"
+
+    rels_path = posixpath.join(posixpath.dirname(sheet_path), "_rels", posixpath.basename(sheet_path) + ".rels")
+    rels = replaced.get(rels_path) or (zf.read(rels_path).decode("utf-8") if rels_path in names else
+                                        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                                        f'<Relationships xmlns="{NS["rel"]}"></Relationships>')
+    used = set(re.findall(r'Id="([^"]+)"', rels))
+    k = 1
+    while f"rId{k}" in used:
+        k += 1
+    target = posixpath.relpath(drawing_path, posixpath.dirname(sheet_path))
+    rels = rels.replace("</Relationships>",
+                        f'<Relationship Id="rId{k}" Type="{REL_TYPES["drawing"]}" Target="{target}"/></Relationships>')
+
+    sheet = replaced.get(sheet_path) or zf.read(sheet_path).decode("utf-8")
+    root_tag = re.search(r'<(\w+:)?worksheet\b[^>]*>', sheet)
+    prefix = root_tag.group(1) or ""
+    if f'xmlns:r="{NS["r"]}"' not in root_tag.group(0):
+        sheet = sheet[:root_tag.end() - 1] + f' xmlns:r="{NS["r"]}"' + sheet[root_tag.end() - 1:]
+    element = f'<{prefix}drawing r:id="rId{k}"/>'
+    later = re.search(r'<%s(?:%s)\b' % (re.escape(prefix), "|".join(_AFTER_DRAWING)), sheet)
+    insert_at = later.start() if later else sheet.rindex(f"</{prefix}worksheet>")
+    sheet = sheet[:insert_at] + element + sheet[insert_at:]
+
+    types = replaced.get("[Content_Types].xml") or zf.read("[Content_Types].xml").decode("utf-8")
+    if f'PartName="/{drawing_path}"' not in types:
+        types = types.replace("</Types>", f'<Override PartName="/{drawing_path}" '
+                                          f'ContentType="{CONTENT_TYPES["drawing"]}"/></Types>')
+    replaced.update({rels_path: rels, sheet_path: sheet, "[Content_Types].xml": types})
+    return drawing_path
+
+
+def update_workbook(excel_file, data, output_file=None, dry_run=False):
+    """
+    Cập nhật diagram trong excel_file cho khớp spec data ({sheet: {"shapes": [...]}})
+
+    Args:
+        output_file: File output (mặc định ghi đè excel_file, ghi qua file tạm rồi thay thế)
+        dry_run: Chỉ tính thao tác, không ghi file
+
+    Returns:
+        {sheet_name: thống kê {"added", "removed", "moved", "replaced", "skipped", "unchanged"}}
+        Sheet có trong spec nhưng không có trong workbook: thống kê là None
+    """
+    replaced = {}
+    report = {}
+    with zipfile.ZipFile(excel_file) as zf:
+        for sheet_name, sheet_path, drawing_path, grid, theme, default_font in iter_sheet_drawings(zf):
+            if sheet_name not in data:
+                continue
+            new_shapes = list(data[sheet_name].get("shapes", []))
+            if drawing_path:
+                old_shapes = read_sheet_drawing(zf, drawing_path, grid, theme, default_font, include_extra=True)
+                xml = zf.read(drawing_path).decode("utf-8")
+            elif new_shapes and sheet_path:
+                old_shapes, xml = [], _empty_drawing()
+                if not dry_run:
+                    drawing_path = _attach_drawing(zf, sheet_path, replaced)
+            else:
+                report[sheet_name] = None
+                continue
+            plan = plan_sheet_update(old_shapes, new_shapes, grid, theme, default_font)
+            new_xml, stats = _apply_plan(xml, plan, old_shapes, grid)
+            stats["unchanged"] = plan["unchanged"]
+            report[sheet_name] = stats
+            if new_xml != xml and not dry_run:
+                replaced[drawing_path] = new_xml
+        for sheet_name in data:
+            report.setdefault(sheet_name, None)
+
+        if dry_run or not replaced:
+            if not dry_run and output_file and output_file != excel_file:
+                with open(excel_file, "rb") as src, open(output_file, "wb") as dst:
+                    dst.write(src.read())
+            return report
+
+        output_file = output_file or excel_file
+        fd, temp_file = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(output_file)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(temp_file, "w", zipfile.ZIP_DEFLATED) as out:
+                for info in zf.infolist():
+                    content = replaced.pop(info.filename, None)
+                    out.writestr(info, content.encode("utf-8") if content is not None else zf.read(info))
+                for name, content in replaced.items():
+                    out.writestr(name, content.encode("utf-8"))
+        except BaseException:
+            os.remove(temp_file)
+            raise
+    os.replace(temp_file, output_file)
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    from compact import load_diagram_json
+
+    parser = argparse.ArgumentParser(description="Cập nhật diagram trong workbook có sẵn, chỉ sửa shape thay đổi")
+    parser.add_argument("excel_file", help="Workbook .xlsx đang có")
+    parser.add_argument("spec", help="Diagram JSON mới (đầy đủ hoặc rút gọn)")
+    parser.add_argument("-o", "--output", help="File output (mặc định: ghi đè workbook)")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ in các thao tác sẽ thực hiện")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = update_workbook(args.excel_file, load_diagram_json(args.spec), args.output, args.dry_run)
+    for sheet_name, stats in report.items():
+        if stats is None:
+            print(f"⚠️  Sheet '{sheet_name}': không có trong workbook, bỏ qua")
+            continue
+        print(f"📄 Sheet '{sheet_name}': +{stats['added']} -{stats['removed']} "
+              f"~{stats['moved']} di chuyển, {stats['replaced']} vẽ lại, {stats['unchanged']} giữ nguyên"
+              + (f", {stats['skipped']} bỏ qua" if stats["skipped"] else ""))
+    if args.dry_run:
+        print("ℹ️  --dry-run: chưa ghi file")
+        sys.exit(0)
+    print(f"✅ Đã cập nhật {args.output or args.excel_file} trong {time.perf_counter() - started:.3f}s")
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Tự động bố trí flowchart theo kiểu Sugiyama (layered layout)
+    1. Bỏ chu trình (đảo chiều back edge)
+    2. Chia tầng (longest path) + chèn node ảo cho edge vượt nhiều tầng
+    3. Giảm giao cắt (barycenter, quét xuống/lên nhiều lượt)
+    4. Gán tọa độ (kéo node về median của hàng xóm, giữ khoảng cách tối thiểu)
+Hỗ trợ chiều dọc, chiều ngang và swimlane (node có key "lane").
+Kết quả xuất ra đúng schema JSON của diagram.json / login_flow.json.
+
+Usage:
+    python layout.py graph.json -o diagram_layout.json
+    python layout.py graph.json --direction horizontal --render flow.xlsx
+    python layout.py RPA業務フロー_xxx.xlsx --swimlanes --render relayout.xlsx
+    python layout.py graph.json --range A50:C100 --render flow.xlsx
+"""
+
+import functools
+import json
+import unicodedata
+from collections import defaultdict, deque
+
+from compact import load_diagram_json
+
+# Kích thước mặc định (point), giống login_flow.json
+NODE_WIDTH = 120.0
+NODE_HEIGHT = 60.0
+RANK_GAP = 40.0
+NODE_GAP = 30.0
+LANE_PADDING = 20.0
+LANE_HEADER = 24.0
+SWEEPS = 8
+
+# Connection site (idx) của preset geometry: (top, left, bottom, right)
+CONNECTION_SITES = {"rect": (0, 1, 2, 3), "roundRect": (0, 1, 2, 3), "diamond": (0, 1, 2, 3),
+                    "ellipse": (0, 2, 4, 6)}
+
+# prstGeom -> (type, type_name) theo revert.get_shape_type_name
+SHAPE_TYPES = {"rect": (1, "Rectangle"), "roundRect": (2, "Rounded Rectangle"),
+               "ellipse": (3, "Ellipse/Oval"), "diamond": (4, "Diamond")}
+# Preset flowchart khác: AutoShape giống drawing_reader (type 1, hình thật nằm ở key "geometry")
+SHAPE_TYPES.update({geometry: (1, "Rectangle") for geometry in (
+    "flowChartTerminator", "flowChartPredefinedProcess", "flowChartMagneticDisk", "flowChartPreparation",
+    "flowChartInputOutput", "flowChartManualOperation", "flowChartDocument", "flowChartOffpageConnector")})
+
+
+@functools.lru_cache(maxsize=8192)
+def label_size(label, font_size=8.0, min_width=NODE_WIDTH, min_height=NODE_HEIGHT, max_width=240.0):
+    """Ước lượng kích thước box đủ chứa label (chữ CJK ~1em, chữ Latin ~0.55em)"""
+    lines = (label or "").replace("\x0b", "\n").split("\n")
+    widest = max((sum(1.0 if unicodedata.east_asian_width(ch) in "WF" else 0.55 for ch in line)
+                  for line in lines), default=0) * font_size
+    width = min(max(min_width, widest + 16), max_width)
+    wrapped = sum(max(1, -(-int(len(line) * font_size * 0.8) // int(width - 16))) for line in lines)
+    height = max(min_height, wrapped * font_size * 1.4 + 16)
+    return width, height
+
+
+def _remove_cycles(node_ids, edges):
+    """DFS lặp (không đệ quy) -> tập các edge index là back edge cần đảo chiều"""
+    adjacency = defaultdict(list)
+    for i, (u, v) in enumerate(edges):
+        adjacency[u].append((v, i))
+    state = {}
+    reversed_edges = set()
+    for root in node_ids:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child, i in children:
+                if state.get(child) == 1:
+                    reversed_edges.add(i)
+                elif child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(adjacency[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return reversed_edges
+
+
+def _assign_layers(node_ids, edges):
+    """Longest path layering theo thứ tự topo (Kahn)"""
+    indegree = {n: 0 for n in node_ids}
+    successors = defaultdict(list)
+    for u, v in edges:
+        successors[u].append(v)
+        indegree[v] += 1
+    layer = {n: 0 for n in node_ids}
+    queue = deque(n for n in node_ids if indegree[n] == 0)
+    while queue:
+        node = queue.popleft()
+        for child in successors[node]:
+            layer[child] = max(layer[child], layer[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    return layer
+
+
+def _count_crossings(upper, lower, down_edges):
+    """Số giao cắt giữa hai tầng liền kề (đếm nghịch thế bằng Fenwick tree)"""
+    position = {n: i for i, n in enumerate(lower)}
+    pairs = sorted((i, position[v]) for i, u in enumerate(upper) for v in down_edges[u] if v in position)
+    tree = [0] * (len(lower) + 1)
+    crossings = 0
+    for seen, (_, p) in enumerate(pairs):
+        # số edge đã thêm có đầu dưới nằm bên phải p
+        i, not_greater = p + 1, 0
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        crossings += seen - not_greater
+        i = p + 1
+        while i <= len(lower):
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _order_layers(layers, down_edges, up_edges, lane_of=None, sweeps=SWEEPS):
+    """Barycenter heuristic, quét xuống rồi lên; giữ thứ tự có ít giao cắt nhất"""
+    def total_crossings(order):
+        return sum(_count_crossings(order[i], order[i + 1], down_edges) for i in range(len(order) - 1))
+
+    def sort_layer(layer, neighbours, reference):
+        position = {n: i for i, n in enumerate(reference)}
+        keyed = []
+        for i, node in enumerate(layer):
+            linked = [position[m] for m in neighbours[node] if m in position]
+            barycenter = sum(linked) / len(linked) if linked else i
+            lane = lane_of.get(node, 0) if lane_of else 0
+            keyed.append((lane, barycenter, i, node))
+        keyed.sort()
+        return [node for *_, node in keyed]
+
+    order = [list(layer) for layer in layers]
+    if lane_of:
+        order = [sorted(layer, key=lambda n: lane_of.get(n, 0)) for layer in order]
+    best, best_crossings = [list(layer) for layer in order], total_crossings(order)
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for i in range(1, len(order)):
+                order[i] = sort_layer(order[i], up_edges, order[i - 1])
+        else:
+            for i in range(len(order) - 2, -1, -1):
+                order[i] = sort_layer(order[i], down_edges, order[i + 1])
+        crossings = total_crossings(order)
+        if crossings < best_crossings:
+            best, best_crossings = [list(layer) for layer in order], crossings
+        if best_crossings == 0:
+            break
+    return best, best_crossings
+
+
+def _place_layer(nodes, desired, size, gap):
+    """
+    Đặt các node của một tầng (đã có thứ tự) gần vị trí mong muốn nhất,
+    giữ khoảng cách tối thiểu: trung bình của phương án dồn trái và dồn phải.
+    """
+    left, cursor = [], float("-inf")
+    for node in nodes:
+        x = max(desired[node], cursor)
+        left.append(x)
+        cursor = x + size[node] + gap
+    right, cursor = [0.0] * len(nodes), float("inf")
+    for i in range(len(nodes) - 1, -1, -1):
+        x = min(desired[nodes[i]], cursor - size[nodes[i]])
+        right[i] = x
+        cursor = x - gap
+    placed, cursor = {}, float("-inf")
+    for i, node in enumerate(nodes):
+        x = max((left[i] + right[i]) / 2, cursor)
+        placed[node] = x
+        cursor = x + size[node] + gap
+    return placed
+
+
+def _assign_coordinates(order, up_edges, down_edges, breadth, gap, sweeps=4):
+    """
+    Tọa độ ngang tầng: khởi tạo dồn trái, rồi kéo node về median của hàng xóm
+    ở tầng trên/dưới (quét xuống/lên). Trả về tọa độ đã dời để nhỏ nhất = 0.
+    """
+    coord = {}
+    for layer_nodes in order:
+        cursor = 0.0
+        for node_id in layer_nodes:
+            coord[node_id] = cursor
+            cursor += breadth[node_id] + gap
+
+    for sweep in range(sweeps):
+        downward = sweep % 2 == 0
+        sequence = range(1, len(order)) if downward else range(len(order) - 2, -1, -1)
+        neighbours = up_edges if downward else down_edges
+        for i in sequence:
+            desired = {}
+            for node_id in order[i]:
+                linked = sorted(coord[m] + breadth[m] / 2 for m in neighbours[node_id] if m in coord)
+                if linked:
+                    mid = len(linked) // 2
+                    median = linked[mid] if len(linked) % 2 else (linked[mid - 1] + linked[mid]) / 2
+                    desired[node_id] = median - breadth[node_id] / 2
+                else:
+                    desired[node_id] = coord[node_id]
+            coord.update(_place_layer(order[i], desired, breadth, gap))
+
+    shift = min(coord.values(), default=0.0)
+    return {node_id: x - shift for node_id, x in coord.items()}
+
+
+def layout_graph(nodes, edges, direction="vertical", swimlanes=False, rank_gap=RANK_GAP,
+                 node_gap=NODE_GAP, origin=(0.0, 0.0), font_size=8.0):
+    """
+    Tính vị trí cho graph
+
+    Args:
+        nodes: List {"id", "label", "shape"?, "width"?, "height"?, "lane"?}
+        edges: List {"source", "target", ...}
+        direction: "vertical" (trên -> dưới) hoặc "horizontal" (trái -> phải)
+        swimlanes: Nhóm node theo key "lane" thành các làn song song với chiều flow
+        origin: Góc trên trái (left, top) của diagram
+
+    Returns:
+        {"positions": {id: {left, top, width, height}},
+         "waypoints": [điểm uốn của từng edge trong edges (qua node ảo)],
+         "lanes": [{"name", "left", "top", "width", "height"}],
+         "crossings": số giao cắt còn lại}
+    """
+    horizontal = direction == "horizontal"
+    node_ids = [str(n["id"]) for n in nodes]
+    by_id = {str(n["id"]): n for n in nodes}
+
+    # Kích thước theo trục flow (depth) và trục ngang tầng (breadth)
+    breadth, depth = {}, {}
+    for node_id, node in by_id.items():
+        width, height = node.get("width"), node.get("height")
+        if not width or not height:
+            width, height = label_size(node.get("label"), font_size)
+        breadth[node_id], depth[node_id] = (height, width) if horizontal else (width, height)
+
+    # Edge có đủ hai đầu hợp lệ và không phải self-loop, giữ index theo list edges đầu vào
+    edge_pairs = {}
+    for i, e in enumerate(edges):
+        u, v = str(e.get("source")), str(e.get("target"))
+        if u in by_id and v in by_id and u != v:
+            edge_pairs[i] = (u, v)
+    kept = list(edge_pairs)
+    reversed_edges = _remove_cycles(node_ids, [edge_pairs[i] for i in kept])
+    acyclic = []
+    for k, i in enumerate(kept):
+        u, v = edge_pairs[i]
+        acyclic.append((i, (v, u) if k in reversed_edges else (u, v)))
+
+    layer = _assign_layers(node_ids, [pair for _, pair in acyclic])
+
+    # Chèn node ảo để mọi edge chỉ nối hai tầng liền kề
+    down_edges, up_edges = defaultdict(list), defaultdict(list)
+    chains = {}
+    dummy_count = 0
+    for i, (u, v) in acyclic:
+        chain = [u]
+        for level in range(layer[u] + 1, layer[v]):
+            dummy = f"__dummy{dummy_count}"
+            dummy_count += 1
+            layer[dummy] = level
+            breadth[dummy], depth[dummy] = 0.0, 0.0
+            chain.append(dummy)
+        chain.append(v)
+        for a, b in zip(chain, chain[1:]):
+            down_edges[a].append(b)
+            up_edges[b].append(a)
+        chains[i] = chain
+
+    layer_count = max(layer.values(), default=-1) + 1
+    layers = [[] for _ in range(layer_count)]
+    for node_id in list(layer):
+        layers[layer[node_id]].append(node_id)
+
+    lane_names, lane_of = [], {}
+    if swimlanes:
+        for node_id in node_ids:
+            lane = by_id[node_id].get("lane") or ""
+            if lane not in lane_names:
+                lane_names.append(lane)
+            lane_of[node_id] = lane_names.index(lane)
+        # Node ảo thuộc lane của đầu edge
+        for chain in chains.values():
+            for dummy in chain[1:-1]:
+                lane_of[dummy] = lane_of[chain[0]]
+
+    order, crossings = _order_layers(layers, down_edges, up_edges, lane_of if swimlanes else None)
+
+    if swimlanes:
+        # Mỗi lane là một dải song song chiều flow: gán tọa độ riêng trong lane
+        # (chỉ xét hàng xóm cùng lane), rồi xếp các lane cạnh nhau
+        coord, lane_bounds, cursor = {}, [], 0.0
+        for index in range(len(lane_names)):
+            members = {n for n, lane in lane_of.items() if lane == index}
+            sub_order = [[n for n in layer_nodes if n in members] for layer_nodes in order]
+            same_lane = lambda edges_of: defaultdict(list, {n: [m for m in edges_of[n] if m in members]
+                                                             for n in members})
+            local = _assign_coordinates(sub_order, same_lane(up_edges), same_lane(down_edges), breadth, node_gap)
+            extent = max((local[n] + breadth[n] for n in local), default=0.0)
+            width = max(extent, NODE_WIDTH) + 2 * LANE_PADDING
+            # Căn giữa nội dung trong lane
+            offset = cursor + (width - extent) / 2
+            coord.update({n: offset + x for n, x in local.items()})
+            lane_bounds.append((cursor, cursor + width))
+            cursor += width
+    else:
+        coord = _assign_coordinates(order, up_edges, down_edges, breadth, node_gap)
+
+    # Tọa độ theo chiều flow: mỗi tầng cao bằng node sâu nhất, node căn giữa trong tầng
+    layer_offset, cursor = [], 0.0
+    for layer_nodes in order:
+        layer_offset.append(cursor)
+        cursor += max((depth[n] for n in layer_nodes), default=0.0) + rank_gap
+    layer_depth = [max((depth[n] for n in layer_nodes), default=0.0) for layer_nodes in order]
+    flow_extent = cursor - rank_gap
+
+    header = LANE_HEADER if swimlanes else 0.0
+    ox, oy = origin
+
+    def to_xy(b, d):
+        # (breadth, depth) -> (left, top)
+        return (ox + d, oy + b) if horizontal else (ox + b, oy + d)
+
+    positions = {}
+    flow_pos = {}
+    for i, layer_nodes in enumerate(order):
+        for node_id in layer_nodes:
+            b = coord[node_id]
+            d = header + layer_offset[i] + (layer_depth[i] - depth[node_id]) / 2
+            flow_pos[node_id] = (b, d)
+            if node_id in by_id:
+                left, top = to_xy(b, d)
+                width, height = (depth[node_id], breadth[node_id]) if horizontal else (breadth[node_id], depth[node_id])
+                positions[node_id] = {"left": left, "top": top, "width": width, "height": height}
+
+    # Điểm uốn qua node ảo (tâm node ảo), theo chiều gốc của edge
+    waypoints = []
+    for i in range(len(edges)):
+        chain = chains.get(i)
+        points = []
+        if chain:
+            for dummy in chain[1:-1]:
+                b, d = flow_pos[dummy]
+                points.append(to_xy(b, d))
+            if edge_pairs[i] != (chain[0], chain[-1]):
+                points.reverse()
+        waypoints.append(points)
+
+    lanes = []
+    if swimlanes:
+        for index, name in enumerate(lane_names):
+            b0, b1 = lane_bounds[index]
+            left, top = to_xy(b0, 0.0)
+            extent = header + flow_extent + LANE_PADDING
+            width, height = (extent, b1 - b0) if horizontal else (b1 - b0, extent)
+            lanes.append({"name": name, "left": left, "top": top, "width": width, "height": height})
+
+    return {"positions": positions, "waypoints": waypoints, "lanes": lanes, "crossings": crossings}
+
+
+def _connector_shape(index, name, begin, end, arrow="forward"):
+    """Connector thẳng từ begin tới end -> shape dict (bbox + flip)"""
+    (x0, y0), (x1, y1) = begin, end
+    shape = {
+        "index": index,
+        "name": name,
+        "type": 6,
+        "type_name": "Connector",
+        "position": {"left": min(x0, x1), "top": min(y0, y1), "width": abs(x1 - x0), "height": abs(y1 - y0)},
+        "text": "",
+        "font": {"name": "Arial", "size": 8.0, "bold": False, "italic": False, "color": "#000000"},
+        "fill_color": "#000000",
+        "line_color": "#000000",
+        "line_weight": 0.75,
+        "line_style": 1,
+        "arrow_end": 2 if arrow in ("forward", "both") else 1,
+        "arrow_begin": 2 if arrow in ("backward", "both") else 1,
+    }
+    flip = {"h": x1 < x0, "v": y1 < y0}
+    if flip["h"] or flip["v"]:
+        shape["flip"] = flip
+    return shape
+
+
+def _anchor_point(position, side):
+    """Điểm giữa cạnh side (top/left/bottom/right) của box"""
+    left, top, width, height = position["left"], position["top"], position["width"], position["height"]
+    return {"top": (left + width / 2, top), "bottom": (left + width / 2, top + height),
+            "left": (left, top + height / 2), "right": (left + width, top + height / 2)}[side]
+
+
+def to_diagram_json(nodes, edges, result, sheet_name="Diagram", direction="vertical",
+                    fill_color="#A9DCDE", line_color="#4472C4", font_name="Arial", font_size=8.0):
+    """
+    Kết quả layout -> JSON cùng schema với login_flow.json
+    (Rectangle/Diamond/... cho node, Connector cho edge, Rectangle không fill cho lane)
+    """
+    horizontal = direction == "horizontal"
+    shapes = []
+    shape_ids = {}
+
+    def base_shape(name, geometry, position, text, fill, line, weight=0.75, bold=False):
+        shape_type, type_name = SHAPE_TYPES.get(geometry, SHAPE_TYPES["rect"])
+        return {
+            "index": len(shapes) + 1,
+            "name": name,
+            "type": shape_type,
+            "type_name": type_name,
+            "position": dict(position),
+            "text": text,
+            "font": {"name": font_name, "size": font_size, "bold": bold, "italic": False, "color": "#000000"},
+            "fill_color": fill,
+            "line_color": line,
+            "line_weight": weight,
+            "line_style": 1,
+            "arrow_end": 1,
+            "arrow_begin": 1,
+            "alignment": {"horizontal": -4108, "vertical": -4108},
+        }
+
+    for lane in result["lanes"]:
+        position = {key: lane[key] for key in ("left", "top", "width", "height")}
+        shape = base_shape(f"Lane: {lane['name']}", "rect", position, lane["name"], None, "#7F7F7F", 1.0, bold=True)
+        # Tên lane nằm ở đầu làn
+        shape["alignment"] = {"horizontal": -4108, "vertical": -4160} if not horizontal else \
+            {"horizontal": -4131, "vertical": -4108}
+        shape["id"] = str(len(shapes) + 2)
+        shapes.append(shape)
+
+    for node in nodes:
+        node_id = str(node["id"])
+        if node_id not in result["positions"]:
+            continue
+        geometry = node.get("shape") or "rect"
+        text = node.get("label") or node.get("name") or ""
+        name = " ".join((text or node_id).split())
+        shape = base_shape(f"Process: {name}", geometry, result["positions"][node_id], text,
+                           node.get("fill_color") or fill_color, node.get("line_color") or line_color)
+        shape["geometry"] = geometry if geometry in SHAPE_TYPES else "rect"
+        shape["id"] = str(len(shapes) + 2)
+        shape_ids[node_id] = shape["id"]
+        shapes.append(shape)
+
+    geometries = {str(n["id"]): n.get("shape") or "rect" for n in nodes}
+    out_side, in_side = ("right", "left") if horizontal else ("bottom", "top")
+    for edge, points in zip(edges, result["waypoints"]):
+        source, target = str(edge.get("source")), str(edge.get("target"))
+        if source not in shape_ids or target not in shape_ids:
+            continue
+        src_pos, dst_pos = result["positions"][source], result["positions"][target]
+        begin, end = _anchor_point(src_pos, out_side), _anchor_point(dst_pos, in_side)
+        sites = {}
+        for key, node_id, side in (("begin", source, out_side), ("end", target, in_side)):
+            geometry = geometries.get(node_id, "rect")
+            site_table = CONNECTION_SITES.get(geometry, CONNECTION_SITES["rect"])
+            sites[key] = [shape_ids[node_id], site_table[("top", "left", "bottom", "right").index(side)]]
+        shape = _connector_shape(len(shapes) + 1, f"Connector {shape_ids[source]}->{shape_ids[target]}",
+                                 begin, end, edge.get("arrow", "forward"))
+        shape["connection"] = sites
+        if points:
+            shape["waypoints"] = [list(p) for p in points]
+        if edge.get("label"):
+            shape["label"] = edge["label"]
+        shape["id"] = str(len(shapes) + 2)
+        shapes.append(shape)
+
+    return {sheet_name: {"total_shapes": len(shapes), "shapes": shapes}}
+
+
+def load_graph(input_file):
+    """
+    Đọc graph: {"nodes", "edges"} / output của topology.py ({sheet: graph}) /
+    file .xlsx hoặc *_analysis.json (suy ra topology trước)
+    """
+    if input_file.lower().endswith((".xlsx", ".xlsm")):
+        from topology import load_diagram, build_graphs
+        return build_graphs(load_diagram(input_file))
+    data = load_diagram_json(input_file)
+    if "nodes" in data and "edges" in data:
+        return {"Diagram": data}
+    if all(isinstance(v, dict) and "nodes" in v for v in data.values()):
+        return data
+    from topology import build_graphs
+    return build_graphs(data)
+
+
+def _layout_nodes(graph):
+    """Node của topology: bỏ khung chứa, node trong khung lấy nhãn khung làm lane"""
+    by_id = {n["id"]: n for n in graph["nodes"]}
+    nodes = []
+    for node in graph["nodes"]:
+        if node.get("children"):
+            continue
+        item = dict(node)
+        item.pop("position", None)
+        parent = by_id.get(node.get("parent"))
+        if "lane" not in item:
+            item["lane"] = (parent.get("label") or parent.get("name")) if parent else ""
+        nodes.append(item)
+    return nodes
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Tự động bố trí flowchart (Sugiyama)")
+    parser.add_argument("input", help="Graph JSON ({nodes, edges}), output topology.py, .xlsx hoặc *_analysis.json")
+    parser.add_argument("--direction", choices=["vertical", "horizontal"], default="vertical")
+    parser.add_argument("--swimlanes", action="store_true", help="Nhóm node theo key 'lane' (hoặc khung chứa)")
+    parser.add_argument("--rank-gap", type=float, default=RANK_GAP)
+    parser.add_argument("--node-gap", type=float, default=NODE_GAP)
+    parser.add_argument("-o", "--output", help="File JSON output (mặc định: <input>_layout.json)")
+    parser.add_argument("--range", dest="cell_range", metavar="A50:C100",
+                        help="Đặt diagram vào range này của sheet (dời + thu nhỏ cho vừa)")
+    parser.add_argument("--render", metavar="XLSX", help="Render luôn ra .xlsx bằng drawing_writer")
+    args = parser.parse_args()
+
+    graphs = load_graph(args.input)
+    started = time.perf_counter()
+    diagram = {}
+    for sheet_name, graph in graphs.items():
+        nodes = _layout_nodes(graph)
+        result = layout_graph(nodes, graph["edges"], args.direction, args.swimlanes,
+                              args.rank_gap, args.node_gap, origin=(20.0, 20.0))
+        diagram.update(to_diagram_json(nodes, graph["edges"], result, sheet_name, args.direction))
+        print(f"Sheet '{sheet_name}': {len(nodes)} nodes, {len(graph['edges'])} edges, "
+              f"{result['crossings']} giao cắt")
+    print(f"⏱️  Layout trong {time.perf_counter() - started:.3f}s")
+    if args.cell_range:
+        from cell_grid import place_in_range
+        for sheet_name, placed in place_in_range(diagram, args.cell_range).items():
+            print(f"📐 Sheet '{sheet_name}': đặt vào {placed['range']} (scale {placed['scale']:.2f})")
+
+    output_file = args.output or args.input.rsplit(".", 1)[0] + "_layout.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(diagram, f, indent=2, ensure_ascii=False)
+    print(f"✅ Đã xuất layout ra file: {output_file}")
+
+    if args.render:
+        from drawing_writer import render_diagram
+        stats = render_diagram(diagram, args.render)
+        print(f"✅ Đã render {stats['shapes']} shapes ra file: {args.render}")
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Chia diagram quá khổ thành nhiều trang in (mỗi trang một sheet, hoặc một sheet có ngắt trang)
+
+1. Dựng graph (topology.build_graph), xác định chiều flow (TB/LR).
+2. Gom shape lá (node, text box, ảnh) thành các tầng theo trục flow: sort theo mép đầu
+   rồi gộp các khoảng chồng nhau -> cắt trang luôn nằm giữa hai tầng, không cắt ngang shape.
+3. Xếp tham lam các tầng liên tiếp vào trang cho tới khi vượt khổ giấy; trục còn lại
+   (quá rộng) cũng chia cột y như vậy -> lưới trang (hàng, cột).
+4. Khung chứa (swimlane, frame) được cắt theo từng trang nó đi qua.
+5. Connector nối hai trang khác nhau -> cặp ký hiệu off-page (flowChartOffpageConnector)
+   "P3" ở trang nguồn và "P1" ở trang đích, nối vào node bằng connector ngắn.
+
+Toàn bộ là sort + quét tuyến tính -> O(n log n), nghìn node vẫn dưới một giây.
+
+Usage:
+    python paginate.py big_flow.json                          # -> big_flow_paged.json
+    python paginate.py big_flow.json --size A3 --landscape --render big_flow.xlsx
+    python paginate.py big_flow.json --mode breaks --render big_flow.xlsx   # một sheet, ngắt trang
+    python paginate.py RPA業務フロー_xxx.xlsx --render RPA業務フロー_xxx_paged.xlsx   # đọc .xlsx headless
+"""
+
+import copy
+import math
+
+from cell_grid import DEFAULT_ROW_HEIGHT, transform_shape
+from drawing_writer import DEFAULT_COL_WIDTH
+from layout import _anchor_point, _connector_shape
+from spatial import bbox_from_position
+from topology import _node_id, build_graph, flow_direction, is_connector
+
+# Khổ giấy dọc (point)
+PAGE_SIZES = {"A4": (595.0, 842.0), "A3": (842.0, 1191.0), "B4": (729.0, 1032.0), "Letter": (612.0, 792.0)}
+# Lề in mặc định của Excel: trái/phải 0.7in, trên/dưới 0.75in
+PRINT_MARGINS = (50.4, 54.0)
+# Khoảng trống giữa mép trang in và diagram
+PAGE_PADDING = 12.0
+MARKER_WIDTH = 30.0
+MARKER_HEIGHT = 24.0
+MARKER_GAP = 16.0
+MARKER_FILL = "#FFF2CC"
+
+
+def printable_size(size="A4", landscape=False):
+    """(rộng, cao) point vùng in được của một trang, đã trừ lề và padding"""
+    width, height = PAGE_SIZES[size]
+    if landscape:
+        width, height = height, width
+    return (width - 2 * PRINT_MARGINS[0] - 2 * PAGE_PADDING,
+            height - 2 * PRINT_MARGINS[1] - 2 * PAGE_PADDING)
+
+
+def _bands(spans, limit):
+    """
+    spans: [(start, end, key)] -> list các trang [(start, end, [key...])]
+    Gộp khoảng chồng nhau thành tầng, rồi xếp tầng liên tiếp vào trang dài tối đa limit
+    (tầng dài hơn limit đứng riêng một trang).
+    """
+    merged = []
+    for span in sorted(spans, key=lambda s: s[0]):
+        if merged and span[0] < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], span[1])
+            merged[-1][2].append(span)
+        else:
+            merged.append([span[0], span[1], [span]])
+    layers = []
+    for start, end, members in merged:
+        if end - start <= limit:
+            layers.append([start, end, [key for _, _, key in members]])
+            continue
+        # Chuỗi shape chồng nối tiếp dài hơn trang (không có khe để cắt): chia tham lam theo mép đầu
+        chunks = []
+        for span_start, span_end, key in members:
+            if chunks and span_end - chunks[-1][0] <= limit:
+                chunks[-1][1] = max(chunks[-1][1], span_end)
+                chunks[-1][2].append(key)
+            else:
+                chunks.append([span_start, span_end, [key]])
+        layers.extend(chunks)
+    pages = []
+    for start, end, keys in layers:
+        if pages and end - pages[-1][0] <= limit:
+            pages[-1][1] = end
+            pages[-1][2].extend(keys)
+        else:
+            pages.append([start, end, list(keys)])
+    return pages
+
+
+def _tiles(boxes, keys, vertical, page_width, page_height):
+    """Lưới trang: list (row, col, bbox trang) và {key: số thứ tự trang}"""
+    flow_limit, cross_limit = (page_height, page_width) if vertical else (page_width, page_height)
+    flow, cross = (1, 0) if vertical else (0, 1)
+    tiles, page_of = [], {}
+    for row, (f0, f1, members) in enumerate(_bands([(boxes[k][flow], boxes[k][flow + 2], k) for k in keys],
+                                                   flow_limit)):
+        for col, (c0, c1, tile_keys) in enumerate(_bands([(boxes[k][cross], boxes[k][cross + 2], k)
+                                                          for k in members], cross_limit)):
+            bbox = (c0, f0, c1, f1) if vertical else (f0, c0, f1, c1)
+            for key in tile_keys:
+                page_of[key] = len(tiles)
+            tiles.append((row, col, bbox))
+    return tiles, page_of
+
+
+def _side_towards(tile, other):
+    """Cạnh của trang tile hướng về trang other: bottom/top/right/left"""
+    (row, col, _), (other_row, other_col, _) = tile, other
+    if other_row != row:
+        return "bottom" if other_row > row else "top"
+    return "right" if other_col > col else "left"
+
+
+OPPOSITE = {"top": "bottom", "bottom": "top", "left": "right", "right": "left"}
+
+
+def _marker(node_box, side, page_box, text, index, name):
+    """
+    Ký hiệu off-page cạnh node, kẹp trong trang
+
+    Ưu tiên phía side; nếu kẹp vào trang làm marker đè lên node thì thử các phía còn lại.
+
+    Returns:
+        (marker, side thực tế)
+    """
+    x0, y0, x1, y1 = node_box
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    candidates = {
+        "bottom": (cx - MARKER_WIDTH / 2, y1 + MARKER_GAP),
+        "top": (cx - MARKER_WIDTH / 2, y0 - MARKER_GAP - MARKER_HEIGHT),
+        "right": (x1 + MARKER_GAP, cy - MARKER_HEIGHT / 2),
+        "left": (x0 - MARKER_GAP - MARKER_WIDTH, cy - MARKER_HEIGHT / 2),
+    }
+    placed = None
+    for candidate in dict.fromkeys([side, "right", "left", "bottom", "top"]):
+        left, top = candidates[candidate]
+        left = min(max(left, page_box[0]), page_box[2] - MARKER_WIDTH)
+        top = min(max(top, page_box[1]), page_box[3] - MARKER_HEIGHT)
+        if placed is None:
+            placed = (left, top, candidate)
+        if left >= x1 or left + MARKER_WIDTH <= x0 or top >= y1 or top + MARKER_HEIGHT <= y0:
+            placed = (left, top, candidate)
+            break
+    left, top, side = placed
+    return {
+        "index": index,
+        "name": name,
+        "type": 1,
+        "type_name": "Rectangle",
+        "position": {"left": round(left, 2), "top": round(top, 2), "width": MARKER_WIDTH, "height": MARKER_HEIGHT},
+        "text": text,
+        "font": {"name": "Arial", "size": 8.0, "bold": True, "italic": False, "color": "#000000"},
+        "fill_color": MARKER_FILL,
+        "line_color": "#7F7F7F",
+        "line_weight": 0.75,
+        "line_style": 1,
+        "arrow_end": 1,
+        "arrow_begin": 1,
+        "alignment": {"horizontal": -4108, "vertical": -4108},
+        "geometry": "flowChartOffpageConnector",
+    }, side
+
+
+def _link(begin_shape, begin_side, end_shape, end_side, template, index, name):
+    """Connector ngắn node <-> marker, giữ màu/nét của connector gốc"""
+    begin = _anchor_point(begin_shape["position"], begin_side)
+    end = _anchor_point(end_shape["position"], end_side)
+    arrow = "forward" if template.get("arrow_end") not in (None, 1, -2) else "none"
+    shape = _connector_shape(index, name, begin, end, arrow)
+    for key in ("line_color", "line_weight", "line_style"):
+        if template.get(key) is not None:
+            shape[key] = template[key]
+    return shape
+
+
+def paginate_sheet(shapes, page_width, page_height, direction=None):
+    """
+    Chia shapes của một sheet thành các trang
+
+    Returns:
+        (pages, stats) - pages: list (row, col, [shapes] đã dời về gốc trang);
+        stats: {"pages", "cut_edges", "oversized"}
+    """
+    shapes = [copy.deepcopy(shape) for shape in shapes]
+    graph = build_graph(shapes)
+    vertical = (direction or flow_direction(graph)) == "TB"
+    by_id = {_node_id(shape): shape for shape in shapes}
+    boxes = {key: bbox_from_position(shape.get("position") or {}) for key, shape in by_id.items()}
+    containers = {node["id"] for node in graph["nodes"] if node.get("children")}
+    leaves = [key for key, shape in by_id.items() if key not in containers and not is_connector(shape)]
+
+    tiles, page_of = _tiles(boxes, leaves, vertical, page_width, page_height)
+    if not tiles:
+        return [(0, 0, shapes)], {"pages": 1 if shapes else 0, "cut_edges": 0, "oversized": 0}
+    members = [[] for _ in tiles]
+    for key in leaves:
+        members[page_of[key]].append(by_id[key])
+
+    # Khung chứa: cắt theo vùng của từng trang nó đi qua
+    for key in containers:
+        x0, y0, x1, y1 = boxes[key]
+        for page, (_, _, (px0, py0, px1, py1)) in enumerate(tiles):
+            cx0, cy0, cx1, cy1 = max(x0, px0), max(y0, py0), min(x1, px1), min(y1, py1)
+            if cx1 > cx0 and cy1 > cy0:
+                clipped = copy.deepcopy(by_id[key])
+                clipped["position"] = {"left": cx0, "top": cy0, "width": cx1 - cx0, "height": cy1 - cy0}
+                members[page].insert(0, clipped)
+
+    # Connector: cùng trang -> giữ nguyên; khác trang -> cặp marker off-page
+    edges = {edge["id"]: edge for edge in graph["edges"]}
+    next_id = max([int(k) for k in by_id if k.isdigit()] + [len(shapes) + 1]) + 1
+    with_ids = all(shape.get("id") is not None for shape in shapes)
+    cut_edges = 0
+    for key, shape in by_id.items():
+        if not is_connector(shape):
+            continue
+        edge = edges.get(key)
+        source, target = (edge["source"], edge["target"]) if edge else (None, None)
+        pages = page_of.get(source), page_of.get(target)
+        if pages[0] is None or pages[1] is None or pages[0] == pages[1]:
+            # Connector nối nửa vời (không rõ đầu/cuối) -> theo trang gần tâm nhất
+            page = pages[0] if pages[0] is not None else pages[1]
+            if page is None:
+                x0, y0, x1, y1 = boxes[key]
+                center = ((x0 + x1) / 2, (y0 + y1) / 2)
+                page = min(range(len(tiles)), key=lambda p: _distance_to_tile(tiles[p][2], center))
+            members[page].append(shape)
+            continue
+
+        cut_edges += 1
+        ends = []
+        for node, page, other in ((source, pages[0], pages[1]), (target, pages[1], pages[0])):
+            side = _side_towards(tiles[page], tiles[other])
+            marker, side = _marker(boxes[node], side, tiles[page][2], f"P{other + 1}", 0,
+                             f"Off-page: {'->' if node == source else '<-'} P{other + 1}")
+            ends.append((node, page, side, marker))
+        for (node, page, side, marker), outgoing in zip(ends, (True, False)):
+            node_shape = by_id[node]
+            if outgoing:
+                link = _link(node_shape, side, marker, OPPOSITE[side], shape, 0, f"Connector {node}->P")
+            else:
+                link = _link(marker, OPPOSITE[side], node_shape, side, shape, 0, f"Connector P->{node}")
+            if with_ids:
+                marker["id"], link["id"] = str(next_id), str(next_id + 1)
+                next_id += 2
+                link["connection"] = _link_connection(node_shape, marker, side, outgoing)
+            members[page].extend([marker, link])
+
+    pages = []
+    for (row, col, (px0, py0, _, _)), page_shapes in zip(tiles, members):
+        def move(x, y, dx=px0, dy=py0):
+            return [round(x - dx, 2), round(y - dy, 2)]
+
+        for index, shape in enumerate(page_shapes, 1):
+            transform_shape(shape, move)
+            shape["index"] = index
+        pages.append((row, col, page_shapes))
+    oversized = sum(1 for _, _, (x0, y0, x1, y1) in tiles if x1 - x0 > page_width + 1e-6 or y1 - y0 > page_height + 1e-6)
+    return pages, {"pages": len(pages), "cut_edges": cut_edges, "oversized": oversized}
+
+
+def _distance_to_tile(bbox, point):
+    x0, y0, x1, y1 = bbox
+    return math.hypot(max(x0 - point[0], 0, point[0] - x1), max(y0 - point[1], 0, point[1] - y1))
+
+
+def _link_connection(node_shape, marker, side, outgoing):
+    """stCxn/endCxn của connector node <-> marker (site theo cạnh: top 0, left 1, bottom 2, right 3)"""
+    sites = {"top": 0, "left": 1, "bottom": 2, "right": 3}
+    node_end = [str(node_shape["id"]), sites[side]]
+    marker_end = [str(marker["id"]), sites[OPPOSITE[side]]]
+    return {"begin": node_end, "end": marker_end} if outgoing else {"begin": marker_end, "end": node_end}
+
+
+def paginate_diagram(data, size="A4", landscape=False, mode="sheets", direction=None):
+    """
+    Chia mọi sheet của diagram thành trang in
+
+    Args:
+        data: {sheet: {"shapes": [...]}} cùng schema *_analysis.json
+        mode: "sheets" - mỗi trang một sheet "<sheet> (n)";
+              "breaks" - giữ một sheet, xếp trang theo lưới ô và thêm ngắt trang thủ công
+        direction: "TB"/"LR", mặc định tự đoán theo hướng connector
+
+    Returns:
+        (data mới, {sheet: stats})
+    """
+    page_width, page_height = printable_size(size, landscape)
+    result, report = {}, {}
+    for sheet_name, sheet_data in data.items():
+        pages, stats = paginate_sheet(list(sheet_data.get("shapes", [])), page_width, page_height, direction)
+        report[sheet_name] = stats
+        page = {"size": size, "landscape": landscape}
+        if mode == "sheets" or len(pages) <= 1:
+            for n, (_, _, shapes) in enumerate(pages, 1):
+                _offset(shapes, PAGE_PADDING, PAGE_PADDING)
+                name = sheet_name if len(pages) == 1 else f"{sheet_name} ({n})"
+                result[name] = {"total_shapes": len(shapes), "shapes": shapes, "page": dict(page)}
+            continue
+
+        # Một sheet: trang (row, col) bắt đầu ở đúng đường lưới để ngắt trang rơi vào giữa hai trang
+        rows_per_page = math.ceil((page_height + 2 * PAGE_PADDING) / DEFAULT_ROW_HEIGHT)
+        cols_per_page = math.ceil((page_width + 2 * PAGE_PADDING) / DEFAULT_COL_WIDTH)
+        shapes = []
+        for row, col, page_shapes in pages:
+            _offset(page_shapes, col * cols_per_page * DEFAULT_COL_WIDTH + PAGE_PADDING,
+                    row * rows_per_page * DEFAULT_ROW_HEIGHT + PAGE_PADDING)
+            shapes.extend(page_shapes)
+        for index, shape in enumerate(shapes, 1):
+            shape["index"] = index
+        page["row_breaks"] = [row * rows_per_page for row in range(1, max(r for r, _, _ in pages) + 1)]
+        page["col_breaks"] = [col * cols_per_page for col in range(1, max(c for _, c, _ in pages) + 1)]
+        result[sheet_name] = {"total_shapes": len(shapes), "shapes": shapes, "page": page}
+    return result, report
+
+
+def _offset(shapes, dx, dy):
+    for shape in shapes:
+        transform_shape(shape, lambda x, y: [round(x + dx, 2), round(y + dy, 2)])
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from compact import save_diagram_json
+    from topology import load_diagram
+
+    parser = argparse.ArgumentParser(description="Chia diagram quá khổ thành nhiều trang in")
+    parser.add_argument("input", help="File .xlsx hoặc diagram JSON (đầy đủ hoặc rút gọn)")
+    parser.add_argument("-o", "--output", help="File JSON output (mặc định: <input>_paged.json)")
+    parser.add_argument("--size", choices=list(PAGE_SIZES), default="A4")
+    parser.add_argument("--landscape", action="store_true")
+    parser.add_argument("--mode", choices=["sheets", "breaks"], default="sheets",
+                        help="sheets: mỗi trang một sheet; breaks: một sheet có ngắt trang")
+    parser.add_argument("--direction", choices=["TB", "LR"], help="Chiều flow (mặc định: tự đoán)")
+    parser.add_argument("--render", metavar="XLSX", help="Render luôn ra .xlsx bằng drawing_writer")
+    args = parser.parse_args()
+
+    data = load_diagram(args.input)
+    started = time.perf_counter()
+    paged, report = paginate_diagram(data, args.size, args.landscape, args.mode, args.direction)
+    elapsed = time.perf_counter() - started
+    for sheet_name, stats in report.items():
+        note = f", ⚠️  {stats['oversized']} trang vẫn quá khổ (một tầng lớn hơn trang)" if stats["oversized"] else ""
+        print(f"📄 Sheet '{sheet_name}': {stats['pages']} trang, {stats['cut_edges']} connector qua trang{note}")
+    print(f"⏱️  Chia trang trong {elapsed:.3f}s")
+
+    output_file = args.output or args.input.rsplit(".", 1)[0] + "_paged.json"
+    save_diagram_json(paged, output_file)
+    print(f"✅ Đã xuất ra file: {output_file}")
+    if args.render:
+        from drawing_writer import render_diagram
+        stats = render_diagram(paged, args.render)
+        print(f"✅ Đã render {stats['sheets']} sheet, {stats['shapes']} shapes ra file: {args.render}")
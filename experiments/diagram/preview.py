@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Vẽ preview diagram JSON (schema của revert.py) ra SVG, hoặc PNG bằng rasteriser thuần Python
+Không cần Excel/Windows, không cần thư viện ngoài - dùng được trong CI / review bot.
+
+Mỗi shape được đổi thành các primitive (polygon, polyline, text) một lần; SVG và PNG cùng
+vẽ từ danh sách primitive đó theo đúng thứ tự z-order của sheet.
+
+PNG: tô polygon theo scanline (không khử răng cưa), text vẽ thành vạch mờ ước lượng
+độ dài dòng vì không có font rasteriser - đủ để nhìn bố cục, xem chữ thì dùng SVG.
+
+Usage:
+    python preview.py diagram.json                      # -> diagram_Flowchart.svg
+    python preview.py RPA業務フロー_xxx.xlsx --png --scale 1.5
+    python preview.py diagram.json diagram_new.json --output-dir previews
+"""
+
+import math
+import struct
+import unicodedata
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from drawing_reader import H_ALIGN, MSO_CHART, MSO_PICTURE, NO_LINE_WEIGHT, V_ALIGN
+from drawing_writer import _frame, _hex, _shape_kind
+from router import connector_polyline
+from spatial import SpatialGrid, bbox_from_position, point_to_border_distance
+from topology import CONNECTION_TOLERANCE, THIN_LINE, _connector_info, _node_id, _orientations, is_connector
+
+MARGIN = 10.0
+DEFAULT_FONT_SIZE = 11.0
+# Lề trong mặc định của text box Excel (point)
+TEXT_INSET_X = 7.2
+TEXT_INSET_Y = 3.6
+ARROW_LENGTH = 7.0
+
+# MsoLineDashStyle -> stroke-dasharray (theo bội số độ dày nét)
+DASH_PATTERNS = {2: (1, 1), 3: (1, 1), 4: (4, 3), 5: (4, 3, 1, 3), 6: (8, 3, 1, 3, 1, 3),
+                 7: (8, 3), 8: (8, 3, 1, 3), 10: (3, 1), 12: (3, 1, 1, 1)}
+H_ANCHOR = {H_ALIGN["l"]: "start", H_ALIGN["r"]: "end"}
+
+
+def _ellipse(x0, y0, x1, y1, steps=40, start=0.0, end=2 * math.pi):
+    cx, cy, rx, ry = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2
+    return [(cx + rx * math.cos(start + (end - start) * i / steps),
+             cy + ry * math.sin(start + (end - start) * i / steps)) for i in range(steps + 1)]
+
+
+def _rounded(x0, y0, x1, y1, radius):
+    radius = min(radius, (x1 - x0) / 2, (y1 - y0) / 2)
+    points = []
+    for cx, cy, a in ((x1 - radius, y0 + radius, -90), (x1 - radius, y1 - radius, 0),
+                      (x0 + radius, y1 - radius, 90), (x0 + radius, y0 + radius, 180)):
+        points += [(cx + radius * math.cos(math.radians(a + d)), cy + radius * math.sin(math.radians(a + d)))
+                   for d in range(0, 91, 15)]
+    return points
+
+
+def _outline(prst, x0, y0, x1, y1):
+    """prstGeom -> (polygon viền ngoài, các đường phụ bên trong)"""
+    w, h = x1 - x0, y1 - y0
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    if prst in ("ellipse", "flowChartConnector"):
+        return _ellipse(x0, y0, x1, y1), []
+    if prst in ("diamond", "flowChartDecision"):
+        return [(cx, y0), (x1, cy), (cx, y1), (x0, cy)], []
+    if prst in ("roundRect", "flowChartAlternateProcess"):
+        return _rounded(x0, y0, x1, y1, min(w, h) * 0.1667), []
+    if prst == "flowChartTerminator":
+        return _rounded(x0, y0, x1, y1, min(w, h) / 2), []
+    if prst in ("triangle", "flowChartExtract"):
+        return [(cx, y0), (x1, y1), (x0, y1)], []
+    if prst in ("parallelogram", "flowChartInputOutput"):
+        d = w * 0.2
+        return [(x0 + d, y0), (x1, y0), (x1 - d, y1), (x0, y1)], []
+    if prst in ("hexagon", "flowChartPreparation"):
+        d = w * 0.2
+        return [(x0 + d, y0), (x1 - d, y0), (x1, cy), (x1 - d, y1), (x0 + d, y1), (x0, cy)], []
+    if prst == "flowChartOffpageConnector":
+        return [(x0, y0), (x1, y0), (x1, y0 + h * 0.8), (cx, y1), (x0, y0 + h * 0.8)], []
+    if prst == "flowChartManualInput":
+        return [(x0, y0 + h * 0.2), (x1, y0), (x1, y1), (x0, y1)], []
+    if prst == "flowChartDocument":
+        # Cạnh dưới lượn sóng
+        wave = [(x1 - w * i / 20, y1 - h * 0.1 + h * 0.08 * math.sin(math.pi * 2 * i / 20)) for i in range(21)]
+        return [(x0, y0), (x1, y0)] + wave, []
+    if prst == "flowChartMagneticDisk":
+        cap = h * 0.15
+        top = _ellipse(x0, y0, x1, y0 + cap * 2, steps=20, start=math.pi, end=2 * math.pi)
+        bottom = _ellipse(x0, y1 - cap * 2, x1, y1, steps=20, start=0, end=math.pi)
+        rim = _ellipse(x0, y0, x1, y0 + cap * 2, steps=20, start=0, end=math.pi)
+        return top + bottom, [rim]
+    if prst == "flowChartPredefinedProcess":
+        d = w * 0.1
+        return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)], [[(x0 + d, y0), (x0 + d, y1)], [(x1 - d, y0), (x1 - d, y1)]]
+    if prst == "cube":
+        d = min(w, h) * 0.25
+        return ([(x0, y0 + d), (x0 + d, y0), (x1, y0), (x1, y1 - d), (x1 - d, y1), (x0, y1)],
+                [[(x0, y0 + d), (x1 - d, y0 + d), (x1, y0)], [(x1 - d, y0 + d), (x1 - d, y1)]])
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)], []
+
+
+def _rotate(points, cx, cy, rotation):
+    if not rotation:
+        return points
+    angle = math.radians(rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    return [(cx + (x - cx) * cos - (y - cy) * sin, cy + (x - cx) * sin + (y - cy) * cos) for x, y in points]
+
+
+def _stroke(shape):
+    """(màu, độ dày, kiểu nét) hoặc None nếu không có viền"""
+    weight = shape.get("line_weight")
+    color = _hex(shape.get("line_color"))
+    if weight is None or weight == NO_LINE_WEIGHT or weight <= 0 or color is None:
+        return None
+    return "#" + color, weight, shape.get("line_style") or 1
+
+
+def _connector_points(shape, bbox, nodes):
+    """Polyline thật của connector (group lấy geometry của connector con)"""
+    connection, flip, rotation = _connector_info(shape)
+    geometry = dict(shape)
+    for child in shape.get("children") or ():
+        if is_connector(child):
+            for key in ("geometry", "adjust"):
+                if key in child:
+                    geometry.setdefault(key, child[key])
+            break
+    x0, y0, x1, y1 = bbox
+
+    def polyline(flip, rotation):
+        points = connector_polyline(dict(geometry, flip=flip, rotation=rotation))
+        # bbox mỏng (group có padding cho arrowhead) -> đường thẳng qua tâm
+        if x1 - x0 <= THIN_LINE:
+            points = [((x0 + x1) / 2, y) for _, y in points]
+        if y1 - y0 <= THIN_LINE:
+            points = [(x, (y0 + y1) / 2) for x, _ in points]
+        return points
+
+    options = [polyline(f, r) for f, r in _orientations(shape, flip, rotation)]
+    if len(options) > 1 and len(nodes):
+        # File COM không có flip: chọn cách đặt đầu/cuối chạm viền shape gần nhất
+        def gap(x, y):
+            near = nodes.nearest(x, y, CONNECTION_TOLERANCE, distance=point_to_border_distance)
+            return near[0][0] if near else CONNECTION_TOLERANCE
+
+        options.sort(key=lambda p: gap(*p[0]) + gap(*p[-1]))
+    return options[0]
+
+
+def _arrowhead(points, at_end, width):
+    """Tam giác mũi tên ở đầu/cuối polyline"""
+    (ax, ay), (bx, by) = (points[-2], points[-1]) if at_end else (points[1], points[0])
+    length = math.hypot(bx - ax, by - ay) or 1.0
+    ux, uy = (bx - ax) / length, (by - ay) / length
+    size = ARROW_LENGTH + width * 2
+    base_x, base_y = bx - ux * size, by - uy * size
+    return [(bx, by), (base_x - uy * size * 0.45, base_y + ux * size * 0.45),
+            (base_x + uy * size * 0.45, base_y - ux * size * 0.45)]
+
+
+def _text_width(line, size):
+    """Độ rộng ước lượng (giống layout.label_size): CJK 1em, Latin 0.55em"""
+    return sum(1.0 if unicodedata.east_asian_width(ch) in "WF" else 0.55 for ch in line) * size
+
+
+def _wrap(line, size, width):
+    """Ngắt dòng như Excel (ước lượng): ưu tiên ngắt ở khoảng trắng, CJK ngắt ở ký tự bất kỳ"""
+    lines = []
+    while line and _text_width(line, size) > width:
+        cut, used = 0, 0.0
+        for ch in line:
+            used += (1.0 if unicodedata.east_asian_width(ch) in "WF" else 0.55) * size
+            if used > width:
+                break
+            cut += 1
+        space = line.rfind(" ", 0, cut + 1)
+        cut = space if space > 0 else max(cut, 1)
+        lines.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    return lines + [line]
+
+
+def _text_primitive(shape, bbox):
+    text = (shape.get("text") or "").replace("\r\n", "\n").replace("\r", "\n").replace("\x0b", "\n")
+    if not text.strip():
+        return None
+    font = shape.get("font") or {}
+    alignment = shape.get("alignment") or {}
+    color = _hex(font.get("color")) or "000000"
+    size = font.get("size") or DEFAULT_FONT_SIZE
+    width = max(bbox[2] - bbox[0] - 2 * TEXT_INSET_X, size)
+    lines = [part for line in text.split("\n") for part in _wrap(line, size, width)]
+    return ("text", bbox, lines, {
+        "family": font.get("name") or "sans-serif", "size": size,
+        "bold": bool(font.get("bold")), "italic": bool(font.get("italic")), "color": "#" + color,
+        "h": alignment.get("horizontal", H_ALIGN["ctr"]), "v": alignment.get("vertical", V_ALIGN["ctr"]),
+    })
+
+
+def _is_placeholder(shape):
+    """Ảnh/chart (không có dữ liệu trong JSON); shape có preset geometry (vd ellipse type 3 của layout.py) thì không"""
+    return shape.get("type") in (MSO_PICTURE, MSO_CHART) and not shape.get("geometry")
+
+
+def build_primitives(shapes):
+    """
+    Shapes -> danh sách primitive theo z-order:
+      ("polygon", points, fill, stroke) / ("polyline", points, stroke, arrows) / ("text", bbox, lines, style)
+    stroke = (màu, độ dày, MsoLineDashStyle) hoặc None
+    """
+    boxes = {_node_id(s): bbox_from_position(s.get("position") or {}) for s in shapes}
+    nodes = SpatialGrid()
+    for shape in shapes:
+        # Ảnh/chart chụp màn hình không phải đích của connector
+        if not is_connector(shape) and not _is_placeholder(shape):
+            nodes.insert(_node_id(shape), boxes[_node_id(shape)])
+
+    primitives = []
+    for shape in shapes:
+        bbox = boxes[_node_id(shape)]
+        stroke = _stroke(shape)
+        if _is_placeholder(shape):
+            # Không có dữ liệu ảnh/chart trong JSON: khung placeholder
+            primitives.append(("polygon", _outline("rect", *bbox)[0], "#EEEEEE", ("#999999", 0.75, 4)))
+            continue
+        kind, prst = _shape_kind(shape)
+        if kind == "cxn" or is_connector(shape):
+            if stroke is None:
+                continue
+            points = _connector_points(shape, bbox, nodes)
+            arrows = (shape.get("arrow_begin") not in (None, 1, -2), shape.get("arrow_end") not in (None, 1, -2))
+            primitives.append(("polyline", points, stroke, arrows))
+            continue
+
+        fill = _hex(shape.get("fill_color"))
+        if kind == "txBox" and fill in (None, "FFFFFF"):
+            # Giống drawing_writer: text box nền trắng vẽ không fill
+            fill = None
+        rotation = shape.get("rotation") or 0
+        x, y, w, h = _frame(shape.get("position") or {}, rotation)
+        outline, details = _outline(prst, x, y, x + w, y + h)
+        cx, cy = x + w / 2, y + h / 2
+        primitives.append(("polygon", _rotate(outline, cx, cy, rotation), "#" + fill if fill else None, stroke))
+        for detail in details:
+            primitives.append(("polyline", _rotate(detail, cx, cy, rotation), stroke, (False, False)))
+        text = _text_primitive(shape, bbox)
+        if text:
+            primitives.append(text)
+    return primitives
+
+
+def _extent(primitives):
+    xs, ys = [], []
+    for primitive in primitives:
+        if primitive[0] == "text":
+            x0, y0, x1, y1 = primitive[1]
+            xs += [x0, x1]
+            ys += [y0, y1]
+        else:
+            xs += [p[0] for p in primitive[1]]
+            ys += [p[1] for p in primitive[1]]
+    if not xs:
+        return (0.0, 0.0, 100.0, 100.0)
+    return (min(xs) - MARGIN, min(ys) - MARGIN, max(xs) + MARGIN, max(ys) + MARGIN)
+
+
+def _text_lines(bbox, lines, style):
+    """Vị trí baseline (x, y) cho từng dòng text"""
+    x0, y0, x1, y1 = bbox
+    size = style["size"]
+    leading = size * 1.2
+    block = leading * len(lines)
+    if style["v"] == V_ALIGN["t"]:
+        top = y0 + TEXT_INSET_Y
+    elif style["v"] == V_ALIGN["b"]:
+        top = y1 - TEXT_INSET_Y - block
+    else:
+        top = (y0 + y1 - block) / 2
+    anchor = H_ANCHOR.get(style["h"], "middle")
+    x = {"start": x0 + TEXT_INSET_X, "end": x1 - TEXT_INSET_X}.get(anchor, (x0 + x1) / 2)
+    return anchor, [(x, top + leading * i + size * 0.9, line) for i, line in enumerate(lines)]
+
+
+# ---------------------------------------------------------------- SVG
+
+
+def _svg_points(points):
+    return " ".join(f"{x:.2f},{y:.2f}" for x, y in points)
+
+
+def _svg_stroke(stroke):
+    if stroke is None:
+        return ' stroke="none"'
+    color, width, style = stroke
+    attrs = f' stroke="{color}" stroke-width="{width:g}"'
+    if style in DASH_PATTERNS:
+        attrs += f' stroke-dasharray="{" ".join(f"{d * width:g}" for d in DASH_PATTERNS[style])}"'
+    return attrs
+
+
+def render_svg(shapes, scale=1.0):
+    """Shapes của một sheet -> chuỗi SVG (tọa độ theo point, width/height nhân scale)"""
+    primitives = build_primitives(shapes)
+    x0, y0, x1, y1 = _extent(primitives)
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{x0:.2f} {y0:.2f} {x1 - x0:.2f} {y1 - y0:.2f}" '
+             f'width="{(x1 - x0) * scale:.0f}" height="{(y1 - y0) * scale:.0f}">',
+             f'<rect x="{x0:.2f}" y="{y0:.2f}" width="{x1 - x0:.2f}" height="{y1 - y0:.2f}" fill="#FFFFFF"/>']
+    for primitive in primitives:
+        kind = primitive[0]
+        if kind == "polygon":
+            _, points, fill, stroke = primitive
+            parts.append(f'<polygon points="{_svg_points(points)}" fill="{fill or "none"}"{_svg_stroke(stroke)}/>')
+        elif kind == "polyline":
+            _, points, stroke, arrows = primitive
+            parts.append(f'<polyline points="{_svg_points(points)}" fill="none"{_svg_stroke(stroke)}/>')
+            for at_end, enabled in zip((False, True), arrows):
+                if enabled:
+                    parts.append(f'<polygon points="{_svg_points(_arrowhead(points, at_end, stroke[1]))}" '
+                                 f'fill="{stroke[0]}"/>')
+        else:
+            _, bbox, lines, style = primitive
+            anchor, positions = _text_lines(bbox, lines, style)
+            attrs = (f' font-family={quoteattr(style["family"])} font-size="{style["size"]:g}"'
+                     f' fill="{style["color"]}" text-anchor="{anchor}"'
+                     + (' font-weight="bold"' if style["bold"] else '')
+                     + (' font-style="italic"' if style["italic"] else ''))
+            spans = "".join(f'<tspan x="{x:.2f}" y="{y:.2f}">{escape(line)}</tspan>' for x, y, line in positions)
+            parts.append(f'<text{attrs} xml:space="preserve">{spans}</text>')
+    parts.append('</svg>')
+    return "\n".join(parts) + "\n"
+
+
+# ---------------------------------------------------------------- PNG
+
+
+class Canvas:
+    """Ảnh RGB trong bytearray, tô polygon theo scanline (even-odd)"""
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.rows = [bytearray(b"\xff" * (width * 3)) for _ in range(height)]
+
+    def fill_polygon(self, points, color):
+        if len(points) < 3:
+            return
+        rgb = bytes(color)
+        edges = [(points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
+        edges = [(a, b) if a[1] <= b[1] else (b, a) for a, b in edges if a[1] != b[1]]
+        if not edges:
+            return
+        top = max(0, math.floor(min(a[1] for a, _ in edges)))
+        bottom = min(self.height - 1, math.ceil(max(b[1] for _, b in edges)))
+        for y in range(top, bottom + 1):
+            sample = y + 0.5
+            xs = sorted(a[0] + (sample - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+                        for a, b in edges if a[1] <= sample < b[1])
+            row = self.rows[y]
+            for i in range(0, len(xs) - 1, 2):
+                start = max(0, math.ceil(xs[i] - 0.5))
+                end = min(self.width, math.floor(xs[i + 1] - 0.5) + 1)
+                if end > start:
+                    row[start * 3:end * 3] = rgb * (end - start)
+
+    def fill_rect(self, x0, y0, x1, y1, color):
+        rgb = bytes(color)
+        start, end = max(0, round(x0)), min(self.width, max(round(x1), round(x0) + 1))
+        if end <= start:
+            return
+        band = rgb * (end - start)
+        for y in range(max(0, round(y0)), min(self.height, max(round(y1), round(y0) + 1))):
+            self.rows[y][start * 3:end * 3] = band
+
+    def stroke_polyline(self, points, color, width, dash=None):
+        half = max(width, 1.0) / 2
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            length = math.hypot(bx - ax, by - ay)
+            if length == 0:
+                continue
+            ux, uy = (bx - ax) / length, (by - ay) / length
+            pieces = [(0.0, length)]
+            if dash:
+                pieces, pos, i = [], 0.0, 0
+                while pos < length:
+                    if i % 2 == 0:
+                        pieces.append((pos, min(pos + dash[i % len(dash)], length)))
+                    pos += dash[i % len(dash)]
+                    i += 1
+            for s, e in pieces:
+                # Nối dài nửa nét ở hai đầu để góc bẻ không bị hở
+                s, e = s - half, e + half
+                sx, sy, ex, ey = ax + ux * s, ay + uy * s, ax + ux * e, ay + uy * e
+                if ux == 0 or uy == 0:
+                    # Đoạn ngang/dọc (phần lớn connector và viền) -> tô hình chữ nhật
+                    self.fill_rect(min(sx, ex) - half * abs(uy), min(sy, ey) - half * abs(ux),
+                                   max(sx, ex) + half * abs(uy), max(sy, ey) + half * abs(ux), color)
+                    continue
+                self.fill_polygon([(sx - uy * half, sy + ux * half), (ex - uy * half, ey + ux * half),
+                                   (ex + uy * half, ey - ux * half), (sx + uy * half, sy - ux * half)], color)
+
+    def to_png(self):
+        raw = b"".join(b"\x00" + bytes(row) for row in self.rows)
+
+        def chunk(tag, data):
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+def _rgb(color, fade=0.0):
+    value = color.lstrip("#")
+    return [round(int(value[i:i + 2], 16) * (1 - fade) + 255 * fade) for i in (0, 2, 4)]
+
+
+def render_png(shapes, scale=1.0):
+    """Shapes của một sheet -> bytes PNG"""
+    primitives = build_primitives(shapes)
+    x0, y0, x1, y1 = _extent(primitives)
+    canvas = Canvas(max(1, math.ceil((x1 - x0) * scale)), max(1, math.ceil((y1 - y0) * scale)))
+
+    def tr(points):
+        return [((x - x0) * scale, (y - y0) * scale) for x, y in points]
+
+    def stroke(points, style, closed=False):
+        color, width, dash_style = style
+        dash = [d * width * scale for d in DASH_PATTERNS.get(dash_style, ())] or None
+        canvas.stroke_polyline(tr(points + points[:1] if closed else points), _rgb(color), width * scale, dash)
+
+    for primitive in primitives:
+        kind = primitive[0]
+        if kind == "polygon":
+            _, points, fill, style = primitive
+            if fill:
+                canvas.fill_polygon(tr(points), _rgb(fill))
+            if style:
+                stroke(points, style, closed=True)
+        elif kind == "polyline":
+            _, points, style, arrows = primitive
+            if style:
+                stroke(points, style)
+                for at_end, enabled in zip((False, True), arrows):
+                    if enabled:
+                        canvas.fill_polygon(tr(_arrowhead(points, at_end, style[1])), _rgb(style[0]))
+        else:
+            # Không có font: mỗi dòng text là một vạch mờ dài bằng độ rộng ước lượng
+            _, bbox, lines, style = primitive
+            anchor, positions = _text_lines(bbox, lines, style)
+            size = style["size"]
+            for x, y, line in positions:
+                width = _text_width(line, size)
+                left = {"start": x, "end": x - width}.get(anchor, x - width / 2)
+                canvas.fill_polygon(tr([(left, y - size * 0.7), (left + width, y - size * 0.7),
+                                        (left + width, y), (left, y)]), _rgb(style["color"], fade=0.6))
+    return canvas.to_png()
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import re
+    import time
+
+    from topology import load_diagram
+
+    parser = argparse.ArgumentParser(description="Vẽ preview diagram ra SVG/PNG (không cần Excel)")
+    parser.add_argument("inputs", nargs="+", help="File diagram JSON (đầy đủ/rút gọn) hoặc .xlsx")
+    parser.add_argument("--output-dir", help="Thư mục output (mặc định: cùng thư mục với input)")
+    parser.add_argument("--png", action="store_true", help="Xuất PNG thay vì SVG")
+    parser.add_argument("--scale", type=float, default=1.0, help="Số pixel cho mỗi point (mặc định: 1.0)")
+    parser.add_argument("--sheet", help="Chỉ vẽ sheet này")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    for input_file in args.inputs:
+        diagram = load_diagram(input_file)
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        output_dir = args.output_dir or os.path.dirname(input_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        for sheet_name, sheet_data in diagram.items():
+            if args.sheet and sheet_name != args.sheet:
+                continue
+            shapes = list(sheet_data.get("shapes", []))
+            safe_name = re.sub(r'[\\/:*?"<>|\s]+', "_", sheet_name)
+            output_file = os.path.join(output_dir, f"{stem}_{safe_name}.{'png' if args.png else 'svg'}")
+            if args.png:
+                with open(output_file, 'wb') as f:
+                    f.write(render_png(shapes, args.scale))
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(render_svg(shapes, args.scale))
+            total += len(shapes)
+            print(f"✅ {input_file} [{sheet_name}] -> {output_file} ({len(shapes)} shapes)")
+    print(f"\n⏱️  Đã vẽ {total} shapes trong {time.perf_counter() - started:.3f}s")
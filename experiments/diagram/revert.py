@@ -4,8 +4,15 @@ Script để reverse engineering diagram từ Excel
 Đọc tất cả thông tin về shapes: vị trí, kích thước, màu sắc, text, etc.
 """
 
-import xlwings as xw
-import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import xlwings as xw
+except ImportError:
+    # Không có xlwings (Linux/CI): chỉ dùng được chế độ headless
+    xw = None
 
 def get_rgb_from_long(rgb_long):
     """Chuyển đổi RGB long integer sang hex color"""
@@ -34,18 +41,265 @@ def get_shape_type_name(shape_type):
     }
     return shape_types.get(shape_type, f"Type_{shape_type}")
 
-def reverse_engineer_diagram(excel_file):
+# Nhóm field -> các key trong shape_data (index và name luôn có)
+FIELD_GROUPS = {
+    "type": ("type", "type_name"),
+    "position": ("position",),
+    "text": ("text", "font", "alignment"),
+    "fill": ("fill_color",),
+    "line": ("line_color", "line_weight", "line_style", "arrow_end", "arrow_begin"),
+    "connection": ("id", "connection", "flip", "rotation"),
+}
+
+# Bộ field đặt sẵn cho --fields (hoặc liệt kê nhóm: --fields position,text)
+FIELD_SETS = {
+    "all": tuple(FIELD_GROUPS),
+    "geometry": ("type", "position", "connection"),
+    "text": ("type", "text"),
+    "style": ("type", "fill", "line"),
+}
+
+def parse_fields(value):
+    """'geometry' / 'position,text' / None -> frozenset các nhóm field"""
+    if not value:
+        return frozenset(FIELD_GROUPS)
+    groups = set()
+    for name in value.split(","):
+        name = name.strip()
+        if name in FIELD_SETS:
+            groups.update(FIELD_SETS[name])
+        elif name in FIELD_GROUPS:
+            groups.add(name)
+        else:
+            raise ValueError(f"Field không hợp lệ: {name!r} (chọn trong {', '.join(dict.fromkeys([*FIELD_SETS, *FIELD_GROUPS]))})")
+    return frozenset(groups)
+
+def filter_fields(data, fields):
+    """Bỏ các key không thuộc nhóm field đã chọn (dùng cho kết quả headless)"""
+    if fields >= frozenset(FIELD_GROUPS):
+        return data
+    allowed = {"index", "name"}.union(*(FIELD_GROUPS[group] for group in fields))
+    for sheet_data in data.values():
+        sheet_data["shapes"] = [{k: v for k, v in shape.items() if k in allowed} for shape in sheet_data["shapes"]]
+    return data
+
+def read_shape(shape, i, fields):
+    """
+    Đọc một shape qua COM, chỉ lấy các nhóm field trong fields
+    shape.api / TextFrame / Characters() chỉ lấy một lần rồi dùng lại (mỗi lần truy cập là một lần gọi COM)
+    """
+    api = shape.api
+    shape_data = {"index": i, "name": shape.name}
+    if "type" in fields:
+        shape_data["type"] = None
+        shape_data["type_name"] = None
+    if "position" in fields:
+        shape_data["position"] = {
+            "left": shape.left,
+            "top": shape.top,
+            "width": shape.width,
+            "height": shape.height
+        }
+    if "text" in fields:
+        shape_data["text"] = None
+        shape_data["font"] = {}
+    if "fill" in fields:
+        shape_data["fill_color"] = None
+    if "line" in fields:
+        shape_data["line_color"] = None
+        shape_data["line_weight"] = None
+    
+    # Lấy shape type (group cần type để tìm connector con)
+    shape_type = None
+    if fields & {"type", "connection"}:
+        try:
+            shape_type = api.Type
+            if "type" in fields:
+                shape_data["type"] = shape_type
+                shape_data["type_name"] = get_shape_type_name(shape_type)
+        except:
+            pass
+    
+    # Lấy text content
+    tf = None
+    if "text" in fields:
+        try:
+            if hasattr(api, 'TextFrame'):
+                tf = api.TextFrame
+                characters = tf.Characters()
+                shape_data["text"] = characters.Text
+                
+                # Lấy font properties
+                font = characters.Font
+                shape_data["font"] = {
+                    "name": font.Name if hasattr(font, 'Name') else None,
+                    "size": font.Size if hasattr(font, 'Size') else None,
+                    "bold": font.Bold if hasattr(font, 'Bold') else None,
+                    "italic": font.Italic if hasattr(font, 'Italic') else None,
+                    "color": get_rgb_from_long(font.Color) if hasattr(font, 'Color') else None,
+                }
+        except:
+            pass
+    
+    # Lấy fill color
+    if "fill" in fields:
+        try:
+            if hasattr(api, 'Fill'):
+                shape_data["fill_color"] = get_rgb_from_long(api.Fill.ForeColor.RGB)
+        except:
+            pass
+    
+    # Lấy line properties
+    if "line" in fields:
+        try:
+            if hasattr(api, 'Line'):
+                line = api.Line
+                shape_data["line_color"] = get_rgb_from_long(line.ForeColor.RGB) if hasattr(line, 'ForeColor') else None
+                shape_data["line_weight"] = line.Weight if hasattr(line, 'Weight') else None
+                shape_data["line_style"] = line.DashStyle if hasattr(line, 'DashStyle') else None
+                
+                # Arrow head info
+                if hasattr(line, 'EndArrowheadStyle'):
+                    shape_data["arrow_end"] = line.EndArrowheadStyle
+                if hasattr(line, 'BeginArrowheadStyle'):
+                    shape_data["arrow_begin"] = line.BeginArrowheadStyle
+        except:
+            pass
+    
+    # Lấy thông tin kết nối của connector (group thì lấy connector con đầu tiên)
+    if "connection" in fields:
+        try:
+            connector = api
+            if shape_type == 6:
+                items = api.GroupItems
+                connector = next((items.Item(k) for k in range(1, items.Count + 1)
+                                  if items.Item(k).Connector), None)
+            if connector is not None and connector.Connector:
+                cf = connector.ConnectorFormat
+                connection = {}
+                # ConnectionSite của COM đánh số từ 1, DrawingML (idx) từ 0
+                if cf.BeginConnected:
+                    connection["begin"] = [str(cf.BeginConnectedShape.ID), cf.BeginConnectionSite - 1]
+                if cf.EndConnected:
+                    connection["end"] = [str(cf.EndConnectedShape.ID), cf.EndConnectionSite - 1]
+                shape_data["connection"] = connection
+                shape_data["flip"] = {"h": bool(connector.HorizontalFlip), "v": bool(connector.VerticalFlip)}
+                shape_data["rotation"] = connector.Rotation
+            shape_data["id"] = str(api.ID)
+        except:
+            pass
+    
+    # Lấy alignment
+    if tf is not None:
+        try:
+            shape_data["alignment"] = {
+                "horizontal": tf.HorizontalAlignment if hasattr(tf, 'HorizontalAlignment') else None,
+                "vertical": tf.VerticalAlignment if hasattr(tf, 'VerticalAlignment') else None,
+            }
+        except:
+            pass
+    
+    return shape_data
+
+def read_sheet(sheet, fields, verbose=False):
+    """
+    Đọc tất cả shapes của một sheet qua COM
+
+    Returns:
+        (shapes_info, errors) - errors: list chuỗi mô tả shape đọc lỗi
+    """
+    shapes_info = []
+    errors = []
+    for i, shape in enumerate(sheet.shapes, 1):
+        try:
+            shape_data = read_shape(shape, i, fields)
+        except Exception as e:
+            errors.append(f"shape {i}: {e}")
+            continue
+        shapes_info.append(shape_data)
+        
+        if verbose:
+            # In thông tin ngắn gọn từng shape (chỉ khi --verbose)
+            position = shape_data.get("position")
+            where = f" at ({position['left']:.1f}, {position['top']:.1f})" if position else ""
+            print(f"  [{i}] {shape_data['name']} - {shape_data.get('type_name')}{where}")
+            if shape_data.get('text'):
+                print(f"      Text: {shape_data['text'][:50]}...")
+            if shape_data.get('fill_color'):
+                print(f"      Fill: {shape_data['fill_color']}")
+    return shapes_info, errors
+
+def report_sheet(sheet_name, shapes_info, errors, seconds):
+    """In tóm tắt một sheet thay cho log từng shape"""
+    print(f"📄 Sheet: {sheet_name} - {len(shapes_info)} shapes ({seconds:.2f}s)")
+    if errors:
+        print(f"  ⚠️  {len(errors)} shape đọc lỗi: {'; '.join(errors[:3])}{' ...' if len(errors) > 3 else ''}")
+
+def _analyse_sheet_com(excel_file, sheet_name, fields):
+    """Worker: mở file đã lưu bằng một Excel instance riêng (ẩn), đọc một sheet rồi đóng"""
+    started = time.perf_counter()
+    app = xw.App(visible=False, add_book=False)
+    try:
+        wb = app.books.open(os.path.abspath(excel_file), read_only=True, update_links=False)
+        shapes_info, errors = read_sheet(wb.sheets[sheet_name], fields)
+        wb.close()
+    finally:
+        app.quit()
+    return shapes_info, errors, time.perf_counter() - started
+
+def _analyse_sheet_headless(excel_file, sheet_name, fields):
+    """Worker: đọc DrawingML của một sheet"""
+    from drawing_reader import read_workbook_diagram
+    started = time.perf_counter()
+    data = filter_fields(read_workbook_diagram(excel_file, sheets=[sheet_name]), fields)
+    return data[sheet_name]["shapes"], [], time.perf_counter() - started
+
+def _analyse_parallel(excel_file, worker, fields, workers):
+    """Chạy worker cho từng sheet trong process pool, giữ thứ tự sheet như trong workbook"""
+    from drawing_reader import sheet_names
+    names = sheet_names(excel_file)
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(names)) or 1) as executor:
+        futures = {executor.submit(worker, excel_file, name, fields): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                shapes_info, errors, seconds = future.result()
+            except Exception as e:
+                # Worker chết (Excel không mở được file...) -> sheet rỗng, vẫn chạy tiếp sheet khác
+                shapes_info, errors, seconds = [], [f"sheet: {e}"], 0.0
+            report_sheet(name, shapes_info, errors, seconds)
+            results[name] = shapes_info
+    return {name: {"total_shapes": len(results[name]), "shapes": results[name]} for name in names}
+
+def reverse_engineer_diagram(excel_file, headless=False, fields=None, workers=1, verbose=False):
     """
     Đọc và phân tích tất cả shapes trong Excel file
     
     Args:
         excel_file: Đường dẫn đến file Excel
+        headless: Đọc thẳng DrawingML trong file .xlsx thay vì mở Excel qua COM
+                  (tự động bật khi không có xlwings)
+        fields: Tập nhóm field cần đọc (parse_fields), mặc định tất cả
+        workers: > 1 thì đọc các sheet song song trong process pool; với COM mỗi process
+                 mở file đã lưu bằng một Excel instance riêng
+        verbose: In thông tin từng shape thay vì chỉ tóm tắt từng sheet
     
     Returns:
         Dictionary chứa thông tin về tất cả shapes
     """
     
     print(f"🔍 Đang phân tích file: {excel_file}")
+    fields = frozenset(FIELD_GROUPS) if fields is None else frozenset(fields)
+
+    if headless or xw is None:
+        if workers > 1:
+            return _analyse_parallel(excel_file, _analyse_sheet_headless, fields, workers)
+        from drawing_reader import read_workbook_diagram
+        return filter_fields(read_workbook_diagram(excel_file), fields)
+
+    if workers > 1:
+        return _analyse_parallel(excel_file, _analyse_sheet_com, fields, workers)
     
     # Mở file Excel
     wb = xw.Book(excel_file)
@@ -54,101 +308,11 @@ def reverse_engineer_diagram(excel_file):
     
     # Duyệt qua tất cả các sheets
     for sheet in wb.sheets:
-        print(f"\n📄 Sheet: {sheet.name}")
-        
-        shapes_info = []
-        
-        # Duyệt qua tất cả shapes trong sheet
-        for i, shape in enumerate(sheet.shapes, 1):
-            try:
-                shape_data = {
-                    "index": i,
-                    "name": shape.name,
-                    "type": None,
-                    "type_name": None,
-                    "position": {
-                        "left": shape.left,
-                        "top": shape.top,
-                        "width": shape.width,
-                        "height": shape.height
-                    },
-                    "text": None,
-                    "font": {},
-                    "fill_color": None,
-                    "line_color": None,
-                    "line_weight": None,
-                }
-                
-                # Lấy shape type
-                try:
-                    shape_data["type"] = shape.api.Type
-                    shape_data["type_name"] = get_shape_type_name(shape.api.Type)
-                except:
-                    pass
-                
-                # Lấy text content
-                try:
-                    if hasattr(shape.api, 'TextFrame'):
-                        shape_data["text"] = shape.api.TextFrame.Characters().Text
-                        
-                        # Lấy font properties
-                        font = shape.api.TextFrame.Characters().Font
-                        shape_data["font"] = {
-                            "name": font.Name if hasattr(font, 'Name') else None,
-                            "size": font.Size if hasattr(font, 'Size') else None,
-                            "bold": font.Bold if hasattr(font, 'Bold') else None,
-                            "italic": font.Italic if hasattr(font, 'Italic') else None,
-                            "color": get_rgb_from_long(font.Color) if hasattr(font, 'Color') else None,
-                        }
-                except:
-                    pass
-                
-                # Lấy fill color
-                try:
-                    if hasattr(shape.api, 'Fill'):
-                        fill_rgb = shape.api.Fill.ForeColor.RGB
-                        shape_data["fill_color"] = get_rgb_from_long(fill_rgb)
-                except:
-                    pass
-                
-                # Lấy line properties
-                try:
-                    if hasattr(shape.api, 'Line'):
-                        line = shape.api.Line
-                        shape_data["line_color"] = get_rgb_from_long(line.ForeColor.RGB) if hasattr(line, 'ForeColor') else None
-                        shape_data["line_weight"] = line.Weight if hasattr(line, 'Weight') else None
-                        shape_data["line_style"] = line.DashStyle if hasattr(line, 'DashStyle') else None
-                        
-                        # Arrow head info
-                        if hasattr(line, 'EndArrowheadStyle'):
-                            shape_data["arrow_end"] = line.EndArrowheadStyle
-                        if hasattr(line, 'BeginArrowheadStyle'):
-                            shape_data["arrow_begin"] = line.BeginArrowheadStyle
-                except:
-                    pass
-                
-                # Lấy alignment
-                try:
-                    if hasattr(shape.api, 'TextFrame'):
-                        tf = shape.api.TextFrame
-                        shape_data["alignment"] = {
-                            "horizontal": tf.HorizontalAlignment if hasattr(tf, 'HorizontalAlignment') else None,
-                            "vertical": tf.VerticalAlignment if hasattr(tf, 'VerticalAlignment') else None,
-                        }
-                except:
-                    pass
-                
-                shapes_info.append(shape_data)
-                
-                # In thông tin ngắn gọn
-                print(f"  [{i}] {shape.name} - {shape_data['type_name']} at ({shape.left:.1f}, {shape.top:.1f})")
-                if shape_data['text']:
-                    print(f"      Text: {shape_data['text'][:50]}...")
-                if shape_data['fill_color']:
-                    print(f"      Fill: {shape_data['fill_color']}")
-                    
-            except Exception as e:
-                print(f"  ⚠️  Lỗi khi đọc shape {i}: {e}")
+        started = time.perf_counter()
+        if verbose:
+            print(f"\n📄 Sheet: {sheet.name}")
+        shapes_info, errors = read_sheet(sheet, fields, verbose)
+        report_sheet(sheet.name, shapes_info, errors, time.perf_counter() - started)
         
         all_sheets_info[sheet.name] = {
             "total_shapes": len(shapes_info),
@@ -160,10 +324,36 @@ def reverse_engineer_diagram(excel_file):
     
     return all_sheets_info
 
-def export_to_json(data, output_file):
-    """Xuất thông tin shapes ra file JSON"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def benchmark(excel_file, headless=False, workers=1, repeat=3):
+    """
+    So sánh thời gian đọc: toàn bộ field vs từng bộ field, tuần tự vs process pool
+
+    Returns:
+        List (nhãn, số giây tốt nhất trong repeat lần)
+    """
+    import contextlib
+    import io
+    
+    runs = [(f"fields={name}", parse_fields(name), 1) for name in FIELD_SETS]
+    if workers > 1:
+        runs.append((f"fields=all, workers={workers}", parse_fields(None), workers))
+    results = []
+    for label, fields, n in runs:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # Bỏ log của từng lần chạy, chỉ giữ bảng kết quả
+            with contextlib.redirect_stdout(io.StringIO()):
+                reverse_engineer_diagram(excel_file, headless=headless, fields=fields, workers=n)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results.append((label, best))
+    return results
+
+def export_to_json(data, output_file, compact=False):
+    """Xuất thông tin shapes ra file JSON (compact=True: dạng rút gọn, xem compact.py)"""
+    from compact import save_diagram_json
+    save_diagram_json(data, output_file, compact=compact)
     print(f"\n✅ Đã xuất thông tin ra file: {output_file}")
 
 def generate_recreation_code(data, output_file):
@@ -188,7 +378,8 @@ def recreate_diagram():
         code += f'    sheet.name = "{sheet_name}"\n\n'
         
         for shape in sheet_data['shapes']:
-            if shape['type_name'] in ['Rectangle', 'Diamond', 'Oval', 'Rounded Rectangle']:
+            # Đọc với --fields thiếu position thì không vẽ lại được
+            if shape.get('type_name') in ['Rectangle', 'Diamond', 'Oval', 'Rounded Rectangle'] and shape.get('position'):
                 # Tạo code để vẽ shape
                 code += f'    # Shape: {shape["name"]}\n'
                 code += f'    shape_{shape["index"]} = sheet.shapes.api.AddShape(\n'
@@ -200,32 +391,33 @@ def recreate_diagram():
                 code += f'    )\n'
                 
                 # Text
-                if shape['text']:
+                if shape.get('text'):
                     code += f'    shape_{shape["index"]}.TextFrame.Characters().Text = """{shape["text"]}"""\n'
                 
                 # Font
-                if shape['font'].get('size'):
-                    code += f'    shape_{shape["index"]}.TextFrame.Characters().Font.Size = {shape["font"]["size"]}\n'
-                if shape['font'].get('bold'):
+                font = shape.get('font') or {}
+                if font.get('size'):
+                    code += f'    shape_{shape["index"]}.TextFrame.Characters().Font.Size = {font["size"]}\n'
+                if font.get('bold'):
                     code += f'    shape_{shape["index"]}.TextFrame.Characters().Font.Bold = True\n'
-                if shape['font'].get('color'):
+                if font.get('color'):
                     # Chuyển hex về RGB long
-                    hex_color = shape['font']['color'].replace('#', '')
+                    hex_color = font["color"].replace('#', '')
                     r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
                     rgb_long = r + (g << 8) + (b << 16)
                     code += f'    shape_{shape["index"]}.TextFrame.Characters().Font.Color = {rgb_long}\n'
                 
                 # Fill color
-                if shape['fill_color']:
+                if shape.get('fill_color'):
                     hex_color = shape['fill_color'].replace('#', '')
                     r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
                     rgb_long = r + (g << 8) + (b << 16)
                     code += f'    shape_{shape["index"]}.Fill.ForeColor.RGB = {rgb_long}\n'
                 
                 # Line
-                if shape['line_weight']:
+                if shape.get('line_weight'):
                     code += f'    shape_{shape["index"]}.Line.Weight = {shape["line_weight"]}\n'
-                if shape['line_color']:
+                if shape.get('line_color'):
                     hex_color = shape['line_color'].replace('#', '')
                     r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
                     rgb_long = r + (g << 8) + (b << 16)
@@ -248,33 +440,75 @@ if __name__ == '__main__':
     print(f"✅ Đã tạo recreation code: {output_file}")
 
 if __name__ == '__main__':
-    import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("Usage: python reverse_engineer_diagram.py <excel_file>")
-        print("\nExample:")
-        print("  python reverse_engineer_diagram.py flowchart_demo.xlsx")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Reverse engineer diagram từ Excel",
+        epilog="Example:\n  python revert.py flowchart_demo.xlsx\n  python revert.py flowchart_demo.xlsx --headless\n  python revert.py flowchart_demo.xlsx --headless --render"
+               "\n  python revert.py flowchart_demo.xlsx --fields geometry --workers 4"
+               "\n  python revert.py flowchart_demo.xlsx --headless --benchmark --workers 4",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("excel_file")
+    parser.add_argument("--headless", action="store_true",
+                        help="Đọc DrawingML trực tiếp từ file .xlsx, không cần Excel")
+    parser.add_argument("--render", action="store_true",
+                        help="Vẽ lại diagram ra *_recreated.xlsx bằng drawing_writer (không cần Excel)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Ghi *_analysis.json dạng rút gọn (bảng style dùng chung)")
+    parser.add_argument("--fields", default="all",
+                        help=f"Chỉ đọc các field cần: {', '.join(FIELD_SETS)} hoặc nhóm "
+                             f"({', '.join(FIELD_GROUPS)}) cách nhau bởi dấu phẩy")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Đọc các sheet song song bằng N process (COM: mỗi process một Excel ẩn, file phải đã lưu)")
+    parser.add_argument("--verbose", action="store_true", help="In thông tin từng shape")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Chỉ so sánh thời gian đọc theo từng bộ field / số worker, không xuất file")
+    args = parser.parse_args()
     
-    excel_file = sys.argv[1]
+    excel_file = args.excel_file
+    
+    try:
+        fields = parse_fields(args.fields)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.benchmark:
+        print(f"⏱️  Benchmark: {excel_file} ({'headless' if args.headless or xw is None else 'COM'})")
+        results = benchmark(excel_file, headless=args.headless, workers=args.workers)
+        baseline = results[0][1]
+        for label, seconds in results:
+            print(f"  {label:<28} {seconds * 1000:8.1f}ms  x{baseline / seconds:.2f}")
+        raise SystemExit(0)
     
     try:
         # Reverse engineer
-        diagram_info = reverse_engineer_diagram(excel_file)
+        started = time.perf_counter()
+        diagram_info = reverse_engineer_diagram(excel_file, headless=args.headless, fields=fields,
+                                                workers=args.workers, verbose=args.verbose)
+        elapsed = time.perf_counter() - started
         
         # Xuất ra JSON
         json_file = excel_file.replace('.xlsx', '_analysis.json')
-        export_to_json(diagram_info, json_file)
+        export_to_json(diagram_info, json_file, compact=args.compact)
         
         # Tạo recreation code
         code_file = excel_file.replace('.xlsx', '_recreate.py')
         generate_recreation_code(diagram_info, code_file)
         
+        # Vẽ lại trực tiếp ra .xlsx
+        if args.render:
+            from drawing_writer import render_diagram
+            recreated_file = excel_file.replace('.xlsx', '_recreated.xlsx')
+            stats = render_diagram(diagram_info, recreated_file)
+            print(f"✅ Đã vẽ lại {stats['shapes']} shapes ra file: {recreated_file}")
+        
         print("\n" + "="*60)
         print("📊 SUMMARY")
         print("="*60)
         for sheet_name, sheet_data in diagram_info.items():
             print(f"Sheet '{sheet_name}': {sheet_data['total_shapes']} shapes")
+        print(f"⏱️  Thời gian phân tích: {elapsed:.2f}s")
         
     except Exception as e:
         print(f"❌ Lỗi: {e}")
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Định tuyến connector vuông góc (orthogonal routing) tránh đè lên shape
+Mỗi edge đi ra từ cạnh của shape nguồn, tìm đường bằng A* trên lưới tọa độ
+"đáng chú ý" (mép các shape cản đường + điểm đầu/cuối, kiểu Hanan grid), với
+phạt cho mỗi lần bẻ góc. Chỉ các shape nằm trong vùng quanh edge mới được đưa
+vào lưới (tra qua spatial index), nên N edge giữa M shape vẫn gần tuyến tính.
+
+Kết quả ghi lại vào diagram JSON dưới dạng elbow connector:
+  - 1 đoạn: straightConnector1, 2 đoạn: bentConnector2, 3 đoạn: bentConnector3 (+ adjust)
+  - nhiều đoạn hơn: connector dạng path (custGeom)
+
+Usage:
+    python router.py RPA業務フロー_xxx.xlsx --render routed.xlsx
+    python router.py diagram_layout.json -o diagram_routed.json
+"""
+
+import heapq
+import json
+import math
+from bisect import bisect_left, bisect_right
+
+from spatial import SpatialGrid, bbox_from_position, bbox_center
+from topology import build_graph, _node_id
+
+# Khoảng cách tối thiểu (point) giữa đường đi và shape cản đường
+MARGIN = 8.0
+# Chi phí một lần bẻ góc, quy ra point chiều dài
+BEND_PENALTY = 40.0
+# Nới vùng tìm kiếm quanh hai đầu edge (point); không thấy đường thì nới gấp đôi
+SEARCH_PADDING = 120.0
+MAX_EXPANSIONS = 4
+
+# Connection site -> cạnh của shape (theo geometry), xem layout.CONNECTION_SITES
+SITE_SIDES = {"ellipse": {0: "top", 2: "left", 4: "bottom", 6: "right"}}
+DEFAULT_SITE_SIDES = {0: "top", 1: "left", 2: "bottom", 3: "right"}
+SIDE_NORMALS = {"top": (0, -1), "bottom": (0, 1), "left": (-1, 0), "right": (1, 0)}
+
+EMU_ADJUST = 100000
+
+
+def _side_point(bbox, side):
+    x0, y0, x1, y1 = bbox
+    return {"top": ((x0 + x1) / 2, y0), "bottom": ((x0 + x1) / 2, y1),
+            "left": (x0, (y0 + y1) / 2), "right": (x1, (y0 + y1) / 2)}[side]
+
+
+def _choose_sides(src, dst):
+    """Không có connection site: chọn cạnh theo vị trí tương đối của hai shape"""
+    (sx, sy), (dx, dy) = bbox_center(src), bbox_center(dst)
+    if abs(dx - sx) >= abs(dy - sy):
+        return ("right", "left") if dx >= sx else ("left", "right")
+    return ("bottom", "top") if dy >= sy else ("top", "bottom")
+
+
+class ObstacleIndex:
+    """Spatial index các shape cản đường (đã nới MARGIN)"""
+
+    def __init__(self, boxes, margin=MARGIN):
+        self.margin = margin
+        self.grid = SpatialGrid(cell_size=60.0)
+        for key, bbox in boxes.items():
+            self.grid.insert(key, (bbox[0] - margin, bbox[1] - margin, bbox[2] + margin, bbox[3] + margin))
+
+    def near(self, region, ignore=()):
+        """bbox (đã nới) của các shape giao với region"""
+        return [self.grid.boxes[key] for key in self.grid.query_bbox(region) if key not in ignore]
+
+
+def _simplify(points):
+    """Bỏ điểm trùng và điểm nằm giữa hai đoạn thẳng hàng"""
+    result = []
+    for p in points:
+        if result and abs(p[0] - result[-1][0]) < 1e-6 and abs(p[1] - result[-1][1]) < 1e-6:
+            continue
+        if len(result) >= 2:
+            a, b = result[-2], result[-1]
+            if (abs(a[0] - b[0]) < 1e-6 and abs(b[0] - p[0]) < 1e-6) or \
+               (abs(a[1] - b[1]) < 1e-6 and abs(b[1] - p[1]) < 1e-6):
+                result[-1] = p
+                continue
+        result.append(p)
+    return result
+
+
+def _blocked_cells(xs, ys, boxes):
+    """
+    Đánh dấu trên lưới (xs, ys): điểm nằm trong shape, đoạn ngang (i, j)->(i+1, j)
+    và đoạn dọc (i, j)->(i, j+1) cắt vào phần trong của shape (đi sát mép thì không tính)
+    """
+    inside, horizontal, vertical = set(), set(), set()
+    for bx0, by0, bx1, by1 in boxes:
+        # Chỉ số cột/hàng nằm hẳn bên trong, và chỉ số đoạn giao với khoảng mở
+        col_in = range(bisect_right(xs, bx0), bisect_left(xs, bx1))
+        row_in = range(bisect_right(ys, by0), bisect_left(ys, by1))
+        col_seg = range(max(bisect_right(xs, bx0) - 1, 0), min(bisect_left(xs, bx1), len(xs) - 1))
+        row_seg = range(max(bisect_right(ys, by0) - 1, 0), min(bisect_left(ys, by1), len(ys) - 1))
+        for j in row_in:
+            horizontal.update((i, j) for i in col_seg)
+            inside.update((i, j) for i in col_in)
+        for i in col_in:
+            vertical.update((i, j) for j in row_seg)
+    return inside, horizontal, vertical
+
+
+def _search(obstacles, start, goal, start_dir, goal_dir, ignore, region, bend_penalty):
+    """A* trên lưới tọa độ mép shape trong region; trả về (list điểm, chi phí) hoặc (None, None)"""
+    rx0, ry0, rx1, ry1 = region
+    boxes = obstacles.near(region, ignore)
+    xs, ys = {start[0], goal[0], rx0, rx1}, {start[1], goal[1], ry0, ry1}
+    for bx0, by0, bx1, by1 in boxes:
+        xs.update(x for x in (bx0, bx1) if rx0 <= x <= rx1)
+        ys.update(y for y in (by0, by1) if ry0 <= y <= ry1)
+    xs, ys = sorted(xs), sorted(ys)
+    inside, horizontal, vertical = _blocked_cells(xs, ys, boxes)
+
+    start_node = (bisect_left(xs, start[0]), bisect_left(ys, start[1]))
+    goal_node = (bisect_left(xs, goal[0]), bisect_left(ys, goal[1]))
+    gx, gy = goal
+
+    # state = (ix, iy, hướng đang đi)
+    start_state = (start_node[0], start_node[1], start_dir)
+    best = {start_state: 0.0}
+    parent = {start_state: None}
+    heap = [(abs(start[0] - gx) + abs(start[1] - gy), 0.0, start_state)]
+    while heap:
+        _, cost, state = heapq.heappop(heap)
+        if cost > best.get(state, math.inf):
+            continue
+        ix, iy, direction = state
+        if (ix, iy) == goal_node:
+            # Đi vào shape đích phải vuông góc với cạnh đích
+            final = cost + (bend_penalty if direction != goal_dir else 0.0)
+            points = []
+            node = state
+            while node is not None:
+                points.append((xs[node[0]], ys[node[1]]))
+                node = parent[node]
+            return points[::-1], final
+        for nx, ny, axis, segment in ((ix + 1, iy, "h", (ix, iy)), (ix - 1, iy, "h", (ix - 1, iy)),
+                                      (ix, iy + 1, "v", (ix, iy)), (ix, iy - 1, "v", (ix, iy - 1))):
+            if not (0 <= nx < len(xs) and 0 <= ny < len(ys)) or (nx, ny) in inside:
+                continue
+            if segment in (horizontal if axis == "h" else vertical):
+                continue
+            step = abs(xs[nx] - xs[ix]) + abs(ys[ny] - ys[iy])
+            new_cost = cost + step + (bend_penalty if axis != direction else 0.0)
+            new_state = (nx, ny, axis)
+            if new_cost < best.get(new_state, math.inf):
+                best[new_state] = new_cost
+                parent[new_state] = state
+                heapq.heappush(heap, (new_cost + abs(xs[nx] - gx) + abs(ys[ny] - gy), new_cost, new_state))
+    return None, None
+
+
+def route_edge(obstacles, src_key, src_bbox, src_side, dst_key, dst_bbox, dst_side,
+               margin=MARGIN, bend_penalty=BEND_PENALTY, extent=None):
+    """
+    Tìm đường vuông góc từ cạnh src_side của shape nguồn tới cạnh dst_side của shape đích
+
+    Returns:
+        (list điểm polyline, True nếu tránh được mọi shape)
+    """
+    begin, end = _side_point(src_bbox, src_side), _side_point(dst_bbox, dst_side)
+    (nx0, ny0), (nx1, ny1) = SIDE_NORMALS[src_side], SIDE_NORMALS[dst_side]
+    # Đi thẳng ra khỏi shape một đoạn margin trước khi rẽ
+    stub_begin = (begin[0] + nx0 * margin, begin[1] + ny0 * margin)
+    stub_end = (end[0] + nx1 * margin, end[1] + ny1 * margin)
+    start_dir = "h" if nx0 else "v"
+    goal_dir = "h" if nx1 else "v"
+    ignore = {src_key, dst_key}
+
+    padding = SEARCH_PADDING
+    for _ in range(MAX_EXPANSIONS):
+        region = (min(stub_begin[0], stub_end[0]) - padding, min(stub_begin[1], stub_end[1]) - padding,
+                  max(stub_begin[0], stub_end[0]) + padding, max(stub_begin[1], stub_end[1]) + padding)
+        if extent:
+            region = (max(region[0], extent[0]), max(region[1], extent[1]),
+                      min(region[2], extent[2]), min(region[3], extent[3]))
+        path, _ = _search(obstacles, stub_begin, stub_end, start_dir, goal_dir, ignore, region, bend_penalty)
+        if path:
+            return _simplify([begin] + path + [end]), True
+        padding *= 2
+
+    # Không tìm được: đường chữ Z đơn giản (có thể đè shape)
+    if start_dir == "h":
+        mid = (stub_begin[0] + stub_end[0]) / 2
+        fallback = [begin, stub_begin, (mid, stub_begin[1]), (mid, stub_end[1]), stub_end, end]
+    else:
+        mid = (stub_begin[1] + stub_end[1]) / 2
+        fallback = [begin, stub_begin, (stub_begin[0], mid), (stub_end[0], mid), stub_end, end]
+    return _simplify(fallback), False
+
+
+def _round(value):
+    return round(value, 3)
+
+
+def elbow_geometry(points):
+    """
+    Polyline vuông góc -> thuộc tính connector DrawingML
+    (geometry, position, flip, rotation, adjust, path)
+
+    bentConnector2/3 trong khung chuẩn luôn đi ngang trước; polyline đi dọc trước
+    thì dùng rotation 90 (vector cục bộ = vector thật xoay -90 độ: (dx, dy) -> (dy, -dx)).
+    """
+    (bx, by), (ex, ey) = points[0], points[-1]
+    position = {"left": _round(min(bx, ex)), "top": _round(min(by, ey)),
+                "width": _round(abs(ex - bx)), "height": _round(abs(ey - by))}
+    segments = len(points) - 1
+    result = {"geometry": "straightConnector1", "position": position}
+    if segments <= 1:
+        flip = {"h": ex < bx, "v": ey < by}
+        if flip["h"] or flip["v"]:
+            result["flip"] = flip
+        return result
+
+    vertical_first = abs(points[1][0] - bx) < 1e-6
+    dx, dy = ex - bx, ey - by
+    local_dx, local_dy = (dy, -dx) if vertical_first else (dx, dy)
+    if segments == 2:
+        result["geometry"] = "bentConnector2"
+    elif segments == 3 and abs(local_dx) > 1e-6:
+        # Vị trí đoạn giữa theo tỉ lệ chiều rộng khung cục bộ, tính từ đầu begin
+        middle = (points[1][1] - by) if vertical_first else (points[1][0] - bx)
+        result["geometry"] = "bentConnector3"
+        result["adjust"] = [int(round(middle / local_dx * EMU_ADJUST))]
+    else:
+        # bentConnector4/5 khó khớp chính xác -> path tự do
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        return {"geometry": "custGeom",
+                "position": {"left": _round(min(xs)), "top": _round(min(ys)),
+                             "width": _round(max(xs) - min(xs)), "height": _round(max(ys) - min(ys))},
+                "path": [[_round(x), _round(y)] for x, y in points]}
+
+    flip = {"h": local_dx < 0, "v": local_dy < 0}
+    if flip["h"] or flip["v"]:
+        result["flip"] = flip
+    if vertical_first:
+        result["rotation"] = 90
+    return result
+
+
+def connector_polyline(shape):
+    """
+    Polyline thật của connector theo geometry/flip/rotation/adjust (ngược với elbow_geometry)
+    Dùng để kiểm tra kết quả và để vẽ preview.
+    """
+    if shape.get("path"):
+        return [tuple(p) for p in shape["path"]]
+    bbox = bbox_from_position(shape.get("position") or {})
+    x0, y0, x1, y1 = bbox
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    width, height = x1 - x0, y1 - y0
+    rotation = shape.get("rotation") or 0
+    if round(rotation) % 180 == 90:
+        width, height = height, width
+    geometry = shape.get("geometry") or "straightConnector1"
+    adjust = (shape.get("adjust") or [EMU_ADJUST // 2])[0] / EMU_ADJUST
+    # Khung cục bộ [0, w] x [0, h]
+    if geometry == "bentConnector2":
+        local = [(0, 0), (width, 0), (width, height)]
+    elif geometry == "bentConnector3":
+        local = [(0, 0), (width * adjust, 0), (width * adjust, height), (width, height)]
+    else:
+        local = [(0, 0), (width, height)]
+    flip = shape.get("flip") or {}
+    angle = math.radians(rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    points = []
+    for lx, ly in local:
+        lx -= width / 2
+        ly -= height / 2
+        if flip.get("h"):
+            lx = -lx
+        if flip.get("v"):
+            ly = -ly
+        points.append((cx + lx * cos - ly * sin, cy + lx * sin + ly * cos))
+    return points
+
+
+def route_diagram(diagram_data, margin=MARGIN, bend_penalty=BEND_PENALTY, only=None):
+    """
+    Định tuyến lại toàn bộ connector đã nối được hai đầu (theo topology.build_graph)
+
+    Args:
+        only: Tập id connector (topology._node_id) cần định tuyến; None = tất cả
+
+    Returns:
+        (diagram_data đã cập nhật, thống kê {"routed", "blocked", "skipped"})
+    """
+    stats = {"routed": 0, "blocked": 0, "skipped": 0}
+    for sheet_data in diagram_data.values():
+        shapes = sheet_data.get("shapes", [])
+        graph = build_graph(shapes)
+        node_ids = {node["id"] for node in graph["nodes"] if not node["children"]}
+        node_shape = {node["id"]: node["shape"] for node in graph["nodes"]}
+        boxes = {}
+        by_key = {}
+        for shape in shapes:
+            key = _node_id(shape)
+            by_key[key] = shape
+            if key in node_ids:
+                boxes[key] = bbox_from_position(shape.get("position") or {})
+        obstacles = ObstacleIndex(boxes, margin)
+        if boxes:
+            all_boxes = list(boxes.values())
+            pad = SEARCH_PADDING * 4
+            extent = (min(b[0] for b in all_boxes) - pad, min(b[1] for b in all_boxes) - pad,
+                      max(b[2] for b in all_boxes) + pad, max(b[3] for b in all_boxes) + pad)
+        else:
+            extent = None
+
+        for edge in graph["edges"]:
+            if only is not None and edge["id"] not in only:
+                continue
+            shape = by_key.get(edge["id"])
+            source, target = edge["source"], edge["target"]
+            if shape is None or source not in boxes or target not in boxes:
+                stats["skipped"] += 1
+                continue
+            sides = _choose_sides(boxes[source], boxes[target])
+            src_side = _site_side(node_shape.get(source), edge.get("source_site")) or sides[0]
+            dst_side = _site_side(node_shape.get(target), edge.get("target_site")) or sides[1]
+            points, clear = route_edge(obstacles, source, boxes[source], src_side,
+                                       target, boxes[target], dst_side, margin, bend_penalty, extent)
+            for key in ("flip", "rotation", "adjust", "path", "children", "geometry"):
+                shape.pop(key, None)
+            shape.update(elbow_geometry(points))
+            shape["type"], shape["type_name"] = 6, "Connector"
+            shape["route"] = [[_round(x), _round(y)] for x, y in points]
+            stats["routed"] += 1
+            if not clear:
+                stats["blocked"] += 1
+    return diagram_data, stats
+
+
+def _site_side(geometry, site):
+    """Connection site chỉ đáng tin khi topology nối bằng stCxn/endCxn"""
+    if site is None:
+        return None
+    return SITE_SIDES.get(geometry, DEFAULT_SITE_SIDES).get(site)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Định tuyến connector vuông góc tránh shape")
+    parser.add_argument("input", help="File .xlsx hoặc diagram JSON")
+    parser.add_argument("-o", "--output", help="File JSON output (mặc định: <input>_routed.json)")
+    parser.add_argument("--margin", type=float, default=MARGIN)
+    parser.add_argument("--bend-penalty", type=float, default=BEND_PENALTY)
+    parser.add_argument("--render", metavar="XLSX", help="Render luôn ra .xlsx bằng drawing_writer")
+    args = parser.parse_args()
+
+    from topology import load_diagram
+    diagram = load_diagram(args.input)
+    started = time.perf_counter()
+    diagram, stats = route_diagram(diagram, args.margin, args.bend_penalty)
+    print(f"⏱️  Định tuyến {stats['routed']} connector trong {time.perf_counter() - started:.3f}s"
+          + (f" ({stats['blocked']} connector không tránh được shape)" if stats["blocked"] else "")
+          + (f", bỏ qua {stats['skipped']} connector chưa nối đủ 2 đầu" if stats["skipped"] else ""))
+
+    output_file = args.output or args.input.rsplit(".", 1)[0] + "_routed.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(diagram, f, indent=2, ensure_ascii=False)
+    print(f"✅ Đã xuất ra file: {output_file}")
+
+    if args.render:
+        from drawing_writer import render_diagram
+        render_stats = render_diagram(diagram, args.render)
+        print(f"✅ Đã render {render_stats['shapes']} shapes ra file: {args.render}")
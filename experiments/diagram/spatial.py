@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Spatial index dạng lưới đều cho bounding box của shapes
+Chia mặt phẳng thành các ô cell_size x cell_size, mỗi ô giữ key của các bbox chạm vào nó,
+nên truy vấn điểm/vùng chỉ phải xét vài ô thay vì toàn bộ shapes trong sheet.
+
+bbox luôn là tuple (x0, y0, x1, y1) theo point, x0 <= x1, y0 <= y1.
+"""
+
+import math
+
+
+def bbox_from_position(position):
+    """{"left", "top", "width", "height"} -> (x0, y0, x1, y1)"""
+    left, top = position.get("left") or 0, position.get("top") or 0
+    return (left, top, left + (position.get("width") or 0), top + (position.get("height") or 0))
+
+
+def bbox_center(bbox):
+    return ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+
+
+def bbox_area(bbox):
+    return (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+
+def bbox_contains_point(bbox, x, y, margin=0.0):
+    return bbox[0] - margin <= x <= bbox[2] + margin and bbox[1] - margin <= y <= bbox[3] + margin
+
+
+def bbox_contains(outer, inner, margin=0.0):
+    """inner nằm trọn trong outer (cho phép lệch margin)"""
+    return (outer[0] - margin <= inner[0] and outer[1] - margin <= inner[1]
+            and inner[2] <= outer[2] + margin and inner[3] <= outer[3] + margin)
+
+
+def bbox_intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def point_to_bbox_distance(bbox, x, y):
+    """Khoảng cách từ điểm tới bbox (0 nếu điểm nằm trong)"""
+    dx = max(bbox[0] - x, 0, x - bbox[2])
+    dy = max(bbox[1] - y, 0, y - bbox[3])
+    return math.hypot(dx, dy)
+
+
+def point_to_border_distance(bbox, x, y):
+    """Khoảng cách từ điểm tới viền bbox (kể cả khi điểm nằm bên trong)"""
+    if not bbox_contains_point(bbox, x, y):
+        return point_to_bbox_distance(bbox, x, y)
+    return min(x - bbox[0], bbox[2] - x, y - bbox[1], bbox[3] - y)
+
+
+class SpatialGrid:
+    """Lưới đều: {(cx, cy): [key, ...]} + {key: bbox}"""
+
+    def __init__(self, cell_size=50.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.boxes = {}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _cell_range(self, bbox):
+        size = self.cell_size
+        return (range(math.floor(bbox[0] / size), math.floor(bbox[2] / size) + 1),
+                range(math.floor(bbox[1] / size), math.floor(bbox[3] / size) + 1))
+
+    def insert(self, key, bbox):
+        """Thêm (hoặc cập nhật) bbox cho key"""
+        if key in self.boxes:
+            self.remove(key)
+        self.boxes[key] = bbox
+        cols, rows = self._cell_range(bbox)
+        for cx in cols:
+            for cy in rows:
+                self.cells.setdefault((cx, cy), []).append(key)
+
+    def remove(self, key):
+        bbox = self.boxes.pop(key, None)
+        if bbox is None:
+            return
+        cols, rows = self._cell_range(bbox)
+        for cx in cols:
+            for cy in rows:
+                bucket = self.cells.get((cx, cy))
+                if bucket and key in bucket:
+                    bucket.remove(key)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def query_bbox(self, bbox):
+        """Các key có bbox giao với vùng bbox"""
+        found = set()
+        cols, rows = self._cell_range(bbox)
+        for cx in cols:
+            for cy in rows:
+                for key in self.cells.get((cx, cy), ()):
+                    if key not in found and bbox_intersects(self.boxes[key], bbox):
+                        found.add(key)
+        return found
+
+    def query_point(self, x, y, radius=0.0):
+        """Các key có bbox (nới rộng radius) chứa điểm (x, y)"""
+        return self.query_bbox((x - radius, y - radius, x + radius, y + radius))
+
+    def nearest(self, x, y, max_distance, distance=point_to_bbox_distance, exclude=()):
+        """
+        Key gần điểm (x, y) nhất trong phạm vi max_distance
+
+        Returns:
+            List (distance, key) đã sắp xếp tăng dần theo khoảng cách, rồi theo diện tích bbox
+        """
+        results = []
+        for key in self.query_point(x, y, max_distance):
+            if key in exclude:
+                continue
+            d = distance(self.boxes[key], x, y)
+            if d <= max_distance:
+                results.append((d, bbox_area(self.boxes[key]), key))
+        results.sort(key=lambda item: (item[0], item[1]))
+        return [(d, key) for d, _, key in results]
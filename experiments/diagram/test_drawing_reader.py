@@ -0,0 +1,26 @@
+"""
+Test drawing_reader.py: đọc headless phải khớp với *_analysis.json tạo bằng revert.py (COM)
+
+Chạy: python -m pytest experiments/diagram/test_drawing_reader.py
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from compact import load_diagram_json  # noqa: E402
+from drawing_reader import compare_with_analysis, read_workbook_diagram  # noqa: E402
+
+WORKBOOK = os.path.join(HERE, "RPA業務フロー_MOCS登録前のExcelDLL不備チェック.xlsx")
+ANALYSIS = os.path.join(HERE, "RPA業務フロー_MOCS登録前のExcelDLL不備チェック_analysis.json")
+
+
+def test_parity_with_com_analysis():
+    analysis = load_diagram_json(ANALYSIS)
+    headless = read_workbook_diagram(WORKBOOK)
+
+    assert compare_with_analysis(headless, analysis) == []
+    assert sum(sheet["total_shapes"] for sheet in headless.values()) == \
+        sum(sheet["total_shapes"] for sheet in analysis.values()) == 61
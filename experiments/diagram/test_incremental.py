@@ -0,0 +1,54 @@
+"""
+Test incremental.py: cập nhật lại workbook bằng chính spec đã vẽ ra nó thì không có thao tác nào
+
+Chạy: python -m pytest experiments/diagram/test_incremental.py
+"""
+
+import copy
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from compact import load_diagram_json  # noqa: E402
+from drawing_writer import render_diagram  # noqa: E402
+from incremental import update_workbook  # noqa: E402
+
+NO_CHANGES = {"added": 0, "removed": 0, "moved": 0, "replaced": 0, "skipped": 0}
+
+
+@pytest.mark.parametrize("spec_file", ["diagram.json", "login_flow.json", "dynamic_flowchart.json"])
+def test_update_with_same_spec_is_noop(tmp_path, spec_file):
+    data = load_diagram_json(os.path.join(HERE, spec_file))
+    excel_file = str(tmp_path / "diagram.xlsx")
+    render_diagram(data, excel_file)
+
+    report = update_workbook(excel_file, data, dry_run=True)
+
+    for sheet_name, sheet in data.items():
+        stats = report[sheet_name]
+        assert {key: stats[key] for key in NO_CHANGES} == NO_CHANGES
+        assert stats["unchanged"] == len(sheet["shapes"])
+
+
+def test_update_touches_only_changed_shapes(tmp_path):
+    data = load_diagram_json(os.path.join(HERE, "login_flow.json"))
+    excel_file = str(tmp_path / "diagram.xlsx")
+    render_diagram(data, excel_file)
+
+    new_data = copy.deepcopy(data)
+    shapes = next(iter(new_data.values()))["shapes"]
+    shapes[0]["position"]["left"] += 30
+    connector = next(shape for shape in shapes if shape.get("type_name") == "Connector")
+    connector["line_color"] = "#00FF00"
+
+    report = update_workbook(excel_file, new_data)
+    stats = next(iter(report.values()))
+    assert (stats["moved"], stats["replaced"], stats["added"], stats["removed"]) == (1, 1, 0, 0)
+
+    # Chạy lại với cùng spec: đã khớp, không còn gì để sửa
+    stats = next(iter(update_workbook(excel_file, new_data, dry_run=True).values()))
+    assert {key: stats[key] for key in NO_CHANGES} == NO_CHANGES
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Suy ra topology (node/edge) từ diagram đã phân tích
+Mỗi connector được nối vào shape ở hai đầu:
+  1. theo stCxn/endCxn (DrawingML) hoặc BeginConnectedShape/EndConnectedShape (COM) nếu có
+  2. nếu không có, tìm shape gần đầu mút nhất qua spatial index
+Xuất graph ra JSON, DOT (Graphviz) hoặc Mermaid.
+
+Usage:
+    python topology.py RPA業務フロー_xxx.xlsx --format mermaid
+    python topology.py RPA業務フロー_xxx_analysis.json --format dot -o flow.dot
+"""
+
+import json
+import math
+import re
+import sys
+
+from compact import load_diagram_json
+from drawing_reader import MSO_GROUP, MSO_PICTURE, MSO_TEXT_BOX
+from drawing_writer import CONNECTOR_GEOMETRIES
+from spatial import (SpatialGrid, bbox_from_position, bbox_center, bbox_area, bbox_contains,
+                     bbox_contains_point, point_to_bbox_distance, point_to_border_distance)
+
+# Khoảng cách tối đa (point) từ đầu connector tới viền shape để coi là nối vào shape đó
+ENDPOINT_TOLERANCE = 6.0
+# stCxn/endCxn chỉ được tin khi shape được tham chiếu cách đầu connector không quá ngưỡng này
+CONNECTION_TOLERANCE = 12.0
+# Khoảng cách tối đa từ text box tới connector để làm nhãn cho edge
+LABEL_TOLERANCE = 20.0
+# Text box chỉ làm nhãn cho shape có diện tích không quá HOST_AREA_RATIO lần text box
+HOST_AREA_RATIO = 3.0
+# bbox mỏng hơn ngưỡng này (group bọc connector có padding cho arrowhead) -> coi là đường thẳng
+THIN_LINE = 6.0
+
+
+def is_connector(shape):
+    """Shape có phải connector/line không"""
+    geometry = shape.get("geometry")
+    if geometry:
+        return geometry in CONNECTOR_GEOMETRIES
+    children = shape.get("children")
+    if children:
+        return all(is_connector(child) for child in children)
+    if shape.get("type") == MSO_PICTURE:
+        return False
+    return shape.get("type") == MSO_GROUP or shape.get("type_name") == "Connector"
+
+
+def _connector_info(shape):
+    """(connection, flip, rotation) của connector; group thì lấy của connector con đầu tiên"""
+    connection, flip, rotation = shape.get("connection"), shape.get("flip"), shape.get("rotation")
+    for child in shape.get("children") or ():
+        if is_connector(child):
+            connection = connection or child.get("connection")
+            flip = flip or child.get("flip")
+            rotation = rotation or child.get("rotation")
+            break
+    return connection or {}, flip, rotation
+
+
+def _orientations(shape, flip, rotation):
+    """
+    Các phương án (flip, rotation) cần thử. Đọc từ .xlsx thì biết chính xác;
+    file phân tích COM không có flip/rotation -> thử cả 4 cách đặt đầu/cuối vào góc bbox.
+    """
+    known = "geometry" in shape or shape.get("children") or "rotation" in shape
+    if flip is None and rotation is None and not known:
+        return [(None, 0), ({"h": True}, 0), ({"v": True}, 0), ({"h": True, "v": True}, 0)]
+    return [(flip, rotation or 0)]
+
+
+def _endpoints(bbox, flip=None, rotation=0):
+    """Đầu/cuối connector: góc khung trước khi xoay -> lật -> xoay quanh tâm bbox"""
+    x0, y0, x1, y1 = bbox
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    width, height = x1 - x0, y1 - y0
+    if round(rotation) % 180 == 90:
+        width, height = height, width
+    flip = flip or {}
+    sx = -1 if flip.get("h") else 1
+    sy = -1 if flip.get("v") else 1
+    angle = math.radians(rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    points = []
+    for lx, ly in ((-width / 2 * sx, -height / 2 * sy), (width / 2 * sx, height / 2 * sy)):
+        x, y = cx + lx * cos - ly * sin, cy + lx * sin + ly * cos
+        # bbox mỏng (group có padding cho arrowhead) -> coi là đường thẳng qua tâm
+        if y1 - y0 <= THIN_LINE:
+            y = cy
+        if x1 - x0 <= THIN_LINE:
+            x = cx
+        points.append((x, y))
+    return points[0], points[1]
+
+
+def _arrow(shape):
+    """Hướng mũi tên: forward (begin->end), backward, both, none"""
+    begin = shape.get("arrow_begin") not in (None, 1, -2)
+    end = shape.get("arrow_end") not in (None, 1, -2)
+    return {(False, True): "forward", (True, False): "backward", (True, True): "both"}.get((begin, end), "none")
+
+
+def _node_id(shape):
+    return str(shape["id"]) if shape.get("id") is not None else f"s{shape['index']}"
+
+
+def _node_shape(shape):
+    geometry = shape.get("geometry")
+    if geometry:
+        return geometry
+    return {"Rounded Rectangle": "roundRect", "Diamond": "diamond", "Oval": "ellipse",
+            "Ellipse/Oval": "ellipse"}.get(shape.get("type_name"), "rect")
+
+
+class _NodeIndex:
+    """Spatial index của các node, dùng để nối đầu connector vào shape gần nhất"""
+
+    def __init__(self, nodes):
+        self.nodes = {node["id"]: node for node in nodes}
+        self.grid = SpatialGrid()
+        for node in nodes:
+            self.grid.insert(node["id"], node["_bbox"])
+
+    def _distance(self, bbox, x, y, node_id):
+        # Đầu connector nằm trong shape thường (không phải khung chứa) cũng tính là nối vào
+        if not self.nodes[node_id]["children"] and bbox_contains_point(bbox, x, y):
+            return 0.0
+        return point_to_border_distance(bbox, x, y)
+
+    def resolve(self, point, tolerance):
+        """-> (node_id, distance) hoặc (None, None)"""
+        best = None
+        for node_id in self.grid.query_point(point[0], point[1], tolerance):
+            d = self._distance(self.grid.boxes[node_id], point[0], point[1], node_id)
+            if d <= tolerance:
+                rank = (round(d, 1), bbox_area(self.grid.boxes[node_id]))
+                if best is None or rank < best[0]:
+                    best = (rank, node_id, d)
+        return (best[1], best[2]) if best else (None, None)
+
+
+def _resolve_edge(index, aliases, connection, bbox, orientations, tolerance):
+    """
+    Nối hai đầu connector vào node.
+    stCxn/endCxn chỉ được tin khi shape được tham chiếu nằm đúng ở đầu tương ứng: file đã qua
+    nhiều lần chuyển đổi có thể giữ id cũ không còn khớp cNvPr id. Đầu nào không có/không tin
+    được thì tìm shape gần nhất qua spatial index.
+
+    Returns:
+        (source, target, số đầu lấy từ connection)
+    """
+    references = []
+    for key in ("begin", "end"):
+        reference = connection.get(key)
+        node_id = aliases.get(str(reference[0]), str(reference[0])) if reference else None
+        references.append(node_id if node_id in index.nodes else None)
+
+    best = None
+    for flip, rotation in orientations:
+        ends = []
+        begin, end = _endpoints(bbox, flip, rotation)
+        for reference, point in zip(references, (begin, end)):
+            if reference and point_to_bbox_distance(index.grid.boxes[reference], *point) <= CONNECTION_TOLERANCE:
+                ends.append((reference, 0.0, True))
+            else:
+                node_id, d = index.resolve(point, tolerance)
+                ends.append((node_id, d or 0.0, False))
+        if ends[0][0] is not None and ends[0][0] == ends[1][0]:
+            # Hai đầu cùng một shape -> bỏ đầu kém tin cậy hơn
+            drop = 0 if ends[1][2] or (not ends[0][2] and ends[0][1] > ends[1][1]) else 1
+            ends[drop] = (None, 0.0, False)
+        resolved = sum(node_id is not None for node_id, _, _ in ends)
+        trusted = sum(from_cxn for _, _, from_cxn in ends)
+        # Hòa điểm (không biết chiều) -> ưu tiên chiều đọc: trái -> phải, trên -> dưới
+        backward_flow = (end[0] - begin[0]) + (end[1] - begin[1]) < 0
+        score = (-resolved, -trusted, round(sum(d for _, d, _ in ends), 1), backward_flow)
+        if best is None or score < best[0]:
+            best = (score, ends)
+    ends = best[1]
+    return ends[0][0], ends[1][0], sum(from_cxn for _, _, from_cxn in ends)
+
+
+def _assign_parents(nodes):
+    """Node nằm trọn trong node khác (khung/swimlane) -> parent là khung nhỏ nhất chứa nó"""
+    grid = SpatialGrid(cell_size=100.0)
+    by_id = {node["id"]: node for node in nodes}
+    for node in nodes:
+        grid.insert(node["id"], node["_bbox"])
+    for node in nodes:
+        containers = [by_id[other] for other in grid.query_bbox(node["_bbox"])
+                      if other != node["id"] and bbox_area(by_id[other]["_bbox"]) > bbox_area(node["_bbox"])
+                      and bbox_contains(by_id[other]["_bbox"], node["_bbox"], margin=0.5)]
+        if containers:
+            parent = min(containers, key=lambda n: bbox_area(n["_bbox"]))
+            node["parent"] = parent["id"]
+            parent["children"].append(node["id"])
+
+
+def build_graph(shapes, tolerance=ENDPOINT_TOLERANCE):
+    """
+    Dựng graph từ danh sách shapes của một sheet (schema revert.py / drawing_reader)
+
+    Returns:
+        {"nodes": [...], "edges": [...], "annotations": [...]}
+    """
+    connectors, text_boxes, nodes = [], [], []
+    for shape in shapes:
+        if is_connector(shape):
+            connectors.append(shape)
+        elif shape.get("type") == MSO_TEXT_BOX or shape.get("type_name") in ("TextBox", "Text Box"):
+            text_boxes.append(shape)
+        else:
+            nodes.append({
+                "id": _node_id(shape),
+                "name": shape.get("name"),
+                "label": (shape.get("text") or "").strip(),
+                "shape": _node_shape(shape),
+                "position": shape.get("position"),
+                "parent": None,
+                "children": [],
+                "_bbox": bbox_from_position(shape.get("position") or {}),
+            })
+
+    # Text box đè lên shape không có text (kiểu RPA業務フロー) -> nhãn của shape đó
+    node_grid = SpatialGrid()
+    for node in nodes:
+        node_grid.insert(node["id"], node["_bbox"])
+    by_id = {node["id"]: node for node in nodes}
+    free_text = []
+    aliases = {}
+    for box in text_boxes:
+        box_bbox = bbox_from_position(box.get("position") or {})
+        cx, cy = bbox_center(box_bbox)
+        # Chỉ nhận shape cỡ tương đương text box, không nhận khung lớn bao quanh
+        hosts = [by_id[k] for k in node_grid.query_point(cx, cy)
+                 if not by_id[k]["label"] and bbox_contains_point(by_id[k]["_bbox"], cx, cy)
+                 and bbox_area(by_id[k]["_bbox"]) <= HOST_AREA_RATIO * max(bbox_area(box_bbox), 1.0)]
+        if hosts:
+            host = min(hosts, key=lambda n: bbox_area(n["_bbox"]))
+            host["label"] = (box.get("text") or "").strip()
+            aliases[_node_id(box)] = host["id"]
+        else:
+            free_text.append(box)
+
+    _assign_parents(nodes)
+    index = _NodeIndex(nodes)
+
+    edges = []
+    for shape in connectors:
+        bbox = bbox_from_position(shape.get("position") or {})
+        connection, flip, rotation = _connector_info(shape)
+        source, target, from_connection = _resolve_edge(
+            index, aliases, connection, bbox, _orientations(shape, flip, rotation), tolerance)
+        if source is None or target is None:
+            resolved_by = "partial"
+        else:
+            resolved_by = {2: "connection", 1: "connection+spatial", 0: "spatial"}[from_connection]
+
+        edges.append({
+            "id": _node_id(shape),
+            "name": shape.get("name"),
+            "source": source,
+            "target": target,
+            "source_site": connection["begin"][1] if connection.get("begin") else None,
+            "target_site": connection["end"][1] if connection.get("end") else None,
+            "arrow": _arrow(shape),
+            "label": "",
+            "resolved_by": resolved_by,
+            "_bbox": bbox,
+        })
+
+    # Text box tự do gần connector -> nhãn của edge (vd "あり"/"なし")
+    edge_grid = SpatialGrid()
+    for i, edge in enumerate(edges):
+        edge_grid.insert(i, edge["_bbox"])
+    annotations = []
+    for box in free_text:
+        text = (box.get("text") or "").strip()
+        cx, cy = bbox_center(bbox_from_position(box.get("position") or {}))
+        near = edge_grid.nearest(cx, cy, LABEL_TOLERANCE, distance=point_to_bbox_distance)
+        unlabeled = [i for _, i in near if not edges[i]["label"]]
+        if text and unlabeled:
+            edges[unlabeled[0]]["label"] = text
+        elif text:
+            annotations.append({"id": _node_id(box), "text": text, "position": box.get("position")})
+
+    for item in nodes + edges:
+        item.pop("_bbox", None)
+    return {"nodes": nodes, "edges": edges, "annotations": annotations}
+
+
+def build_graphs(diagram_data, tolerance=ENDPOINT_TOLERANCE):
+    """{sheet: {"shapes": [...]}} -> {sheet: graph}"""
+    return {sheet: build_graph(data.get("shapes", []), tolerance) for sheet, data in diagram_data.items()}
+
+
+def flow_direction(graph):
+    """'LR' nếu các edge chủ yếu đi ngang, 'TB' nếu chủ yếu đi dọc"""
+    centers = {}
+    for node in graph["nodes"]:
+        position = node.get("position") or {}
+        centers[node["id"]] = bbox_center(bbox_from_position(position))
+    horizontal = vertical = 0.0
+    for edge in graph["edges"]:
+        if edge["source"] in centers and edge["target"] in centers:
+            (x0, y0), (x1, y1) = centers[edge["source"]], centers[edge["target"]]
+            horizontal += abs(x1 - x0)
+            vertical += abs(y1 - y0)
+    return "TB" if vertical > horizontal else "LR"
+
+
+def _dot_quote(text):
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\x0b", "\\n") + '"'
+
+
+DOT_SHAPES = {"diamond": "diamond", "ellipse": "ellipse", "roundRect": "box", "rect": "box"}
+
+
+def to_dot(graph, name="diagram"):
+    """graph -> Graphviz DOT (khung chứa -> subgraph cluster)"""
+    by_id = {node["id"]: node for node in graph["nodes"]}
+    lines = [f"digraph {_dot_quote(name)} {{", f"  rankdir={flow_direction(graph)};", '  node [shape=box, fontname="Meiryo UI"];']
+
+    def emit(node, indent):
+        pad = "  " * indent
+        if node["children"]:
+            lines.append(f"{pad}subgraph {_dot_quote('cluster_' + node['id'])} {{")
+            lines.append(f"{pad}  label={_dot_quote(node['label'] or node['name'] or '')};")
+            for child_id in node["children"]:
+                emit(by_id[child_id], indent + 1)
+            lines.append(f"{pad}}}")
+        else:
+            style = ", style=rounded" if node["shape"] == "roundRect" else ""
+            lines.append(f"{pad}{_dot_quote(node['id'])} [label={_dot_quote(node['label'] or node['name'] or '')}, "
+                         f"shape={DOT_SHAPES.get(node['shape'], 'box')}{style}];")
+
+    for node in graph["nodes"]:
+        if node["parent"] is None:
+            emit(node, 1)
+
+    for edge in graph["edges"]:
+        ends = []
+        for key in ("source", "target"):
+            if edge[key] is None:
+                # Đầu không nối vào shape nào -> node dạng point
+                dangling = f"{edge['id']}_{key}"
+                lines.append(f"  {_dot_quote(dangling)} [shape=point];")
+                ends.append(dangling)
+            elif by_id[edge[key]]["children"]:
+                # Graphviz không nối được vào cluster -> nối vào node đại diện trong khung
+                ends.append(edge[key] + "_frame")
+                lines.append(f"  {_dot_quote(ends[-1])} [shape=plaintext, label={_dot_quote(by_id[edge[key]]['label'])}];")
+            else:
+                ends.append(edge[key])
+        attrs = [f"dir={ {'forward': 'forward', 'backward': 'back', 'both': 'both'}.get(edge['arrow'], 'none') }"]
+        if edge["label"]:
+            attrs.append(f"label={_dot_quote(edge['label'])}")
+        lines.append(f"  {_dot_quote(ends[0])} -> {_dot_quote(ends[1])} [{', '.join(attrs)}];")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _mermaid_id(node_id):
+    return "n" + re.sub(r"\W", "_", str(node_id))
+
+
+def _mermaid_text(text):
+    return '"' + str(text).replace('"', "#quot;").replace("\n", "<br/>").replace("\x0b", "<br/>") + '"'
+
+
+MERMAID_SHAPES = {"diamond": "{%s}", "ellipse": "((%s))", "roundRect": "(%s)"}
+
+
+def to_mermaid(graph, direction=None):
+    """graph -> Mermaid flowchart (khung chứa -> subgraph); direction mặc định tự suy ra"""
+    by_id = {node["id"]: node for node in graph["nodes"]}
+    direction = direction or {"TB": "TD", "LR": "LR"}[flow_direction(graph)]
+    lines = [f"flowchart {direction}"]
+
+    def emit(node, indent):
+        pad = "    " * indent
+        label = _mermaid_text(node["label"] or node["name"] or "")
+        if node["children"]:
+            lines.append(f"{pad}subgraph {_mermaid_id(node['id'])}[{label}]")
+            for child_id in node["children"]:
+                emit(by_id[child_id], indent + 1)
+            lines.append(f"{pad}end")
+        else:
+            lines.append(f"{pad}{_mermaid_id(node['id'])}" + MERMAID_SHAPES.get(node["shape"], "[%s]") % label)
+
+    for node in graph["nodes"]:
+        if node["parent"] is None:
+            emit(node, 1)
+
+    arrows = {"forward": "-->", "backward": "<--", "both": "<-->", "none": "---"}
+    for edge in graph["edges"]:
+        ends = []
+        for key in ("source", "target"):
+            if edge[key] is None:
+                ends.append(_mermaid_id(f"{edge['id']}_{key}"))
+                lines.append(f"    {ends[-1]}(( ))")
+            else:
+                ends.append(_mermaid_id(edge[key]))
+        arrow = arrows[edge["arrow"]]
+        if edge["arrow"] == "backward":
+            # Mermaid không có "<--" một chiều -> đảo chiều edge
+            ends.reverse()
+            arrow = "-->"
+        label = f"|{_mermaid_text(edge['label'])}|" if edge["label"] else ""
+        lines.append(f"    {ends[0]} {arrow}{label} {ends[1]}")
+    return "\n".join(lines) + "\n"
+
+
+def load_diagram(input_file):
+    """File .xlsx (đọc headless, có stCxn/endCxn) hoặc file JSON đã phân tích (đầy đủ/rút gọn)"""
+    if input_file.lower().endswith((".xlsx", ".xlsm")):
+        from drawing_reader import read_workbook_diagram
+        return read_workbook_diagram(input_file, include_extra=True)
+    return load_diagram_json(input_file)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Suy ra graph node/edge từ diagram Excel")
+    parser.add_argument("input", help="File .xlsx hoặc *_analysis.json")
+    parser.add_argument("--format", choices=["json", "dot", "mermaid"], default="json")
+    parser.add_argument("--sheet", help="Chỉ xuất một sheet")
+    parser.add_argument("--tolerance", type=float, default=ENDPOINT_TOLERANCE,
+                        help=f"Khoảng cách tối đa (pt) từ đầu connector tới shape (mặc định {ENDPOINT_TOLERANCE})")
+    parser.add_argument("-o", "--output", help="File output (mặc định: stdout)")
+    args = parser.parse_args()
+
+    diagram = load_diagram(args.input)
+    if args.sheet:
+        if args.sheet not in diagram:
+            parser.error(f"Không có sheet '{args.sheet}'")
+        diagram = {args.sheet: diagram[args.sheet]}
+    graphs = build_graphs(diagram, args.tolerance)
+
+    if args.format == "json":
+        output = json.dumps(graphs, indent=2, ensure_ascii=False) + "\n"
+    elif args.format == "dot":
+        output = "".join(to_dot(graph, sheet) for sheet, graph in graphs.items())
+    else:
+        output = "\n".join(f"%% Sheet: {sheet}\n{to_mermaid(graph)}" for sheet, graph in graphs.items())
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+    for sheet, graph in graphs.items():
+        unresolved = sum(1 for e in graph["edges"] if e["source"] is None or e["target"] is None)
+        print(f"Sheet '{sheet}': {len(graph['nodes'])} nodes, {len(graph['edges'])} edges"
+              + (f", {unresolved} edge chưa nối đủ 2 đầu" if unresolved else ""), file=sys.stderr)
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Dịch diagram (ja <-> vi) qua JSON schema của revert.py, không cần mở Excel
+
+1. Đọc diagram: file .xlsx đọc headless bằng drawing_reader, hoặc diagram JSON (đầy đủ/rút gọn).
+2. Gom text của mọi shape (kể cả shape con trong group) trên tất cả file input,
+   bỏ trùng -> mỗi câu chỉ dịch một lần; câu đã có trong translation memory thì bỏ qua.
+3. Dịch theo batch (giới hạn số câu + số ký tự), các batch chạy song song.
+   Batch trả về sai số đoạn thì chia đôi và dịch lại thay vì lệch câu; lỗi API khác
+   (client đã tự retry 429/5xx) thì dừng hẳn, không chia nhỏ ra gọi thêm.
+4. Gán text mới và chỉnh box cho vừa chữ: nới ngang (tối đa MAX_WIDTH_GROWTH) rồi nới dọc;
+   đụng shape bên cạnh thì thu nhỏ font (tối thiểu MIN_FONT_SCALE); vẫn không vừa thì đành nới
+   đè lên shape bên cạnh và cảnh báo. Connector nối vào box đã đổi kích thước được định tuyến
+   lại bằng router.
+5. Ghi <tên>_<lang>.json và render thẳng ra <tên>_<lang>.xlsx bằng drawing_writer.
+
+Usage:
+    python translate.py RPA業務フロー_xxx.xlsx --to vi
+    python translate.py flows/ --to ja --memory memory.json --output-dir translated
+    python translate.py diagram.json --to vi --dry-run        # chỉ đếm câu/batch, không gọi API
+
+Cần: pip install openai httpx python-dotenv, biến môi trường GEMINI_API_KEY (giống trans-excel2.py);
+client API dùng chung với các translator khác (experiments/shared/llm_client.py, chỉnh qua LLM_*)
+"""
+
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from preview import DEFAULT_FONT_SIZE, TEXT_INSET_X, TEXT_INSET_Y, _text_width, _wrap
+from drawing_reader import H_ALIGN, V_ALIGN
+from router import route_diagram
+from spatial import SpatialGrid, bbox_contains, bbox_from_position
+from topology import _node_id, build_graph, is_connector
+
+# experiments/shared: llm_client (client API có connection pool, dùng chung với trans-excel2.py / slide-tran.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+BATCH_SIZE = 100        # Số câu tối đa mỗi batch
+BATCH_CHARS = 4000      # Số ký tự tối đa mỗi batch
+SEPARATOR = "|||"
+LINE_BREAK = "<br>"     # Xuống dòng trong shape, gửi dạng tag để model không làm mất
+LINE_SPACING = 1.2
+MAX_WIDTH_GROWTH = 1.6  # Box chỉ được nới ngang tối đa 1.6 lần
+MIN_FONT_SCALE = 0.7    # Font chỉ được thu nhỏ tới 70%
+LANGUAGES = {"ja": "Japanese", "vi": "Vietnamese"}
+
+SYSTEM_PROMPT = """You are a professional translator for business flow diagrams (RPA / system flowcharts).
+Follow these rules strictly:
+1. Output ONLY the translations, nothing else
+2. Translate every segment separated by "|||" and keep them separated with the same delimiter, in the same order
+3. Keep "<br>" line-break tags; you may move them so each line stays short
+4. Labels are short box captions: keep them concise, do not add explanations
+5. Keep product names, IDs, file names, and system codes unchanged (e.g. WinActor, MOCS, DLL)"""
+
+
+def _is_cjk(ch):
+    return unicodedata.east_asian_width(ch) in "WF" and ch.isalpha()
+
+
+def needs_translation(text, target_lang):
+    """Chỉ dịch câu còn chữ của ngôn ngữ nguồn: sang vi cần có kana/kanji, sang ja cần có chữ Latin"""
+    if not text or not text.strip():
+        return False
+    if target_lang == "vi":
+        return any(_is_cjk(ch) for ch in text)
+    return any(ch.isalpha() and not _is_cjk(ch) for ch in text)
+
+
+def normalize_text(text):
+    """Xuống dòng của Excel (\\r\\n, \\r, \\x0b) -> \\n"""
+    return text.replace("\r\n", "\n").replace("\r", "\n").replace("\x0b", "\n")
+
+
+def iter_text_shapes(shapes):
+    """Duyệt shape có text, kể cả shape con trong group"""
+    for shape in shapes:
+        if shape.get("text"):
+            yield shape
+        if shape.get("children"):
+            yield from iter_text_shapes(shape["children"])
+
+
+def collect_texts(diagrams, target_lang):
+    """Danh sách câu cần dịch (bỏ trùng, giữ thứ tự xuất hiện) trên mọi diagram"""
+    texts = {}
+    for data in diagrams:
+        for sheet_data in data.values():
+            for shape in iter_text_shapes(sheet_data.get("shapes", [])):
+                text = normalize_text(shape["text"]).strip()
+                if needs_translation(text, target_lang):
+                    texts.setdefault(text, None)
+    return list(texts)
+
+
+def make_batches(texts, batch_size=BATCH_SIZE, batch_chars=BATCH_CHARS):
+    """Chia câu thành batch theo cả số câu lẫn tổng số ký tự"""
+    batches, current, chars = [], [], 0
+    for text in texts:
+        if current and (len(current) >= batch_size or chars + len(text) > batch_chars):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(text)
+        chars += len(text) + len(SEPARATOR)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class SegmentCountError(ValueError):
+    """Model trả về số đoạn khác số câu gửi đi"""
+
+
+def translate_batch(client, texts, target_lang, model=DEFAULT_MODEL, system_prompt=SYSTEM_PROMPT):
+    """
+    Dịch một batch bằng một lần gọi API
+
+    Returns:
+        list bản dịch cùng độ dài với texts
+
+    Raises:
+        SegmentCountError: Số đoạn trả về khác số câu gửi đi
+    """
+    source = "Vietnamese" if target_lang == "ja" else "Japanese"
+    combined = SEPARATOR.join(text.replace("\n", LINE_BREAK) for text in texts)
+    user_prompt = (f"Translate the following text from {source} to {LANGUAGES[target_lang]}, "
+                   f"keeping segments separated by '{SEPARATOR}':\n\n{combined}")
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+    )
+    parts = (response.choices[0].message.content or "").strip().split(SEPARATOR)
+    if len(parts) != len(texts):
+        raise SegmentCountError(f"Nhận {len(parts)} đoạn, gửi {len(texts)} câu")
+    return [re.sub(r"\s*<br\s*/?>\s*", "\n", part, flags=re.I).strip() for part in parts]
+
+
+def _translate_resilient(client, texts, target_lang, model, system_prompt):
+    """
+    Dịch batch; lệch số đoạn thì chia đôi và dịch lại
+
+    Lỗi API khác (auth, quota, mạng sau khi client đã retry...) không sửa được bằng cách chia
+    nhỏ batch - chia ra chỉ nhân số request lên - nên được raise tiếp.
+
+    Returns:
+        (dict câu -> bản dịch, số câu dịch lỗi - giữ nguyên bản gốc)
+    """
+    try:
+        return dict(zip(texts, translate_batch(client, texts, target_lang, model, system_prompt))), 0
+    except SegmentCountError as e:
+        if len(texts) == 1:
+            print(f"   ⚠️  Không dịch được '{texts[0][:30]}': {e}")
+            return {}, 1
+        print(f"   ⚠️  Batch {len(texts)} câu lỗi ({e}) -> chia đôi")
+    middle = len(texts) // 2
+    left, left_failed = _translate_resilient(client, texts[:middle], target_lang, model, system_prompt)
+    right, right_failed = _translate_resilient(client, texts[middle:], target_lang, model, system_prompt)
+    left.update(right)
+    return left, left_failed + right_failed
+
+
+def translate_texts(texts, target_lang, client=None, model=DEFAULT_MODEL, system_prompt=SYSTEM_PROMPT,
+                    batch_size=BATCH_SIZE, batch_chars=BATCH_CHARS, workers=4):
+    """
+    Dịch danh sách câu theo batch, các batch chạy song song
+
+    Returns:
+        (dict câu -> bản dịch, số câu dịch lỗi)
+    """
+    batches = make_batches(texts, batch_size, batch_chars)
+    if not batches:
+        return {}, 0
+    if client is None:
+        # Import muộn để --dry-run không cần openai/httpx; pool cỡ bằng số luồng gọi song song
+        from llm_client import get_client
+        client = get_client(workers)
+    translations, failed = {}, 0
+    print(f"📦 Dịch {len(texts)} câu trong {len(batches)} batch ({workers} luồng)")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(_translate_resilient, client, batch, target_lang, model, system_prompt)
+                   for batch in batches]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                result, batch_failed = future.result()
+                translations.update(result)
+                failed += batch_failed
+                print(f"   🔄 {done}/{len(batches)} batch xong")
+        except Exception:
+            # Lỗi API: bỏ các batch chưa chạy thay vì tiếp tục gọi API đang lỗi
+            for future in futures:
+                future.cancel()
+            raise
+    return translations, failed
+
+
+def load_memory(memory_file):
+    """Translation memory: {"vi": {câu gốc: bản dịch}, "ja": {...}}"""
+    if memory_file and os.path.exists(memory_file):
+        with open(memory_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_memory(memory, memory_file):
+    tmp_file = memory_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(memory, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_file, memory_file)
+
+
+# ---------------------------------------------------------------- chỉnh box cho vừa chữ
+
+
+def text_height(text, size, width):
+    """Chiều cao cần để chứa text trong box rộng width (ngắt dòng ước lượng như preview)"""
+    inner = max(width - 2 * TEXT_INSET_X, size)
+    lines = sum(len(_wrap(line, size, inner)) for line in text.split("\n"))
+    return lines * size * LINE_SPACING + 2 * TEXT_INSET_Y
+
+
+def _natural_width(text, size):
+    """Độ rộng để mọi dòng nằm trên một hàng"""
+    return max(_text_width(line, size) for line in text.split("\n")) + 2 * TEXT_INSET_X + 1
+
+
+def _grown_box(bbox, width, height, alignment):
+    """Box mới cỡ width x height, neo theo căn lề của text (trái/phải/giữa, trên/dưới/giữa)"""
+    x0, y0, x1, y1 = bbox
+    horizontal = alignment.get("horizontal", H_ALIGN["ctr"])
+    vertical = alignment.get("vertical", V_ALIGN["ctr"])
+    if horizontal == H_ALIGN["l"]:
+        left = x0
+    elif horizontal == H_ALIGN["r"]:
+        left = x1 - width
+    else:
+        left = (x0 + x1 - width) / 2
+    if vertical == V_ALIGN["t"]:
+        top = y0
+    elif vertical == V_ALIGN["b"]:
+        top = y1 - height
+    else:
+        top = (y0 + y1 - height) / 2
+    return (left, top, left + width, top + height)
+
+
+def _fit_options(text, size, bbox):
+    """Các box ứng viên theo thứ tự ưu tiên: nới ngang vừa đủ, nới dọc, nới cả hai"""
+    x0, y0, x1, y1 = bbox
+    width, height = x1 - x0, y1 - y0
+    widest = max(width, min(width * MAX_WIDTH_GROWTH, _natural_width(text, size)))
+    options = []
+    steps = 8
+    for step in range(1, steps + 1):
+        candidate = width + (widest - width) * step / steps
+        if text_height(text, size, candidate) <= height:
+            options.append((candidate, height))
+            break
+    options.append((width, text_height(text, size, width)))
+    options.append((widest, max(height, text_height(text, size, widest))))
+    return options
+
+
+def fit_sheet(shapes, translated):
+    """
+    Chỉnh box của các shape đã dịch (translated: list shape) cho vừa text mới
+
+    Container (chứa shape khác) và shape con trong group giữ nguyên box, chỉ thu nhỏ font.
+
+    Returns:
+        (tập id node đã đổi kích thước, stats {"resized", "shrunk", "overlap", "overflow"})
+    """
+    stats = {"resized": 0, "shrunk": 0, "overlap": 0, "overflow": 0}
+    graph = build_graph(shapes)
+    containers = {node["id"] for node in graph["nodes"] if node.get("children")}
+    grid = SpatialGrid()
+    for shape in shapes:
+        if not is_connector(shape) and shape.get("position"):
+            grid.insert(_node_id(shape), bbox_from_position(shape["position"]))
+    top_level = {id(shape) for shape in shapes}
+
+    resized = set()
+    for shape in translated:
+        if is_connector(shape) or not shape.get("position"):
+            continue
+        key = _node_id(shape)
+        text = shape["text"]
+        font = shape.setdefault("font", {})
+        size = font.get("size") or DEFAULT_FONT_SIZE
+        bbox = bbox_from_position(shape["position"])
+        if text_height(text, size, bbox[2] - bbox[0]) <= bbox[3] - bbox[1] + 0.5:
+            continue
+
+        chosen = None
+        if id(shape) in top_level and key not in containers:
+            for width, height in _fit_options(text, size, bbox):
+                box = _grown_box(bbox, width, height, shape.get("alignment") or {})
+                # Không tính container bao quanh shape (swimlane, frame) là va chạm
+                hits = [other for other in grid.query_bbox(box)
+                        if other != key and not bbox_contains(grid.boxes[other], bbox)]
+                if not hits:
+                    chosen = box
+                    break
+        if chosen is None:
+            scale = 1.0
+            while scale - 0.05 >= MIN_FONT_SCALE - 1e-9 and text_height(text, size * scale, bbox[2] - bbox[0]) > bbox[3] - bbox[1]:
+                scale -= 0.05
+            if text_height(text, size * scale, bbox[2] - bbox[0]) <= bbox[3] - bbox[1] + 0.5:
+                font["size"] = round(size * scale * 2) / 2
+                stats["shrunk"] += 1
+                continue
+            if id(shape) in top_level and key not in containers:
+                # Không còn chỗ: vẫn nới box (chữ tràn còn tệ hơn box đè nhau)
+                width, height = _fit_options(text, size, bbox)[-1]
+                chosen = _grown_box(bbox, width, height, shape.get("alignment") or {})
+                stats["overlap"] += 1
+            else:
+                font["size"] = round(size * MIN_FONT_SCALE * 2) / 2
+                stats["overflow"] += 1
+                continue
+
+        x0, y0, x1, y1 = chosen
+        shape["position"] = {"left": round(x0, 2), "top": round(y0, 2),
+                             "width": round(x1 - x0, 2), "height": round(y1 - y0, 2)}
+        grid.remove(key)
+        grid.insert(key, chosen)
+        resized.add(key)
+        stats["resized"] += 1
+    return resized, stats
+
+
+def apply_translations(data, translations, font_name=None, fit=True):
+    """
+    Gán bản dịch vào diagram (sửa tại chỗ), chỉnh box và định tuyến lại connector bị ảnh hưởng
+
+    Returns:
+        dict {sheet: {"texts", "resized", "shrunk", "overlap", "overflow", "rerouted"}}
+    """
+    report = {}
+    for sheet_name, sheet_data in data.items():
+        shapes = sheet_data.get("shapes", [])
+        translated = []
+        for shape in iter_text_shapes(shapes):
+            new_text = translations.get(normalize_text(shape["text"]).strip())
+            if new_text is None:
+                continue
+            shape["text"] = new_text
+            if font_name:
+                shape.setdefault("font", {})["name"] = font_name
+            translated.append(shape)
+        stats = {"texts": len(translated), "resized": 0, "shrunk": 0, "overlap": 0, "overflow": 0, "rerouted": 0}
+        if fit and translated:
+            resized, fit_stats = fit_sheet(shapes, translated)
+            stats.update(fit_stats)
+            if resized:
+                edges = {edge["id"] for edge in build_graph(shapes)["edges"]
+                         if edge["source"] in resized or edge["target"] in resized}
+                _, route_stats = route_diagram({sheet_name: sheet_data}, only=edges)
+                stats["rerouted"] = route_stats["routed"]
+        report[sheet_name] = stats
+    return report
+
+
+def is_translated_output(path):
+    """File do chính tool này ghi ra: <tên>_<lang>.json / .xlsx"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return any(stem.endswith(f"_{lang}") for lang in LANGUAGES)
+
+
+def _input_files(inputs, exclude=()):
+    """
+    File .xlsx/.xlsm/.json; thư mục thì lấy các file đó ở cấp đầu
+
+    Trong thư mục bỏ qua output của lần chạy trước (<tên>_<lang>.*, output mặc định nằm
+    cạnh input) và các file trong exclude (translation memory), để chạy lại không dịch
+    chồng thành <tên>_vi_vi.*. File chỉ định trực tiếp thì luôn được lấy.
+    """
+    exclude = {os.path.abspath(path) for path in exclude if path}
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith((".xlsx", ".xlsm", ".json")) and not name.startswith("~$")
+                         and not is_translated_output(name)
+                         and os.path.abspath(os.path.join(path, name)) not in exclude)
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from compact import save_diagram_json
+    from drawing_writer import is_diagram_spec, render_diagram
+    from topology import load_diagram
+
+    parser = argparse.ArgumentParser(description="Dịch diagram ja <-> vi qua JSON, render lại .xlsx không cần Excel")
+    parser.add_argument("inputs", nargs="+", help="File .xlsx / diagram JSON, hoặc thư mục chứa chúng")
+    parser.add_argument("--to", choices=list(LANGUAGES), default="vi", help="Ngôn ngữ đích (mặc định: vi)")
+    parser.add_argument("--output-dir", help="Thư mục output (mặc định: cạnh file input)")
+    parser.add_argument("--memory", help="File translation memory JSON (đọc trước khi dịch, ghi thêm sau khi dịch)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--prompt", help="File system prompt thay cho prompt mặc định")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-chars", type=int, default=BATCH_CHARS)
+    parser.add_argument("--workers", type=int, default=4, help="Số batch gọi API song song")
+    parser.add_argument("--font", help="Đổi font cho text đã dịch (vd 'Meiryo UI')")
+    parser.add_argument("--no-fit", action="store_true", help="Không chỉnh kích thước box")
+    parser.add_argument("--no-render", action="store_true", help="Chỉ ghi JSON, không render .xlsx")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm câu/batch, không gọi API")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    diagrams = []
+    for input_file in _input_files(args.inputs, exclude=[args.memory]):
+        try:
+            data = load_diagram(input_file)
+        except Exception as e:
+            print(f"❌ {os.path.basename(input_file)}: {e}")
+            continue
+        if input_file.lower().endswith(".json") and not is_diagram_spec(data):
+            print(f"⏩ Bỏ qua {os.path.basename(input_file)} (không phải diagram JSON)")
+            continue
+        diagrams.append((input_file, data))
+    if not diagrams:
+        parser.error("Không có diagram nào để dịch")
+
+    texts = collect_texts([data for _, data in diagrams], args.to)
+    memory = load_memory(args.memory)
+    known = memory.setdefault(args.to, {})
+    pending = [text for text in texts if text not in known]
+    batches = make_batches(pending, args.batch_size, args.batch_chars)
+    print(f"📊 {len(diagrams)} diagram, {len(texts)} câu khác nhau, "
+          f"{len(texts) - len(pending)} câu có sẵn trong memory, {len(pending)} câu cần dịch ({len(batches)} batch)")
+    if args.dry_run:
+        raise SystemExit(0)
+
+    if pending:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()  # GEMINI_API_KEY / LLM_* từ .env, trước khi tạo client
+        except ImportError:
+            pass
+        system_prompt = SYSTEM_PROMPT
+        if args.prompt:
+            with open(args.prompt, "r", encoding="utf-8") as f:
+                system_prompt = f.read()
+        translations, failed = translate_texts(pending, args.to, model=args.model, system_prompt=system_prompt,
+                                               batch_size=args.batch_size, batch_chars=args.batch_chars,
+                                               workers=args.workers)
+        known.update(translations)
+        if failed:
+            print(f"⚠️  {failed} câu dịch lỗi, giữ nguyên bản gốc")
+        if args.memory:
+            save_memory(memory, args.memory)
+            print(f"💾 Đã lưu translation memory: {args.memory}")
+
+    for input_file, data in diagrams:
+        report = apply_translations(data, known, args.font, fit=not args.no_fit)
+        base = os.path.splitext(os.path.basename(input_file))[0]
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(input_file))
+        os.makedirs(output_dir, exist_ok=True)
+        json_file = os.path.join(output_dir, f"{base}_{args.to}.json")
+        save_diagram_json(data, json_file)
+        print(f"\n📄 {os.path.basename(input_file)}")
+        for sheet_name, stats in report.items():
+            print(f"   Sheet '{sheet_name}': dịch {stats['texts']} shape, nới {stats['resized']} box, "
+                  f"thu nhỏ font {stats['shrunk']}, định tuyến lại {stats['rerouted']} connector"
+                  + (f", ⚠️  {stats['overlap']} box nới đè lên shape khác" if stats["overlap"] else "")
+                  + (f", ⚠️  {stats['overflow']} shape vẫn tràn chữ" if stats["overflow"] else ""))
+        print(f"✅ Đã xuất ra file: {json_file}")
+        if not args.no_render:
+            xlsx_file = os.path.join(output_dir, f"{base}_{args.to}.xlsx")
+            render_diagram(data, xlsx_file)
+            print(f"✅ Đã render ra file: {xlsx_file}")
+    print(f"\n⏱️  Tổng thời gian: {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,134 @@
+"""Shared, pooled OpenAI-compatible client for the translator scripts.
+
+trans-excel2.py, slide-tran.py and diagram/translate.py import this module
+instead of building their own client. One tuned httpx.Client per process is created lazily on first
+use and reused for every file of a directory run:
+
+- keep-alive connection reuse (no new TLS handshake per batch)
+- explicit connect / read / pool timeouts instead of httpx's 5s default
+- HTTP/2 when the optional ``h2`` package is installed (or forced via env)
+- pool size bounded by the caller's request concurrency
+- connection-level retries in the transport, plus the OpenAI SDK's
+  backoff retries for 429 / 5xx responses
+
+Tuning via environment variables (all optional):
+    LLM_CONNECT_TIMEOUT   seconds to establish a connection (default 10)
+    LLM_READ_TIMEOUT      seconds to wait for a response (default 120)
+    LLM_HTTP2             1 / 0 to force HTTP/2 on / off (default: on if h2 is installed)
+    LLM_MAX_RETRIES       SDK retries on 429 / 5xx / timeouts (default 3)
+    LLM_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+
+Usage:
+    from llm_client import get_client
+    client = get_client(concurrency=4)
+    client.chat.completions.create(model=..., messages=[...])
+"""
+
+import atexit
+import functools
+import os
+import threading
+
+import httpx
+from openai import OpenAI
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+# Defaults for the LLM_* variables; read at client creation so a later load_dotenv() still applies
+DEFAULTS = {"LLM_CONNECT_TIMEOUT": 10.0, "LLM_READ_TIMEOUT": 120.0, "LLM_MAX_RETRIES": 3, "LLM_KEEPALIVE_EXPIRY": 30.0}
+CONNECT_RETRIES = 2  # Transport-level retries for failed connects only (requests are never resent here)
+
+# (pid, base_url, api_key, concurrency, http2) -> OpenAI; the pid keeps forked workers off the parent's sockets
+_clients = {}
+_lock = threading.Lock()
+
+
+def setting(name):
+    """Value of an LLM_* tuning variable, typed like its default."""
+    default = DEFAULTS[name]
+    value = os.getenv(name, "").strip()
+    return type(default)(value) if value else default
+
+
+def timeout():
+    """Connect / read timeouts; waiting for a free pooled connection may take as long as a whole request."""
+    read = setting("LLM_READ_TIMEOUT")
+    return httpx.Timeout(read, connect=setting("LLM_CONNECT_TIMEOUT"), pool=read)
+
+
+@functools.lru_cache(maxsize=None)
+def _h2_installed():
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    except ImportError:
+        return False
+    return True
+
+
+def http2_enabled():
+    """HTTP/2 setting from LLM_HTTP2, falling back to whether the h2 package is importable."""
+    value = os.getenv("LLM_HTTP2", "").strip().lower()
+    if value in ("0", "false", "no", "off"):
+        return False
+    if value in ("1", "true", "yes", "on") and not _h2_installed():
+        raise RuntimeError("LLM_HTTP2 is set but the 'h2' package is missing: pip install httpx[http2]")
+    return _h2_installed()
+
+
+def create_http_client(concurrency=1, http2=None):
+    """
+    Build a pooled httpx.Client sized for ``concurrency`` simultaneous requests
+
+    With HTTP/2 all requests multiplex over one connection per host, so the
+    pool mostly matters for HTTP/1.1, where each in-flight request holds one.
+    """
+    concurrency = max(1, int(concurrency))
+    if http2 is None:
+        http2 = http2_enabled()
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=setting("LLM_KEEPALIVE_EXPIRY"),
+    )
+    transport = httpx.HTTPTransport(http2=http2, limits=limits, retries=CONNECT_RETRIES)
+    return httpx.Client(transport=transport, timeout=timeout())
+
+
+def get_client(concurrency=1, api_key=None, base_url=GEMINI_BASE_URL, http2=None):
+    """
+    Process-wide OpenAI client for base_url, created on first use and then reused
+
+    Args:
+        concurrency: maximum requests this process sends at the same time (pool size)
+        api_key: defaults to $GEMINI_API_KEY (read at call time, so load_dotenv() may run first)
+        base_url: OpenAI-compatible endpoint
+        http2: force HTTP/2 on/off; None uses LLM_HTTP2 / h2 availability
+    """
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    if http2 is None:
+        http2 = http2_enabled()
+    key = (os.getpid(), base_url, api_key, max(1, int(concurrency)), http2)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=create_http_client(concurrency, http2),
+                max_retries=setting("LLM_MAX_RETRIES"),
+                timeout=timeout(),
+            )
+            _clients[key] = client
+    return client
+
+
+def close_clients():
+    """Close the pooled connections of every client created by this process."""
+    with _lock:
+        for key, client in list(_clients.items()):
+            if key[0] == os.getpid():
+                client.close()
+            del _clients[key]
+
+
+atexit.register(close_clients)
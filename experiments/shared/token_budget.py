@@ -0,0 +1,331 @@
+"""Token budget governor and model-tier routing for translation batches.
+
+Segments are routed by length and complexity to one of three model tiers:
+short labels (cell values, headings, button text) go to the cheapest / fastest
+tier, long specification prose to a stronger model, everything else to the
+standard tier. Batches are formed per tier, so one long paragraph does not
+drag a hundred labels onto the expensive model.
+
+Before each request the governor estimates prompt and completion tokens and
+reserves their cost against the per-run and per-day budgets; the request is
+refused (BudgetExceeded) when it would overrun either. After the response,
+the reservation is corrected with the real usage the API reports. Day totals
+are kept in a small JSON ledger so several runs on the same day share one
+daily budget.
+
+Per file, the governor keeps the projected spend (estimated before sending)
+next to the actual spend, for the end-of-file report.
+
+Tiers (USD per 1M tokens; approximate list prices, adjust to your contract)
+can be overridden with a JSON file in $LLM_TIERS_FILE of the same shape as
+DEFAULT_TIERS, or per tier with $LLM_MODEL_FAST / _STANDARD / _STRONG.
+
+Usage:
+    governor = BudgetGovernor(run_usd=2.0, day_usd=10.0, ledger_path="budget_ledger.json")
+    for tier, indices in route_batches(texts, batch_size=30):
+        reservation = governor.reserve(tier, prompt_tokens, completion_tokens, file="deck.pptx")
+        response = client.chat.completions.create(model=governor.model(tier), ...)
+        governor.record(reservation, response.usage)
+    print(format_spend(governor.file_report("deck.pptx")))
+    governor.commit()
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import re
+from datetime import datetime, timezone
+
+TIER_ORDER = ("fast", "standard", "strong")
+DEFAULT_TIERS = {
+    "fast": {"model": "gemini-2.0-flash-lite", "input": 0.075, "output": 0.30},
+    "standard": {"model": "gemini-2.5-flash-lite", "input": 0.10, "output": 0.40},
+    "strong": {"model": "gemini-2.5-flash", "input": 0.30, "output": 2.50},
+}
+
+# Routing thresholds, in estimated tokens
+SHORT_TOKENS = 12  # Single-line segments up to this size are labels
+LONG_TOKENS = 80  # Segments from this size (or with 3+ sentences) are prose
+
+# Japanese output of a Vietnamese source (and vice versa) is about this many tokens per source token
+OUTPUT_RATIO = 1.3
+SEPARATOR_TOKENS = 2  # Per-segment overhead of the batch separator
+
+LEDGER_DAYS = 31  # Days kept in the ledger
+
+_CJK = re.compile("[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_SENTENCE_END = re.compile(r"[.!?。！？](?:\s|$)")
+
+
+class BudgetExceeded(RuntimeError):
+    """A request (or a whole file) would overrun the run or day budget."""
+
+
+def load_tiers():
+    """DEFAULT_TIERS with the $LLM_TIERS_FILE and $LLM_MODEL_<TIER> overrides applied."""
+    tiers = {name: dict(values) for name, values in DEFAULT_TIERS.items()}
+    tiers_file = os.getenv("LLM_TIERS_FILE")
+    if tiers_file:
+        with open(tiers_file, "r", encoding="utf-8") as f:
+            for name, values in json.load(f).items():
+                tiers.setdefault(name, {}).update(values)
+    for name in tiers:
+        model = os.getenv(f"LLM_MODEL_{name.upper()}")
+        if model:
+            tiers[name]["model"] = model
+    return tiers
+
+
+def estimate_tokens(text):
+    """Rough token count: about one token per CJK character, three characters per token otherwise
+    (Vietnamese diacritics split more than plain English)."""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 3)
+
+
+def estimate_completion(texts):
+    """Expected completion tokens for translating texts."""
+    return math.ceil(sum(estimate_tokens(t) for t in texts) * OUTPUT_RATIO) + SEPARATOR_TOKENS * len(texts)
+
+
+def classify(text):
+    """Tier for one segment: "fast" for labels, "strong" for long prose, else "standard"."""
+    tokens = estimate_tokens(text)
+    sentences = len(_SENTENCE_END.findall(text.strip()))
+    if tokens <= SHORT_TOKENS and "\n" not in text.strip() and sentences <= 1:
+        return "fast"
+    if tokens >= LONG_TOKENS or sentences >= 3:
+        return "strong"
+    return "standard"
+
+
+def route_batches(texts, batch_size, routing=True, default_tier="standard"):
+    """
+    Split texts into batches of at most batch_size, one tier per batch
+
+    Returns:
+        [(tier, [indices into texts])], cheapest tier first; within a tier the
+        original order is kept. With routing=False every batch uses default_tier.
+    """
+    groups = {}
+    for index, text in enumerate(texts):
+        groups.setdefault(classify(text) if routing else default_tier, []).append(index)
+    batches = []
+    for tier in sorted(groups, key=lambda t: TIER_ORDER.index(t) if t in TIER_ORDER else len(TIER_ORDER)):
+        indices = groups[tier]
+        batches.extend((tier, indices[i:i + batch_size]) for i in range(0, len(indices), batch_size))
+    return batches
+
+
+def _today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+# Slots of the shared spend array
+RUN_USD, RUN_TOKENS, DAY_USD, DAY_TOKENS = range(4)
+
+
+class BudgetGovernor:
+    """Enforce per-run / per-day spend limits and track projected vs actual spend per file.
+
+    The spend counters live in shared memory (like slide-tran's RateLimiter), so
+    worker processes attached via worker_args() / attach() draw from one budget.
+    Only the process that created the governor writes the ledger (commit()).
+    """
+
+    def __init__(self, run_usd=None, day_usd=None, run_tokens=None, day_tokens=None,
+                 ledger_path=None, tiers=None, lock=None, spent=None):
+        self.limits = {"run_usd": run_usd, "day_usd": day_usd, "run_tokens": run_tokens, "day_tokens": day_tokens}
+        self.ledger_path = ledger_path
+        self.tiers = tiers or load_tiers()
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+        self.spent = spent if spent is not None else multiprocessing.Array("d", 4, lock=False)
+        self.files = {}  # file -> projected / actual spend, local to the process handling the file
+        self._committed = (0.0, 0.0)  # Run spend already written to the ledger
+        if spent is None:
+            day = self._load_ledger().get(_today(), {})
+            self.spent[DAY_USD] = day.get("usd", 0.0)
+            self.spent[DAY_TOKENS] = day.get("tokens", 0)
+
+    # ------------------------------------------------------------ processes
+
+    def worker_args(self):
+        """Arguments for attach() in a pool initializer."""
+        return self.limits, self.tiers, self.lock, self.spent
+
+    @classmethod
+    def attach(cls, limits, tiers, lock, spent):
+        """Governor for a worker process, sharing the parent's counters."""
+        return cls(tiers=tiers, lock=lock, spent=spent, **limits)
+
+    # ------------------------------------------------------------ costs
+
+    def model(self, tier):
+        return self.tiers[tier]["model"]
+
+    def cost(self, tier, prompt_tokens, completion_tokens):
+        """USD for a request of this size on tier."""
+        prices = self.tiers[tier]
+        return (prompt_tokens * prices.get("input", 0.0) + completion_tokens * prices.get("output", 0.0)) / 1_000_000
+
+    def remaining(self):
+        """{"usd": .., "tokens": ..} left under the tightest run/day limits (None = unlimited)."""
+        with self.lock:
+            spent = list(self.spent)
+        left = {"usd": None, "tokens": None}
+        for key, limit, used in (("usd", self.limits["run_usd"], spent[RUN_USD]),
+                                 ("usd", self.limits["day_usd"], spent[DAY_USD]),
+                                 ("tokens", self.limits["run_tokens"], spent[RUN_TOKENS]),
+                                 ("tokens", self.limits["day_tokens"], spent[DAY_TOKENS])):
+            if limit is not None:
+                left[key] = limit - used if left[key] is None else min(left[key], limit - used)
+        return left
+
+    def exhausted(self):
+        """Whether any budget is used up."""
+        left = self.remaining()
+        return any(value is not None and value <= 0 for value in left.values())
+
+    def _over(self, usd, tokens):
+        """Description of the first limit usd / tokens more would overrun, or None. Caller holds the lock."""
+        for name, limit, used, extra, unit in (
+                ("run", self.limits["run_usd"], self.spent[RUN_USD], usd, "$"),
+                ("daily", self.limits["day_usd"], self.spent[DAY_USD], usd, "$"),
+                ("run", self.limits["run_tokens"], self.spent[RUN_TOKENS], tokens, "tokens"),
+                ("daily", self.limits["day_tokens"], self.spent[DAY_TOKENS], tokens, "tokens")):
+            if limit is not None and used + extra > limit:
+                if unit == "$":
+                    return f"{name} budget ${limit:.4f} (spent ${used:.4f}, needs ${extra:.4f})"
+                return f"{name} budget {int(limit)} tokens (spent {int(used)}, needs {int(extra)})"
+        return None
+
+    # ------------------------------------------------------------ per file
+
+    def project(self, file, batches):
+        """
+        Add the estimate for a file's batches and refuse the file when it cannot fit
+
+        Args:
+            batches: [(tier, prompt_tokens, completion_tokens)]
+
+        Raises:
+            BudgetExceeded: the projection is larger than what is left of a budget
+        """
+        usd = sum(self.cost(tier, p, c) for tier, p, c in batches)
+        tokens = sum(p + c for _, p, c in batches)
+        stats = self._file(file)
+        stats["projected_usd"] += usd
+        stats["projected_tokens"] += tokens
+        with self.lock:
+            over = self._over(usd, tokens)
+        if over:
+            raise BudgetExceeded(f"{file}: projected ${usd:.4f} / {tokens} tokens exceeds the {over}")
+        return usd, tokens
+
+    def file_report(self, file):
+        """Projected vs actual spend of a finished file (and forget it)."""
+        return self.files.pop(file, None) or self._file(file, keep=False)
+
+    def _file(self, file, keep=True):
+        stats = self.files.get(file)
+        if stats is None:
+            stats = {"file": file, "projected_usd": 0.0, "projected_tokens": 0,
+                     "actual_usd": 0.0, "actual_tokens": 0, "requests": 0, "tiers": {}}
+            if keep:
+                self.files[file] = stats
+        return stats
+
+    # ------------------------------------------------------------ requests
+
+    def reserve(self, tier, prompt_tokens, completion_tokens, file=None):
+        """
+        Reserve the estimated cost of one request before it is sent
+
+        Raises:
+            BudgetExceeded: the request would overrun a budget
+        """
+        usd = self.cost(tier, prompt_tokens, completion_tokens)
+        tokens = prompt_tokens + completion_tokens
+        with self.lock:
+            over = self._over(usd, tokens)
+            if over:
+                raise BudgetExceeded(f"Batch on {self.model(tier)} refused: {over}")
+            self._add(usd, tokens)
+        return {"tier": tier, "file": file, "usd": usd, "tokens": tokens}
+
+    def record(self, reservation, usage):
+        """Replace the reservation with the usage the API reported (the estimate stays if it reported none)."""
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if prompt is None or completion is None:
+            usd, tokens = reservation["usd"], reservation["tokens"]
+        else:
+            usd, tokens = self.cost(reservation["tier"], prompt, completion), prompt + completion
+            with self.lock:
+                self._add(usd - reservation["usd"], tokens - reservation["tokens"])
+        if reservation["file"] is not None:
+            stats = self._file(reservation["file"])
+            stats["actual_usd"] += usd
+            stats["actual_tokens"] += tokens
+            stats["requests"] += 1
+            stats["tiers"][reservation["tier"]] = stats["tiers"].get(reservation["tier"], 0) + 1
+        return usd, tokens
+
+    def release(self, reservation):
+        """Give back a reservation whose request failed."""
+        with self.lock:
+            self._add(-reservation["usd"], -reservation["tokens"])
+
+    def _add(self, usd, tokens):
+        self.spent[RUN_USD] += usd
+        self.spent[RUN_TOKENS] += tokens
+        self.spent[DAY_USD] += usd
+        self.spent[DAY_TOKENS] += tokens
+
+    # ------------------------------------------------------------ ledger
+
+    def _load_ledger(self):
+        if not self.ledger_path:
+            return {}
+        try:
+            with open(self.ledger_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def commit(self):
+        """Add the spend since the last commit to today's ledger entry (call from the owning process).
+
+        Long-running (watch mode) processes commit after every file; after midnight
+        UTC the daily counters restart from the new day's ledger entry.
+        """
+        if not self.ledger_path:
+            return
+        with self.lock:
+            run_usd, run_tokens = self.spent[RUN_USD], self.spent[RUN_TOKENS]
+            delta_usd, delta_tokens = run_usd - self._committed[0], run_tokens - self._committed[1]
+            self._committed = (run_usd, run_tokens)
+            ledger = self._load_ledger()
+            today = _today()
+            entry = ledger.setdefault(today, {"usd": 0.0, "tokens": 0})
+            entry["usd"] = round(entry["usd"] + delta_usd, 6)
+            entry["tokens"] = int(entry["tokens"] + delta_tokens)
+            for day in sorted(ledger)[:-LEDGER_DAYS]:
+                del ledger[day]
+            tmp_path = self.ledger_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(ledger, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.ledger_path)
+            # Other runs may have spent today as well; continue from the ledger total
+            self.spent[DAY_USD] = entry["usd"]
+            self.spent[DAY_TOKENS] = entry["tokens"]
+
+
+def format_spend(report):
+    """One-line projected vs actual summary of a file_report()."""
+    tiers = ", ".join(f"{tier} x{count}" for tier, count in sorted(report["tiers"].items())) or "no requests"
+    return (f"projected ${report['projected_usd']:.4f} / {report['projected_tokens']} tokens, "
+            f"actual ${report['actual_usd']:.4f} / {report['actual_tokens']} tokens ({tiers})")
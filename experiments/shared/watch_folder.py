@@ -0,0 +1,163 @@
+"""Watch an input folder for dropped files, for the translators' --watch mode.
+
+Polling (not inotify) so it behaves the same on Windows and macOS, where the
+translators run next to Excel / PowerPoint. A file is handed out once it is
+"settled": its size and mtime have not changed for ``settle`` seconds and it
+can be opened for writing (a file still being copied, or open in Office, is
+locked on Windows).
+
+Every file gets a status record ``<status_dir>/<file name>.json``:
+
+    {"file": ..., "state": "processing" | "done" | "partial" | "skipped" | "failed", "output": ...,
+     "error": ..., "reason": ..., "started_at": ..., "finished_at": ..., "seconds": ...,
+     "source": {"size": ..., "mtime_ns": ...}}
+
+"partial" is a file whose output was written but is incomplete (e.g. the token
+budget ran out); "skipped" is a file there was nothing to do for (e.g. no text
+to translate); "reason" says why. A file whose record is finished (done /
+partial / skipped / failed) for the same size and mtime is not picked up
+again, also after a restart; dropping a new version (or touching the file)
+processes it again.
+"""
+
+import fnmatch
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+FINISHED_STATES = ("done", "partial", "skipped", "failed")
+
+# Names written by copy tools / browsers / Office while a file is incomplete
+TEMP_PATTERNS = ("~$*", ".~*", "*.tmp", "*.part", "*.partial", "*.crdownload", "*.download")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _signature(info):
+    return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def _unlocked(path):
+    """Whether the file can be opened for writing (Windows refuses while another process writes it)."""
+    try:
+        with open(path, "rb+"):
+            return True
+    except PermissionError:
+        # Read-only files can never be opened this way; they are not being written either
+        return not os.access(path, os.W_OK)
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """Hand out settled files from input_dir and keep their status records."""
+
+    def __init__(self, input_dir, patterns, status_dir, settle=3.0):
+        self.input_dir = input_dir
+        self.patterns = patterns
+        self.status_dir = status_dir
+        self.settle = settle
+        self.active = set()  # Files handed out and not finished yet
+        # path -> (signature, monotonic time it was first seen with it, or None once processed)
+        self._pending = {}
+        os.makedirs(status_dir, exist_ok=True)
+
+    def status_path(self, path):
+        return os.path.join(self.status_dir, os.path.basename(path) + ".json")
+
+    def read_status(self, path):
+        try:
+            with open(self.status_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_status(self, path, record):
+        """Write the record atomically, so a reader never sees half a file."""
+        status_path = self.status_path(path)
+        tmp_path = status_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, status_path)
+
+    def _finished(self, path, signature):
+        record = self.read_status(path)
+        return bool(record) and record.get("state") in FINISHED_STATES and record.get("source") == signature
+
+    def _candidates(self):
+        try:
+            names = sorted(os.listdir(self.input_dir))
+        except OSError:
+            return
+        for name in names:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in TEMP_PATTERNS):
+                continue
+            if any(fnmatch.fnmatch(name.lower(), pattern) for pattern in self.patterns):
+                path = os.path.join(self.input_dir, name)
+                if os.path.isfile(path):
+                    yield path
+
+    def ready(self):
+        """Settled files that have not been processed in their current version, oldest first."""
+        now = time.monotonic()
+        seen = set()
+        ready = []
+        for path in self._candidates():
+            seen.add(path)
+            if path in self.active:
+                continue
+            try:
+                signature = _signature(os.stat(path))
+            except OSError:
+                continue
+            pending = self._pending.get(path)
+            if pending is not None and pending[0] == signature and pending[1] is None:
+                continue  # Already processed in this version
+            if pending is None or pending[0] != signature:
+                if self._finished(path, signature):
+                    self._pending[path] = (signature, None)
+                    continue
+                # New or still growing: restart the settle timer
+                self._pending[path] = (signature, now)
+                continue
+            if now - pending[1] >= self.settle and _unlocked(path):
+                ready.append((signature["mtime_ns"], path))
+        for path in set(self._pending) - seen:
+            del self._pending[path]
+        return [path for _, path in sorted(ready)]
+
+    def start(self, path):
+        """Mark path as being processed; returns the record to pass to finish()."""
+        info = os.stat(path)
+        self._pending.pop(path, None)
+        self.active.add(path)
+        record = {"file": os.path.basename(path), "state": "processing", "output": None, "error": None,
+                  "reason": None, "started_at": _now(), "finished_at": None, "seconds": None, "source": _signature(info),
+                  "_started": time.monotonic()}
+        self.write_status(path, {k: v for k, v in record.items() if not k.startswith("_")})
+        return record
+
+    def finish(self, path, record, output=None, error=None, skipped=None, partial=None):
+        """Record the outcome; a file that changed while it was processed will be picked up again.
+
+        skipped: reason there was nothing to write (not a failure), e.g. "no text"
+        partial: reason the written output is incomplete, e.g. the budget ran out
+        """
+        self.active.discard(path)
+        seconds = round(time.monotonic() - record["_started"], 2)
+        record = {k: v for k, v in record.items() if not k.startswith("_")}
+        if skipped and not error:
+            state, reason = "skipped", skipped
+        elif output and not error:
+            state, reason = ("partial", partial) if partial else ("done", None)
+        else:
+            state, reason = "failed", None
+        record.update(state=state, output=output, error=error, reason=reason,
+                      finished_at=_now(), seconds=seconds)
+        if record["state"] == "failed" and not error:
+            record["error"] = "no output was written"
+        self.write_status(path, record)
+        return record